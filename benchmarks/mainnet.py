@@ -0,0 +1,315 @@
+"""Mainnet-scale benchmarks of the slot processing against a synthetic network.
+
+Usage:
+
+    python -m benchmarks.mainnet [--validators 1000000] [--watched 10000] [--output results.json] [--baseline previous.json]
+
+A synthetic network (see benchmarks.synthetic) is served by a local
+beacon stand-in and processed by a watcher as it would on the first
+slots of an epoch: validators, liveness, rewards and queues once, then
+duties, metrics aggregation, export and a Prometheus scrape for each
+slot. Requests to the beacon are reported per endpoint, split between
+the request and the parsing of the response.
+
+Results are written as JSON. With --baseline, stages slower than the
+baseline by more than the tolerance are reported and the command
+fails, so that regressions are caught.
+"""
+
+import argparse
+import json
+import logging
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from prometheus_client import REGISTRY
+
+from eth_validator_watcher.duties import process_duties
+from eth_validator_watcher.entrypoint import ValidatorWatcher
+from eth_validator_watcher.metrics import MetricsExporter, compute_validator_metrics
+from eth_validator_watcher.price import PriceFetcher, StaticPriceSource
+from eth_validator_watcher.queues import get_pending_consolidations, get_pending_deposits, get_pending_withdrawals
+from eth_validator_watcher.rewards import process_rewards
+from eth_validator_watcher.watched_keys import WatchedKeys, save_watched_keys_file
+from eth_validator_watcher.watched_validators import WatchedValidators
+
+from .pubkey_index import _rss
+from .synthetic import SLOTS_PER_EPOCH, BeaconStandIn, SyntheticNetwork
+
+
+NETWORK = 'synthetic'
+
+ENDPOINTS = [
+    'validators', 'liveness', 'rewards', 'pending_deposits', 'pending_consolidations',
+    'pending_withdrawals', 'committees', 'attestations',
+]
+
+# Categories of labels given to the watched keys.
+LABEL_CATEGORIES = {'operator': 10, 'vc': 100, 'region': 4}
+
+
+class Timings:
+    """Collect the durations of the benchmark stages."""
+
+    def __init__(self) -> None:
+        self.stages: dict[str, list[float]] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.stages.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        return {
+            name: {'median_seconds': statistics.median(durations), 'max_seconds': max(durations), 'runs': len(durations)}
+            for name, durations in self.stages.items()
+        }
+
+
+def _free_port() -> int:
+    """Find a free TCP port on the loopback interface.
+
+    Args:
+        None
+
+    Returns:
+        int
+            A port number.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss() -> int:
+    """Get the peak resident set size of the process.
+
+    Args:
+        None
+
+    Returns:
+        int
+            Peak resident set size in bytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _endpoint_seconds(metric: str) -> dict[str, float]:
+    """Get the cumulated time of beacon requests per endpoint.
+
+    Args:
+        metric: str
+            Name of the histogram.
+
+    Returns:
+        dict[str, float]
+            Seconds per endpoint.
+    """
+    return {
+        endpoint: REGISTRY.get_sample_value(f'{metric}_sum', {'endpoint': endpoint, 'network': NETWORK}) or 0.0
+        for endpoint in ENDPOINTS
+    }
+
+
+def _write_config(directory: Path, network: SyntheticNetwork, beacon_url: str, watched: int) -> Path:
+    """Write the configuration of the watcher and its watched keys.
+
+    Args:
+        directory: Path
+            Where to write the files.
+        network: SyntheticNetwork
+            Network to watch.
+        beacon_url: str
+            URL of the beacon stand-in.
+        watched: int
+            Number of watched validators.
+
+    Returns:
+        Path
+            Path of the configuration file.
+    """
+    keys = WatchedKeys()
+    for i in range(watched):
+        keys.add(network.pubkeys[i], [f'{category}:{category}-{i % count}' for category, count in LABEL_CATEGORIES.items()])
+    save_watched_keys_file(str(directory / 'keys.bin'), keys)
+
+    path = directory / 'config.yaml'
+    path.write_text(json.dumps({
+        'network': NETWORK,
+        'beacon_url': beacon_url,
+        'beacon_timeout_sec': 600,
+        'metrics_port': _free_port(),
+        'watched_keys_file': str(directory / 'keys.bin'),
+    }))
+    return path
+
+
+def run(validators: int, watched: int, slots: int, seed: int) -> dict:
+    """Process a synthetic network and time each stage.
+
+    Args:
+        validators: int
+            Number of validators on the network.
+        watched: int
+            Number of watched validators.
+        slots: int
+            Number of slots to process.
+        seed: int
+            Seed of the synthetic network.
+
+    Returns:
+        dict
+            Results of the benchmark.
+    """
+    timings = Timings()
+    rss_before = _rss()
+    start = time.perf_counter()
+    network = SyntheticNetwork(validators, seed)
+    generate_seconds = time.perf_counter() - start
+    stand_in = BeaconStandIn(network).start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cfg_path = _write_config(Path(directory), network, stand_in.url, watched)
+        watcher = ValidatorWatcher(cfg_path)
+        # The price would be fetched from Coinbase otherwise.
+        watcher._exporter = MetricsExporter(watcher._metrics, time.monotonic(), PriceFetcher(StaticPriceSource(3000.0)))
+        beacon = watcher._beacon
+        metrics_url = f'http://127.0.0.1:{watcher._cfg.metrics_port}/metrics'
+
+        epoch = 200_000
+        first_slot = epoch * SLOTS_PER_EPOCH + 1
+        stand_in.finalized_slot = first_slot - 2 * SLOTS_PER_EPOCH
+        registry = WatchedValidators()
+
+        rss_start = _rss()
+        with timings.stage('process_config'):
+            registry.process_config(watcher._cfg)
+        with timings.stage('fetch_validators'):
+            beacon_validators = beacon.get_validators(first_slot)
+        with timings.stage('process_epoch'):
+            registry.process_epoch(beacon_validators)
+        del beacon_validators
+
+        with timings.stage('liveness'):
+            liveness = beacon.get_validators_liveness(epoch - 1, registry.get_watched_indexes())
+            registry.process_liveness(liveness, epoch)
+        with timings.stage('fetch_rewards'):
+            rewards = beacon.get_rewards(epoch - 2)
+        with timings.stage('process_rewards'):
+            process_rewards(registry, rewards, epoch - 2)
+        del rewards
+        with timings.stage('queues'):
+            pending_deposits = get_pending_deposits(beacon)
+            pending_consolidations = get_pending_consolidations(beacon)
+            pending_withdrawals = get_pending_withdrawals(beacon)
+
+        scrape_bytes = 0
+        for slot in range(first_slot, first_slot + slots):
+            with timings.stage('fetch_duties'):
+                committees = beacon.get_committees(slot - 1)
+                attestations = beacon.get_attestations(slot)
+            with timings.stage('process_duties'):
+                process_duties(registry, committees, attestations, slot)
+            with timings.stage('compute_validator_metrics'):
+                compute_validator_metrics(registry, slot)
+            with timings.stage('update_metrics'):
+                watcher._update_metrics(registry, epoch, slot, pending_deposits, pending_consolidations, pending_withdrawals)
+            with timings.stage('scrape'):
+                with urllib.request.urlopen(metrics_url, timeout=60) as response:
+                    scrape_bytes = len(response.read())
+
+        results = {
+            'validators': validators,
+            'watched': watched,
+            'slots': slots,
+            'seed': seed,
+            'generate_seconds': generate_seconds,
+            'stages': timings.summary(),
+            'beacon': {
+                'request_seconds': _endpoint_seconds('eth_watcher_beacon_request_seconds'),
+                'parse_seconds': _endpoint_seconds('eth_watcher_beacon_parse_seconds'),
+            },
+            'scrape_bytes': scrape_bytes,
+            'registry': registry.get_native_stats(),
+            'rss_growth_bytes': _rss() - rss_start,
+            'synthetic_rss_bytes': rss_start - rss_before,
+            'peak_rss_bytes': _peak_rss(),
+        }
+
+    stand_in.stop()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Find the stages slower than in a baseline.
+
+    Args:
+        results: dict
+            Results of this run.
+        baseline: dict
+            Results of a previous run, with the same parameters.
+        tolerance: float
+            Accepted slowdown ratio.
+
+    Returns:
+        list[str]
+            Description of the regressions.
+    """
+    regressions = []
+    for name, stage in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous and stage['median_seconds'] > previous['median_seconds'] * tolerance:
+            regressions.append(f"{name}: {previous['median_seconds'] * 1000:.1f}ms -> {stage['median_seconds'] * 1000:.1f}ms")
+    previous = baseline.get('peak_rss_bytes')
+    if previous and results['peak_rss_bytes'] > previous * tolerance:
+        regressions.append(f"peak RSS: {previous >> 20}MB -> {results['peak_rss_bytes'] >> 20}MB")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--validators', type=int, default=1_000_000, help='Number of validators on the network (10k to 3M).')
+    parser.add_argument('--watched', type=int, default=10_000, help='Number of watched validators.')
+    parser.add_argument('--slots', type=int, default=4, help='Number of slots to process.')
+    parser.add_argument('--seed', type=int, default=42, help='Seed of the synthetic network.')
+    parser.add_argument('--output', type=Path, default=None, help='Where to write the JSON results.')
+    parser.add_argument('--baseline', type=Path, default=None, help='Previous JSON results to compare with.')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Accepted slowdown ratio against the baseline.')
+    args = parser.parse_args()
+
+    if args.watched > args.validators:
+        parser.error('--watched must not exceed --validators')
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.validators, args.watched, args.slots, args.seed)
+
+    for name, stage in results['stages'].items():
+        print(f"{name:>26}: {stage['median_seconds'] * 1000:9.1f}ms (max {stage['max_seconds'] * 1000:.1f}ms)")
+    for endpoint in ENDPOINTS:
+        print(f"{endpoint:>26}: request {results['beacon']['request_seconds'][endpoint] * 1000:9.1f}ms, "
+              f"parse {results['beacon']['parse_seconds'][endpoint] * 1000:9.1f}ms")
+    print(f"{'peak RSS':>26}: {results['peak_rss_bytes'] >> 20}MB")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for regression in regressions:
+            print(f'regression: {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Public key index benchmarks: memory footprint and lookup throughput.
+
+Usage:
+
+    python -m benchmarks.pubkey_index [--validators 2000000] [--output results.json]
+
+Compares the native PubkeyIndex used by the validators registry with
+the dictionary of normalized hex strings it replaces. Memory is the
+growth of the process RSS while building each index, lookups are
+performed with the 0x-prefixed hex strings returned by the beacon
+node, and with raw keys for the native index.
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import time
+
+from eth_validator_watcher_ext import PubkeyIndex
+from eth_validator_watcher.utils import normalized_public_key
+
+
+def _rss() -> int:
+    """Get the resident set size of the process.
+
+    Args:
+        None
+
+    Returns:
+        int
+            Resident set size in bytes.
+    """
+    with open('/proc/self/statm') as fh:
+        return int(fh.read().split()[1]) * resource.getpagesize()
+
+
+def _lookups_per_second(lookup, keys: list, runs: int) -> float:
+    """Measure the lookup throughput of an index.
+
+    Args:
+        lookup: Callable
+            Lookup function.
+        keys: list
+            Keys to look up.
+        runs: int
+            Number of passes over the keys.
+
+    Returns:
+        float
+            Lookups per second.
+    """
+    start = time.perf_counter()
+    for _ in range(runs):
+        for key in keys:
+            lookup(key)
+    return runs * len(keys) / (time.perf_counter() - start)
+
+
+def bench_dict(pubkeys: list[str], queries: list[str], runs: int) -> dict:
+    """Benchmark the dictionary of normalized hex strings.
+
+    Args:
+        pubkeys: list[str]
+            Public keys to index.
+        queries: list[str]
+            Public keys to look up.
+        runs: int
+            Number of passes over the queries.
+
+    Returns:
+        dict
+            Memory and lookup throughput.
+    """
+    gc.collect()
+    before = _rss()
+    start = time.perf_counter()
+    index = {}
+    for i, pubkey in enumerate(pubkeys):
+        index[normalized_public_key(pubkey)] = i
+    build = time.perf_counter() - start
+    memory = _rss() - before
+
+    return {
+        'build_seconds': build,
+        'memory_bytes': memory,
+        'hex_lookups_per_second': _lookups_per_second(lambda k: index.get(normalized_public_key(k)), queries, runs),
+    }
+
+
+def bench_native(pubkeys: list[str], queries: list[str], runs: int) -> dict:
+    """Benchmark the native public key index.
+
+    Args:
+        pubkeys: list[str]
+            Public keys to index.
+        queries: list[str]
+            Public keys to look up.
+        runs: int
+            Number of passes over the queries.
+
+    Returns:
+        dict
+            Memory and lookup throughput.
+    """
+    gc.collect()
+    before = _rss()
+    start = time.perf_counter()
+    index = PubkeyIndex()
+    index.reserve(len(pubkeys))
+    for i, pubkey in enumerate(pubkeys):
+        index[pubkey] = i
+    build = time.perf_counter() - start
+    memory = _rss() - before
+
+    raw = [bytes.fromhex(q[2:]) for q in queries]
+    start = time.perf_counter()
+    for _ in range(runs):
+        index.get_many(queries)
+    batch = runs * len(queries) / (time.perf_counter() - start)
+
+    return {
+        'build_seconds': build,
+        'memory_bytes': memory,
+        'reported_memory_bytes': index.memory_usage(),
+        'hex_lookups_per_second': _lookups_per_second(index.get, queries, runs),
+        'raw_lookups_per_second': _lookups_per_second(index.get, raw, runs),
+        'batch_hex_lookups_per_second': batch,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--validators', type=int, default=2_000_000, help='Number of public keys to index.')
+    parser.add_argument('--lookups', type=int, default=100_000, help='Number of distinct keys to look up.')
+    parser.add_argument('--runs', type=int, default=5, help='Number of passes over the looked up keys.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    random.seed(0)
+    pubkeys = [f'0x{os.urandom(48).hex()}' for _ in range(args.validators)]
+    queries = random.sample(pubkeys, min(args.lookups, len(pubkeys)))
+
+    # Native first: the dictionary would leave freed memory in the
+    # allocator pools that the native index could reuse.
+    results = {
+        'validators': args.validators,
+        'native': bench_native(pubkeys, queries, args.runs),
+        'dict': bench_dict(pubkeys, queries, args.runs),
+    }
+
+    for name in ('native', 'dict'):
+        r = results[name]
+        print(f"{name:>6}: {r['memory_bytes'] / args.validators:6.1f} bytes/key, "
+              f"build {r['build_seconds']:.2f}s, {r['hex_lookups_per_second'] / 1e6:.2f}M hex lookups/s")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
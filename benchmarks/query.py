@@ -0,0 +1,171 @@
+"""Query API benchmarks: latency under concurrent load.
+
+Usage:
+
+    python -m benchmarks.query [--watched 100000] [--clients 32] [--requests 200] [--output results.json]
+
+A registry of watched validators spread over labels is published as
+a view and queried over HTTP by concurrent clients while views keep
+being rebuilt, as the processing loop does on every slot. Lookups by
+index and public key, label pages and filtered label pages are timed
+separately, along with the time to build a view.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_validator_watcher_ext import RegistryView
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.models import ValidatorsLivenessResponse
+from eth_validator_watcher.query import publish_view, start_query_server
+from eth_validator_watcher.watched_validators import WatchedValidators
+
+from .registry import _validators
+
+
+NETWORK = 'benchmark'
+
+# Number of values of the operator label.
+OPERATORS = 10
+
+
+def _registry(watched: int) -> WatchedValidators:
+    """Build a registry where all validators are watched.
+
+    Args:
+        watched: int
+            Number of watched validators.
+
+    Returns:
+        WatchedValidators
+            The registry, with a missed attestation every 50 validators.
+    """
+    validators = _validators(watched)
+    registry = WatchedValidators()
+    registry.process_config(Config(watched_keys=[
+        {'public_key': item.validator.pubkey, 'labels': [f'operator:{item.index % OPERATORS}', f'vc:{item.index % 1000}']}
+        for item in validators.data
+    ]))
+    registry.process_epoch(validators)
+    registry.process_liveness(ValidatorsLivenessResponse.model_construct(data=[
+        ValidatorsLivenessResponse.Data.model_construct(index=i, is_live=i % 50 != 0) for i in range(watched)
+    ]), 10)
+    return registry
+
+
+def _percentiles(durations: list[float]) -> dict:
+    """Summarize latencies.
+
+    Args:
+        durations: list[float]
+            Latencies, in seconds.
+
+    Returns:
+        dict
+            Median, 99th percentile and maximum, in milliseconds.
+    """
+    ordered = sorted(durations)
+    return {
+        'p50_ms': statistics.median(ordered) * 1000,
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def run(watched: int, clients: int, requests: int) -> dict:
+    """Time queries sent by concurrent clients.
+
+    Args:
+        watched: int
+            Number of watched validators.
+        clients: int
+            Number of concurrent clients.
+        requests: int
+            Number of requests per client and kind of query.
+
+    Returns:
+        dict
+            Results of the benchmark.
+    """
+    registry = _registry(watched)
+    pubkeys = [validator.state.consensus_pubkey for validator in registry.get_validators().values()]
+
+    start = time.perf_counter()
+    view = RegistryView(registry.get_validators(), 0)
+    publish_view(NETWORK, view)
+    build = time.perf_counter() - start
+
+    url = f'http://127.0.0.1:{start_query_server(0, "127.0.0.1").server_port}'
+    queries = {
+        'index': lambda i: f'/v1/validators/{(i * 7919) % watched}',
+        'pubkey': lambda i: f'/v1/validators/{pubkeys[(i * 7919) % watched]}',
+        'label_page': lambda i: f'/v1/validators?label=operator:{i % OPERATORS}&offset={i % 50 * 100}&limit=100',
+        'label_filtered': lambda i: f'/v1/validators?label=operator:{i % OPERATORS}&missed_attestation=true&fields=index,pubkey',
+    }
+
+    # Views are updated in the background, as on every slot.
+    stopped = threading.Event()
+    updates = []
+
+    def rebuild() -> None:
+        slot = 1
+        while not stopped.is_set():
+            start = time.perf_counter()
+            publish_view(NETWORK, view.update(registry.get_validators(), slot))
+            updates.append(time.perf_counter() - start)
+            slot += 1
+            stopped.wait(0.5)
+
+    def client(kind: str, offset: int) -> list[float]:
+        durations = []
+        for i in range(offset, offset + requests):
+            start = time.perf_counter()
+            with urllib.request.urlopen(url + queries[kind](i), timeout=60) as response:
+                response.read()
+            durations.append(time.perf_counter() - start)
+        return durations
+
+    rebuilder = threading.Thread(target=rebuild)
+    rebuilder.start()
+    results = {'watched': watched, 'clients': clients, 'requests': requests, 'queries': {}}
+    try:
+        with ThreadPoolExecutor(clients) as executor:
+            for kind in queries:
+                durations = [d for batch in executor.map(lambda c: client(kind, c * requests), range(clients)) for d in batch]
+                results['queries'][kind] = _percentiles(durations)
+    finally:
+        stopped.set()
+        rebuilder.join()
+
+    results['view_build'] = build
+    results['view_update'] = _percentiles(updates)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--watched', type=int, default=100_000, help='Number of watched validators.')
+    parser.add_argument('--clients', type=int, default=32, help='Number of concurrent clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per client and kind of query.')
+    parser.add_argument('--output', type=str, default=None, help='Where to write the JSON results.')
+    args = parser.parse_args()
+
+    results = run(args.watched, args.clients, args.requests)
+    print(f"{'view_build':>16}: {results['view_build'] * 1000:7.2f}ms")
+    for kind, latencies in {**results['queries'], 'view_update': results['view_update']}.items():
+        print(f"{kind:>16}: p50 {latencies['p50_ms']:7.2f}ms, p99 {latencies['p99_ms']:7.2f}ms, max {latencies['max_ms']:7.2f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Validators registry benchmarks: memory footprint of network validators.
+
+Usage:
+
+    python -m benchmarks.registry [--validators 2000000] [--output results.json]
+
+Compares the registry, where only watched validators are backed by a
+WatchedValidator and the rest of the network lives in the compact
+NetworkRegistry, with one WatchedValidator per validator of the
+network. Memory is the growth of the process RSS while processing the
+first epoch, compute time is the aggregation of the metrics.
+"""
+
+import argparse
+import gc
+import json
+import os
+import time
+
+from eth_validator_watcher_ext import PubkeyIndex, fast_compute_validator_metrics
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import compute_validator_metrics
+from eth_validator_watcher.models import Validators
+from eth_validator_watcher.watched_validators import WatchedValidator, WatchedValidators
+
+from .pubkey_index import _rss
+
+
+def _validators(n: int) -> Validators:
+    """Build a synthetic validators state.
+
+    Args:
+        n: int
+            Number of validators.
+
+    Returns:
+        Validators
+            Validators state, as returned by the beacon node.
+    """
+    status = Validators.DataItem.StatusEnum.activeOngoing
+    credentials = '0x01' + '00' * 11 + '11' * 20
+    data = []
+    for i in range(n):
+        validator = Validators.DataItem.Validator.model_construct(
+            pubkey=f'0x{os.urandom(48).hex()}',
+            effective_balance=32_000_000_000,
+            slashed=False,
+            activation_epoch=0,
+            withdrawal_credentials=credentials,
+        )
+        data.append(Validators.DataItem.model_construct(index=i, status=status, validator=validator))
+    return Validators.model_construct(data=data)
+
+
+def bench_objects(validators: Validators, slot: int) -> dict:
+    """Benchmark one WatchedValidator per validator of the network.
+
+    Args:
+        validators: Validators
+            Validators state.
+        slot: int
+            Slot for which metrics are computed.
+
+    Returns:
+        dict
+            Memory and compute time.
+    """
+    gc.collect()
+    before = _rss()
+    start = time.perf_counter()
+    registry = {}
+    pubkey_index = PubkeyIndex()
+    pubkey_index.reserve(len(validators.data))
+    for item in validators.data:
+        validator = WatchedValidator()
+        validator.process_epoch(item)
+        registry[item.index] = validator
+        pubkey_index[item.validator.pubkey] = item.index
+    build = time.perf_counter() - start
+    memory = _rss() - before
+
+    start = time.perf_counter()
+    fast_compute_validator_metrics(registry, slot)
+    compute = time.perf_counter() - start
+
+    return {'build_seconds': build, 'compute_seconds': compute, 'memory_bytes': memory}
+
+
+def bench_registry(validators: Validators, watched: int, slot: int) -> dict:
+    """Benchmark the registry with a compact network registry.
+
+    Args:
+        validators: Validators
+            Validators state.
+        watched: int
+            Number of watched validators.
+        slot: int
+            Slot for which metrics are computed.
+
+    Returns:
+        dict
+            Memory and compute time.
+    """
+    gc.collect()
+    before = _rss()
+    start = time.perf_counter()
+    registry = WatchedValidators()
+    registry.process_config(Config(watched_keys=[{'public_key': item.validator.pubkey} for item in validators.data[:watched]]))
+    registry.process_epoch(validators)
+    build = time.perf_counter() - start
+    memory = _rss() - before
+
+    start = time.perf_counter()
+    compute_validator_metrics(registry, slot)
+    compute = time.perf_counter() - start
+
+    return {
+        'build_seconds': build,
+        'compute_seconds': compute,
+        'memory_bytes': memory,
+        'reported_memory_bytes': registry.get_network().memory_usage(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--validators', type=int, default=2_000_000, help='Number of validators on the network.')
+    parser.add_argument('--watched', type=int, default=1_000, help='Number of watched validators.')
+    parser.add_argument('--output', type=str, default=None, help='Write results as JSON to this file.')
+    args = parser.parse_args()
+
+    validators = _validators(args.validators)
+
+    # Compact registry first: the objects would leave freed memory in
+    # the allocator pools that it could reuse.
+    results = {
+        'validators': args.validators,
+        'watched': args.watched,
+        'registry': bench_registry(validators, args.watched, 0),
+        'objects': bench_objects(validators, 0),
+    }
+
+    for name in ('registry', 'objects'):
+        r = results[name]
+        print(f"{name:>8}: {r['memory_bytes'] / args.validators:6.1f} bytes/validator, "
+              f"build {r['build_seconds']:.2f}s, compute {r['compute_seconds'] * 1000:.0f}ms")
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Startup benchmarks: import time and time-to-first-metric.
+
+Usage:
+
+    python -m benchmarks.startup [--output results.json]
+
+Import time is measured in fresh interpreters so that nothing is
+cached. Time-to-first-metric replays the Sepolia cassette used by the
+end-to-end tests, it measures the time between the creation of the
+watcher and the end of the first slot processing (i.e: once all
+metrics are exported).
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from pathlib import Path
+
+
+ROOT = Path(__file__).parent.parent
+CASSETTE = ROOT / 'tests' / 'assets' / 'cassettes' / 'test_sepolia.yaml'
+CONFIG = ROOT / 'tests' / 'assets' / 'config.sepolia.yaml'
+
+
+class _FirstSlotDone(Exception):
+    pass
+
+
+def import_time(module: str, runs: int) -> dict:
+    """Measure the time it takes to import a module in a fresh interpreter.
+
+    Args:
+        module: str
+            Module to import.
+        runs: int
+            Number of measurements.
+
+    Returns:
+        dict
+            Median wall-clock and self-reported cumulative import time in seconds.
+    """
+    wall = []
+    cumulative = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        wall.append(time.perf_counter() - start)
+        for line in out.stderr.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if len(fields) == 3 and fields[2] == module:
+                cumulative.append(int(fields[1]) / 1_000_000)
+
+    return {
+        'wall_seconds': statistics.median(wall),
+        'import_seconds': statistics.median(cumulative),
+    }
+
+
+def time_to_first_metric() -> float:
+    """Measure the time until the first slot is processed and exported.
+
+    Args:
+        None
+
+    Returns:
+        float
+            Time in seconds.
+    """
+    import vcr
+
+    from eth_validator_watcher.entrypoint import ValidatorWatcher
+
+    def stop(slot: int) -> None:
+        raise _FirstSlotDone()
+
+    recorder = vcr.VCR(before_record=lambda r: None if r.uri.endswith('/metrics') else r)
+    with recorder.use_cassette(str(CASSETTE)):
+        start = time.perf_counter()
+        watcher = ValidatorWatcher(CONFIG)
+        watcher._slot_hook = stop
+        try:
+            watcher.run()
+        except _FirstSlotDone:
+            pass
+        return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Number of import time measurements.')
+    parser.add_argument('--output', type=Path, default=None, help='Where to write the JSON results.')
+    args = parser.parse_args()
+
+    results = {
+        'import': import_time('eth_validator_watcher.entrypoint', args.runs),
+        'time_to_first_metric_seconds': time_to_first_metric(),
+    }
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        args.output.write_text(payload)
+    print(payload)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,476 @@
+"""Synthetic mainnet-like network served by a local beacon stand-in.
+
+The network is generated from a seed so that runs are comparable:
+validators with a mix of statuses and effective balances, 64
+committees per slot with a few aggregated attestation flavors,
+attestation rewards, liveness, proposer duties and the deposit,
+consolidation and withdrawal queues.
+
+The stand-in implements the beacon API endpoints used by the watcher,
+responses are pre-encoded where possible so that the benchmarks
+measure the watcher and not the stand-in.
+"""
+
+import json
+import random
+import re
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+
+SLOTS_PER_EPOCH = 32
+SECONDS_PER_SLOT = 12
+COMMITTEES_PER_SLOT = 64
+
+# Share of validators performing their duties, as seen on mainnet.
+PARTICIPATION = 0.97
+
+# Number of distinct attestation flavors (i.e: votes) per slot.
+ATTESTATION_FLAVORS = 4
+
+STATUSES = [
+    ('active_ongoing', 0.90),
+    ('active_exiting', 0.01),
+    ('pending_queued', 0.02),
+    ('exited_unslashed', 0.02),
+    ('withdrawal_done', 0.05),
+]
+
+IDEAL_REWARDS = {
+    32_000_000_000: (14_000, 26_000, 14_000),
+    2_048_000_000_000: (896_000, 1_664_000, 896_000),
+}
+
+
+def _bitfield(bits: list[bool], bitlist: bool) -> str:
+    """Encode bits as an SSZ bitvector, or bitlist with its length marker.
+
+    Args:
+        bits: list[bool]
+            Bits to encode.
+        bitlist: bool
+            Whether to append the length marker of bitlists.
+
+    Returns:
+        str
+            0x-prefixed hex encoding, least significant bit first.
+    """
+    value = 0
+    for i, bit in enumerate(bits):
+        if bit:
+            value |= 1 << i
+    length = len(bits)
+    if bitlist:
+        value |= 1 << length
+        length += 1
+    return '0x' + value.to_bytes((length + 7) // 8, 'little').hex()
+
+
+class SyntheticNetwork:
+    """Deterministic mainnet-like network.
+
+    Args:
+        validators: int
+            Number of validators on the network.
+        seed: int
+            Seed of the generator.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, validators: int, seed: int = 42) -> None:
+        self.size = validators
+        self._seed = seed
+        rng = random.Random(seed)
+
+        self.pubkeys = [f'0x{rng.getrandbits(384):096x}' for _ in range(validators)]
+        self.statuses = rng.choices([s for s, _ in STATUSES], [w for _, w in STATUSES], k=validators)
+        self.balances = [2_048_000_000_000 if rng.random() < 0.01 else 32_000_000_000 for _ in range(validators)]
+        self.genesis_time = 1606824023
+        self._index_by_pubkey: Optional[dict[str, int]] = None
+
+        self._validators = [self._encode_validator(i) for i in range(validators)]
+        self._rewards = [self._encode_reward(i, rng) for i in range(validators)]
+        self._validators_body: Optional[bytes] = None
+
+    def _encode_validator(self, i: int) -> bytes:
+        """Encode a validator as returned by the beacon.
+
+        Args:
+            i: int
+                Index of the validator.
+
+        Returns:
+            bytes
+                JSON encoding of the validator.
+        """
+        exited = self.statuses[i] in ('exited_unslashed', 'withdrawal_done')
+        return json.dumps({
+            'index': str(i),
+            'balance': str(self.balances[i] + 12_345_678),
+            'status': self.statuses[i],
+            'validator': {
+                'pubkey': self.pubkeys[i],
+                'withdrawal_credentials': '0x01' + '00' * 11 + f'{i:040x}',
+                'effective_balance': str(self.balances[i]),
+                'slashed': False,
+                'activation_eligibility_epoch': '0',
+                'activation_epoch': '0' if self.statuses[i] != 'pending_queued' else '18446744073709551615',
+                'exit_epoch': '200000' if exited else '18446744073709551615',
+                'withdrawable_epoch': '200256' if exited else '18446744073709551615',
+            },
+        }, separators=(',', ':')).encode()
+
+    def _encode_reward(self, i: int, rng: random.Random) -> bytes:
+        """Encode the attestation rewards of a validator.
+
+        Args:
+            i: int
+                Index of the validator.
+            rng: random.Random
+                Generator to draw missed duties from.
+
+        Returns:
+            bytes
+                JSON encoding of the rewards.
+        """
+        source, target, head = IDEAL_REWARDS[self.balances[i]]
+        if rng.random() > PARTICIPATION:
+            source, target, head = -source, -target, 0
+        return json.dumps({
+            'validator_index': str(i),
+            'source': str(source),
+            'target': str(target),
+            'head': str(head),
+            'inactivity': '0',
+        }, separators=(',', ':')).encode()
+
+    def index(self, validator_id: str) -> Optional[int]:
+        """Resolve a validator index or public key.
+
+        Args:
+            validator_id: str
+                Index or 0x-prefixed public key.
+
+        Returns:
+            Optional[int]
+                Index of the validator, None if unknown.
+        """
+        if validator_id.startswith('0x'):
+            if self._index_by_pubkey is None:
+                self._index_by_pubkey = {pubkey: i for i, pubkey in enumerate(self.pubkeys)}
+            return self._index_by_pubkey.get(validator_id)
+        index = int(validator_id)
+        return index if index < self.size else None
+
+    def validators(self, ids: Optional[list[str]] = None) -> bytes:
+        """Get the validators state.
+
+        Args:
+            ids: Optional[list[str]]
+                Validators to return, all of them if None.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        if ids is None:
+            if self._validators_body is None:
+                self._validators_body = b'{"execution_optimistic":false,"finalized":false,"data":[' + b','.join(self._validators) + b']}'
+            return self._validators_body
+        indexes = [self.index(i) for i in ids]
+        return b'{"data":[' + b','.join(self._validators[i] for i in indexes if i is not None) + b']}'
+
+    def committees(self, slot: int) -> list[list[int]]:
+        """Get the committees of a slot.
+
+        Args:
+            slot: int
+                Slot of the committees.
+
+        Returns:
+            list[list[int]]
+                Indexes of the validators of each committee.
+        """
+        rng = random.Random(self._seed * 1_000_003 + slot % SLOTS_PER_EPOCH)
+        members = list(range(slot % SLOTS_PER_EPOCH, self.size, SLOTS_PER_EPOCH))
+        rng.shuffle(members)
+        size = len(members) // COMMITTEES_PER_SLOT
+        return [members[c * size:(c + 1) * size] for c in range(COMMITTEES_PER_SLOT)]
+
+    def committees_body(self, slot: int) -> bytes:
+        """Get the committees response of a slot.
+
+        Args:
+            slot: int
+                Slot of the committees.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        return json.dumps({'data': [
+            {'index': str(c), 'slot': str(slot), 'validators': [str(v) for v in committee]}
+            for c, committee in enumerate(self.committees(slot))
+        ]}).encode()
+
+    def attestations_body(self, slot: int) -> bytes:
+        """Get the attestations included in the block of a slot.
+
+        Most validators vote for the previous slot, each one in one of
+        a few flavors aggregating all committees. An aggregate for an
+        older slot is included as well.
+
+        Args:
+            slot: int
+                Slot of the block.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        rng = random.Random(self._seed * 7_919 + slot)
+        committees = self.committees(slot - 1)
+        flavors = [[] for _ in range(ATTESTATION_FLAVORS)]
+        for committee in committees:
+            votes = [rng.randrange(ATTESTATION_FLAVORS) if rng.random() < PARTICIPATION else -1 for _ in committee]
+            for flavor, bits in enumerate(flavors):
+                bits.extend(vote == flavor for vote in votes)
+
+        all_committees = _bitfield([True] * COMMITTEES_PER_SLOT, False)
+        data = [
+            {
+                'aggregation_bits': _bitfield(bits, True),
+                'committee_bits': all_committees,
+                'data': {'slot': str(slot - 1), 'index': '0'},
+            }
+            for bits in flavors
+        ]
+        data.append({
+            'aggregation_bits': _bitfield([True] * len(committees[0]), True),
+            'committee_bits': _bitfield([True] + [False] * (COMMITTEES_PER_SLOT - 1), False),
+            'data': {'slot': str(slot - 2), 'index': '0'},
+        })
+        return json.dumps({'version': 'electra', 'data': data}).encode()
+
+    def header_body(self, slot: int) -> bytes:
+        """Get the header of the block of a slot.
+
+        Args:
+            slot: int
+                Slot of the block.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        return json.dumps({'data': {'root': f'0x{slot:064x}', 'header': {'message': {
+            'slot': str(slot),
+            'proposer_index': str(slot % self.size),
+            'parent_root': f'0x{slot - 1:064x}',
+        }}}}).encode()
+
+    def proposer_duties_body(self, epoch: int) -> bytes:
+        """Get the proposer duties of an epoch.
+
+        Args:
+            epoch: int
+                Epoch of the duties.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        rng = random.Random(self._seed * 104_729 + epoch)
+        start = epoch * SLOTS_PER_EPOCH
+        return json.dumps({
+            'dependent_root': f'0x{start - 1:064x}',
+            'data': [
+                {'pubkey': self.pubkeys[index], 'validator_index': str(index), 'slot': str(slot)}
+                for slot, index in ((slot, rng.randrange(self.size)) for slot in range(start, start + SLOTS_PER_EPOCH))
+            ],
+        }).encode()
+
+    def rewards_body(self, ids: list[str]) -> bytes:
+        """Get the attestation rewards of an epoch.
+
+        Args:
+            ids: list[str]
+                Validators to return, all of them if empty.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        ideal = b','.join(json.dumps({
+            'effective_balance': str(balance),
+            'source': str(source),
+            'target': str(target),
+            'head': str(head),
+            'inclusion_delay': '0',
+            'inactivity': '0',
+        }).encode() for balance, (source, target, head) in IDEAL_REWARDS.items())
+        rewards = self._rewards if not ids else [self._rewards[int(i)] for i in ids if int(i) < self.size]
+        return b'{"data":{"ideal_rewards":[' + ideal + b'],"total_rewards":[' + b','.join(rewards) + b']}}'
+
+    def liveness_body(self, ids: list[str]) -> bytes:
+        """Get the liveness of validators.
+
+        Args:
+            ids: list[str]
+                Indexes of the validators.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        rng = random.Random(self._seed)
+        return json.dumps({'data': [
+            {'index': i, 'is_live': rng.random() < PARTICIPATION} for i in ids
+        ]}).encode()
+
+    def pending_deposits_body(self) -> bytes:
+        """Get the deposit queue, about 1% of the network.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        return json.dumps({'data': [
+            {'pubkey': f'0x{i:096x}', 'withdrawal_credentials': '0x01' + '00' * 31, 'amount': '32000000000', 'signature': '0x' + '00' * 96, 'slot': str(i)}
+            for i in range(self.size // 100)
+        ]}).encode()
+
+    def pending_consolidations_body(self) -> bytes:
+        """Get the consolidation queue.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        return json.dumps({'data': [
+            {'source_index': str(i), 'target_index': str(i + 1)} for i in range(0, self.size // 1000, 2)
+        ]}).encode()
+
+    def pending_withdrawals_body(self) -> bytes:
+        """Get the partial withdrawal queue.
+
+        Returns:
+            bytes
+                JSON response.
+        """
+        return json.dumps({'data': [
+            {'validator_index': str(i), 'amount': '1000000000', 'withdrawable_epoch': '0'} for i in range(self.size // 1000)
+        ]}).encode()
+
+
+class BeaconStandIn:
+    """Local HTTP server serving a synthetic network with the beacon API.
+
+    Args:
+        network: SyntheticNetwork
+            Network to serve.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, network: SyntheticNetwork) -> None:
+        self.network = network
+        n = network
+        self._get: list[tuple[re.Pattern, Callable[..., bytes]]] = [
+            (re.compile(r'/eth/v1/beacon/genesis'), lambda: json.dumps({'data': {'genesis_time': str(n.genesis_time)}}).encode()),
+            (re.compile(r'/eth/v1/config/spec'), lambda: json.dumps({'data': {'SECONDS_PER_SLOT': str(SECONDS_PER_SLOT), 'SLOTS_PER_EPOCH': str(SLOTS_PER_EPOCH)}}).encode()),
+            (re.compile(r'/eth/v1/beacon/states/\w+/validators'), lambda: n.validators()),
+            (re.compile(r'/eth/v1/beacon/states/\w+/committees\?slot=(\d+)'), lambda slot: n.committees_body(int(slot))),
+            (re.compile(r'/eth/v2/beacon/blocks/(\d+)/attestations'), lambda slot: n.attestations_body(int(slot))),
+            (re.compile(r'/eth/v1/beacon/headers/(\d+)'), lambda slot: n.header_body(int(slot))),
+            (re.compile(r'/eth/v1/beacon/headers/(?:finalized|head)'), lambda: n.header_body(self.finalized_slot)),
+            (re.compile(r'/eth/v1/validator/duties/proposer/(\d+)'), lambda epoch: n.proposer_duties_body(int(epoch))),
+            (re.compile(r'/eth/v1/beacon/states/head/pending_deposits'), n.pending_deposits_body),
+            (re.compile(r'/eth/v1/beacon/states/head/pending_consolidations'), n.pending_consolidations_body),
+            (re.compile(r'/eth/v1/beacon/states/head/pending_partial_withdrawals'), n.pending_withdrawals_body),
+        ]
+        self._post: list[tuple[re.Pattern, Callable[..., bytes]]] = [
+            (re.compile(r'/eth/v1/beacon/states/\w+/validators'), lambda body: n.validators(body['ids'])),
+            (re.compile(r'/eth/v1/beacon/rewards/attestations/\d+'), n.rewards_body),
+            (re.compile(r'/eth/v1/validator/liveness/\d+'), n.liveness_body),
+        ]
+        self.finalized_slot = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self) -> 'BeaconStandIn':
+        """Start serving in a background thread.
+
+        Args:
+            None
+
+        Returns:
+            BeaconStandIn
+                This stand-in.
+        """
+        threading.Thread(target=self._server.serve_forever, name='beacon-stand-in', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self) -> type:
+        """Build the request handler bound to this stand-in.
+
+        Args:
+            None
+
+        Returns:
+            type
+                Request handler class.
+        """
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self) -> None:
+                self._route(stand_in._get, ())
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get('Content-Length', 0))
+                self._route(stand_in._post, (json.loads(self.rfile.read(length) or b'null'),))
+
+            def _route(self, routes: list, args: tuple) -> None:
+                for pattern, fn in routes:
+                    match = pattern.fullmatch(self.path)
+                    if match:
+                        self._reply(200, fn(*match.groups(), *args))
+                        return
+                self._reply(404, b'{"code":404,"message":"not found"}')
+
+            def _reply(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
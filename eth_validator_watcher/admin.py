@@ -0,0 +1,396 @@
+"""Opt-in admin HTTP server to look inside a running watcher.
+
+The server only runs when an admin port is configured and does nothing
+until queried:
+
+- `/debug/profile?seconds=30`: CPU profile of the slot loops during the
+  given time, as a pstats file (or text with `format=text`),
+- `/debug/memory?seconds=0&top=25`: top allocations from tracemalloc,
+  traced during the given time unless tracing is already enabled (or
+  the raw snapshot with `format=raw`),
+- `/debug/native`: sizes of the native structures and state of the
+  native worker pool, as JSON,
+- `/debug/threads`: current stack of every thread, to look at stalls.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import tracemalloc
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
+
+from eth_validator_watcher_ext import native_worker_stats
+
+
+# Longest profile or allocation tracing which can be requested.
+ADMIN_MAX_DURATION_SEC = 300
+
+# Default number of entries in text reports.
+ADMIN_DEFAULT_TOP = 25
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+_native_stats: dict[str, Callable[[], dict]] = {}
+_native_stats_lock = threading.Lock()
+
+# Tracing started by a capture is stopped at its end, captures can't
+# overlap.
+_memory_lock = threading.Lock()
+
+
+class ProfileBusyError(Exception):
+    pass
+
+
+class MemoryBusyError(Exception):
+    pass
+
+
+class LoopProfiler:
+    """Profile the slot loops on demand.
+
+    cProfile only profiles the thread which enables it: slot loops
+    enable a profiler of their own around each slot while a capture is
+    running, and the captured profiles are merged at the end. Outside
+    of a capture, a slot only costs an attribute lookup.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Condition()
+        self._deadline: Optional[float] = None
+        self._running = 0
+        self._profiles: list[cProfile.Profile] = []
+
+    def start_slot(self) -> Optional[cProfile.Profile]:
+        """Start profiling a slot if a capture is running.
+
+        Args:
+            None
+
+        Returns:
+            Optional[cProfile.Profile]
+                The profiler of the slot, to give back to end_slot(),
+                or None if no capture is running.
+        """
+        if self._deadline is None:
+            return None
+
+        with self._lock:
+            if self._deadline is None or time.monotonic() >= self._deadline:
+                return None
+            self._running += 1
+
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end_slot(self, profile: Optional[cProfile.Profile]) -> None:
+        """Stop profiling a slot.
+
+        Args:
+            profile: Optional[cProfile.Profile]
+                The profiler returned by start_slot().
+
+        Returns:
+            None
+        """
+        if profile is None:
+            return
+
+        profile.disable()
+        with self._lock:
+            self._profiles.append(profile)
+            self._running -= 1
+            self._lock.notify_all()
+
+    def capture(self, duration_sec: float) -> Optional[pstats.Stats]:
+        """Profile the slot loops during the given time.
+
+        Slots being processed at the end of the capture are waited for.
+
+        Args:
+            duration_sec: float
+                Duration of the capture, in seconds.
+
+        Returns:
+            Optional[pstats.Stats]
+                Merged profiles, or None if no slot was processed.
+
+        Raises:
+            ProfileBusyError
+                If a capture is already running.
+        """
+        with self._lock:
+            if self._deadline is not None:
+                raise ProfileBusyError('a profile is already being captured')
+            self._profiles = []
+            self._deadline = time.monotonic() + duration_sec
+
+        time.sleep(duration_sec)
+
+        with self._lock:
+            self._lock.wait_for(lambda: self._running == 0)
+            profiles, self._profiles = self._profiles, []
+            self._deadline = None
+
+        if not profiles:
+            return None
+        return pstats.Stats(*profiles)
+
+
+_profiler = LoopProfiler()
+
+
+def get_loop_profiler() -> LoopProfiler:
+    """Get the profiler shared by the slot loops of the process.
+
+    Args:
+        None
+
+    Returns:
+        LoopProfiler
+            The profiler.
+    """
+    return _profiler
+
+
+def register_native_stats(name: str, stats: Callable[[], dict]) -> None:
+    """Register a source of native statistics, i.e: one per network.
+
+    Args:
+        name: str
+            Name under which the statistics are reported.
+        stats: Callable[[], dict]
+            Returns the statistics when called.
+
+    Returns:
+        None
+    """
+    with _native_stats_lock:
+        _native_stats[name] = stats
+
+
+def get_native_stats() -> dict:
+    """Get the native statistics of the process.
+
+    Args:
+        None
+
+    Returns:
+        dict
+            Worker pool state, resident memory and the statistics of
+            each registered source.
+    """
+    with _native_stats_lock:
+        sources = dict(_native_stats)
+
+    stats = {
+        'worker_pool': native_worker_stats(),
+        'rss_bytes': _rss_bytes(),
+        'threads': threading.active_count(),
+    }
+    stats.update({name: source() for name, source in sources.items()})
+    return stats
+
+
+def _rss_bytes() -> Optional[int]:
+    """Get the resident memory of the process.
+
+    Args:
+        None
+
+    Returns:
+        Optional[int]
+            Resident memory in bytes, None where /proc is unavailable.
+    """
+    try:
+        with open('/proc/self/statm') as fh:
+            return int(fh.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _trace_allocations(duration_sec: float) -> tracemalloc.Snapshot:
+    """Take a snapshot of the allocations.
+
+    If tracing is not already enabled, allocations are traced during
+    the given time only: the snapshot then holds what was allocated
+    during that time and is still alive.
+
+    Args:
+        duration_sec: float
+            Duration of the tracing, in seconds.
+
+    Returns:
+        tracemalloc.Snapshot
+            The snapshot.
+
+    Raises:
+        MemoryBusyError
+            If allocations are already being traced by another capture.
+    """
+    if not _memory_lock.acquire(blocking=False):
+        raise MemoryBusyError('allocations are already being traced')
+
+    try:
+        if tracemalloc.is_tracing():
+            time.sleep(duration_sec)
+            return tracemalloc.take_snapshot()
+
+        tracemalloc.start()
+        try:
+            time.sleep(duration_sec)
+            return tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+    finally:
+        _memory_lock.release()
+
+
+def _thread_stacks() -> str:
+    """Format the current stack of every thread.
+
+    Args:
+        None
+
+    Returns:
+        str
+            The stacks, one block per thread.
+    """
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    out = io.StringIO()
+    for ident, frame in sys._current_frames().items():
+        out.write(f'Thread {names.get(ident, ident)}:\n')
+        out.write(''.join(traceback.format_stack(frame)))
+        out.write('\n')
+    return out.getvalue()
+
+
+class AdminHandler(BaseHTTPRequestHandler):
+    """Serve the debug endpoints."""
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {
+            '/debug/profile': self._profile,
+            '/debug/memory': self._memory,
+            '/debug/native': self._native,
+            '/debug/threads': self._threads,
+        }
+        route = routes.get(url.path)
+        if route is None:
+            self._reply(404, b'not found\n')
+            return
+
+        try:
+            duration = float(params.get('seconds', 0))
+            top = int(params.get('top', ADMIN_DEFAULT_TOP))
+        except ValueError:
+            self._reply(400, b'invalid parameters\n')
+            return
+        if not 0 <= duration <= ADMIN_MAX_DURATION_SEC or top <= 0:
+            self._reply(400, f'seconds must be within [0, {ADMIN_MAX_DURATION_SEC}] and top positive\n'.encode())
+            return
+
+        logging.info(f'🩺 Serving {url.path}')
+        route(duration, top, params.get('format', 'text'))
+
+    def _profile(self, duration: float, top: int, fmt: str) -> None:
+        try:
+            stats = _profiler.capture(duration or 30)
+        except ProfileBusyError as e:
+            self._reply(409, f'{e}\n'.encode())
+            return
+
+        if stats is None:
+            self._reply(200, b'no slot was processed during the capture\n')
+        elif fmt == 'text':
+            out = io.StringIO()
+            stats.stream = out
+            stats.sort_stats('cumulative').print_stats(top)
+            self._reply(200, out.getvalue().encode())
+        else:
+            self._reply(200, marshal.dumps(stats.stats), 'application/octet-stream', 'profile.prof')
+
+    def _memory(self, duration: float, top: int, fmt: str) -> None:
+        try:
+            snapshot = _trace_allocations(duration)
+        except MemoryBusyError as e:
+            self._reply(409, f'{e}\n'.encode())
+            return
+
+        if fmt == 'raw':
+            with tempfile.NamedTemporaryFile() as fh:
+                snapshot.dump(fh.name)
+                self._reply(200, fh.read(), 'application/octet-stream', 'memory.tracemalloc')
+            return
+
+        statistics = snapshot.statistics('lineno')
+        lines = [f'Traced {sum(stat.size for stat in statistics)} bytes in {len(statistics)} locations']
+        lines.extend(str(stat) for stat in statistics[:top])
+        self._reply(200, ('\n'.join(lines) + '\n').encode())
+
+    def _native(self, duration: float, top: int, fmt: str) -> None:
+        self._reply(200, json.dumps(get_native_stats(), indent=2).encode(), 'application/json')
+
+    def _threads(self, duration: float, top: int, fmt: str) -> None:
+        self._reply(200, _thread_stacks().encode())
+
+    def _reply(self, status: int, body: bytes, content_type: str = 'text/plain; charset=utf-8', filename: Optional[str] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if filename is not None:
+            self.send_header('Content-Disposition', f'attachment; filename="{filename}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def start_admin_server(port: int, addr: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Start the admin HTTP server if not already running.
+
+    There is a single server per process, shared by all networks. It
+    listens on the loopback interface by default.
+
+    Args:
+        port: int
+            Port on which the debug endpoints are served.
+        addr: str
+            Address to listen on.
+
+    Returns:
+        ThreadingHTTPServer
+            The running server.
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((addr, port), AdminHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name='admin', daemon=True).start()
+            logging.info(f'🩺 Admin server listening on {addr}:{_server.server_port}')
+        return _server
@@ -0,0 +1,420 @@
+"""Record beacon responses to an archive and replay them offline.
+
+In record mode, every response of the beacon is written to an archive
+file while the watcher runs normally. In replay mode, the beacon is
+served from the archive without any network access: combined with the
+replay clock, days of history are processed as fast as the CPU allows.
+
+The archive is a single append-only file:
+
+- a magic header,
+- records made of a fixed-size header, JSON metadata and a payload:
+  response bodies (compressed, stored once per distinct content) and
+  exchanges (request key, status and headers, digest of the body),
+- an index of the records, written when the archive is closed, and
+  the offset of this index followed by the magic.
+
+An archive which was not closed (i.e: the watcher was killed) is still
+readable, its index is rebuilt by scanning the records.
+
+Requests are identified by their method, path and query and the digest
+of their body, the beacon URL is not part of it so archives can be
+replayed against any configuration. A request which was recorded
+several times (i.e: the finalized header) is replayed in the recorded
+order, the last response being repeated once all were served.
+"""
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+import zlib
+
+from collections import defaultdict
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError
+from requests.structures import CaseInsensitiveDict
+
+
+MAGIC = b'EVWARCH1'
+
+RECORD_HEADER = struct.Struct('<BIQ')
+TRAILER = struct.Struct('<Q8s')
+
+RECORD_BLOB = 1
+RECORD_EXCHANGE = 2
+RECORD_INDEX = 3
+
+# Compression level of response bodies, beacon responses are highly
+# redundant JSON and compress well at moderate levels.
+COMPRESSION_LEVEL = 6
+
+# Response headers kept in the archive.
+KEPT_HEADERS = ('Content-Type', 'Eth-Consensus-Version')
+
+
+class ArchiveMissError(ConnectionError):
+    pass
+
+
+def _request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """Identify a request independently of the beacon URL.
+
+    Args:
+        method: str
+            HTTP method.
+        url: str
+            URL of the request.
+        body: Optional[bytes]
+            Body of the request.
+
+    Returns:
+        str
+            Key of the request.
+    """
+    parts = urlsplit(url)
+    path = f'{parts.path}?{parts.query}' if parts.query else parts.path
+    digest = hashlib.sha256(body).hexdigest()[:16] if body else ''
+    return f'{method} {path} {digest}'
+
+
+def _request_body(request: PreparedRequest) -> Optional[bytes]:
+    """Get the body of a prepared request as bytes.
+
+    Args:
+        request: PreparedRequest
+            The request.
+
+    Returns:
+        Optional[bytes]
+            The body, if any.
+    """
+    body = request.body
+    if isinstance(body, str):
+        return body.encode()
+    return body
+
+
+class ArchiveWriter:
+    """Append beacon responses to an archive.
+
+    Args:
+        path: str
+            Path of the archive, truncated if it exists.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._fh = open(path, 'wb')
+        self._fh.write(MAGIC)
+        self._lock = threading.Lock()
+        self._blobs: dict[str, tuple[int, int]] = {}
+        self._exchanges: dict[str, list] = defaultdict(list)
+        self._closed = False
+        atexit.register(self.close)
+
+    def record(self, method: str, url: str, body: Optional[bytes], status: int, headers: dict[str, str], content: bytes) -> None:
+        """Record a response.
+
+        Args:
+            method: str
+                HTTP method of the request.
+            url: str
+                URL of the request.
+            body: Optional[bytes]
+                Body of the request.
+            status: int
+                HTTP status of the response.
+            headers: dict[str, str]
+                Headers of the response.
+            content: bytes
+                Body of the response.
+
+        Returns:
+            None
+        """
+        key = _request_key(method, url, body)
+        digest = hashlib.sha256(content).hexdigest()
+        # Compressing is the expensive part, done outside of the lock.
+        compressed = zlib.compress(content, COMPRESSION_LEVEL) if digest not in self._blobs else None
+
+        with self._lock:
+            if self._closed:
+                return
+            if digest not in self._blobs:
+                if compressed is None:
+                    compressed = zlib.compress(content, COMPRESSION_LEVEL)
+                self._blobs[digest] = self._write(RECORD_BLOB, {'digest': digest}, compressed)
+            exchange = [status, headers, digest]
+            self._write(RECORD_EXCHANGE, {'key': key, 'exchange': exchange}, b'')
+            self._exchanges[key].append(exchange)
+            self._fh.flush()
+
+    def close(self) -> None:
+        """Write the index and close the archive.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            index = json.dumps({'blobs': self._blobs, 'exchanges': self._exchanges}).encode()
+            offset = self._fh.tell()
+            self._write(RECORD_INDEX, {}, zlib.compress(index, COMPRESSION_LEVEL))
+            self._fh.write(TRAILER.pack(offset, MAGIC))
+            self._fh.close()
+        atexit.unregister(self.close)
+        logging.info(f'📼 Closed beacon archive {self._path} ({len(self._exchanges)} requests)')
+
+    def _write(self, kind: int, meta: dict, payload: bytes) -> tuple[int, int]:
+        """Write a record.
+
+        Args:
+            kind: int
+                Kind of the record.
+            meta: dict
+                Metadata of the record.
+            payload: bytes
+                Payload of the record.
+
+        Returns:
+            tuple[int, int]
+                Offset and length of the payload.
+        """
+        encoded = json.dumps(meta).encode()
+        self._fh.write(RECORD_HEADER.pack(kind, len(encoded), len(payload)))
+        self._fh.write(encoded)
+        offset = self._fh.tell()
+        self._fh.write(payload)
+        return offset, len(payload)
+
+
+class ArchiveReader:
+    """Serve beacon responses from an archive.
+
+    Args:
+        path: str
+            Path of the archive.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError
+            If the file is not an archive.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._fd = os.open(path, os.O_RDONLY)
+        self._size = os.fstat(self._fd).st_size
+        if os.pread(self._fd, len(MAGIC), 0) != MAGIC:
+            os.close(self._fd)
+            raise ValueError(f'{path} is not a beacon archive')
+
+        index = self._read_index()
+        if index is None:
+            logging.warning(f'📼 Beacon archive {path} was not closed, scanning it')
+            index = self._scan()
+        self._blobs: dict[str, tuple[int, int]] = index['blobs']
+        self._exchanges: dict[str, list] = index['exchanges']
+        self._served: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._exchanges)
+
+    def lookup(self, method: str, url: str, body: Optional[bytes]) -> Optional[tuple[int, dict[str, str], bytes]]:
+        """Get the next recorded response to a request.
+
+        Args:
+            method: str
+                HTTP method of the request.
+            url: str
+                URL of the request.
+            body: Optional[bytes]
+                Body of the request.
+
+        Returns:
+            Optional[tuple[int, dict[str, str], bytes]]
+                Status, headers and body of the response, None if the
+                request was not recorded.
+        """
+        key = _request_key(method, url, body)
+        exchanges = self._exchanges.get(key)
+        if not exchanges:
+            return None
+
+        with self._lock:
+            served = self._served[key]
+            self._served[key] = served + 1
+        status, headers, digest = exchanges[min(served, len(exchanges) - 1)]
+        offset, length = self._blobs[digest]
+        return status, headers, zlib.decompress(os.pread(self._fd, length, offset))
+
+    def close(self) -> None:
+        """Close the archive.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        os.close(self._fd)
+
+    def _read_index(self) -> Optional[dict]:
+        """Read the index written when the archive was closed.
+
+        Args:
+            None
+
+        Returns:
+            Optional[dict]
+                The index, None if the archive was not closed.
+        """
+        if self._size < len(MAGIC) + TRAILER.size:
+            return None
+        offset, magic = TRAILER.unpack(os.pread(self._fd, TRAILER.size, self._size - TRAILER.size))
+        if magic != MAGIC:
+            return None
+        kind, meta_length, length = RECORD_HEADER.unpack(os.pread(self._fd, RECORD_HEADER.size, offset))
+        if kind != RECORD_INDEX:
+            return None
+        payload = os.pread(self._fd, length, offset + RECORD_HEADER.size + meta_length)
+        return json.loads(zlib.decompress(payload))
+
+    def _scan(self) -> dict:
+        """Rebuild the index by reading all records.
+
+        A truncated last record, i.e: interrupted while being written,
+        is ignored.
+
+        Args:
+            None
+
+        Returns:
+            dict
+                The index.
+        """
+        blobs = {}
+        exchanges = defaultdict(list)
+        offset = len(MAGIC)
+        while offset + RECORD_HEADER.size <= self._size:
+            kind, meta_length, length = RECORD_HEADER.unpack(os.pread(self._fd, RECORD_HEADER.size, offset))
+            payload_offset = offset + RECORD_HEADER.size + meta_length
+            if payload_offset + length > self._size:
+                break
+            meta = json.loads(os.pread(self._fd, meta_length, offset + RECORD_HEADER.size))
+            if kind == RECORD_BLOB:
+                blobs[meta['digest']] = (payload_offset, length)
+            elif kind == RECORD_EXCHANGE and meta['exchange'][2] in blobs:
+                exchanges[meta['key']].append(meta['exchange'])
+            offset = payload_offset + length
+        return {'blobs': blobs, 'exchanges': exchanges}
+
+
+class RecordingAdapter(BaseAdapter):
+    """Transport adapter recording the responses of another adapter.
+
+    Args:
+        adapter: BaseAdapter
+            Adapter sending the requests.
+        archive: ArchiveWriter
+            Where responses are recorded.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, adapter: BaseAdapter, archive: ArchiveWriter) -> None:
+        super().__init__()
+        self._adapter = adapter
+        self._archive = archive
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        response = self._adapter.send(request, **kwargs)
+        headers = {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers}
+        self._archive.record(request.method, request.url, _request_body(request), response.status_code, headers, response.content)
+        return response
+
+    def close(self) -> None:
+        self._adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter serving responses from an archive.
+
+    Args:
+        archive: ArchiveReader
+            Where responses are served from.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, archive: ArchiveReader) -> None:
+        super().__init__()
+        self._archive = archive
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        recorded = self._archive.lookup(request.method, request.url, _request_body(request))
+        if recorded is None:
+            raise ArchiveMissError(f'{request.method} {request.url} is not in the beacon archive', request=request)
+
+        status, headers, content = recorded
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = content
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.reason = 'OK' if status < 400 else 'Error'
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def archive_adapter(path: str, mode: str) -> Callable[[BaseAdapter], BaseAdapter]:
+    """Open an archive and build the adapters wrapping the beacon ones.
+
+    Args:
+        path: str
+            Path of the archive.
+        mode: str
+            `record` to write responses to the archive, `replay` to
+            serve them from it.
+
+    Returns:
+        Callable[[BaseAdapter], BaseAdapter]
+            Builds the adapter to use in place of a beacon adapter.
+
+    Raises:
+        ValueError
+            If the mode is unknown or the archive can't be read.
+    """
+    if mode == 'record':
+        writer = ArchiveWriter(path)
+        logging.info(f'📼 Recording beacon responses to {path}')
+        return lambda adapter: RecordingAdapter(adapter, writer)
+    if mode == 'replay':
+        reader = ArchiveReader(path)
+        logging.info(f'📼 Replaying {len(reader)} beacon requests from {path}')
+        return lambda adapter: ReplayAdapter(reader)
+    raise ValueError(f'unknown beacon archive mode: {mode}')
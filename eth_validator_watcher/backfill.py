@@ -0,0 +1,355 @@
+"""Historical backfill of per-label performance over finalized epochs.
+
+Finalized epochs are independent from each other given their
+committees, attestations, proposer duties, rewards and liveness: the
+epoch range is split in chunks which are processed by a pool of worker
+processes. Each worker replays the duties of its epochs slot by slot
+on the watched validators and aggregates them per label with the
+native metrics code, the coordinator merges the aggregates of all
+chunks into a CSV file, one row per epoch and label.
+
+Only watched validators are processed, as in watched-only mode: the
+cost of an epoch does not depend on the size of the network.
+"""
+
+import csv
+import logging
+import multiprocessing
+import time
+
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Iterator, Optional
+
+from eth_validator_watcher_ext import MetricsByLabel, fast_compute_validator_metrics
+
+from .archive import archive_adapter
+from .beacon import Beacon, BeaconSessions
+from .blocks import process_finalized_block
+from .config import Config, load_config
+from .duties import process_duties
+from .models import Spec
+from .proposer_schedule import ProposerSchedule
+from .rewards import process_rewards
+from .utils import LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK
+from .watched_validators import WatchedValidators
+
+
+# Epochs processed by a worker in one go: the epoch before each chunk
+# is processed first to know the previous missed attestations.
+BACKFILL_CHUNK_EPOCHS = 16
+
+# Only watched validators are processed, network scopes would be
+# meaningless.
+NETWORK_LABELS = (LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK)
+
+
+@dataclass
+class EpochAggregate:
+    """Performance of the validators of a label over an epoch.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    epoch: int
+    label: str
+    validators: int = 0
+    performed_duties: int = 0
+    missed_duties: int = 0
+    missed_attestations: int = 0
+    missed_consecutive_attestations: int = 0
+    suboptimal_source: int = 0
+    suboptimal_target: int = 0
+    suboptimal_head: int = 0
+    ideal_consensus_reward: float = 0.0
+    actual_consensus_reward: float = 0.0
+    proposed_blocks: int = 0
+    missed_blocks: int = 0
+
+    @property
+    def duties_rate(self) -> float:
+        total = self.performed_duties + self.missed_duties
+        return self.performed_duties / total if total else 1.0
+
+
+class EpochBackfiller:
+    """Compute the per-label aggregates of finalized epochs.
+
+    Args:
+        cfg: Config
+            Configuration of the watcher, for the beacon and the
+            watched keys.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError
+            If the configuration records a beacon archive: workers
+            would all write to it.
+    """
+
+    def __init__(self, cfg: Config) -> None:
+        sessions = None
+        if cfg.beacon_archive_path:
+            if cfg.beacon_archive_mode == 'record':
+                raise ValueError('beacon archives can only be replayed when backfilling')
+            sessions = BeaconSessions(archive_adapter(cfg.beacon_archive_path, 'replay'))
+
+        self._beacon = Beacon(cfg.beacon_url, cfg.beacon_timeout_sec, sessions, cfg.network)
+        self._spec: Spec = self._beacon.get_spec()
+        self._validators = WatchedValidators()
+        self._validators.process_config(cfg)
+
+    def process_chunk(self, epochs: range) -> list[EpochAggregate]:
+        """Process consecutive epochs.
+
+        Args:
+            epochs: range
+                Epochs to process.
+
+        Returns:
+            list[EpochAggregate]
+                Aggregates of each epoch and label.
+        """
+        self._load_state(epochs.start)
+        self._process_liveness(epochs.start - 1)
+
+        aggregates = []
+        for epoch in epochs:
+            aggregates.extend(self.process_epoch(epoch))
+        return aggregates
+
+    def process_epoch(self, epoch: int) -> list[EpochAggregate]:
+        """Process the duties of an epoch.
+
+        Args:
+            epoch: int
+                Finalized epoch to process.
+
+        Returns:
+            list[EpochAggregate]
+                Aggregates of the epoch, one per label.
+        """
+        slots_per_epoch = self._spec.data.SLOTS_PER_EPOCH
+        start = epoch * slots_per_epoch
+
+        self._load_state(epoch)
+        self._process_liveness(epoch)
+        indexes = self._validators.get_watched_indexes()
+        if indexes:
+            process_rewards(self._validators, self._beacon.get_rewards(epoch, indexes), epoch)
+
+        schedule = ProposerSchedule(self._spec)
+        schedule.load({duty.slot: duty.validator_index for duty in self._beacon.get_proposer_duties(epoch).data})
+
+        aggregates: dict[str, EpochAggregate] = {}
+        for slot in range(start, start + slots_per_epoch):
+            process_finalized_block(self._validators, schedule, slot, self._beacon.has_block_at_slot(slot))
+
+            # Attestations for a slot are included in the next blocks.
+            committees = self._beacon.get_committees(slot)
+            attestations = self._beacon.get_attestations(slot + 1)
+            if attestations:
+                process_duties(self._validators, committees, attestations, slot + 1)
+
+            metrics = fast_compute_validator_metrics(self._validators.get_validators(), slot + 1)
+            self._validators.reset_blocks()
+            for label, m in metrics.items():
+                if label in NETWORK_LABELS:
+                    continue
+                self._accumulate(aggregates.setdefault(label, EpochAggregate(epoch=epoch, label=label)), m)
+
+        # State and rewards are the same on all slots of the epoch.
+        for label, aggregate in aggregates.items():
+            self._set_epoch_state(aggregate, metrics[label])
+
+        return sorted(aggregates.values(), key=lambda a: a.label)
+
+    def _load_state(self, epoch: int) -> None:
+        """Fetch the state of the watched validators at an epoch.
+
+        Args:
+            epoch: int
+                Epoch of the state.
+
+        Returns:
+            None
+        """
+        slot = epoch * self._spec.data.SLOTS_PER_EPOCH
+        self._validators.process_epoch(self._beacon.get_validators_by_ids(slot, self._validators.get_watched_ids()))
+
+    def _process_liveness(self, epoch: int) -> None:
+        """Process the liveness of the watched validators during an epoch.
+
+        Args:
+            epoch: int
+                Epoch of the liveness.
+
+        Returns:
+            None
+        """
+        indexes = self._validators.get_watched_indexes()
+        if indexes:
+            self._validators.process_liveness(self._beacon.get_validators_liveness(epoch, indexes), epoch + 1)
+
+    @staticmethod
+    def _accumulate(aggregate: EpochAggregate, m: MetricsByLabel) -> None:
+        """Add the duties and blocks of a slot to an aggregate.
+
+        Args:
+            aggregate: EpochAggregate
+                Aggregate of the epoch.
+            m: MetricsByLabel
+                Metrics of the slot.
+
+        Returns:
+            None
+        """
+        aggregate.performed_duties += m.performed_duties_at_slot_count
+        aggregate.missed_duties += m.missed_duties_at_slot_count
+        aggregate.proposed_blocks += m.proposed_blocks_finalized
+        aggregate.missed_blocks += m.missed_blocks_finalized
+
+    @staticmethod
+    def _set_epoch_state(aggregate: EpochAggregate, m: MetricsByLabel) -> None:
+        """Set the state and rewards of the validators in an aggregate.
+
+        Args:
+            aggregate: EpochAggregate
+                Aggregate of the epoch.
+            m: MetricsByLabel
+                Metrics of the last slot of the epoch.
+
+        Returns:
+            None
+        """
+        aggregate.validators = sum(m.validator_status_count.values())
+        aggregate.missed_attestations = m.missed_attestations_count
+        aggregate.missed_consecutive_attestations = m.missed_consecutive_attestations_count
+        aggregate.suboptimal_source = m.suboptimal_source_count
+        aggregate.suboptimal_target = m.suboptimal_target_count
+        aggregate.suboptimal_head = m.suboptimal_head_count
+        aggregate.ideal_consensus_reward = m.ideal_consensus_reward
+        aggregate.actual_consensus_reward = m.actual_consensus_reward
+
+
+_backfiller: Optional[EpochBackfiller] = None
+
+
+def _init_worker(cfg_path: Path) -> None:
+    """Set up the backfiller of a worker process.
+
+    Args:
+        cfg_path: Path
+            Path to the configuration file.
+
+    Returns:
+        None
+    """
+    global _backfiller
+    _backfiller = EpochBackfiller(load_config(str(cfg_path)))
+
+
+def _process_chunk(epochs: range) -> list[EpochAggregate]:
+    """Process a chunk of epochs in a worker process.
+
+    Args:
+        epochs: range
+            Epochs to process.
+
+    Returns:
+        list[EpochAggregate]
+            Aggregates of each epoch and label.
+    """
+    return _backfiller.process_chunk(epochs)
+
+
+def chunk_epochs(start: int, end: int, size: int) -> Iterator[range]:
+    """Split an epoch range in chunks.
+
+    Args:
+        start: int
+            First epoch.
+        end: int
+            Last epoch, included.
+        size: int
+            Number of epochs per chunk.
+
+    Returns:
+        Iterator[range]
+            The chunks.
+    """
+    for first in range(start, end + 1, size):
+        yield range(first, min(first + size, end + 1))
+
+
+def write_aggregates(path: Path, aggregates: list[EpochAggregate]) -> None:
+    """Write aggregates to a CSV file.
+
+    Args:
+        path: Path
+            Path of the file.
+        aggregates: list[EpochAggregate]
+            Aggregates to write.
+
+    Returns:
+        None
+    """
+    columns = [field.name for field in fields(EpochAggregate)] + ['duties_rate']
+    with open(path, 'w', newline='') as fh:
+        writer = csv.DictWriter(fh, fieldnames=columns)
+        writer.writeheader()
+        for aggregate in aggregates:
+            writer.writerow(dict(asdict(aggregate), duties_rate=aggregate.duties_rate))
+
+
+def run_backfill(cfg_path: Path, start: int, end: int, workers: int, output: Path, chunk_size: int = BACKFILL_CHUNK_EPOCHS) -> list[EpochAggregate]:
+    """Compute the per-label aggregates of an epoch range.
+
+    Chunks are distributed to the workers as they become available so
+    that slow chunks don't hold the others back.
+
+    Args:
+        cfg_path: Path
+            Path to the configuration file.
+        start: int
+            First epoch.
+        end: int
+            Last epoch, included, must be finalized.
+        workers: int
+            Number of worker processes, 1 to process in this process.
+        output: Path
+            CSV file to write.
+        chunk_size: int
+            Number of epochs per chunk.
+
+    Returns:
+        list[EpochAggregate]
+            Aggregates, sorted by epoch and label.
+    """
+    chunks = list(chunk_epochs(start, end, chunk_size))
+    started_at = time.monotonic()
+    aggregates: list[EpochAggregate] = []
+
+    if workers <= 1:
+        backfiller = EpochBackfiller(load_config(str(cfg_path)))
+        for chunk in chunks:
+            aggregates.extend(backfiller.process_chunk(chunk))
+    else:
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(cfg_path,)) as pool:
+            for done, result in enumerate(pool.imap_unordered(_process_chunk, chunks), 1):
+                aggregates.extend(result)
+                logging.info(f'⏪ Backfilled {done}/{len(chunks)} chunks')
+
+    aggregates.sort(key=lambda a: (a.epoch, a.label))
+    write_aggregates(output, aggregates)
+
+    epochs = end - start + 1
+    elapsed = time.monotonic() - started_at
+    logging.info(f'⏪ Backfilled {epochs} epochs in {elapsed:.1f}s ({epochs / elapsed:.2f} epochs/s) to {output}')
+    return aggregates
@@ -1,13 +1,17 @@
 """Contains the Beacon class which is used to interact with the consensus layer node."""
 
 import functools
-from typing import Any, Union
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar, Union
 
+from pydantic import BaseModel
 from requests import HTTPError, Response, Session, codes
-from requests.adapters import HTTPAdapter, Retry
+from requests.adapters import BaseAdapter, HTTPAdapter, Retry
 from requests.exceptions import ChunkedEncodingError
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
+from .metrics import get_prometheus_metrics
 from .models import (
     Attestations,
     BlockIdentierType,
@@ -27,32 +31,37 @@ from .models import (
 
 print = functools.partial(print, flush=True)
 
+# Validators are resolved by ids in chunks fetched concurrently: beacon
+# nodes limit the size of request bodies and parsing a chunk is cheap.
+VALIDATORS_IDS_CHUNK_SIZE = 1000
+VALIDATORS_IDS_CONCURRENCY = 4
+
+ModelT = TypeVar('ModelT', bound=BaseModel)
+
 
 class NoBlockError(Exception):
     pass
 
 
-class Beacon:
-    """Beacon node abstraction."""
+class BeaconSessions:
+    """HTTP sessions used to query beacon nodes.
 
-    def __init__(self, url: str, timeout_sec: int) -> None:
-        """Initialize a Beacon instance.
+    Connection pools are per host, the sessions can be shared by the
+    beacons of several networks running in the same process and are
+    kept when a beacon client is re-created on configuration reload.
 
-        Args:
-            url: str
-                URL where the beacon can be reached.
-            timeout_sec: int
-                Timeout in seconds used to query the beacon.
+    Args:
+        wrap_adapter: Optional[Callable[[BaseAdapter], BaseAdapter]]
+            Builds the transport adapter used in place of the HTTP
+            ones, i.e: to record or replay responses.
 
-        Returns:
-            None
-        """
-        self._url = url
-        self._timeout_sec = timeout_sec
-        self._http_retry_not_found = Session()
-        self._http = Session()
-        self._first_liveness_call = True
-        self._first_rewards_call = True
+    Returns:
+        None
+    """
+
+    def __init__(self, wrap_adapter: Optional[Callable[[BaseAdapter], BaseAdapter]] = None) -> None:
+        self.retry_not_found = Session()
+        self.default = Session()
 
         adapter_retry_not_found = HTTPAdapter(
             max_retries=Retry(
@@ -77,21 +86,61 @@ class Beacon:
             )
         )
 
-        self._http_retry_not_found.mount("http://", adapter_retry_not_found)
-        self._http_retry_not_found.mount("https://", adapter_retry_not_found)
+        if wrap_adapter is not None:
+            adapter_retry_not_found = wrap_adapter(adapter_retry_not_found)
+            adapter = wrap_adapter(adapter)
+
+        self.retry_not_found.mount("http://", adapter_retry_not_found)
+        self.retry_not_found.mount("https://", adapter_retry_not_found)
 
-        self._http.mount("http://", adapter)
-        self._http.mount("https://", adapter)
+        self.default.mount("http://", adapter)
+        self.default.mount("https://", adapter)
+
+
+class Beacon:
+    """Beacon node abstraction."""
+
+    def __init__(self, url: str, timeout_sec: int, sessions: Optional[BeaconSessions] = None, network: str = '', timings: bool = True) -> None:
+        """Initialize a Beacon instance.
+
+        Args:
+            url: str
+                URL where the beacon can be reached.
+            timeout_sec: int
+                Timeout in seconds used to query the beacon.
+            sessions: Optional[BeaconSessions]
+                HTTP sessions to use, new ones are created if None.
+            network: str
+                Network of the beacon, used to label request metrics.
+            timings: bool
+                Whether requests are timed and measured.
+
+        Returns:
+            None
+        """
+        sessions = sessions or BeaconSessions()
+
+        self._url = url
+        self._timeout_sec = timeout_sec
+        self._http_retry_not_found = sessions.retry_not_found
+        self._http = sessions.default
+        self._network = network
+        self._timings = timings
+        self._metrics = get_prometheus_metrics()
+        self._first_liveness_call = True
+        self._first_rewards_call = True
 
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_fixed(3),
         retry=retry_if_exception_type(ChunkedEncodingError),
     )
-    def _get_retry_not_found(self, *args: Any, **kwargs: Any) -> Response:
+    def _get_retry_not_found(self, endpoint: str, *args: Any, **kwargs: Any) -> Response:
         """Wrapper around requests.get() with retry on 404.
 
         Args:
+            endpoint: str
+                Name of the endpoint, for metrics.
             *args: Any
                 Positional arguments to pass to requests.get().
             **kwargs: Any
@@ -101,17 +150,22 @@ class Beacon:
             Response
                 The HTTP response.
         """
-        return self._http_retry_not_found.get(*args, **kwargs)
+        start = time.perf_counter()
+        response = self._http_retry_not_found.get(*args, **kwargs)
+        self._observe_request(endpoint, time.perf_counter() - start, response)
+        return response
 
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_fixed(3),
         retry=retry_if_exception_type(ChunkedEncodingError),
     )
-    def _get(self, *args: Any, **kwargs: Any) -> Response:
+    def _get(self, endpoint: str, *args: Any, **kwargs: Any) -> Response:
         """Wrapper around requests.get().
 
         Args:
+            endpoint: str
+                Name of the endpoint, for metrics.
             *args: Any
                 Positional arguments to pass to requests.get().
             **kwargs: Any
@@ -121,17 +175,47 @@ class Beacon:
             Response
                 The HTTP response.
         """
-        return self._http.get(*args, **kwargs)
+        start = time.perf_counter()
+        response = self._http.get(*args, **kwargs)
+        self._observe_request(endpoint, time.perf_counter() - start, response)
+        return response
 
     @retry(
         stop=stop_after_attempt(5),
         wait=wait_fixed(3),
         retry=retry_if_exception_type(ChunkedEncodingError),
     )
-    def _post_retry_not_found(self, *args: Any, **kwargs: Any) -> Response:
+    def _post_retry_not_found(self, endpoint: str, *args: Any, **kwargs: Any) -> Response:
         """Wrapper around requests.post() with retry on 404.
 
         Args:
+            endpoint: str
+                Name of the endpoint, for metrics.
+            *args: Any
+                Positional arguments to pass to requests.post().
+            **kwargs: Any
+                Keyword arguments to pass to requests.post().
+
+        Returns:
+            Response
+                The HTTP response.
+        """
+        start = time.perf_counter()
+        response = self._http_retry_not_found.post(*args, **kwargs)
+        self._observe_request(endpoint, time.perf_counter() - start, response)
+        return response
+
+    @retry(
+        stop=stop_after_attempt(5),
+        wait=wait_fixed(3),
+        retry=retry_if_exception_type(ChunkedEncodingError),
+    )
+    def _post(self, endpoint: str, *args: Any, **kwargs: Any) -> Response:
+        """Wrapper around requests.post().
+
+        Args:
+            endpoint: str
+                Name of the endpoint, for metrics.
             *args: Any
                 Positional arguments to pass to requests.post().
             **kwargs: Any
@@ -141,7 +225,51 @@ class Beacon:
             Response
                 The HTTP response.
         """
-        return self._http_retry_not_found.post(*args, **kwargs)
+        start = time.perf_counter()
+        response = self._http.post(*args, **kwargs)
+        self._observe_request(endpoint, time.perf_counter() - start, response)
+        return response
+
+    def _observe_request(self, endpoint: str, duration: float, response: Response) -> None:
+        """Record the network time and size of a response.
+
+        Args:
+            endpoint: str
+                Name of the endpoint.
+            duration: float
+                Time to send the request and read the response, in seconds.
+            response: Response
+                The HTTP response.
+
+        Returns:
+            None
+        """
+        if not self._timings:
+            return
+        self._metrics.eth_watcher_beacon_request_seconds.labels(endpoint, self._network).observe(duration)
+        self._metrics.eth_watcher_beacon_response_bytes.labels(endpoint, self._network).observe(len(response.content))
+
+    def _parse(self, endpoint: str, model: type[ModelT], response: Response) -> ModelT:
+        """Parse a response and record the time it took.
+
+        Args:
+            endpoint: str
+                Name of the endpoint.
+            model: type[ModelT]
+                Model of the response.
+            response: Response
+                The HTTP response.
+
+        Returns:
+            ModelT
+                The parsed response.
+        """
+        if not self._timings:
+            return model.model_validate_json(response.text)
+        start = time.perf_counter()
+        parsed = model.model_validate_json(response.text)
+        self._metrics.eth_watcher_beacon_parse_seconds.labels(endpoint, self._network).observe(time.perf_counter() - start)
+        return parsed
 
     def get_url(self) -> str:
         """Get the URL of the beacon node.
@@ -178,12 +306,13 @@ class Beacon:
                 The beacon chain genesis data.
         """
         response = self._get_retry_not_found(
+            "genesis",
             f"{self._url}/eth/v1/beacon/genesis", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return Genesis.model_validate_json(response.text)
+        return self._parse("genesis", Genesis, response)
 
     def get_spec(self) -> Spec:
         """Get beacon chain specification data.
@@ -196,12 +325,13 @@ class Beacon:
                 The beacon chain specification data.
         """
         response = self._get_retry_not_found(
+            "spec",
             f"{self._url}/eth/v1/config/spec", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return Spec.model_validate_json(response.text)
+        return self._parse("spec", Spec, response)
 
     def get_committees(self, slot: int) -> Committees:
         """Get beacon chain committees for a specific slot.
@@ -215,11 +345,12 @@ class Beacon:
                 The committee assignments for the specified slot.
         """
         response = self._get(
+            "committees",
             f"{self._url}/eth/v1/beacon/states/{slot}/committees?slot={slot}", timeout=self._timeout_sec
         )
         response.raise_for_status()
 
-        return Committees.model_validate_json(response.text)
+        return self._parse("committees", Committees, response)
 
     def get_attestations(self, slot: int) -> Attestations:
         """Get attestations from a specific block.
@@ -234,6 +365,7 @@ class Beacon:
         """
         try:
             response = self._get(
+                "attestations",
                 f"{self._url}/eth/v2/beacon/blocks/{slot}/attestations", timeout=self._timeout_sec
             )
             response.raise_for_status()
@@ -243,7 +375,7 @@ class Beacon:
             # If we are here, it's an other error
             raise
 
-        return Attestations.model_validate_json(response.text)
+        return self._parse("attestations", Attestations, response)
 
     def get_header(self, block_identifier: Union[BlockIdentierType, int]) -> Header:
         """Get a block header.
@@ -262,6 +394,7 @@ class Beacon:
         """
         try:
             response = self._get(
+                "header",
                 f"{self._url}/eth/v1/beacon/headers/{block_identifier}", timeout=self._timeout_sec
             )
             response.raise_for_status()
@@ -272,7 +405,7 @@ class Beacon:
             # If we are here, it's an other error
             raise
 
-        return Header.model_validate_json(response.text)
+        return self._parse("header", Header, response)
 
     def get_proposer_duties(self, epoch: int) -> ProposerDuties:
         """Get proposer duties for a specific epoch.
@@ -286,12 +419,13 @@ class Beacon:
                 The proposer duties for the specified epoch.
         """
         response = self._get_retry_not_found(
+            "proposer_duties",
             f"{self._url}/eth/v1/validator/duties/proposer/{epoch}", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return ProposerDuties.model_validate_json(response.text)
+        return self._parse("proposer_duties", ProposerDuties, response)
 
     def get_validators(self, slot: int) -> Validators:
         """Get validator information for a specific slot.
@@ -305,33 +439,77 @@ class Beacon:
                 The validator information for the specified slot.
         """
         response = self._get_retry_not_found(
+            "validators",
             f"{self._url}/eth/v1/beacon/states/{slot}/validators", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return Validators.model_validate_json(response.text)
+        return self._parse("validators", Validators, response)
+
+    def get_validators_by_ids(self, slot: int, ids: list[str]) -> Validators:
+        """Get validator information for a subset of validators.
+
+        Validators are requested by index or public key in chunks,
+        which are fetched concurrently. The cost of a call scales with
+        the number of ids instead of the size of the network.
 
-    def get_rewards(self, epoch: int) -> Rewards:
+        Args:
+            slot: int
+                Slot for which to retrieve validator information.
+            ids: list[str]
+                Indexes or hex-encoded public keys of the validators.
+
+        Returns:
+            Validators
+                The validator information for the validators found.
+        """
+        def fetch(chunk: list[str]) -> Validators:
+            response = self._post(
+                "validators_by_ids",
+                f"{self._url}/eth/v1/beacon/states/{slot}/validators",
+                json={"ids": chunk},
+                timeout=self._timeout_sec,
+            )
+            response.raise_for_status()
+            return self._parse("validators_by_ids", Validators, response)
+
+        chunks = [ids[i:i + VALIDATORS_IDS_CHUNK_SIZE] for i in range(0, len(ids), VALIDATORS_IDS_CHUNK_SIZE)]
+        if len(chunks) <= 1:
+            return fetch(ids) if ids else Validators(data=[])
+
+        with ThreadPoolExecutor(max_workers=VALIDATORS_IDS_CONCURRENCY, thread_name_prefix='beacon') as executor:
+            results = list(executor.map(fetch, chunks))
+
+        return Validators(data=[item for result in results for item in result.data])
+
+    def get_rewards(self, epoch: int, indexes: Optional[list[int]] = None) -> Rewards:
         """Get attestation rewards for a specific epoch.
 
         Args:
             epoch: int
                 Epoch corresponding to the rewards to retrieve.
+            indexes: Optional[list[int]]
+                Validators to retrieve rewards for, all of them if None.
 
         Returns:
             Rewards
                 The attestation rewards for the specified epoch.
         """
+        # An empty list of indexes asks the beacon for all validators.
+        if indexes is not None and not indexes:
+            return Rewards(data=Rewards.Data(ideal_rewards=[], total_rewards=[]))
+
         response = self._post_retry_not_found(
+            "rewards",
             f"{self._url}/eth/v1/beacon/rewards/attestations/{epoch}",
-            json=([]),
+            json=[f"{i}" for i in indexes] if indexes is not None else [],
             timeout=self._timeout_sec,
         )
 
         response.raise_for_status()
 
-        return Rewards.model_validate_json(response.text)
+        return self._parse("rewards", Rewards, response)
 
     def get_validators_liveness(self, epoch: int, indexes: list[int]) -> ValidatorsLivenessResponse:
         """Get validators liveness information for a specific epoch.
@@ -347,6 +525,7 @@ class Beacon:
                 The liveness information for the specified validators.
         """
         response = self._post_retry_not_found(
+            "liveness",
             f"{self._url}/eth/v1/validator/liveness/{epoch}",
             json=[f"{i}" for i in indexes],
             timeout=self._timeout_sec,
@@ -354,7 +533,7 @@ class Beacon:
 
         response.raise_for_status()
 
-        return ValidatorsLivenessResponse.model_validate_json(response.text)
+        return self._parse("liveness", ValidatorsLivenessResponse, response)
 
     def get_pending_deposits(self) -> PendingDeposits:
         """Get beacon chain pending deposits.
@@ -367,12 +546,13 @@ class Beacon:
                 The beacon chain pending deposits.
         """
         response = self._get_retry_not_found(
+            "pending_deposits",
             f"{self._url}/eth/v1/beacon/states/head/pending_deposits", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return PendingDeposits.model_validate_json(response.text)
+        return self._parse("pending_deposits", PendingDeposits, response)
 
     def get_pending_consolidations(self) -> PendingConsolidations:
         """Get beacon chain pending consolidations.
@@ -385,12 +565,13 @@ class Beacon:
                 The beacon chain pending consolidations.
         """
         response = self._get_retry_not_found(
+            "pending_consolidations",
             f"{self._url}/eth/v1/beacon/states/head/pending_consolidations", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return PendingConsolidations.model_validate_json(response.text)
+        return self._parse("pending_consolidations", PendingConsolidations, response)
 
     def get_pending_withdrawals(self) -> PendingWithdrawals:
         """Get beacon chain pending withdrawals.
@@ -403,12 +584,30 @@ class Beacon:
                 The beacon chain pending withdrawals.
         """
         response = self._get_retry_not_found(
+            "pending_withdrawals",
             f"{self._url}/eth/v1/beacon/states/head/pending_partial_withdrawals", timeout=self._timeout_sec
         )
 
         response.raise_for_status()
 
-        return PendingWithdrawals.model_validate_json(response.text)
+        return self._parse("pending_withdrawals", PendingWithdrawals, response)
+
+    def get_block_header(self, block_identifier: BlockIdentierType | int) -> Optional[Header]:
+        """Get a block header if the block exists.
+
+        Args:
+            block_identifier: BlockIdentierType | int
+                Block identifier (i.e: head, finalized, 42, etc).
+
+        Returns:
+            Optional[Header]
+                The block header, None if there is no block.
+        """
+        try:
+            header = self.get_header(block_identifier)
+        except NoBlockError:
+            return None
+        return header if header.data.header.message.slot > 0 else None
 
     def has_block_at_slot(self, block_identifier: BlockIdentierType | int) -> bool:
         """Returns the slot of a block identifier if it exists.
@@ -422,7 +621,4 @@ class Beacon:
         --------
         bool: True if the block exists, False otherwise.
         """
-        try:
-            return self.get_header(block_identifier).data.header.message.slot > 0
-        except NoBlockError:
-            return False
+        return self.get_block_header(block_identifier) is not None
@@ -24,6 +24,7 @@ def process_block(validators: WatchedValidators, schedule: ProposerSchedule, slo
 
     validator = validators.get_validator_by_index(validator_index)
     if validator is None:
+        validators.get_network().process_block(validator_index, has_block)
         return
 
     validator.process_block(slot_id, has_block)
@@ -51,6 +52,7 @@ def process_finalized_block(validators: WatchedValidators, schedule: ProposerSch
 
     validator = validators.get_validator_by_index(validator_index)
     if validator is None:
+        validators.get_network().process_block_finalized(validator_index, has_block)
         return
 
     validator.process_block_finalized(slot_id, has_block)
@@ -71,10 +73,12 @@ def process_future_blocks(validators: WatchedValidators, schedule: ProposerSched
         None
     """
     future_proposals = schedule.get_future_proposals(slot_id)
+    network = validators.get_network()
 
     for slot_id, validator_index in future_proposals.items():
         validator = validators.get_validator_by_index(validator_index)
         if validator is None:
+            network.process_future_block(validator_index)
             continue
 
         validator.process_future_block(slot_id)
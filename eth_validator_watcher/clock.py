@@ -91,6 +91,20 @@ class BeaconClock:
         """
         return int((self.now() - self._genesis) // self._slot_duration)
 
+    def get_slot_lag(self, slot: int) -> float:
+        """Get the time elapsed since the start of a slot.
+
+        Args:
+        -----
+        slot: int
+            Slot to measure the lag of.
+
+        Returns:
+        --------
+        float: Seconds since the start of the slot.
+        """
+        return self.now() + self._lag_seconds - (self._genesis + slot * self._slot_duration)
+
     def maybe_wait_for_slot(self, slot: int) -> None:
         """Wait until the given slot is reached.
 
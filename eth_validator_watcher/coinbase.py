@@ -1,7 +1,6 @@
 """Helper to fetch the ETH/USD price from Coinbase."""
 
-from cachetools import func
-from pydantic import parse_obj_as
+from pydantic import TypeAdapter
 from requests import Session
 
 from .models import CoinbaseTrade
@@ -10,25 +9,35 @@ from .models import CoinbaseTrade
 URL = "https://api.exchange.coinbase.com/products/ETH-USD/trades"
 
 
-@func.ttl_cache(ttl=600)
-def get_current_eth_price() -> float:
-    """Get the current ETH price in USD from Coinbase.
+class CoinbasePriceSource:
+    """Fetch the ETH/USD price from the last Coinbase trade.
 
     Args:
-        None
+        url: str
+            URL of the trades endpoint.
 
     Returns:
-        float
-            The current ETH price in USD, or 0.0 if fetching fails.
+        None
     """
-    try:
-        response = Session().get(URL, params=dict(limit=1))
-        trades_dict = response.json()
-        trades = parse_obj_as(list[CoinbaseTrade], trades_dict)
-        trade, *_ = trades
-    except Exception:
-        # This feature is totally optional, so if it fails, we just
-        # return 0.0.
-        return 0.0
-
-    return trade.price
+
+    def __init__(self, url: str = URL) -> None:
+        self._url = url
+        self._trades = TypeAdapter(list[CoinbaseTrade])
+
+    def fetch(self, session: Session, timeout_sec: float) -> float:
+        """Get the current ETH price in USD from Coinbase.
+
+        Args:
+            session: Session
+                HTTP session to use.
+            timeout_sec: float
+                Timeout of the HTTP request, in seconds.
+
+        Returns:
+            float
+                The current ETH price in USD.
+        """
+        response = session.get(self._url, params=dict(limit=1), timeout=timeout_sec)
+        response.raise_for_status()
+        trade, *_ = self._trades.validate_python(response.json())
+        return trade.price
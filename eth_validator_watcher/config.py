@@ -1,23 +1,13 @@
-from pydantic import BaseModel
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional
+from typing import Any, Literal, Optional
 
 import logging
 import json
 import yaml
 
-
-class WatchedKeyConfig(BaseModel):
-    """Configuration model for a watched validator key.
-
-    Args:
-        None
-
-    Returns:
-        None
-    """
-    public_key: str
-    labels: Optional[list[str]] = None
+from .watch_selectors import WatchedSelectorConfig
+from .watched_keys import BaseWatchedKeys, MappedWatchedKeys, WatchedKeyConfig, WatchedKeys  # noqa: F401
 
 
 class Config(BaseSettings):
@@ -29,13 +19,15 @@ class Config(BaseSettings):
     Returns:
         None
     """
-    model_config = SettingsConfigDict(case_sensitive=True, env_prefix='eth_watcher_')
+    model_config = SettingsConfigDict(case_sensitive=True, env_prefix='eth_watcher_', arbitrary_types_allowed=True)
 
     network: Optional[str] = None
     beacon_url: Optional[str] = None
     beacon_timeout_sec: Optional[int] = None
     metrics_port: Optional[int] = None
-    watched_keys: Optional[List[WatchedKeyConfig]] = None
+    watched_keys: Optional[BaseWatchedKeys] = None
+    watched_keys_file: Optional[str] = None
+    watched_selectors: Optional[list[WatchedSelectorConfig]] = None
 
     slack_token: Optional[str] = None
     slack_channel: Optional[str] = None
@@ -43,6 +35,46 @@ class Config(BaseSettings):
     replay_start_at_ts: Optional[int] = None
     replay_end_at_ts: Optional[int] = None
 
+    snapshot_path: Optional[str] = None
+
+    beacon_archive_path: Optional[str] = None
+    beacon_archive_mode: Optional[Literal['record', 'replay']] = None
+
+    watched_only: Optional[bool] = None
+    network_stats_interval_epochs: Optional[int] = None
+
+    admin_port: Optional[int] = None
+    query_port: Optional[int] = None
+
+    history_window_epochs: Optional[int] = None
+    history_missed_threshold: Optional[int] = None
+
+    export_path: Optional[str] = None
+    export_format: Optional[Literal['parquet', 'arrow']] = None
+    export_rotate_epochs: Optional[int] = None
+
+    @field_validator('watched_keys', mode='before')
+    @classmethod
+    def _validate_watched_keys(cls, value: Any) -> Optional[BaseWatchedKeys]:
+        """Convert watched keys entries to their compact representation.
+
+        Args:
+            value: Any
+                Watched keys as a BaseWatchedKeys, a list of entries or
+                a JSON-encoded list of entries (environment variables).
+
+        Returns:
+            Optional[BaseWatchedKeys]
+                The compact mapping of watched keys.
+        """
+        if value is None or isinstance(value, BaseWatchedKeys):
+            return value
+        if isinstance(value, str):
+            value = json.loads(value)
+        if not isinstance(value, list):
+            raise ValueError('watched_keys must be a list')
+        return WatchedKeys.from_entries(value)
+
 
 def _default_config() -> Config:
     """Create and return the default configuration.
@@ -63,6 +95,38 @@ def _default_config() -> Config:
     )
 
 
+def read_config_file(config_file: str) -> tuple[dict, Optional[WatchedKeys]]:
+    """Parse a YAML or JSON configuration file.
+
+    Args:
+        config_file: str
+            Path to the YAML or JSON configuration file.
+
+    Returns:
+        tuple[dict, Optional[WatchedKeys]]
+            The configuration without its watched keys, and the
+            watched keys if the file has any.
+    """
+    with open(config_file, 'r') as fh:
+        logging.info(f'⚙️ Parsing configuration file {config_file}')
+
+        # We support json for large configuration files (500 MiB)
+        # which can take time to parse with PyYAML. Watched keys are
+        # consumed while parsing so that we never hold a dictionary
+        # per key.
+        if config_file.endswith('.json'):
+            watched_keys = WatchedKeys()
+            config = json.load(fh, object_hook=watched_keys.json_object_hook)
+            if config.pop('watched_keys', None) is None:
+                watched_keys = None
+        else:
+            config = yaml.load(fh, Loader=yaml.CLoader) or dict()
+            entries = config.pop('watched_keys', None)
+            watched_keys = WatchedKeys.from_entries(entries) if entries is not None else None
+
+    return config, watched_keys
+
+
 def load_config(config_file: str) -> Config:
     """Load and merge configuration from environment variables and config file.
 
@@ -77,29 +141,29 @@ def load_config(config_file: str) -> Config:
         Config
             The effective configuration used by the watcher.
     """
-    with open(config_file, 'r') as fh:
-        logging.info(f'⚙️ Parsing configuration file {config_file}')
+    config, watched_keys = read_config_file(config_file)
 
-        # We support json for large configuration files (500 MiB)
-        # which can take time to parse with PyYAML.
-        if config_file.endswith('.json'):
-            config = json.load(fh)
-        else:
-            config = yaml.load(fh, Loader=yaml.CLoader) or dict()
+    logging.info('⚙️ Validating configuration file')
+    from_default = _default_config().model_dump()
+    from_env = Config().model_dump()
+    from_file = Config(**config).model_dump()
 
-        logging.info('⚙️ Validating configuration file')
-        from_default = _default_config().model_dump()
-        from_env = Config().model_dump()
-        from_file = Config(**config).model_dump()
+    logging.info('⚙️ Merging with environment variables')
+    merged = from_default.copy()
 
-        logging.info('⚙️ Merging with environment variables')
-        merged = from_default.copy()
+    merged.update({k: v for k, v in from_file.items() if v})
+    if watched_keys:
+        merged['watched_keys'] = watched_keys
+    merged.update({k: v for k, v in from_env.items() if v})
 
-        merged.update({k: v for k, v in from_file.items() if v})
-        merged.update({k: v for k, v in from_env.items() if v})
+    if merged['watched_keys_file']:
+        if merged['watched_keys']:
+            raise ValueError('watched_keys and watched_keys_file are mutually exclusive')
+        logging.info(f'⚙️ Mapping watched keys file {merged["watched_keys_file"]}')
+        merged['watched_keys'] = MappedWatchedKeys(merged['watched_keys_file'])
 
-        r = Config(**merged)
+    r = Config(**merged)
 
-        logging.info('⚙️ Configuration file is ready')
+    logging.info(f'⚙️ Configuration file is ready ({len(r.watched_keys)} watched keys)')
 
-        return r
+    return r
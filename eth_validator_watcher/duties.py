@@ -120,8 +120,14 @@ def process_duties(watched_validators: WatchedValidators, previous_slot_committe
                 committee_offset += len(validators_in_committee)
 
     # Update validators
+    network_indexes: list[int] = []
+    network_performed: list[bool] = []
     for validator, ok in validator_duty_performed.items():
         v = watched_validators.get_validator_by_index(validator)
+        if v is None:
+            network_indexes.append(validator)
+            network_performed.append(ok)
+            continue
         # Here we keep both the current slot and the corresponding value,
         # this is to avoid iterating over the entire validator set: in
         # the compute metrics code we check the slot_id with the
@@ -130,3 +136,5 @@ def process_duties(watched_validators: WatchedValidators, previous_slot_committe
         # its attestation from the previous epoch and the validator
         # didn't perform on this slot.
         v.process_duties(current_slot, ok)
+
+    watched_validators.get_network().process_duties(current_slot, network_indexes, network_performed)
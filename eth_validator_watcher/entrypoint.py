@@ -1,22 +1,29 @@
 """Main entrypoint module for the Ethereum Validator Watcher."""
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from prometheus_client import start_http_server
 from pydantic import ValidationError
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional
 
 import logging
+import os
+import queue
+import threading
+import time
 import typer
 
-from .beacon import Beacon
+from eth_validator_watcher_ext import MetricsByLabel, RegistryView
+
+from .beacon import Beacon, BeaconSessions
 from .blocks import process_block, process_finalized_block, process_future_blocks
-from .coinbase import get_current_eth_price
 from .clock import BeaconClock
-from .config import load_config
+from .config import Config, load_config, read_config_file
 from .duties import process_duties
 from .log import log_details, slack_send
-from .metrics import get_prometheus_metrics, compute_validator_metrics
-from .models import BlockIdentierType, Validators
+from .metrics import MetricsExporter, SlotMetrics, get_prometheus_metrics, compute_validator_metrics
+from .models import BlockIdentierType
 from .proposer_schedule import ProposerSchedule
 from .rewards import process_rewards
 from .queues import (
@@ -24,22 +31,54 @@ from .queues import (
     get_pending_consolidations,
     get_pending_withdrawals,
 )
+from .snapshot import SNAPSHOT_MAX_AGE_EPOCHS, SnapshotHeader, load_snapshot, save_snapshot
 from .utils import (
+    DEFAULT_HISTORY_MISSED_THRESHOLD,
+    DEFAULT_HISTORY_WINDOW_EPOCHS,
+    DEFAULT_NETWORK_STATS_INTERVAL_EPOCHS,
     SLOT_FOR_CONFIG_RELOAD,
     SLOT_FOR_MISSED_ATTESTATIONS_PROCESS,
     SLOT_FOR_REWARDS_PROCESS,
-    pct,
+    SLOT_FOR_SNAPSHOT,
 )
+from .watched_keys import save_watched_keys_file
 from .watched_validators import WatchedValidators
 
+if TYPE_CHECKING:
+    from .admin import LoopProfiler
+    from .export import EpochExporter
+    from .shards import ShardWorker
+
 
 app = typer.Typer(add_completion=False)
+convert_keys_app = typer.Typer(add_completion=False)
+backfill_app = typer.Typer(add_completion=False)
 
 # This needs to be global for unit tests as there doesn't seem to be a
 # way to stop the prometheus HTTP server in a clean way. We have to
 # re-use it from test to test and so need to know whether or not it
 # was already started.
 prometheus_metrics_thread_started = False
+prometheus_metrics_thread_lock = threading.Lock()
+
+
+def start_metrics_server(port: int) -> None:
+    """Start the Prometheus HTTP server if not already running.
+
+    There is a single server per process, shared by all networks.
+
+    Args:
+        port: int
+            Port on which metrics are served.
+
+    Returns:
+        None
+    """
+    global prometheus_metrics_thread_started
+    with prometheus_metrics_thread_lock:
+        if not prometheus_metrics_thread_started:
+            start_http_server(port)
+            prometheus_metrics_thread_started = True
 
 
 class ValidatorWatcher:
@@ -52,29 +91,60 @@ class ValidatorWatcher:
         None
     """
 
-    def __init__(self, cfg_path: Path) -> None:
+    def __init__(self, cfg_path: Path, shard: Optional['ShardWorker'] = None, sessions: Optional[BeaconSessions] = None) -> None:
         """Initialize the Ethereum Validator Watcher.
 
         Args:
             cfg_path: Path
                 Path to the configuration file.
+            shard: Optional[ShardWorker]
+                Shard to process when running as a shard worker, the
+                metrics are then sent to the coordinator.
+            sessions: Optional[BeaconSessions]
+                HTTP sessions shared with the other networks of the
+                process, if any.
 
         Returns:
             None
         """
+        self._started_at = time.monotonic()
         self._metrics = get_prometheus_metrics()
-        self._metrics_started = False
+        self._exporter = MetricsExporter(self._metrics, self._started_at)
+        self._shard = shard
         self._cfg_path = cfg_path
         self._cfg = None
         self._cfg_last_modified = None
+        self._cfg_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='config')
+        self._cfg_pending: Optional[Future] = None
+        self._sessions = sessions or BeaconSessions()
         self._beacon = None
         self._slot_duration = None
         self._genesis = None
 
-        self._reload_config()
+        # The admin and query endpoints pull in modules which are of no
+        # use otherwise, they are only imported when enabled.
+        self._profiler: Optional['LoopProfiler'] = None
 
-        self._spec = self._beacon.get_spec()
-        genesis = self._beacon.get_genesis().data.genesis_time
+        self._reload_config()
+        if self._shard is None:
+            self._start_metrics_server()
+            if self._cfg.admin_port:
+                from .admin import get_loop_profiler, start_admin_server
+
+                start_admin_server(self._cfg.admin_port)
+                self._profiler = get_loop_profiler()
+            if self._cfg.query_port:
+                from .query import start_query_server
+
+                start_query_server(self._cfg.query_port)
+
+        # Both are needed before anything else can happen and are
+        # independent from each other.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            spec = executor.submit(self._beacon.get_spec)
+            genesis = executor.submit(self._beacon.get_genesis)
+            self._spec = spec.result()
+            genesis = genesis.result().data.genesis_time
 
         self._clock = BeaconClock(
             genesis,
@@ -86,6 +156,22 @@ class ValidatorWatcher:
 
         self._schedule = ProposerSchedule(self._spec)
         self._slot_hook = None
+        self._epoch_exporter = self._make_epoch_exporter()
+
+    def _start_metrics_server(self) -> None:
+        """Start the Prometheus HTTP server if not already running.
+
+        The server is started as early as possible so that probes can
+        reach it while the watcher bootstraps; readiness is exposed
+        with the eth_watcher_ready metric.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        start_metrics_server(self._cfg.metrics_port)
 
     def _reload_config(self) -> None:
         """Reload the configuration file and update beacon client if needed.
@@ -97,14 +183,99 @@ class ValidatorWatcher:
             None
         """
         try:
-            if not self._cfg or self._cfg_path.stat().st_mtime != self._cfg_last_modified:
-                self._cfg = load_config(str(self._cfg_path))
-                self._cfg_last_modified = self._cfg_path.stat().st_mtime
-        except ValidationError as err:
+            if not self._cfg or self._config_mtime() != self._cfg_last_modified:
+                self._apply_config(load_config(str(self._cfg_path)))
+                self._cfg_last_modified = self._config_mtime()
+        except (ValidationError, ValueError, OSError) as err:
             raise typer.BadParameter(f'Invalid configuration file: {err}')
 
+    def _config_mtime(self) -> tuple[float, Optional[float]]:
+        """Get the modification times of the configuration files.
+
+        The watched keys file is replaced atomically by the converter,
+        its modification time changes when new keys are written.
+
+        Args:
+            None
+
+        Returns:
+            tuple[float, Optional[float]]
+                Modification times of the configuration file and of
+                the watched keys file, if any.
+        """
+        keys_mtime = None
+        if self._cfg and self._cfg.watched_keys_file:
+            try:
+                keys_mtime = Path(self._cfg.watched_keys_file).stat().st_mtime
+            except FileNotFoundError:
+                pass
+        return self._cfg_path.stat().st_mtime, keys_mtime
+
+    def _request_config_reload(self) -> None:
+        """Start parsing the configuration file in the background if it changed.
+
+        Large configuration files can take seconds to parse, this
+        must not delay the processing of slots.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._cfg_pending is not None:
+            return
+
+        mtime = self._config_mtime()
+        if mtime != self._cfg_last_modified:
+            logging.info('⚙️ Configuration file changed, reloading in the background')
+            self._cfg_last_modified = mtime
+            self._cfg_pending = self._cfg_executor.submit(load_config, str(self._cfg_path))
+
+    def _poll_config_reload(self) -> bool:
+        """Apply a configuration parsed in the background, if ready.
+
+        Args:
+            None
+
+        Returns:
+            bool
+                True if a new configuration was applied.
+        """
+        if self._cfg_pending is None or not self._cfg_pending.done():
+            return False
+
+        pending, self._cfg_pending = self._cfg_pending, None
+        try:
+            cfg = pending.result()
+        except (ValidationError, ValueError, OSError) as err:
+            raise typer.BadParameter(f'Invalid configuration file: {err}')
+
+        self._apply_config(cfg)
+        return True
+
+    def _apply_config(self, cfg: Config) -> None:
+        """Use a new configuration and update beacon client if needed.
+
+        Args:
+            cfg: Config
+                The new configuration.
+
+        Returns:
+            None
+        """
+        self._cfg = cfg
+
+        if self._beacon is None and self._cfg.beacon_archive_path:
+            # The archive is opened with the first configuration only,
+            # switching to another one requires a restart.
+            from .archive import archive_adapter
+
+            wrap_adapter = archive_adapter(self._cfg.beacon_archive_path, self._cfg.beacon_archive_mode or 'replay')
+            self._sessions = BeaconSessions(wrap_adapter)
+
         if self._beacon is None or self._beacon.get_url() != self._cfg.beacon_url or self._beacon.get_timeout_sec() != self._cfg.beacon_timeout_sec:
-            self._beacon = Beacon(self._cfg.beacon_url, self._cfg.beacon_timeout_sec)
+            self._beacon = Beacon(self._cfg.beacon_url, self._cfg.beacon_timeout_sec, self._sessions, self._cfg.network, timings=self._shard is None)
 
     def _update_metrics(
             self,
@@ -114,9 +285,12 @@ class ValidatorWatcher:
             pending_deposits: tuple[int, int],
             pending_consolidations: int,
             pending_withdrawals: int,
-    ) -> None:
+    ) -> dict[str, MetricsByLabel]:
         """Update the Prometheus metrics with the watched validators data.
 
+        Shard workers don't export anything: their partial metrics are
+        sent to the coordinator which merges and exports them.
+
         Args:
             watched_validators: WatchedValidators
                 Registry of validators being watched.
@@ -131,79 +305,196 @@ class ValidatorWatcher:
             pending_withdrawals: int
                 Number of pending withdrawals.
 
+        Returns:
+            dict[str, MetricsByLabel]
+                Metrics of the watched validators by label.
+        """
+        # We iterate once on the validator set to optimize CPU as
+        # there is a log of entries here, this makes code here a bit
+        # more complex and entangled.
+
+        with self._stage('aggregation'):
+            metrics = compute_validator_metrics(
+                watched_validators,
+                slot,
+                self._cfg.history_window_epochs or DEFAULT_HISTORY_WINDOW_EPOCHS,
+                self._cfg.history_missed_threshold or DEFAULT_HISTORY_MISSED_THRESHOLD,
+            )
+
+        with self._stage('notifications'):
+            log_details(self._cfg, watched_validators, metrics, slot)
+
+        report = SlotMetrics(
+            epoch=epoch,
+            slot=slot,
+            pending_deposits=pending_deposits,
+            pending_consolidations=pending_consolidations,
+            pending_withdrawals=pending_withdrawals,
+            metrics=metrics,
+            epoch_seconds=self._spec.data.SECONDS_PER_SLOT * self._spec.data.SLOTS_PER_EPOCH,
+        )
+
+        with self._stage('export'):
+            if self._shard is not None:
+                self._shard.send(report)
+            else:
+                self._exporter.export(self._cfg.network, report)
+
+        return metrics
+
+    @contextmanager
+    def _stage(self, stage: str) -> Iterator[None]:
+        """Measure the time spent in a stage of the slot processing.
+
+        Shards don't serve /metrics, so their stages aren't measured.
+
+        Args:
+            stage: str
+                Name of the stage.
+
+        Returns:
+            Iterator[None]
+                Context in which the stage runs.
+        """
+        if self._shard is not None:
+            yield
+            return
+        start = time.perf_counter()
+        yield
+        self._metrics.eth_watcher_stage_seconds.labels(stage, self._cfg.network).observe(time.perf_counter() - start)
+
+    def _observe_slot(self, slot: int, duration: float) -> None:
+        """Record the processing time and lag of a slot.
+
+        A slot overruns when its processing ends after the time at
+        which the next slot should be processed. Nothing is recorded
+        by shards, which don't serve /metrics.
+
+        Args:
+            slot: int
+                Slot which was processed.
+            duration: float
+                Time spent processing the slot, in seconds.
+
         Returns:
             None
         """
+        if self._shard is not None:
+            return
         network = self._cfg.network
+        self._metrics.eth_watcher_stage_seconds.labels('slot', network).observe(duration)
+        self._metrics.eth_watcher_slot_lag_seconds.labels(network).set(self._clock.get_slot_lag(slot))
+        if self._clock.get_current_slot() > slot:
+            self._metrics.eth_watcher_slot_overruns_total.labels(network).inc()
 
-        self._metrics.eth_epoch.labels(network).set(epoch)
-        self._metrics.eth_slot.labels(network).set(slot)
-        self._metrics.eth_current_price_dollars.labels(network).set(get_current_eth_price())
+    def _sample_network(self, epoch: int, network_epoch: Optional[int]) -> bool:
+        """Check whether the whole network should be fetched for this epoch.
 
-        # Queues
+        In watched-only mode, only watched validators are fetched on
+        most epochs and the network scopes are refreshed once every
+        network_stats_interval_epochs.
 
-        self._metrics.eth_pending_deposits_count.labels(network).set(pending_deposits[0])
-        self._metrics.eth_pending_deposits_value.labels(network).set(pending_deposits[1])
-        self._metrics.eth_pending_consolidations_count.labels(network).set(pending_consolidations)
-        self._metrics.eth_pending_withdrawals_count.labels(network).set(pending_withdrawals)
+        Args:
+            epoch: int
+                Epoch being processed.
+            network_epoch: Optional[int]
+                Last epoch at which the whole network was fetched.
 
-        # We iterate once on the validator set to optimize CPU as
-        # there is a log of entries here, this makes code here a bit
-        # more complex and entangled.
+        Returns:
+            bool
+                True if the whole network should be fetched.
+        """
+        if not self._cfg.watched_only or network_epoch is None:
+            return True
+        interval = self._cfg.network_stats_interval_epochs or DEFAULT_NETWORK_STATS_INTERVAL_EPOCHS
+        return epoch - network_epoch >= interval
 
-        metrics = compute_validator_metrics(watched_validators.get_validators(), slot)
-
-        log_details(self._cfg, watched_validators, metrics, slot)
-
-        for label, m in metrics.items():
-            for status in Validators.DataItem.StatusEnum:
-                value = m.validator_status_count.get(status, 0)
-                self._metrics.eth_validator_status_count.labels(label, status, network).set(value)
-                scaled_value = m.validator_status_scaled_count.get(status, 0.0)
-                self._metrics.eth_validator_status_scaled_count.labels(label, status, network).set(scaled_value)
-
-            for consensus_type in [0, 1, 2]:
-                value = m.validator_type_count.get(consensus_type, 0)
-                self._metrics.eth_validator_type_count.labels(label, consensus_type, network).set(value)
-                scaled_value = m.validator_type_scaled_count.get(consensus_type, 0.0)
-                self._metrics.eth_validator_type_scaled_count.labels(label, consensus_type, network).set(scaled_value)
-
-        for label, m in metrics.items():
-            self._metrics.eth_suboptimal_sources_rate.labels(label, network).set(pct(m.suboptimal_source_count, m.optimal_source_count))
-            self._metrics.eth_suboptimal_targets_rate.labels(label, network).set(pct(m.suboptimal_target_count, m.optimal_target_count))
-            self._metrics.eth_suboptimal_heads_rate.labels(label, network).set(pct(m.suboptimal_head_count, m.optimal_head_count))
-
-            self._metrics.eth_ideal_consensus_rewards_gwei.labels(label, network).set(m.ideal_consensus_reward)
-            self._metrics.eth_actual_consensus_rewards_gwei.labels(label, network).set(m.actual_consensus_reward)
-            self._metrics.eth_consensus_rewards_rate.labels(label, network).set(pct(m.actual_consensus_reward, m.ideal_consensus_reward, True))
-
-            self._metrics.eth_missed_attestations_count.labels(label, network).set(m.missed_attestations_count)
-            self._metrics.eth_missed_attestations_scaled_count.labels(label, network).set(m.missed_attestations_scaled_count)
-            self._metrics.eth_missed_consecutive_attestations_count.labels(label, network).set(m.missed_consecutive_attestations_count)
-            self._metrics.eth_missed_consecutive_attestations_scaled_count.labels(label, network).set(m.missed_consecutive_attestations_scaled_count)
-            self._metrics.eth_slashed_validators_count.labels(label, network).set(m.validator_slashes)
-            self._metrics.eth_missed_duties_at_slot_count.labels(label, network).set(m.missed_duties_at_slot_count)
-            self._metrics.eth_missed_duties_at_slot_scaled_count.labels(label, network).set(m.missed_duties_at_slot_scaled_count)
-            self._metrics.eth_performed_duties_at_slot_count.labels(label, network).set(m.performed_duties_at_slot_count)
-            self._metrics.eth_performed_duties_at_slot_scaled_count.labels(label, network).set(m.performed_duties_at_slot_scaled_count)
-            self._metrics.eth_duties_rate.labels(label, network).set(m.duties_rate)
-            self._metrics.eth_duties_rate_scaled.labels(label, network).set(m.duties_rate_scaled)
-
-            # Here we inc, it's fine since we previously reset the
-            # counters on each run; we can't use set because those
-            # metrics are counters.
-
-            self._metrics.eth_block_proposals_head_total.labels(label, network).inc(m.proposed_blocks)
-            self._metrics.eth_missed_block_proposals_head_total.labels(label, network).inc(m.missed_blocks)
-            self._metrics.eth_block_proposals_finalized_total.labels(label, network).inc(m.proposed_blocks_finalized)
-            self._metrics.eth_missed_block_proposals_finalized_total.labels(label, network).inc(m.missed_blocks_finalized)
-
-            self._metrics.eth_future_block_proposals.labels(label, network).set(m.future_blocks_proposal)
-
-        global prometheus_metrics_thread_started
-        if not prometheus_metrics_thread_started:
-            start_http_server(self._cfg.metrics_port)
-            prometheus_metrics_thread_started = True
+    def _network_sampled(self, epoch: int, network_epoch: Optional[int]) -> bool:
+        """Check whether the whole network is processed for this epoch.
+
+        Liveness and rewards of unwatched validators are only fetched
+        along with their state.
+
+        Args:
+            epoch: int
+                Epoch being processed.
+            network_epoch: Optional[int]
+                Last epoch at which the whole network was fetched.
+
+        Returns:
+            bool
+                True if liveness and rewards are needed for all validators.
+        """
+        return not self._cfg.watched_only or network_epoch == epoch
+
+    def _make_epoch_exporter(self) -> Optional['EpochExporter']:
+        """Create the columnar exporter if an export path is configured.
+
+        The export is set up with the first configuration only, and
+        shard workers each write their own files.
+
+        Args:
+            None
+
+        Returns:
+            Optional[EpochExporter]
+                The exporter, None if the export is disabled.
+        """
+        if not self._cfg.export_path:
+            return None
+
+        # pyarrow is an optional dependency, only needed here.
+        from .export import DEFAULT_EXPORT_ROTATE_EPOCHS, EpochExporter
+
+        name = self._cfg.network if self._shard is None else f'{self._cfg.network}.{self._shard.index}'
+        return EpochExporter(
+            self._cfg.export_path,
+            name,
+            self._cfg.export_format or 'parquet',
+            self._cfg.export_rotate_epochs or DEFAULT_EXPORT_ROTATE_EPOCHS,
+        )
+
+    def _snapshot_path(self) -> str:
+        """Get the path of the snapshot file of this process.
+
+        Shard workers each have their own snapshot.
+
+        Args:
+            None
+
+        Returns:
+            str
+                Path of the snapshot file.
+        """
+        if self._shard is None:
+            return self._cfg.snapshot_path
+        return f'{self._cfg.snapshot_path}.{self._shard.index}'
+
+    def _load_snapshot(self, watched_validators: WatchedValidators, epoch: int) -> Optional[SnapshotHeader]:
+        """Restore the state saved by a previous run, if any.
+
+        Args:
+            watched_validators: WatchedValidators
+                Registry of validators to fill.
+            epoch: int
+                Current epoch.
+
+        Returns:
+            Optional[SnapshotHeader]
+                Scalar state of the processing loop, or None if there
+                is no usable snapshot.
+        """
+        if not self._cfg.snapshot_path:
+            return None
+
+        return load_snapshot(
+            self._snapshot_path(),
+            watched_validators,
+            self._schedule,
+            self._metrics,
+            self._cfg.network,
+            epoch - SNAPSHOT_MAX_AGE_EPOCHS,
+        )
 
     def run(self) -> None:
         """Run the Ethereum Validator Watcher main processing loop.
@@ -214,94 +505,194 @@ class ValidatorWatcher:
         Returns:
             None
         """
-        watched_validators = WatchedValidators()
+        if self._shard is None:
+            watched_validators = WatchedValidators()
+        else:
+            watched_validators = WatchedValidators(self._shard.index, self._shard.count)
+        if self._profiler is not None:
+            from .admin import register_native_stats
+
+            register_native_stats(self._cfg.network, watched_validators.get_native_stats)
         epoch = self._clock.get_current_epoch()
         slot = self._clock.get_current_slot()
 
-        beacon_validators = None
-        validators_liveness = None
-        rewards = None
+        validators_epoch = None
+        network_epoch = None
+        liveness_epoch = None
+        rewards_epoch = None
         last_processed_finalized_slot = None
         pending_deposits = None
         pending_consolidations = None
         pending_withdrawals = None
-
-        slack_send(self._cfg, f'🚀 *Ethereum Validator Watcher* started on {self._cfg.network}, watching {len(self._cfg.watched_keys)} validators')
+        view = None
+        view_generation = None
+
+        snapshot = self._load_snapshot(watched_validators, epoch)
+        if snapshot is not None:
+            # The regular processing below reconciles the restored
+            # state with the chain: we only skip what was already
+            # processed for the current epoch.
+            last_processed_finalized_slot = snapshot.last_processed_finalized_slot
+            if snapshot.epoch == epoch:
+                # Selectors need the validators state which is not
+                # part of the snapshot.
+                if not self._cfg.watched_selectors:
+                    validators_epoch = snapshot.epoch
+                liveness_epoch = snapshot.liveness_epoch
+                rewards_epoch = snapshot.rewards_epoch
+
+        if self._shard is None or self._shard.index == 0:
+            slack_send(self._cfg, f'🚀 *Ethereum Validator Watcher* started on {self._cfg.network}, watching {len(self._cfg.watched_keys)} validators')
 
         while True:
             logging.info(f'🔨 Processing slot {slot}')
+            slot_started_at = time.perf_counter()
+            profile = self._profiler.start_slot() if self._profiler is not None else None
 
-            last_finalized_slot = self._beacon.get_header(BlockIdentierType.FINALIZED).data.header.message.slot
-            self._schedule.update(self._beacon, slot)
+            with self._stage('schedule'):
+                last_finalized_slot = self._beacon.get_header(BlockIdentierType.FINALIZED).data.header.message.slot
+                self._schedule.update(self._beacon, slot)
 
-            if beacon_validators is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
-                logging.info(f'🔨 Processing epoch {epoch}')
-                beacon_validators = self._beacon.get_validators(self._clock.epoch_to_slot(epoch))
-                watched_validators.process_epoch(beacon_validators)
-                if not watched_validators.config_initialized:
+            # Configuration is processed before the validators so
+            # that selectors know what to index.
+            if not watched_validators.config_initialized:
+                with self._stage('config'):
                     watched_validators.process_config(self._cfg)
 
-            if pending_deposits is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
-                logging.info('🔨 Fetching pending deposits')
-                pending_deposits = get_pending_deposits(self._beacon)
-
-            if pending_consolidations is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
-                logging.info('🔨 Fetching pending consolidations')
-                pending_consolidations = get_pending_consolidations(self._beacon)
-
-            if pending_withdrawals is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
-                logging.info('🔨 Fetching pending withdrawals')
-                pending_withdrawals = get_pending_withdrawals(self._beacon)
-
-            if validators_liveness is None or (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_MISSED_ATTESTATIONS_PROCESS):
+            if validators_epoch is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
+                logging.info(f'🔨 Processing epoch {epoch}')
+                with self._stage('validators'):
+                    if self._sample_network(epoch, network_epoch):
+                        beacon_validators = self._beacon.get_validators(self._clock.epoch_to_slot(epoch))
+                        network_epoch = epoch
+                    else:
+                        logging.info('🔨 Fetching watched validators only')
+                        beacon_validators = self._beacon.get_validators_by_ids(self._clock.epoch_to_slot(epoch), watched_validators.get_watched_ids())
+                    watched_validators.process_epoch(beacon_validators)
+                validators_epoch = epoch
+
+            with self._stage('queues'):
+                if pending_deposits is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
+                    logging.info('🔨 Fetching pending deposits')
+                    pending_deposits = get_pending_deposits(self._beacon)
+
+                if pending_consolidations is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
+                    logging.info('🔨 Fetching pending consolidations')
+                    pending_consolidations = get_pending_consolidations(self._beacon)
+
+                if pending_withdrawals is None or (slot % self._spec.data.SLOTS_PER_EPOCH == 0):
+                    logging.info('🔨 Fetching pending withdrawals')
+                    pending_withdrawals = get_pending_withdrawals(self._beacon)
+
+            if liveness_epoch is None or (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_MISSED_ATTESTATIONS_PROCESS):
                 logging.info('🔨 Processing validator liveness')
-                validators_liveness = self._beacon.get_validators_liveness(epoch - 1, watched_validators.get_indexes())
-                watched_validators.process_liveness(validators_liveness, epoch)
-
-            has_block = self._beacon.has_block_at_slot(slot)
-
-            if rewards is None or (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_REWARDS_PROCESS):
+                with self._stage('liveness'):
+                    indexes = watched_validators.get_indexes() if self._network_sampled(epoch, network_epoch) else watched_validators.get_watched_indexes()
+                    validators_liveness = self._beacon.get_validators_liveness(epoch - 1, indexes)
+                    watched_validators.process_liveness(validators_liveness, epoch)
+                liveness_epoch = epoch
+
+            with self._stage('header'):
+                header = self._beacon.get_block_header(slot)
+                has_block = header is not None
+                self._schedule.process_header(self._beacon, slot, header)
+
+            if rewards_epoch is None or (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_REWARDS_PROCESS):
                 # There is a possibility the slot is missed, in which
                 # case we'll have to wait for the next one.
                 if not has_block:
-                    rewards = None
+                    rewards_epoch = None
                 else:
                     logging.info('🔨 Trying to process rewards')
-                    rewards = self._beacon.get_rewards(epoch - 2)
-                    process_rewards(watched_validators, rewards)
-
-            process_block(watched_validators, self._schedule, slot, has_block)
-            process_future_blocks(watched_validators, self._schedule, slot)
-
-            while last_processed_finalized_slot and last_processed_finalized_slot < last_finalized_slot:
-                logging.info(f'🔨 Processing finalized slot from {last_processed_finalized_slot or last_finalized_slot} to {last_finalized_slot}')
-                has_block = self._beacon.has_block_at_slot(last_processed_finalized_slot)
-                process_finalized_block(watched_validators, self._schedule, last_processed_finalized_slot, has_block)
-                last_processed_finalized_slot += 1
-            last_processed_finalized_slot = last_finalized_slot
+                    with self._stage('rewards'):
+                        indexes = None if self._network_sampled(epoch, network_epoch) else watched_validators.get_watched_indexes()
+                        # Nothing to fetch before watched validators are resolved.
+                        if indexes is None or indexes:
+                            rewards = self._beacon.get_rewards(epoch - 2, indexes)
+                            process_rewards(watched_validators, rewards, epoch - 2)
+                    rewards_epoch = epoch
+
+            with self._stage('blocks'):
+                process_block(watched_validators, self._schedule, slot, has_block)
+                process_future_blocks(watched_validators, self._schedule, slot)
+                if self._epoch_exporter is not None:
+                    self._epoch_exporter.record_proposal(self._schedule.get_proposer(slot), has_block)
+
+            with self._stage('finalized'):
+                while last_processed_finalized_slot and last_processed_finalized_slot < last_finalized_slot:
+                    logging.info(f'🔨 Processing finalized slot from {last_processed_finalized_slot or last_finalized_slot} to {last_finalized_slot}')
+                    has_block = self._beacon.has_block_at_slot(last_processed_finalized_slot)
+                    process_finalized_block(watched_validators, self._schedule, last_processed_finalized_slot, has_block)
+                    last_processed_finalized_slot += 1
+                last_processed_finalized_slot = last_finalized_slot
 
             logging.info('🔨 Processing committees for previous slot')
-            # Here we are looking at attestations in the current slot,
-            # which were for the previous slot, this is why we get the
-            # previous committees.
-            previous_slot_committees = self._beacon.get_committees(slot - 1)
-            # But we fetch attestations in the current slot (we expect
-            # to find most of what we want for the previous slot).
-            # There can be no attestations if the block is entirely
-            # missed.
-            current_attestations = self._beacon.get_attestations(slot)
-            if current_attestations:
-                process_duties(watched_validators, previous_slot_committees, current_attestations, slot)
+            with self._stage('duties'):
+                # Here we are looking at attestations in the current slot,
+                # which were for the previous slot, this is why we get the
+                # previous committees.
+                previous_slot_committees = self._beacon.get_committees(slot - 1)
+                # But we fetch attestations in the current slot (we expect
+                # to find most of what we want for the previous slot).
+                # There can be no attestations if the block is entirely
+                # missed.
+                current_attestations = self._beacon.get_attestations(slot)
+                if current_attestations:
+                    process_duties(watched_validators, previous_slot_committees, current_attestations, slot)
 
             logging.info('🔨 Updating Prometheus metrics')
-            self._update_metrics(watched_validators, epoch, slot, pending_deposits, pending_consolidations, pending_withdrawals)
+            metrics = self._update_metrics(watched_validators, epoch, slot, pending_deposits, pending_consolidations, pending_withdrawals)
+
+            if self._epoch_exporter is not None and (slot % self._spec.data.SLOTS_PER_EPOCH == self._spec.data.SLOTS_PER_EPOCH - 1):
+                logging.info('🔨 Exporting epoch performance')
+                with self._stage('columnar_export'):
+                    self._epoch_exporter.export(watched_validators, epoch)
+
+            if self._cfg.query_port and self._shard is None:
+                from .query import publish_view
+
+                with self._stage('query'):
+                    offenders = {label: m.top_offenders for label, m in metrics.items()}
+                    # Public keys and labels are only copied again when
+                    # watched validators changed.
+                    if view is None or view_generation != watched_validators.generation:
+                        view = RegistryView(watched_validators.get_validators(), slot)
+                        view_generation = watched_validators.generation
+                    else:
+                        view = view.update(watched_validators.get_validators(), slot)
+                    publish_view(self._cfg.network, view, offenders)
 
             if (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_CONFIG_RELOAD):
+                self._request_config_reload()
+
+            if self._poll_config_reload():
                 logging.info('🔨 Processing configuration update')
-                self._reload_config()
-                watched_validators.process_config(self._cfg)
+                with self._stage('config'):
+                    watched_validators.process_config(self._cfg)
 
             self._schedule.clear(last_processed_finalized_slot)
+
+            if self._cfg.snapshot_path and (slot % self._spec.data.SLOTS_PER_EPOCH == SLOT_FOR_SNAPSHOT):
+                logging.info('🔨 Writing snapshot')
+                with self._stage('snapshot'):
+                    save_snapshot(
+                        self._snapshot_path(),
+                        SnapshotHeader(
+                            network=self._cfg.network,
+                            epoch=epoch,
+                            last_processed_finalized_slot=last_processed_finalized_slot,
+                            liveness_epoch=liveness_epoch,
+                            rewards_epoch=rewards_epoch,
+                        ),
+                        watched_validators,
+                        self._schedule,
+                        self._metrics,
+                    )
+
+            self._observe_slot(slot, time.perf_counter() - slot_started_at)
+            if self._profiler is not None:
+                self._profiler.end_slot(profile)
+
             self._clock.maybe_wait_for_slot(slot + 1)
 
             if self._slot_hook:
@@ -315,9 +706,168 @@ class ValidatorWatcher:
             epoch = slot // self._spec.data.SLOTS_PER_EPOCH
 
 
+def run_networks(cfg_paths: list[Path]) -> None:
+    """Run the processing loops of several networks in this process.
+
+    Each network runs in its own thread with its own clock, a slow
+    beacon only delays the slots of its network. Networks share the
+    beacon HTTP sessions, the native worker pool, the Prometheus server
+    (on the port of the first configuration) and the slack notifiers.
+    The process stops as soon as one of the networks fails.
+
+    Args:
+        cfg_paths: list[Path]
+            Paths to the configuration files, one per network.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError
+            If a network is configured more than once.
+        RuntimeError
+            If the processing loop of a network failed.
+    """
+    cfgs = [load_config(str(path)) for path in cfg_paths]
+    networks = [cfg.network for cfg in cfgs]
+    duplicates = sorted({network for network in networks if networks.count(network) > 1})
+    if duplicates:
+        raise ValueError(f'networks configured more than once: {", ".join(duplicates)}')
+
+    for cfg in cfgs[1:]:
+        if cfg.metrics_port != cfgs[0].metrics_port:
+            logging.warning(f'⚠️ Ignoring metrics_port of {cfg.network}, metrics of all networks are served on port {cfgs[0].metrics_port}')
+    start_metrics_server(cfgs[0].metrics_port)
+
+    sessions = BeaconSessions()
+    done: queue.Queue = queue.Queue()
+
+    def run(cfg_path: Path, network: str) -> None:
+        try:
+            ValidatorWatcher(cfg_path, sessions=sessions).run()
+        except BaseException as err:
+            done.put((network, err))
+        else:
+            done.put((network, None))
+
+    for cfg_path, network in zip(cfg_paths, networks):
+        threading.Thread(target=run, args=(cfg_path, network), name=network, daemon=True).start()
+
+    logging.info(f'🌐 Started {len(networks)} networks: {", ".join(networks)}')
+
+    for _ in cfg_paths:
+        network, err = done.get()
+        if err is not None:
+            raise RuntimeError(f'{network} stopped: {err}') from err
+
+
 @app.command()
 def handler(
-    config: Optional[Path] = typer.Option(
+    config: list[Path] = typer.Option(
+        ['etc/config.local.yaml'],
+        help="File containing the Ethereum Validator Watcher configuration file, repeat it to watch several networks from the same process.",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+        show_default=True,
+    ),
+    shards: int = typer.Option(
+        1,
+        help="Number of worker processes sharing the validators, metrics are merged and served by a coordinator process.",
+        min=1,
+        show_default=True,
+    ),
+) -> None:
+    """Command line handler to run the Ethereum Validator Watcher.
+
+    Args:
+        config: list[Path]
+            Paths to the configuration files, one per network.
+        shards: int
+            Number of shard worker processes, 1 to process everything
+            in this process.
+
+    Returns:
+        None
+    """
+    if len(config) > 1:
+        if shards > 1:
+            raise typer.BadParameter('--shards is not supported with several networks')
+
+        # Log lines are prefixed with the network of the thread.
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s %(levelname)-8s [%(threadName)s] %(message)s'
+        )
+        try:
+            run_networks(config)
+        except (ValidationError, ValueError, OSError) as err:
+            raise typer.BadParameter(f'Invalid configuration file: {err}')
+        return
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)-8s %(message)s'
+    )
+
+    if shards > 1:
+        from .shards import run_sharded
+
+        try:
+            run_sharded(config[0], shards)
+        except (ValidationError, ValueError, OSError) as err:
+            raise typer.BadParameter(f'Invalid configuration file: {err}')
+        return
+
+    watcher = ValidatorWatcher(config[0])
+    watcher.run()
+
+
+@convert_keys_app.command()
+def convert_keys_handler(
+    config: Path = typer.Argument(
+        ...,
+        help="YAML or JSON configuration file containing watched_keys.",
+        exists=True,
+        file_okay=True,
+        dir_okay=False,
+    ),
+    output: Path = typer.Argument(
+        ...,
+        help="Binary watched keys file to write, to be used as watched_keys_file.",
+        dir_okay=False,
+    ),
+) -> None:
+    """Command line handler to convert watched keys to the binary format.
+
+    Args:
+        config: Path
+            Path to the configuration file containing watched_keys.
+        output: Path
+            Path to the binary watched keys file.
+
+    Returns:
+        None
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)-8s %(message)s'
+    )
+
+    try:
+        _, watched_keys = read_config_file(str(config))
+    except ValueError as err:
+        raise typer.BadParameter(f'Invalid configuration file: {err}')
+    if watched_keys is None:
+        raise typer.BadParameter(f'No watched_keys in {config}')
+
+    save_watched_keys_file(str(output), watched_keys)
+    logging.info(f'💾 Wrote {len(watched_keys)} watched keys to {output}')
+
+
+@backfill_app.command()
+def backfill_handler(
+    config: Path = typer.Option(
         'etc/config.local.yaml',
         help="File containing the Ethereum Validator Watcher configuration file.",
         exists=True,
@@ -325,12 +875,28 @@ def handler(
         dir_okay=False,
         show_default=True,
     ),
+    start_epoch: int = typer.Option(..., help="First epoch to backfill.", min=1),
+    end_epoch: int = typer.Option(..., help="Last epoch to backfill, included, must be finalized."),
+    output: Path = typer.Option(..., help="CSV file to write, one row per epoch and label.", dir_okay=False),
+    workers: int = typer.Option(
+        os.cpu_count() or 1,
+        help="Number of worker processes.",
+        min=1,
+    ),
 ) -> None:
-    """Command line handler to run the Ethereum Validator Watcher.
+    """Command line handler to backfill per-label performance over finalized epochs.
 
     Args:
-        config: Optional[Path]
+        config: Path
             Path to the configuration file.
+        start_epoch: int
+            First epoch to backfill.
+        end_epoch: int
+            Last epoch to backfill, included.
+        output: Path
+            CSV file to write.
+        workers: int
+            Number of worker processes.
 
     Returns:
         None
@@ -340,5 +906,16 @@ def handler(
         format='%(asctime)s %(levelname)-8s %(message)s'
     )
 
-    watcher = ValidatorWatcher(config)
-    watcher.run()
+    if end_epoch < start_epoch:
+        raise typer.BadParameter('--end-epoch must not be before --start-epoch')
+
+    try:
+        cfg = load_config(str(config))
+    except (ValidationError, ValueError, OSError) as err:
+        raise typer.BadParameter(f'Invalid configuration file: {err}')
+    if cfg.beacon_archive_path and cfg.beacon_archive_mode == 'record':
+        raise typer.BadParameter('Beacon archives can only be replayed when backfilling')
+
+    from .backfill import run_backfill
+
+    run_backfill(config, start_epoch, end_epoch, workers, output)
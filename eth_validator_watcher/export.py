@@ -0,0 +1,254 @@
+"""Columnar export of the per-validator performance of each epoch.
+
+Prometheus only has per-label aggregates: per-key series would be far
+too many to store. When an export path is configured, the watcher
+writes one record batch per epoch with a row per watched validator,
+as Parquet (one row group per epoch) or Arrow IPC files, a new file
+being started every few epochs:
+
+    {export_path}/{network}-{first epoch}.parquet
+
+Columns are built by the native code straight from the registry into
+flat buffers (values, validity bitmaps and dictionary codes for label
+sets and statuses) which are wrapped as Arrow arrays without copy, so
+no Python object is created per row.
+
+Liveness and rewards are those processed during the epoch, for the
+epochs given in the `liveness_epoch` and `rewards_epoch` columns.
+Duties are the last attestation duty processed for each validator, in
+the `duty_slot` column. Proposals are the head blocks of the slots of
+the epoch.
+
+This requires pyarrow (`pip install eth-validator-watcher[export]`).
+"""
+
+import atexit
+import logging
+import os
+
+from collections import defaultdict
+from typing import Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from eth_validator_watcher_ext import validator_columns
+
+from .watched_validators import WatchedValidators
+
+
+# Number of epochs written to a file before starting a new one, about
+# a day of mainnet epochs.
+DEFAULT_EXPORT_ROTATE_EPOCHS = 225
+
+EXPORT_FORMATS = ('parquet', 'arrow')
+
+EXPORT_SCHEMA = pa.schema([
+    ('epoch', pa.uint64()),
+    ('index', pa.uint64()),
+    ('label_set', pa.dictionary(pa.int32(), pa.string())),
+    ('status', pa.dictionary(pa.int8(), pa.string())),
+    ('withdrawal_type', pa.uint8()),
+    ('effective_balance', pa.uint64()),
+    ('slashed', pa.bool_()),
+    ('liveness_epoch', pa.uint64()),
+    ('live', pa.bool_()),
+    ('previous_live', pa.bool_()),
+    ('rewards_epoch', pa.uint64()),
+    ('source_ok', pa.bool_()),
+    ('target_ok', pa.bool_()),
+    ('head_ok', pa.bool_()),
+    ('ideal_reward', pa.float64()),
+    ('actual_reward', pa.float64()),
+    ('duty_slot', pa.uint64()),
+    ('duty_performed', pa.bool_()),
+    ('proposed_blocks', pa.uint16()),
+    ('missed_blocks', pa.uint16()),
+])
+
+
+def _wrap(columns: dict, name: str, n: int) -> pa.Array:
+    """Wrap a native buffer as an Arrow array of the schema type.
+
+    Args:
+        columns: dict
+            Buffers returned by the native code.
+        name: str
+            Name of the column.
+        n: int
+            Number of rows.
+
+    Returns:
+        pa.Array
+            The column, sharing the buffer.
+    """
+    return pa.Array.from_buffers(EXPORT_SCHEMA.field(name).type, n, [None, pa.py_buffer(columns[name])])
+
+
+def _wrap_dictionary(columns: dict, name: str, values: str, n: int) -> pa.DictionaryArray:
+    """Wrap native dictionary codes as an Arrow dictionary array.
+
+    Args:
+        columns: dict
+            Buffers returned by the native code.
+        name: str
+            Name of the column.
+        values: str
+            Name of the dictionary values.
+        n: int
+            Number of rows.
+
+    Returns:
+        pa.DictionaryArray
+            The column, sharing the codes buffer.
+    """
+    kind = EXPORT_SCHEMA.field(name).type
+    codes = pa.Array.from_buffers(kind.index_type, n, [None, pa.py_buffer(columns[name])])
+    return pa.DictionaryArray.from_arrays(codes, pa.array(columns[values], kind.value_type))
+
+
+class EpochExporter:
+    """Write the per-validator performance of each epoch.
+
+    Args:
+        path: str
+            Directory where files are written, created if needed.
+        network: str
+            Name of the network, prefix of the files.
+        fmt: str
+            `parquet` or `arrow` (IPC file format).
+        rotate_epochs: int
+            Number of epochs per file.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError
+            If the format is unknown.
+    """
+
+    def __init__(self, path: str, network: str, fmt: str = 'parquet', rotate_epochs: int = DEFAULT_EXPORT_ROTATE_EPOCHS) -> None:
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f'unknown export format: {fmt}')
+
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._network = network
+        self._fmt = fmt
+        self._rotate_epochs = max(rotate_epochs, 1)
+        self._writer = None
+        self._file_epoch: Optional[int] = None
+        self._proposals: dict[int, list[int]] = defaultdict(lambda: [0, 0])
+        atexit.register(self.close)
+
+    def record_proposal(self, proposer: Optional[int], has_block: bool) -> None:
+        """Record the outcome of a block proposal of the current epoch.
+
+        Args:
+            proposer: Optional[int]
+                Index of the expected proposer, None if unknown.
+            has_block: bool
+                Whether the block was proposed.
+
+        Returns:
+            None
+        """
+        if proposer is not None:
+            self._proposals[proposer][0 if has_block else 1] += 1
+
+    def build_batch(self, validators: WatchedValidators, epoch: int) -> pa.RecordBatch:
+        """Build the record batch of an epoch.
+
+        Args:
+            validators: WatchedValidators
+                Registry of watched validators.
+            epoch: int
+                Epoch which was processed.
+
+        Returns:
+            pa.RecordBatch
+                One row per watched validator.
+        """
+        columns = validator_columns(validators.get_validators())
+        n = len(columns['index']) // 8
+        index = _wrap(columns, 'index', n)
+
+        proposers = pa.array(list(self._proposals), pa.uint64())
+        positions = pc.index_in(index, value_set=proposers)
+        proposed = pa.array([counts[0] for counts in self._proposals.values()], pa.uint16())
+        missed = pa.array([counts[1] for counts in self._proposals.values()], pa.uint16())
+
+        arrays = {
+            'epoch': pa.repeat(pa.scalar(epoch, pa.uint64()), n),
+            'index': index,
+            'label_set': _wrap_dictionary(columns, 'label_set', 'label_sets', n),
+            'status': _wrap_dictionary(columns, 'status', 'statuses', n),
+            'liveness_epoch': pa.repeat(pa.scalar(max(epoch - 1, 0), pa.uint64()), n),
+            'rewards_epoch': pa.repeat(pa.scalar(max(epoch - 2, 0), pa.uint64()), n),
+            'proposed_blocks': pc.fill_null(pc.take(proposed, positions), 0),
+            'missed_blocks': pc.fill_null(pc.take(missed, positions), 0),
+        }
+        for field in EXPORT_SCHEMA:
+            if field.name not in arrays:
+                arrays[field.name] = _wrap(columns, field.name, n)
+
+        return pa.RecordBatch.from_arrays([arrays[field.name] for field in EXPORT_SCHEMA], schema=EXPORT_SCHEMA)
+
+    def export(self, validators: WatchedValidators, epoch: int) -> None:
+        """Write the batch of an epoch and forget its proposals.
+
+        Args:
+            validators: WatchedValidators
+                Registry of watched validators.
+            epoch: int
+                Epoch which was processed.
+
+        Returns:
+            None
+        """
+        batch = self.build_batch(validators, epoch)
+        self._proposals.clear()
+
+        if self._writer is None or epoch - self._file_epoch >= self._rotate_epochs:
+            self._open(epoch)
+
+        if self._fmt == 'parquet':
+            self._writer.write_batch(batch, row_group_size=max(batch.num_rows, 1))
+        else:
+            self._writer.write_batch(batch)
+        logging.info(f'🗃️ Exported {batch.num_rows} validators for epoch {epoch}')
+
+    def close(self) -> None:
+        """Close the current file, which is needed for it to be readable.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _open(self, epoch: int) -> None:
+        """Start a new file.
+
+        Args:
+            epoch: int
+                First epoch of the file.
+
+        Returns:
+            None
+        """
+        self.close()
+        path = os.path.join(self._path, f'{self._network}-{epoch}.{self._fmt}')
+        if self._fmt == 'parquet':
+            self._writer = pq.ParquetWriter(path, EXPORT_SCHEMA)
+        else:
+            self._writer = pyarrow.ipc.new_file(path, EXPORT_SCHEMA)
+        self._file_epoch = epoch
+        logging.info(f'🗃️ Exporting epochs to {path}')
@@ -1,11 +1,11 @@
 import collections
 import logging
 
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
+from typing import Optional
 
 from eth_validator_watcher_ext import MetricsByLabel
 from .config import Config
+from .slack import get_slack_notifier
 from .utils import LABEL_SCOPE_WATCHED, SLOT_FOR_MISSED_ATTESTATIONS_PROCESS
 from .watched_validators import WatchedValidators
 
@@ -62,16 +62,27 @@ def beaconcha_slot_link(cfg: Config, slot: int) -> str:
     return f'<https://{cfg.network}.beaconcha.in/slot/{slot}|{slot}>'
 
 
-def slack_send(cfg: Config, msg: str) -> None:
-    """Attempts to send a message to the configured slack channel."""
+def slack_send(cfg: Config, msg: str, kind: Optional[str] = None) -> None:
+    """Queue a message for the configured slack channel.
+
+    Messages are sent in the background, see SlackNotifier.
+
+    Args:
+        cfg: Config
+            Configuration object containing slack settings.
+        msg: str
+            Message to send.
+        kind: Optional[str]
+            Kind of event, messages of the same kind received within a
+            short window are sent as one.
+
+    Returns:
+        None
+    """
     if not (cfg.slack_channel and cfg.slack_token):
         return
 
-    try:
-        w = WebClient(token=cfg.slack_token)
-        w.chat_postMessage(channel=cfg.slack_channel, text=msg)
-    except SlackApiError as e:
-        logging.warning(f'😿 Unable to send slack notification: {e.response["error"]}')
+    get_slack_notifier(cfg.slack_token, cfg.slack_channel).notify(msg, kind)
 
 
 def log_single_entry(cfg: Config, validator: str, registry: WatchedValidators, msg: str, emoji: str, slot: int, color: str) -> None:
@@ -110,7 +121,7 @@ def log_single_entry(cfg: Config, validator: str, registry: WatchedValidators, m
     logging.info(msg_shell)
 
     msg_slack = f'{emoji} Validator {beaconcha_validator_link(cfg, validator)}{label_msg_slack} {msg} on slot {beaconcha_slot_link(cfg, slot)}'
-    slack_send(cfg, msg_slack)
+    slack_send(cfg, msg_slack, f'{emoji} {msg}')
 
 
 def log_multiple_entries(cfg: Config, validators: list[str], registry: WatchedValidators, msg: str, emoji: str, color: str) -> None:
@@ -155,7 +166,7 @@ def log_multiple_entries(cfg: Config, validators: list[str], registry: WatchedVa
 
     msg_validators_slack = f'{", ".join([beaconcha_validator_link(cfg, v) for v in validators])} and more'
     msg_slack = f'{emoji} Validator(s) {msg_validators_slack}{label_msg_slack} {msg}'
-    slack_send(cfg, msg_slack)
+    slack_send(cfg, msg_slack, f'{emoji} {msg}')
 
 
 def log_details(cfg: Config, registry: WatchedValidators, metrics: MetricsByLabel, current_slot: int) -> None:
@@ -196,3 +207,8 @@ def log_details(cfg: Config, registry: WatchedValidators, metrics: MetricsByLabe
         # Only log once per epoch future block proposals.
         if current_slot % 32 == SLOT_FOR_MISSED_ATTESTATIONS_PROCESS:
             log_multiple_entries(cfg, m.details_missed_attestations, registry, 'missed an attestation', '😞', COLOR_YELLOW)
+
+    # Offenders are ranked by the native aggregation, worst first.
+    repeated = [offender.pubkey for offender in m.top_offenders if offender.streak > 1]
+    if repeated and current_slot % 32 == SLOT_FOR_MISSED_ATTESTATIONS_PROCESS:
+        log_multiple_entries(cfg, repeated[:5], registry, 'keep missing attestations', '😱', COLOR_RED)
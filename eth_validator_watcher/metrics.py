@@ -1,18 +1,125 @@
+import itertools
 import logging
+import threading
+import time
 
 from dataclasses import dataclass
-
-from prometheus_client import Counter, Gauge
-
-from eth_validator_watcher_ext import fast_compute_validator_metrics, MetricsByLabel
-
-from .watched_validators import WatchedValidator
+from typing import Iterator, Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeHistogramMetricFamily, Metric
+from prometheus_client.registry import Collector
+from prometheus_client.utils import floatToGoString
+
+from eth_validator_watcher_ext import (
+    DUTIES_RATE_BUCKETS,
+    EFFECTIVE_BALANCE_BUCKETS,
+    REWARD_RATE_BUCKETS,
+    fast_compute_validator_metrics,
+    merge_validator_metrics,
+    MetricsByLabel,
+)
+
+from .models import Validators
+from .price import PriceFetcher, get_price_fetcher
+from .rollups import (
+    ACTIVE_VALIDATORS,
+    ACTUAL_CONSENSUS_REWARDS,
+    IDEAL_CONSENSUS_REWARDS,
+    MISSED_ATTESTATIONS,
+    MISSED_BLOCKS,
+    MISSED_DUTIES,
+    PERFORMED_DUTIES,
+    PROPOSED_BLOCKS,
+    LabelRollups,
+)
+from .utils import (
+    DEFAULT_HISTORY_MISSED_THRESHOLD,
+    DEFAULT_HISTORY_WINDOW_EPOCHS,
+    LABEL_SCOPE_ALL_NETWORK,
+    LABEL_SCOPE_NETWORK,
+    pct,
+)
+from .watched_validators import WatchedValidators
 
 
 # This is global because Prometheus metrics don't support registration
 # multiple times. This is a workaround for unit tests.
 _metrics = None
 
+# Buckets of the timings, from sub-millisecond parsing of small
+# responses to whole-network fetches which can take longer than a slot.
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 12.0, 30.0, 60.0)
+
+# Buckets of the beacon response sizes, from a header to the whole
+# validator set of mainnet.
+SIZE_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8, 1e9)
+
+# Buckets of the query API latencies, from a lookup by index to a page
+# of a large label.
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+# Per-validator distributions computed by the native aggregation: name,
+# description, attribute of MetricsByLabel and bucket bounds.
+DISTRIBUTIONS = (
+    ('eth_validator_consensus_rewards_rate', 'Consensus rewards rate of the validators in the last epoch', 'reward_rate_distribution', REWARD_RATE_BUCKETS),
+    ('eth_validator_duties_rate_window', 'Duties rate of the validators over the history window', 'duties_rate_distribution', DUTIES_RATE_BUCKETS),
+    ('eth_validator_effective_balance_eth', 'Effective balance of the validators', 'effective_balance_distribution', EFFECTIVE_BALANCE_BUCKETS),
+)
+
+
+class DistributionCollector(Collector):
+    """Export the per-validator distributions of the last slot by label.
+
+    Distributions are recomputed on every slot rather than accumulated
+    over time: they are gauge histograms, exposed with the histogram
+    type so that `histogram_quantile()` applies to their buckets, but
+    `rate()` does not.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, dict[str, MetricsByLabel]] = {}
+
+    def update(self, network: str, metrics: dict[str, MetricsByLabel]) -> None:
+        """Replace the distributions of a network.
+
+        Labels which are no longer in the metrics are no longer
+        exported.
+
+        Args:
+            network: str
+                Network the metrics are computed for.
+            metrics: dict[str, MetricsByLabel]
+                Metrics of the watched validators by label.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._metrics[network] = metrics
+
+    def collect(self) -> Iterator[Metric]:
+        with self._lock:
+            metrics = dict(self._metrics)
+
+        for name, documentation, attribute, bounds in DISTRIBUTIONS:
+            family = GaugeHistogramMetricFamily(name, documentation, labels=['scope', 'network'])
+            les = [floatToGoString(bound) for bound in bounds]
+            for network, by_label in metrics.items():
+                for label, m in by_label.items():
+                    distribution = getattr(m, attribute)
+                    cumulative = itertools.accumulate(distribution.buckets[:len(bounds)])
+                    buckets = list(zip(les, cumulative)) + [('+Inf', distribution.count)]
+                    family.add_metric([label, network], buckets, distribution.sum)
+            yield family
+
 
 @dataclass
 class PrometheusMetrics:
@@ -33,6 +140,30 @@ class PrometheusMetrics:
     eth_slot: Gauge
     eth_epoch: Gauge
     eth_current_price_dollars: Gauge
+    eth_current_price_age_seconds: Gauge
+
+    # Watcher lifecycle
+    eth_watcher_ready: Gauge
+    eth_watcher_time_to_first_metric_seconds: Gauge
+
+    # Slot processing
+    eth_watcher_stage_seconds: Histogram
+    eth_watcher_slot_lag_seconds: Gauge
+    eth_watcher_slot_overruns_total: Counter
+
+    # Beacon requests
+    eth_watcher_beacon_request_seconds: Histogram
+    eth_watcher_beacon_parse_seconds: Histogram
+    eth_watcher_beacon_response_bytes: Histogram
+
+    # Query API
+    eth_watcher_query_seconds: Histogram
+
+    # Slack notifications
+    eth_watcher_slack_queue_depth: Gauge
+    eth_watcher_slack_sent_total: Counter
+    eth_watcher_slack_dropped_total: Counter
+    eth_watcher_slack_rate_limited_total: Counter
 
     # Queues
     eth_pending_deposits_count: Gauge
@@ -60,6 +191,14 @@ class PrometheusMetrics:
     eth_missed_consecutive_attestations_count: Gauge
     eth_missed_consecutive_attestations_scaled_count: Gauge
     eth_slashed_validators_count: Gauge
+
+    # Over the history window, watched validators only.
+    eth_missed_attestations_window_count: Gauge
+    eth_missed_attestations_window_scaled_count: Gauge
+    eth_missed_attestations_streak_max: Gauge
+    eth_missed_duties_window_count: Gauge
+    eth_missed_consensus_rewards_window_gwei: Gauge
+
     eth_missed_duties_at_slot_count: Gauge
     eth_missed_duties_at_slot_scaled_count: Gauge
     eth_performed_duties_at_slot_count: Gauge
@@ -75,29 +214,317 @@ class PrometheusMetrics:
 
     eth_future_block_proposals: Gauge
 
-
-def compute_validator_metrics(validators: dict[int, WatchedValidator], slot: int) -> dict[str, MetricsByLabel]:
-    """Compute the metrics from a dictionary of validators.
+    eth_validator_distributions: DistributionCollector
+
+    # Over rolling windows.
+    eth_rollup_missed_attestations_rate: Gauge
+    eth_rollup_consensus_rewards_rate: Gauge
+    eth_rollup_block_proposals: Gauge
+    eth_rollup_missed_block_proposals: Gauge
+    eth_rollup_duties_rate: Gauge
+
+    def remove_scope(self, scope: str, network: str) -> None:
+        """Remove all the series of a scope which is no longer used.
+
+        This happens when a label is removed from the configuration,
+        we don't want to keep exporting its last values forever.
+
+        Args:
+            scope: str
+                Scope (label) to remove.
+            network: str
+                Network of the series.
+
+        Returns:
+            None
+        """
+        for status in Validators.DataItem.StatusEnum:
+            self.eth_validator_status_count.remove(scope, status, network)
+            self.eth_validator_status_scaled_count.remove(scope, status, network)
+
+        for consensus_type in [0, 1, 2]:
+            self.eth_validator_type_count.remove(scope, consensus_type, network)
+            self.eth_validator_type_scaled_count.remove(scope, consensus_type, network)
+
+        for metric in [
+            self.eth_suboptimal_sources_rate,
+            self.eth_suboptimal_targets_rate,
+            self.eth_suboptimal_heads_rate,
+            self.eth_consensus_rewards_rate,
+            self.eth_ideal_consensus_rewards_gwei,
+            self.eth_actual_consensus_rewards_gwei,
+            self.eth_missed_attestations_count,
+            self.eth_missed_attestations_scaled_count,
+            self.eth_missed_consecutive_attestations_count,
+            self.eth_missed_consecutive_attestations_scaled_count,
+            self.eth_slashed_validators_count,
+            self.eth_missed_attestations_window_count,
+            self.eth_missed_attestations_window_scaled_count,
+            self.eth_missed_attestations_streak_max,
+            self.eth_missed_duties_window_count,
+            self.eth_missed_consensus_rewards_window_gwei,
+            self.eth_missed_duties_at_slot_count,
+            self.eth_missed_duties_at_slot_scaled_count,
+            self.eth_performed_duties_at_slot_count,
+            self.eth_performed_duties_at_slot_scaled_count,
+            self.eth_duties_rate,
+            self.eth_duties_rate_scaled,
+            self.eth_block_proposals_head_total,
+            self.eth_missed_block_proposals_head_total,
+            self.eth_block_proposals_finalized_total,
+            self.eth_missed_block_proposals_finalized_total,
+            self.eth_future_block_proposals,
+        ]:
+            metric.remove(scope, network)
+
+    def remove_rollup(self, scope: str, window: str, network: str) -> None:
+        """Remove the series of a rolling window of a scope which is no longer used.
+
+        Args:
+            scope: str
+                Scope (label) to remove.
+            window: str
+                Rolling window of the series.
+            network: str
+                Network of the series.
+
+        Returns:
+            None
+        """
+        for metric in [
+            self.eth_rollup_missed_attestations_rate,
+            self.eth_rollup_consensus_rewards_rate,
+            self.eth_rollup_block_proposals,
+            self.eth_rollup_missed_block_proposals,
+            self.eth_rollup_duties_rate,
+        ]:
+            metric.remove(scope, window, network)
+
+
+def compute_validator_metrics(
+        validators: WatchedValidators,
+        slot: int,
+        window_epochs: int = DEFAULT_HISTORY_WINDOW_EPOCHS,
+        missed_threshold: int = DEFAULT_HISTORY_MISSED_THRESHOLD,
+) -> dict[str, MetricsByLabel]:
+    """Compute the metrics from the registry of validators.
+
+    Watched validators are aggregated by label, the others from the
+    compact network registry into the network scopes only.
 
     Args:
-        validators: dict[int, WatchedValidator]
-            Dictionary of validator index to WatchedValidator objects.
+        validators: WatchedValidators
+            Registry of validators.
         slot: int
             Current slot being processed.
+        window_epochs: int
+            Number of epochs of history for the windowed metrics.
+        missed_threshold: int
+            Missed attestations over the window for a validator to be
+            reported.
 
     Returns:
         dict[str, MetricsByLabel]
             Dictionary of metric names to computed metrics by label.
     """
-    logging.info(f"📊 Computing metrics for {len(validators)} validators")
-    metrics = fast_compute_validator_metrics(validators, slot)
+    watched = validators.get_validators()
+    network = validators.get_network()
+    logging.info(f"📊 Computing metrics for {len(watched)} watched validators and {len(network) - len(watched)} network validators")
+
+    metrics = merge_validator_metrics([
+        fast_compute_validator_metrics(watched, slot, window_epochs, missed_threshold),
+        network.compute(slot, [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK]),
+    ])
 
-    for _, v in validators.items():
-        v.reset_blocks()
+    validators.reset_blocks()
 
     return metrics
 
 
+@dataclass
+class SlotMetrics:
+    """Metrics computed for a slot, ready to be exported.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    epoch: int
+    slot: int
+    pending_deposits: tuple[int, int]
+    pending_consolidations: int
+    pending_withdrawals: int
+    metrics: dict[str, MetricsByLabel]
+    epoch_seconds: int
+
+
+class MetricsExporter:
+    """Export the metrics computed for a slot to Prometheus.
+
+    Args:
+        metrics: PrometheusMetrics
+            Prometheus metrics of the watcher.
+        started_at: float
+            Monotonic time at which the watcher started.
+        prices: Optional[PriceFetcher]
+            Where to get the ETH price from, the fetcher of the process
+            if None.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, metrics: PrometheusMetrics, started_at: float, prices: Optional[PriceFetcher] = None) -> None:
+        self._metrics = metrics
+        self._started_at = started_at
+        self._prices = prices
+        self._ready = False
+        self._exported_scopes: set[str] = set()
+        self._rollups: dict[str, LabelRollups] = {}
+        # Rollup series are only created once the first epoch of a
+        # label is over.
+        self._exported_rollups: set[tuple[str, str]] = set()
+
+    def export(self, network: str, report: SlotMetrics) -> None:
+        """Update the Prometheus metrics.
+
+        Args:
+            network: str
+                Network the metrics are computed for.
+            report: SlotMetrics
+                Metrics computed for the slot.
+
+        Returns:
+            None
+        """
+        # The price is refreshed in the background, the fetcher is
+        # started on the first export.
+        if self._prices is None:
+            self._prices = get_price_fetcher()
+
+        self._metrics.eth_epoch.labels(network).set(report.epoch)
+        self._metrics.eth_slot.labels(network).set(report.slot)
+        self._metrics.eth_current_price_dollars.labels(network).set(self._prices.get())
+        price_age = self._prices.age()
+        if price_age is not None:
+            self._metrics.eth_current_price_age_seconds.labels(network).set(price_age)
+
+        # Queues
+
+        self._metrics.eth_pending_deposits_count.labels(network).set(report.pending_deposits[0])
+        self._metrics.eth_pending_deposits_value.labels(network).set(report.pending_deposits[1])
+        self._metrics.eth_pending_consolidations_count.labels(network).set(report.pending_consolidations)
+        self._metrics.eth_pending_withdrawals_count.labels(network).set(report.pending_withdrawals)
+
+        metrics = report.metrics
+
+        for label, m in metrics.items():
+            for status in Validators.DataItem.StatusEnum:
+                value = m.validator_status_count.get(status, 0)
+                self._metrics.eth_validator_status_count.labels(label, status, network).set(value)
+                scaled_value = m.validator_status_scaled_count.get(status, 0.0)
+                self._metrics.eth_validator_status_scaled_count.labels(label, status, network).set(scaled_value)
+
+            for consensus_type in [0, 1, 2]:
+                value = m.validator_type_count.get(consensus_type, 0)
+                self._metrics.eth_validator_type_count.labels(label, consensus_type, network).set(value)
+                scaled_value = m.validator_type_scaled_count.get(consensus_type, 0.0)
+                self._metrics.eth_validator_type_scaled_count.labels(label, consensus_type, network).set(scaled_value)
+
+        for label, m in metrics.items():
+            self._metrics.eth_suboptimal_sources_rate.labels(label, network).set(pct(m.suboptimal_source_count, m.optimal_source_count))
+            self._metrics.eth_suboptimal_targets_rate.labels(label, network).set(pct(m.suboptimal_target_count, m.optimal_target_count))
+            self._metrics.eth_suboptimal_heads_rate.labels(label, network).set(pct(m.suboptimal_head_count, m.optimal_head_count))
+
+            self._metrics.eth_ideal_consensus_rewards_gwei.labels(label, network).set(m.ideal_consensus_reward)
+            self._metrics.eth_actual_consensus_rewards_gwei.labels(label, network).set(m.actual_consensus_reward)
+            self._metrics.eth_consensus_rewards_rate.labels(label, network).set(pct(m.actual_consensus_reward, m.ideal_consensus_reward, True))
+
+            self._metrics.eth_missed_attestations_count.labels(label, network).set(m.missed_attestations_count)
+            self._metrics.eth_missed_attestations_scaled_count.labels(label, network).set(m.missed_attestations_scaled_count)
+            self._metrics.eth_missed_consecutive_attestations_count.labels(label, network).set(m.missed_consecutive_attestations_count)
+            self._metrics.eth_missed_consecutive_attestations_scaled_count.labels(label, network).set(m.missed_consecutive_attestations_scaled_count)
+            self._metrics.eth_slashed_validators_count.labels(label, network).set(m.validator_slashes)
+
+            # Only watched validators have a history.
+            if label not in (LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK):
+                self._metrics.eth_missed_attestations_window_count.labels(label, network).set(m.missed_attestations_window_count)
+                self._metrics.eth_missed_attestations_window_scaled_count.labels(label, network).set(m.missed_attestations_window_scaled_count)
+                self._metrics.eth_missed_attestations_streak_max.labels(label, network).set(m.missed_attestations_streak_max)
+                self._metrics.eth_missed_duties_window_count.labels(label, network).set(m.missed_duties_window)
+                self._metrics.eth_missed_consensus_rewards_window_gwei.labels(label, network).set(m.missed_consensus_rewards_window)
+            self._metrics.eth_missed_duties_at_slot_count.labels(label, network).set(m.missed_duties_at_slot_count)
+            self._metrics.eth_missed_duties_at_slot_scaled_count.labels(label, network).set(m.missed_duties_at_slot_scaled_count)
+            self._metrics.eth_performed_duties_at_slot_count.labels(label, network).set(m.performed_duties_at_slot_count)
+            self._metrics.eth_performed_duties_at_slot_scaled_count.labels(label, network).set(m.performed_duties_at_slot_scaled_count)
+            self._metrics.eth_duties_rate.labels(label, network).set(m.duties_rate)
+            self._metrics.eth_duties_rate_scaled.labels(label, network).set(m.duties_rate_scaled)
+
+            # Here we inc, it's fine since we previously reset the
+            # counters on each run; we can't use set because those
+            # metrics are counters.
+
+            self._metrics.eth_block_proposals_head_total.labels(label, network).inc(m.proposed_blocks)
+            self._metrics.eth_missed_block_proposals_head_total.labels(label, network).inc(m.missed_blocks)
+            self._metrics.eth_block_proposals_finalized_total.labels(label, network).inc(m.proposed_blocks_finalized)
+            self._metrics.eth_missed_block_proposals_finalized_total.labels(label, network).inc(m.missed_blocks_finalized)
+
+            self._metrics.eth_future_block_proposals.labels(label, network).set(m.future_blocks_proposal)
+
+        rollups = self._rollups.get(network)
+        if rollups is None:
+            rollups = self._rollups[network] = LabelRollups(report.epoch_seconds)
+        if rollups.observe(report.epoch, metrics):
+            self._export_rollups(network, rollups)
+
+        # Only watched validators have distributions.
+        self._metrics.eth_validator_distributions.update(network, {
+            label: m for label, m in metrics.items() if label not in (LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK)
+        })
+
+        # Labels no longer assigned to any validator, i.e: after a
+        # configuration reload.
+        removed = self._exported_scopes - metrics.keys()
+        for label in removed:
+            self._metrics.remove_scope(label, network)
+        if removed:
+            for label, window in [rollup for rollup in self._exported_rollups if rollup[0] in removed]:
+                self._metrics.remove_rollup(label, window, network)
+                self._exported_rollups.remove((label, window))
+        self._exported_scopes = set(metrics.keys())
+
+        if not self._ready:
+            self._metrics.eth_watcher_time_to_first_metric_seconds.labels(network).set(time.monotonic() - self._started_at)
+            self._metrics.eth_watcher_ready.labels(network).set(1)
+            self._ready = True
+
+    def _export_rollups(self, network: str, rollups: LabelRollups) -> None:
+        """Update the gauges of the rolling windows.
+
+        Args:
+            network: str
+                Network the rollups are computed for.
+            rollups: LabelRollups
+                Rollups of the network.
+
+        Returns:
+            None
+        """
+        for window, rollup in rollups.windows.items():
+            for label, c in rollup.totals():
+                duties = c[PERFORMED_DUTIES] + c[MISSED_DUTIES]
+                self._metrics.eth_rollup_missed_attestations_rate.labels(label, window, network).set(pct(c[MISSED_ATTESTATIONS], c[ACTIVE_VALIDATORS], True))
+                self._metrics.eth_rollup_consensus_rewards_rate.labels(label, window, network).set(pct(c[ACTUAL_CONSENSUS_REWARDS], c[IDEAL_CONSENSUS_REWARDS], True))
+                self._metrics.eth_rollup_block_proposals.labels(label, window, network).set(c[PROPOSED_BLOCKS])
+                self._metrics.eth_rollup_missed_block_proposals.labels(label, window, network).set(c[MISSED_BLOCKS])
+                # As for the duties rate of a slot, no duties means
+                # they were performed.
+                self._metrics.eth_rollup_duties_rate.labels(label, window, network).set(c[PERFORMED_DUTIES] / duties if duties else 1.0)
+                self._exported_rollups.add((label, window))
+
+
 def get_prometheus_metrics() -> PrometheusMetrics:
     """Get or initialize the Prometheus metrics singleton.
 
@@ -115,6 +542,24 @@ def get_prometheus_metrics() -> PrometheusMetrics:
             eth_slot=Gauge("eth_slot", "Current slot", ["network"]),
             eth_epoch=Gauge("eth_epoch", "Current epoch", ["network"]),
             eth_current_price_dollars=Gauge("eth_current_price_dollars", "Current price of ETH in USD", ["network"]),
+            eth_current_price_age_seconds=Gauge("eth_current_price_age_seconds", "Time since the price of ETH was fetched", ["network"]),
+
+            eth_watcher_ready=Gauge("eth_watcher_ready", "Whether the watcher exported its first metrics", ["network"]),
+            eth_watcher_time_to_first_metric_seconds=Gauge("eth_watcher_time_to_first_metric_seconds", "Time between startup and the first metrics export", ["network"]),
+
+            eth_watcher_stage_seconds=Histogram("eth_watcher_stage_seconds", "Time spent in each stage of the slot processing", ["stage", "network"], buckets=DURATION_BUCKETS),
+            eth_watcher_slot_lag_seconds=Gauge("eth_watcher_slot_lag_seconds", "Time between the start of the last processed slot and the end of its processing", ["network"]),
+            eth_watcher_slot_overruns_total=Counter("eth_watcher_slot_overruns_total", "Total slots processed after the start of the next slot", ["network"]),
+
+            eth_watcher_beacon_request_seconds=Histogram("eth_watcher_beacon_request_seconds", "Time spent waiting for and reading beacon responses", ["endpoint", "network"], buckets=DURATION_BUCKETS),
+            eth_watcher_beacon_parse_seconds=Histogram("eth_watcher_beacon_parse_seconds", "Time spent parsing beacon responses", ["endpoint", "network"], buckets=DURATION_BUCKETS),
+            eth_watcher_beacon_response_bytes=Histogram("eth_watcher_beacon_response_bytes", "Size of beacon responses", ["endpoint", "network"], buckets=SIZE_BUCKETS),
+            eth_watcher_query_seconds=Histogram("eth_watcher_query_seconds", "Time to answer query API requests", ["route", "network"], buckets=QUERY_BUCKETS),
+
+            eth_watcher_slack_queue_depth=Gauge("eth_watcher_slack_queue_depth", "Slack notifications waiting to be sent", ["channel"]),
+            eth_watcher_slack_sent_total=Counter("eth_watcher_slack_sent_total", "Total slack messages sent", ["channel"]),
+            eth_watcher_slack_dropped_total=Counter("eth_watcher_slack_dropped_total", "Total slack notifications dropped, queue full or send failure", ["channel"]),
+            eth_watcher_slack_rate_limited_total=Counter("eth_watcher_slack_rate_limited_total", "Total slack messages rate limited", ["channel"]),
 
             eth_pending_deposits_count=Gauge("eth_pending_deposits_count", "Pending deposits count sampled every epoch", ['network']),
             eth_pending_deposits_value=Gauge("eth_pending_deposits_value", "Pending deposits value sampled every epoch", ['network']),
@@ -136,6 +581,11 @@ def get_prometheus_metrics() -> PrometheusMetrics:
             eth_missed_consecutive_attestations_count=Gauge("eth_missed_consecutive_attestations", "Missed consecutive attestations in the last two epochs", ['scope', 'network']),
             eth_missed_consecutive_attestations_scaled_count=Gauge("eth_missed_consecutive_attestations_scaled", "Stake-scaled missed consecutive attestations in the last two epochs", ['scope', 'network']),
             eth_slashed_validators_count=Gauge("eth_slashed_validators", "Slashed validators", ['scope', 'network']),
+            eth_missed_attestations_window_count=Gauge("eth_missed_attestations_window", "Validators which missed too many attestations over the history window", ['scope', 'network']),
+            eth_missed_attestations_window_scaled_count=Gauge("eth_missed_attestations_window_scaled", "Stake-scaled validators which missed too many attestations over the history window", ['scope', 'network']),
+            eth_missed_attestations_streak_max=Gauge("eth_missed_attestations_streak_max", "Longest ongoing streak of missed attestations, in epochs", ['scope', 'network']),
+            eth_missed_duties_window_count=Gauge("eth_missed_duties_window", "Missed validator duties over the history window", ['scope', 'network']),
+            eth_missed_consensus_rewards_window_gwei=Gauge("eth_missed_consensus_rewards_window_gwei", "Missed consensus rewards over the history window", ['scope', 'network']),
             eth_missed_duties_at_slot_count=Gauge("eth_missed_duties_at_slot", "Missed validator duties in last slot", ['scope', 'network']),
             eth_missed_duties_at_slot_scaled_count=Gauge("eth_missed_duties_at_slot_scaled", "Stake-scaled missed validator duties in last slot", ['scope', 'network']),
             eth_performed_duties_at_slot_count=Gauge("eth_performed_duties_at_slot", "Performed validator duties in last slot", ['scope', 'network']),
@@ -146,7 +596,16 @@ def get_prometheus_metrics() -> PrometheusMetrics:
             eth_missed_block_proposals_head_total=Counter("eth_missed_block_proposals_head_total", "Total missed block proposals at head", ['scope', 'network']),
             eth_block_proposals_finalized_total=Counter("eth_block_proposals_finalized_total", "Total finalized block proposals", ['scope', 'network']),
             eth_missed_block_proposals_finalized_total=Counter("eth_missed_block_proposals_finalized_total", "Total missed finalized block proposals", ['scope', 'network']),
-            eth_future_block_proposals=Gauge("eth_future_block_proposals", "Future block proposals", ['scope', 'network'])
+            eth_future_block_proposals=Gauge("eth_future_block_proposals", "Future block proposals", ['scope', 'network']),
+
+            eth_validator_distributions=DistributionCollector(),
+
+            eth_rollup_missed_attestations_rate=Gauge("eth_rollup_missed_attestations_rate", "Missed attestations rate over a rolling window", ['scope', 'window', 'network']),
+            eth_rollup_consensus_rewards_rate=Gauge("eth_rollup_consensus_rewards_rate", "Consensus rewards rate over a rolling window", ['scope', 'window', 'network']),
+            eth_rollup_block_proposals=Gauge("eth_rollup_block_proposals", "Block proposals at head over a rolling window", ['scope', 'window', 'network']),
+            eth_rollup_missed_block_proposals=Gauge("eth_rollup_missed_block_proposals", "Missed block proposals at head over a rolling window", ['scope', 'window', 'network']),
+            eth_rollup_duties_rate=Gauge("eth_rollup_duties_rate", "Duties rate over a rolling window", ['scope', 'window', 'network']),
         )
+        REGISTRY.register(_metrics.eth_validator_distributions)
 
     return _metrics
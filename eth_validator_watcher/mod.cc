@@ -1,6 +1,22 @@
+#include <algorithm>
+#include <array>
+#include <atomic>
+#include <cctype>
+#include <condition_variable>
+#include <cstring>
+#include <deque>
+#include <functional>
 #include <iostream>
+#include <limits>
+#include <memory>
+#include <mutex>
+#include <optional>
+#include <stdexcept>
 #include <vector>
 #include <thread>
+#include <tuple>
+#include <type_traits>
+#include <unordered_map>
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
@@ -8,9 +24,190 @@ namespace py = pybind11;
 
 static constexpr int kMaxLogging = 5;
 static constexpr char kLogLabel[] = "scope:watched";
+static constexpr std::size_t kPubkeySize = 48;
 
 using float64_t = double;
 
+// Number of epochs kept in the history of a watched validator: one
+// bit per epoch in a 64-bit word.
+static constexpr uint64_t kHistoryEpochs = 64;
+
+// Bit-packed outcomes of a duty over the last kHistoryEpochs epochs,
+// the most recent one in the lowest bit. Recording a newer epoch
+// shifts the older ones out, so the history never grows.
+struct EpochBits {
+  // Epoch of the lowest bit.
+  uint64_t last = 0;
+  // Epochs for which there is an outcome.
+  uint64_t known = 0;
+  // Epochs for which the outcome was successful.
+  uint64_t ok = 0;
+
+  void record(uint64_t epoch, bool success) {
+    if (known == 0 || epoch > last) {
+      const uint64_t shift = known == 0 ? 0 : epoch - last;
+      known = shift >= kHistoryEpochs ? 0 : known << shift;
+      ok = shift >= kHistoryEpochs ? 0 : ok << shift;
+      last = epoch;
+    }
+    const uint64_t age = last - epoch;
+    if (age >= kHistoryEpochs) {
+      return;
+    }
+    const uint64_t bit = uint64_t(1) << age;
+    known |= bit;
+    ok = success ? (ok | bit) : (ok & ~bit);
+  }
+
+  // Bits of the last `window` epochs.
+  static uint64_t mask(uint64_t window) {
+    return window >= kHistoryEpochs ? ~uint64_t(0) : (uint64_t(1) << window) - 1;
+  }
+
+  // Failures among the last `window` recorded epochs.
+  uint64_t misses(uint64_t window) const {
+    return known & ~ok & mask(window);
+  }
+
+  // Outcomes recorded among the last `window` epochs.
+  uint64_t recorded(uint64_t window) const {
+    return __builtin_popcountll(known & mask(window));
+  }
+
+  uint64_t missed(uint64_t window) const {
+    return __builtin_popcountll(misses(window));
+  }
+
+  // Consecutive failures up to the last recorded epoch.
+  uint64_t streak() const {
+    const uint64_t failures = known & ~ok;
+    return failures == ~uint64_t(0) ? kHistoryEpochs : __builtin_ctzll(~failures);
+  }
+};
+
+// History of a watched validator, preallocated so that it costs a
+// fixed ~380 bytes per validator whatever the uptime.
+struct ValidatorHistory {
+  EpochBits live;
+  EpochBits source;
+  EpochBits target;
+  EpochBits head;
+  // Attestation duties, one per epoch: they are recorded in sequence
+  // rather than by epoch.
+  EpochBits duties;
+  uint64_t last_duty_slot = 0;
+  // Missed consensus rewards (ideal - actual, in Gwei) indexed by
+  // epoch modulo kHistoryEpochs, valid for the epochs known in the
+  // source history.
+  std::array<int32_t, kHistoryEpochs> reward_deltas{};
+
+  void record_liveness(uint64_t epoch, bool is_live) {
+    live.record(epoch, is_live);
+  }
+
+  void record_rewards(uint64_t epoch, bool source_ok, bool target_ok, bool head_ok, int64_t delta) {
+    source.record(epoch, source_ok);
+    target.record(epoch, target_ok);
+    head.record(epoch, head_ok);
+    const int64_t limit = std::numeric_limits<int32_t>::max();
+    reward_deltas[epoch % kHistoryEpochs] = static_cast<int32_t>(std::clamp(delta, -limit, limit));
+  }
+
+  void record_duty(uint64_t slot, bool performed) {
+    uint64_t sequence = duties.last;
+    if (duties.known != 0 && slot != last_duty_slot) {
+      sequence += 1;
+    }
+    duties.record(sequence, performed);
+    last_duty_slot = slot;
+  }
+
+  bool empty() const {
+    return !live.known && !source.known && !duties.known;
+  }
+
+  int64_t missed_rewards(uint64_t window) const {
+    int64_t total = 0;
+    for (uint64_t known = source.known & EpochBits::mask(window); known; known &= known - 1) {
+      const uint64_t age = __builtin_ctzll(known);
+      total += reward_deltas[(source.last - age) % kHistoryEpochs];
+    }
+    return total;
+  }
+};
+
+// Histories are serialized as raw bytes.
+static_assert(std::is_trivially_copyable_v<ValidatorHistory>);
+
+// Parameters of the metrics computed over the history.
+struct HistoryWindow {
+  // Number of epochs considered.
+  uint64_t epochs = 32;
+  // Missed attestations over the window for a validator to be
+  // reported.
+  uint64_t threshold = 3;
+};
+
+// Upper bounds of the buckets of the per-validator distributions, an
+// implicit last bucket holding values above the last bound.
+static constexpr std::size_t kDistributionBuckets = 16;
+static const std::vector<float64_t> kRewardRateBounds = {0.0, 0.5, 0.8, 0.9, 0.95, 0.98, 0.99, 0.995, 1.0};
+static const std::vector<float64_t> kDutiesRateBounds = {0.0, 0.5, 0.75, 0.9, 0.95, 0.99, 1.0};
+static const std::vector<float64_t> kEffectiveBalanceBounds = {16, 24, 31, 32, 64, 128, 256, 512, 1024, 2048};
+
+// Fixed-bucket histogram of a per-validator value: cheap to fill and
+// to merge, whatever the number of validators.
+struct Distribution {
+  std::array<uint64_t, kDistributionBuckets> buckets{};
+  uint64_t count = 0;
+  float64_t sum = 0;
+
+  // Index of the bucket of a value, computed once per validator
+  // rather than once per label.
+  static std::size_t bucket(const std::vector<float64_t> &bounds, float64_t value) {
+    return std::lower_bound(bounds.begin(), bounds.end(), value) - bounds.begin();
+  }
+
+  void observe(std::size_t bucket, float64_t value) {
+    buckets[bucket] += 1;
+    count += 1;
+    sum += value;
+  }
+
+  void merge(const Distribution &other) {
+    for (std::size_t i = 0; i < kDistributionBuckets; i++) {
+      buckets[i] += other.buckets[i];
+    }
+    count += other.count;
+    sum += other.sum;
+  }
+};
+
+// Number of worst watched validators ranked per label.
+static constexpr std::size_t kTopOffenders = 10;
+
+// A watched validator ranked among the worst of its labels.
+struct Offender {
+  uint64_t index = 0;
+  std::string pubkey;
+  bool missed_attestation = false;
+  // Ongoing run of missed attestations, in epochs.
+  uint64_t streak = 0;
+  // Consensus rewards lost over the history window, in Gwei.
+  int64_t lost_rewards = 0;
+  float64_t weight = 0;
+};
+
+// Validators missing their last attestation rank first, so that they
+// are always the ones logged even without history, then longer
+// streaks, then larger lost rewards, then larger stakes. Lower indexes
+// break ties so that the ranking doesn't depend on how validators are
+// split between threads or shards.
+inline bool worse(const Offender &a, const Offender &b) {
+  return std::tie(a.missed_attestation, a.streak, a.lost_rewards, a.weight, b.index) >
+    std::tie(b.missed_attestation, b.streak, b.lost_rewards, b.weight, a.index);
+}
+
 // Flat structure to allow stupid simple conversions to Python without
 // having too-many levels of mental indirections. Processing is shared
 // between python (convenience) and cpp (fast).
@@ -50,6 +247,9 @@ struct Validator {
   // This is the weight of the validator compared to a 32 ETH 0x01
   // validator.
   float64_t weight = 0;
+
+  // Outcomes of the last epochs, updated along with the above.
+  ValidatorHistory history;
 };
 
 // Same, flat structure approach. This is used to aggregate data from
@@ -81,20 +281,840 @@ struct MetricsByLabel {
   uint64_t missed_consecutive_attestations_count = 0;
   float64_t missed_consecutive_attestations_scaled_count = 0.0f;
 
+  // Over the history window, watched validators only.
+  uint64_t missed_attestations_window_count = 0;
+  float64_t missed_attestations_window_scaled_count = 0.0f;
+  uint64_t missed_attestations_streak_max = 0;
+  uint64_t missed_duties_window = 0;
+  float64_t missed_consensus_rewards_window = 0;
+
   uint64_t proposed_blocks = 0;
   uint64_t missed_blocks = 0;
   uint64_t proposed_blocks_finalized = 0;
   uint64_t missed_blocks_finalized = 0;
   uint64_t future_blocks_proposal = 0;
 
+  // Per-validator distributions, watched validators only: rewards
+  // rate of the last epoch, duties rate over the history window and
+  // effective balance in ETH.
+  Distribution reward_rate_distribution;
+  Distribution duties_rate_distribution;
+  Distribution effective_balance_distribution;
+
   std::vector<std::pair<uint64_t, std::string>> details_proposed_blocks;
   std::vector<std::pair<uint64_t, std::string>> details_missed_blocks;
   std::vector<std::pair<uint64_t, std::string>> details_missed_blocks_finalized;
   std::vector<std::pair<uint64_t, std::string>> details_future_blocks;
   std::vector<std::string> details_missed_attestations;
+
+  // Worst watched validators, worst first. While aggregating, this
+  // is a bounded heap with the least bad offender on top.
+  std::vector<Offender> top_offenders;
+};
+
+// Open-addressing hash table of raw 48-byte public keys to validator
+// indexes. Keys are stored contiguously and slots only hold 32-bit
+// positions in the key array, so an entry costs ~64 bytes instead of
+// a hex string plus a dict entry in Python.
+class PubkeyIndex {
+public:
+  void set(const uint8_t *key, uint64_t index) {
+    if ((keys_.size() / kPubkeySize + 1) * 10 > slots_.size() * 7) {
+      grow();
+    }
+    std::size_t slot = find(key);
+    if (slots_[slot]) {
+      uint32_t position = slots_[slot];
+      unlink(values_[position - 1], position);
+      values_[position - 1] = index;
+      link(index, position);
+      return;
+    }
+    keys_.insert(keys_.end(), key, key + kPubkeySize);
+    values_.push_back(index);
+    slots_[slot] = values_.size();
+    link(index, values_.size());
+  }
+
+  std::optional<uint64_t> get(const uint8_t *key) const {
+    if (slots_.empty()) {
+      return std::nullopt;
+    }
+    std::size_t slot = find(key);
+    if (!slots_[slot]) {
+      return std::nullopt;
+    }
+    return values_[slots_[slot] - 1];
+  }
+
+  // Reverse lookup, used when a validator starts being watched.
+  const uint8_t *get_pubkey(uint64_t index) const {
+    if (index >= positions_.size() || !positions_[index]) {
+      return nullptr;
+    }
+    return &keys_[(positions_[index] - 1) * kPubkeySize];
+  }
+
+  void reserve(std::size_t n) {
+    keys_.reserve(n * kPubkeySize);
+    values_.reserve(n);
+    std::size_t capacity = slots_.empty() ? 1024 : slots_.size();
+    while (n * 10 > capacity * 7) {
+      capacity *= 2;
+    }
+    if (capacity != slots_.size()) {
+      rehash(capacity);
+    }
+  }
+
+  std::size_t size() const {
+    return values_.size();
+  }
+
+  std::size_t memory_usage() const {
+    return keys_.capacity() + values_.capacity() * sizeof(uint64_t) + (slots_.capacity() + positions_.capacity()) * sizeof(uint32_t);
+  }
+
+  // Serialized as the number of entries followed by the keys and the
+  // indexes, slots are rebuilt on load.
+  std::string dump() const {
+    uint64_t n = values_.size();
+    std::string out(sizeof(n) + keys_.size() + n * sizeof(uint64_t), '\0');
+    std::memcpy(&out[0], &n, sizeof(n));
+    std::memcpy(&out[sizeof(n)], keys_.data(), keys_.size());
+    std::memcpy(&out[sizeof(n) + keys_.size()], values_.data(), n * sizeof(uint64_t));
+    return out;
+  }
+
+  bool load(const std::string &data) {
+    uint64_t n;
+    if (data.size() < sizeof(n)) {
+      return false;
+    }
+    std::memcpy(&n, data.data(), sizeof(n));
+    if (data.size() != sizeof(n) + n * (kPubkeySize + sizeof(uint64_t))) {
+      return false;
+    }
+    keys_.assign(data.begin() + sizeof(n), data.begin() + sizeof(n) + n * kPubkeySize);
+    values_.resize(n);
+    std::memcpy(values_.data(), data.data() + sizeof(n) + n * kPubkeySize, n * sizeof(uint64_t));
+    positions_.clear();
+    for (std::size_t i = 0; i < n; i++) {
+      link(values_[i], i + 1);
+    }
+    slots_.clear();
+    reserve(n);
+    return true;
+  }
+
+private:
+  static std::size_t hash(const uint8_t *key) {
+    // Keys are close to uniform but mixing a few words is cheap and
+    // keeps pathological inputs from degenerating into long probes.
+    uint64_t w[kPubkeySize / sizeof(uint64_t)];
+    std::memcpy(w, key, sizeof(w));
+    uint64_t h = (w[0] ^ w[1] ^ w[2] ^ w[3] ^ w[4] ^ w[5]) * 0x9e3779b97f4a7c15ULL;
+    return h ^ (h >> 32);
+  }
+
+  std::size_t find(const uint8_t *key) const {
+    std::size_t mask = slots_.size() - 1;
+    std::size_t slot = hash(key) & mask;
+    while (slots_[slot] && std::memcmp(&keys_[(slots_[slot] - 1) * kPubkeySize], key, kPubkeySize) != 0) {
+      slot = (slot + 1) & mask;
+    }
+    return slot;
+  }
+
+  void grow() {
+    rehash(slots_.empty() ? 1024 : slots_.size() * 2);
+  }
+
+  void rehash(std::size_t capacity) {
+    slots_.assign(capacity, 0);
+    std::size_t mask = capacity - 1;
+    for (std::size_t i = 0; i < values_.size(); i++) {
+      std::size_t slot = hash(&keys_[i * kPubkeySize]) & mask;
+      while (slots_[slot]) {
+        slot = (slot + 1) & mask;
+      }
+      slots_[slot] = i + 1;
+    }
+  }
+
+  void link(uint64_t index, uint32_t position) {
+    if (index >= positions_.size()) {
+      positions_.resize(index + 1, 0);
+    }
+    positions_[index] = position;
+  }
+
+  void unlink(uint64_t index, uint32_t position) {
+    if (index < positions_.size() && positions_[index] == position) {
+      positions_[index] = 0;
+    }
+  }
+
+  std::vector<uint8_t> keys_;
+  std::vector<uint64_t> values_;
+  std::vector<uint32_t> slots_;
+  // Validator index to position in the key array, plus one.
+  std::vector<uint32_t> positions_;
+};
+
+// Compact state of the validators which are not watched, only used to
+// aggregate the network-wide metrics. Columns are indexed by validator
+// index and skip everything that is only useful for watched validators
+// (public keys, labels and block slots) so that an entry costs ~35
+// bytes instead of a full Validator and its Python wrapper.
+class NetworkRegistry {
+public:
+  static constexpr uint8_t kSlashed = 1 << 0;
+  static constexpr uint8_t kMissedAttestation = 1 << 1;
+  static constexpr uint8_t kPreviousMissedAttestation = 1 << 2;
+  static constexpr uint8_t kSuboptimalSource = 1 << 3;
+  static constexpr uint8_t kSuboptimalTarget = 1 << 4;
+  static constexpr uint8_t kSuboptimalHead = 1 << 5;
+  static constexpr uint8_t kDutiesPerformed = 1 << 6;
+  // Watched validators have their state held by a Validator object,
+  // their entry is kept so they still count as known.
+  static constexpr uint8_t kWatched = 1 << 7;
+
+  // In sharded mode, a registry only holds the indexes equal to the
+  // shard modulo the number of shards, stored at index / shards.
+  explicit NetworkRegistry(uint64_t shard_index = 0, uint64_t shard_count = 1)
+    : shard_index_(shard_index), shard_count_(shard_count) {
+    if (!shard_count || shard_index >= shard_count) {
+      throw std::invalid_argument("invalid shard");
+    }
+  }
+
+  void update(uint64_t index, const std::string &status, uint64_t type, uint64_t effective_balance, bool slashed, uint64_t activation_epoch) {
+    if (index % shard_count_ != shard_index_) {
+      throw std::invalid_argument("index not in shard");
+    }
+    const std::size_t i = index / shard_count_;
+    ensure(i);
+    size_ += status_[i] == 0;
+    status_[i] = status_id(status) + 1;
+    type_[i] = type;
+    effective_balance_[i] = effective_balance;
+    activation_epoch_[i] = activation_epoch;
+    set_flag(i, kSlashed, slashed);
+  }
+
+  bool contains(uint64_t index) const {
+    return position(index).has_value();
+  }
+
+  bool is_watched(uint64_t index) const {
+    auto i = position(index);
+    return i && (flags_[*i] & kWatched);
+  }
+
+  void set_watched(uint64_t index, bool watched) {
+    if (auto i = position(index)) {
+      set_flag(*i, kWatched, watched);
+      // The history is now held by the Validator object.
+      if (watched) {
+        history_.erase(index);
+      }
+    }
+  }
+
+  void process_liveness(const std::vector<uint64_t> &indexes, const std::vector<bool> &is_live, uint64_t current_epoch) {
+    for (std::size_t j = 0; j < indexes.size() && j < is_live.size(); j++) {
+      auto i = position(indexes[j]);
+      if (!i) {
+        continue;
+      }
+      // Because we ask for the liveness of the previous epoch, we
+      // need to dismiss validators that weren't activated yet at
+      // that time to prevent false positive.
+      if (current_epoch > activation_epoch_[*i]) {
+        set_flag(*i, kPreviousMissedAttestation, flags_[*i] & kMissedAttestation);
+        set_flag(*i, kMissedAttestation, !is_live[j]);
+      }
+    }
+  }
+
+  void process_rewards(const std::map<uint64_t, std::tuple<int64_t, int64_t, int64_t>> &ideal_by_eb,
+                       const std::vector<uint64_t> &indexes,
+                       const std::vector<int64_t> &sources,
+                       const std::vector<int64_t> &targets,
+                       const std::vector<int64_t> &heads) {
+    for (std::size_t j = 0; j < indexes.size(); j++) {
+      auto i = position(indexes[j]);
+      if (!i) {
+        continue;
+      }
+      auto it = ideal_by_eb.find(effective_balance_[*i]);
+      if (it == ideal_by_eb.end()) {
+        continue;
+      }
+      const auto &[source, target, head] = it->second;
+      set_flag(*i, kSuboptimalSource, sources[j] != source);
+      set_flag(*i, kSuboptimalTarget, targets[j] != target);
+      set_flag(*i, kSuboptimalHead, heads[j] != head);
+      ideal_reward_[*i] = source + target + head;
+      actual_reward_[*i] = sources[j] + targets[j] + heads[j];
+    }
+  }
+
+  void process_duties(uint64_t slot, const std::vector<uint64_t> &indexes, const std::vector<bool> &performed) {
+    for (std::size_t j = 0; j < indexes.size() && j < performed.size(); j++) {
+      if (auto i = position(indexes[j])) {
+        duties_slot_[*i] = slot;
+        set_flag(*i, kDutiesPerformed, performed[j]);
+      }
+    }
+  }
+
+  // Only the number of blocks is kept, proposals are rare enough to
+  // live in a sparse map which is cleared on every slot.
+  void process_block(uint64_t index, bool has_block) {
+    if (contains(index)) {
+      blocks_[index][has_block ? kProposed : kMissed] += 1;
+    }
+  }
+
+  void process_block_finalized(uint64_t index, bool has_block) {
+    if (contains(index)) {
+      blocks_[index][has_block ? kProposedFinalized : kMissedFinalized] += 1;
+    }
+  }
+
+  void process_future_block(uint64_t index) {
+    if (contains(index)) {
+      blocks_[index][kFuture] += 1;
+    }
+  }
+
+  void reset_blocks() {
+    blocks_.clear();
+  }
+
+  // State transfer with Validator objects when a validator starts or
+  // stops being watched. Block counters are not transferred as they
+  // are reset on every slot, and the public key is left empty. The
+  // history is only recorded while watched, it is kept aside so that
+  // it is restored when the validator is watched again.
+  std::optional<Validator> get(uint64_t index) const {
+    auto i = position(index);
+    if (!i) {
+      return std::nullopt;
+    }
+    Validator v;
+    v.consensus_index = index;
+    v.consensus_status = statuses_[status_[*i] - 1];
+    v.consensus_type = type_[*i];
+    v.consensus_effective_balance = effective_balance_[*i];
+    v.consensus_activation_epoch = activation_epoch_[*i];
+    v.weight = effective_balance_[*i] / 32'000'000'000.0;
+    v.consensus_slashed = flags_[*i] & kSlashed;
+    v.missed_attestation = flags_[*i] & kMissedAttestation;
+    v.previous_missed_attestation = flags_[*i] & kPreviousMissedAttestation;
+    v.suboptimal_source = flags_[*i] & kSuboptimalSource;
+    v.suboptimal_target = flags_[*i] & kSuboptimalTarget;
+    v.suboptimal_head = flags_[*i] & kSuboptimalHead;
+    v.duties_slot = duties_slot_[*i];
+    v.duties_performed_at_slot = flags_[*i] & kDutiesPerformed;
+    v.ideal_consensus_reward = ideal_reward_[*i];
+    v.actual_consensus_reward = actual_reward_[*i];
+    if (auto h = history_.find(index); h != history_.end()) {
+      v.history = h->second;
+    }
+    return v;
+  }
+
+  void set(uint64_t index, const Validator &v) {
+    update(index, v.consensus_status, v.consensus_type, v.consensus_effective_balance, v.consensus_slashed, v.consensus_activation_epoch);
+    const std::size_t i = index / shard_count_;
+    set_flag(i, kMissedAttestation, v.missed_attestation);
+    set_flag(i, kPreviousMissedAttestation, v.previous_missed_attestation);
+    set_flag(i, kSuboptimalSource, v.suboptimal_source);
+    set_flag(i, kSuboptimalTarget, v.suboptimal_target);
+    set_flag(i, kSuboptimalHead, v.suboptimal_head);
+    set_flag(i, kDutiesPerformed, v.duties_performed_at_slot);
+    duties_slot_[i] = v.duties_slot;
+    ideal_reward_[i] = v.ideal_consensus_reward;
+    actual_reward_[i] = v.actual_consensus_reward;
+    if (v.history.empty()) {
+      history_.erase(index);
+    } else {
+      history_[index] = v.history;
+    }
+  }
+
+  // Same aggregation as process() for the validators which are not
+  // watched, the result is shared by all the given labels. There are
+  // no details as those are only logged for watched validators.
+  std::map<std::string, MetricsByLabel> compute(uint64_t slot, const std::vector<std::string> &labels) const {
+    std::vector<uint64_t> status_count(statuses_.size(), 0);
+    std::vector<float64_t> status_scaled_count(statuses_.size(), 0);
+    std::vector<uint64_t> type_count(256, 0);
+    std::vector<float64_t> type_scaled_count(256, 0);
+    MetricsByLabel m;
+
+    for (std::size_t i = 0; i < status_.size(); i++) {
+      const uint8_t status = status_[i];
+      const uint8_t flags = flags_[i];
+      if (!status || (flags & kWatched)) {
+        continue;
+      }
+      const float64_t weight = effective_balance_[i] / 32'000'000'000.0;
+
+      status_count[status - 1] += 1;
+      status_scaled_count[status - 1] += weight;
+      type_count[type_[i]] += 1;
+      type_scaled_count[type_[i]] += weight;
+
+      m.validator_slashes += (flags & kSlashed) != 0;
+
+      if (!active_[status - 1]) {
+        continue;
+      }
+
+      m.suboptimal_source_count += (flags & kSuboptimalSource) != 0;
+      m.suboptimal_target_count += (flags & kSuboptimalTarget) != 0;
+      m.suboptimal_head_count += (flags & kSuboptimalHead) != 0;
+      m.optimal_source_count += (flags & kSuboptimalSource) == 0;
+      m.optimal_target_count += (flags & kSuboptimalTarget) == 0;
+      m.optimal_head_count += (flags & kSuboptimalHead) == 0;
+
+      if (slot == duties_slot_[i]) {
+        const bool performed = flags & kDutiesPerformed;
+        m.performed_duties_at_slot_count += performed;
+        m.performed_duties_at_slot_scaled_count += performed * weight;
+        m.missed_duties_at_slot_count += !performed;
+        m.missed_duties_at_slot_scaled_count += !performed * weight;
+      }
+
+      m.ideal_consensus_reward += ideal_reward_[i];
+      m.actual_consensus_reward += actual_reward_[i];
+
+      const bool missed = flags & kMissedAttestation;
+      const bool consecutive = missed && (flags & kPreviousMissedAttestation);
+      m.missed_attestations_count += missed;
+      m.missed_attestations_scaled_count += missed * weight;
+      m.missed_consecutive_attestations_count += consecutive;
+      m.missed_consecutive_attestations_scaled_count += consecutive * weight;
+    }
+
+    for (const auto &[index, counters]: blocks_) {
+      auto i = position(index);
+      if (!i || (flags_[*i] & kWatched) || !active_[status_[*i] - 1]) {
+        continue;
+      }
+      m.proposed_blocks += counters[kProposed];
+      m.missed_blocks += counters[kMissed];
+      m.proposed_blocks_finalized += counters[kProposedFinalized];
+      m.missed_blocks_finalized += counters[kMissedFinalized];
+      m.future_blocks_proposal += counters[kFuture];
+    }
+
+    for (std::size_t i = 0; i < statuses_.size(); i++) {
+      if (status_count[i]) {
+        m.validator_status_count[statuses_[i]] = status_count[i];
+        m.validator_status_scaled_count[statuses_[i]] = status_scaled_count[i];
+      }
+    }
+    for (std::size_t i = 0; i < type_count.size(); i++) {
+      if (type_count[i]) {
+        m.validator_type_count[i] = type_count[i];
+        m.validator_type_scaled_count[i] = type_scaled_count[i];
+      }
+    }
+
+    std::map<std::string, MetricsByLabel> out;
+    for (const auto &label: labels) {
+      out[label] = m;
+    }
+    return out;
+  }
+
+  std::vector<uint64_t> indexes() const {
+    std::vector<uint64_t> out;
+    out.reserve(size_);
+    for (std::size_t i = 0; i < status_.size(); i++) {
+      if (status_[i]) {
+        out.push_back(i * shard_count_ + shard_index_);
+      }
+    }
+    return out;
+  }
+
+  void reserve(std::size_t n) {
+    status_.reserve(n);
+    type_.reserve(n);
+    flags_.reserve(n);
+    effective_balance_.reserve(n);
+    activation_epoch_.reserve(n);
+    duties_slot_.reserve(n);
+    ideal_reward_.reserve(n);
+    actual_reward_.reserve(n);
+  }
+
+  std::size_t size() const {
+    return size_;
+  }
+
+  std::size_t memory_usage() const {
+    return status_.capacity() + type_.capacity() + flags_.capacity()
+      + (effective_balance_.capacity() + activation_epoch_.capacity() + duties_slot_.capacity()) * sizeof(uint64_t)
+      + (ideal_reward_.capacity() + actual_reward_.capacity()) * sizeof(int32_t)
+      + history_.size() * (sizeof(uint64_t) + sizeof(ValidatorHistory));
+  }
+
+  // Serialized as the status names followed by the raw columns. Block
+  // counters are not saved and entries are restored as not watched.
+  std::string dump() const {
+    std::string out;
+    uint64_t n = status_.size();
+    uint64_t n_statuses = statuses_.size();
+    append(&out, &shard_index_, sizeof(shard_index_));
+    append(&out, &shard_count_, sizeof(shard_count_));
+    append(&out, &n, sizeof(n));
+    append(&out, &n_statuses, sizeof(n_statuses));
+    for (const auto &status: statuses_) {
+      uint64_t length = status.size();
+      append(&out, &length, sizeof(length));
+      append(&out, status.data(), length);
+    }
+    append(&out, status_.data(), n);
+    append(&out, type_.data(), n);
+    append(&out, flags_.data(), n);
+    append(&out, effective_balance_.data(), n * sizeof(uint64_t));
+    append(&out, activation_epoch_.data(), n * sizeof(uint64_t));
+    append(&out, duties_slot_.data(), n * sizeof(uint64_t));
+    append(&out, ideal_reward_.data(), n * sizeof(int32_t));
+    append(&out, actual_reward_.data(), n * sizeof(int32_t));
+    return out;
+  }
+
+  bool load(const std::string &data) {
+    std::size_t offset = 0;
+    uint64_t shard_index, shard_count, n, n_statuses;
+    if (!read(data, &offset, &shard_index, sizeof(shard_index)) || !read(data, &offset, &shard_count, sizeof(shard_count))
+        || shard_index != shard_index_ || shard_count != shard_count_) {
+      return false;
+    }
+    if (!read(data, &offset, &n, sizeof(n)) || !read(data, &offset, &n_statuses, sizeof(n_statuses)) || n_statuses > 255) {
+      return false;
+    }
+
+    NetworkRegistry loaded(shard_index_, shard_count_);
+    for (uint64_t i = 0; i < n_statuses; i++) {
+      uint64_t length;
+      if (!read(data, &offset, &length, sizeof(length)) || length > data.size() - offset) {
+        return false;
+      }
+      loaded.status_id(data.substr(offset, length));
+      offset += length;
+    }
+
+    if (data.size() - offset != n * (3 + 3 * sizeof(uint64_t) + 2 * sizeof(int32_t))) {
+      return false;
+    }
+    if (n) {
+      loaded.ensure(n - 1);
+    }
+    read(data, &offset, loaded.status_.data(), n);
+    read(data, &offset, loaded.type_.data(), n);
+    read(data, &offset, loaded.flags_.data(), n);
+    read(data, &offset, loaded.effective_balance_.data(), n * sizeof(uint64_t));
+    read(data, &offset, loaded.activation_epoch_.data(), n * sizeof(uint64_t));
+    read(data, &offset, loaded.duties_slot_.data(), n * sizeof(uint64_t));
+    read(data, &offset, loaded.ideal_reward_.data(), n * sizeof(int32_t));
+    read(data, &offset, loaded.actual_reward_.data(), n * sizeof(int32_t));
+
+    for (std::size_t i = 0; i < n; i++) {
+      if (loaded.status_[i] > n_statuses) {
+        return false;
+      }
+      loaded.size_ += loaded.status_[i] != 0;
+      loaded.flags_[i] &= ~kWatched;
+    }
+
+    *this = std::move(loaded);
+    return true;
+  }
+
+  // The history kept aside is serialized on its own, as the number of
+  // entries followed by the indexes and raw histories sorted by index.
+  std::string dump_history() const {
+    std::vector<uint64_t> indexes;
+    indexes.reserve(history_.size());
+    for (const auto &[index, history]: history_) {
+      indexes.push_back(index);
+    }
+    std::sort(indexes.begin(), indexes.end());
+
+    std::string out;
+    uint64_t n = indexes.size();
+    out.reserve(sizeof(n) + n * (sizeof(uint64_t) + sizeof(ValidatorHistory)));
+    append(&out, &n, sizeof(n));
+    for (const auto &index: indexes) {
+      append(&out, &index, sizeof(index));
+      append(&out, &history_.at(index), sizeof(ValidatorHistory));
+    }
+    return out;
+  }
+
+  bool load_history(const std::string &data) {
+    std::size_t offset = 0;
+    uint64_t n;
+    const std::size_t entry = sizeof(uint64_t) + sizeof(ValidatorHistory);
+    if (!read(data, &offset, &n, sizeof(n)) || n > data.size() / entry || data.size() - offset != n * entry) {
+      return false;
+    }
+
+    std::unordered_map<uint64_t, ValidatorHistory> loaded;
+    loaded.reserve(n);
+    for (uint64_t j = 0; j < n; j++) {
+      uint64_t index = 0;
+      ValidatorHistory history;
+      read(data, &offset, &index, sizeof(index));
+      read(data, &offset, &history, sizeof(history));
+      if (!contains(index)) {
+        return false;
+      }
+      loaded[index] = history;
+    }
+
+    history_ = std::move(loaded);
+    return true;
+  }
+
+private:
+  enum BlockCounter { kProposed, kMissed, kProposedFinalized, kMissedFinalized, kFuture, kBlockCounters };
+
+  static void append(std::string *out, const void *data, std::size_t size) {
+    out->append(static_cast<const char *>(data), size);
+  }
+
+  static bool read(const std::string &data, std::size_t *offset, void *out, std::size_t size) {
+    if (size > data.size() - *offset) {
+      return false;
+    }
+    std::memcpy(out, data.data() + *offset, size);
+    *offset += size;
+    return true;
+  }
+
+  // Position of a validator in the columns, if known.
+  std::optional<std::size_t> position(uint64_t index) const {
+    if (index % shard_count_ != shard_index_) {
+      return std::nullopt;
+    }
+    const std::size_t i = index / shard_count_;
+    if (i >= status_.size() || !status_[i]) {
+      return std::nullopt;
+    }
+    return i;
+  }
+
+  void ensure(std::size_t i) {
+    if (i < status_.size()) {
+      return;
+    }
+    status_.resize(i + 1, 0);
+    type_.resize(i + 1, 0);
+    flags_.resize(i + 1, 0);
+    effective_balance_.resize(i + 1, 0);
+    activation_epoch_.resize(i + 1, 0);
+    duties_slot_.resize(i + 1, 0);
+    ideal_reward_.resize(i + 1, 0);
+    actual_reward_.resize(i + 1, 0);
+  }
+
+  // Statuses are a handful of strings, entries only hold their id.
+  uint8_t status_id(const std::string &status) {
+    for (std::size_t i = 0; i < statuses_.size(); i++) {
+      if (statuses_[i] == status) {
+        return i;
+      }
+    }
+    if (statuses_.size() == 255) {
+      throw std::length_error("too many validator statuses");
+    }
+    statuses_.push_back(status);
+    active_.push_back(status.find("active") != std::string::npos);
+    return statuses_.size() - 1;
+  }
+
+  void set_flag(std::size_t i, uint8_t flag, bool value) {
+    flags_[i] = value ? (flags_[i] | flag) : (flags_[i] & ~flag);
+  }
+
+  uint64_t shard_index_;
+  uint64_t shard_count_;
+
+  std::vector<std::string> statuses_;
+  std::vector<bool> active_;
+
+  // Columns are indexed by validator index divided by the number of
+  // shards. Status id plus one, zero for indexes not seen on the
+  // beacon chain.
+  std::vector<uint8_t> status_;
+  std::vector<uint8_t> type_;
+  std::vector<uint8_t> flags_;
+  std::vector<uint64_t> effective_balance_;
+  std::vector<uint64_t> activation_epoch_;
+  std::vector<uint64_t> duties_slot_;
+  // Consensus rewards of an epoch are a few thousand Gwei.
+  std::vector<int32_t> ideal_reward_;
+  std::vector<int32_t> actual_reward_;
+  std::size_t size_ = 0;
+
+  // History of the validators which were watched, by index.
+  std::unordered_map<uint64_t, ValidatorHistory> history_;
+
+  std::map<uint64_t, std::array<uint16_t, kBlockCounters>> blocks_;
+};
+
+// Process-wide pool of native workers. Several processing loops can run
+// in the same process (one per network), they share these workers
+// instead of each spawning one thread per core on every slot.
+class WorkerPool {
+public:
+  static WorkerPool& get() {
+    // Never destroyed: workers are blocked waiting for tasks when the
+    // interpreter exits.
+    static WorkerPool* pool = new WorkerPool(std::max(1u, std::thread::hardware_concurrency()));
+    return *pool;
+  }
+
+  std::size_t size() const {
+    return workers_.size();
+  }
+
+  std::size_t busy() const {
+    return busy_;
+  }
+
+  std::size_t queued() {
+    std::lock_guard<std::mutex> lock(mutex_);
+    return tasks_.size();
+  }
+
+  uint64_t completed() const {
+    return completed_;
+  }
+
+  // Run fn(0) ... fn(n - 1) on the workers and wait for all of them.
+  void run(std::size_t n, const std::function<void(std::size_t)>& fn) {
+    std::mutex done_mutex;
+    std::condition_variable done_cv;
+    std::size_t remaining = n;
+
+    {
+      std::lock_guard<std::mutex> lock(mutex_);
+      for (std::size_t i = 0; i < n; i++) {
+        tasks_.push_back([i, &fn, &done_mutex, &done_cv, &remaining] {
+          fn(i);
+          std::lock_guard<std::mutex> done_lock(done_mutex);
+          if (--remaining == 0) {
+            done_cv.notify_one();
+          }
+        });
+      }
+    }
+    cv_.notify_all();
+
+    std::unique_lock<std::mutex> done_lock(done_mutex);
+    done_cv.wait(done_lock, [&remaining] { return remaining == 0; });
+  }
+
+private:
+  explicit WorkerPool(std::size_t n) {
+    for (std::size_t i = 0; i < n; i++) {
+      workers_.emplace_back([this] { work(); });
+    }
+  }
+
+  void work() {
+    while (true) {
+      std::function<void()> task;
+      {
+        std::unique_lock<std::mutex> lock(mutex_);
+        cv_.wait(lock, [this] { return !tasks_.empty(); });
+        task = std::move(tasks_.front());
+        tasks_.pop_front();
+      }
+      busy_++;
+      task();
+      busy_--;
+      completed_++;
+    }
+  }
+
+  std::vector<std::thread> workers_;
+  std::mutex mutex_;
+  std::condition_variable cv_;
+  std::deque<std::function<void()>> tasks_;
+  std::atomic<std::size_t> busy_{0};
+  std::atomic<uint64_t> completed_{0};
 };
 
 namespace {
+  // Lookup table of hex digit values, -1 for other characters: random
+  // hex digits would otherwise mispredict most branches.
+  struct HexTable {
+    int8_t values[256];
+
+    constexpr HexTable() : values() {
+      for (int c = 0; c < 256; c++) {
+        values[c] = -1;
+      }
+      for (int c = '0'; c <= '9'; c++) {
+        values[c] = c - '0';
+      }
+      for (int c = 'a'; c <= 'f'; c++) {
+        values[c] = c - 'a' + 10;
+        values[c - 'a' + 'A'] = c - 'a' + 10;
+      }
+    }
+  };
+  constexpr HexTable kHexTable;
+
+  // Accepts raw 48-byte keys or hex-encoded keys with or without the
+  // 0x prefix, in any case.
+  bool parse_pubkey(const py::handle &obj, uint8_t *out) {
+    if (py::isinstance<py::bytes>(obj)) {
+      char *data;
+      Py_ssize_t size;
+      if (PyBytes_AsStringAndSize(obj.ptr(), &data, &size) != 0 || size != kPubkeySize) {
+        PyErr_Clear();
+        return false;
+      }
+      std::memcpy(out, data, kPubkeySize);
+      return true;
+    }
+
+    if (PyUnicode_Check(obj.ptr()) && PyUnicode_IS_COMPACT_ASCII(obj.ptr())) {
+      const char *data = static_cast<const char *>(PyUnicode_DATA(obj.ptr()));
+      Py_ssize_t size = PyUnicode_GET_LENGTH(obj.ptr());
+      if (size >= 2 && data[0] == '0' && (data[1] == 'x' || data[1] == 'X')) {
+        data += 2;
+        size -= 2;
+      }
+      if (size != kPubkeySize * 2) {
+        return false;
+      }
+      int invalid = 0;
+      for (std::size_t i = 0; i < kPubkeySize; i++) {
+        int hi = kHexTable.values[static_cast<uint8_t>(data[2 * i])];
+        int lo = kHexTable.values[static_cast<uint8_t>(data[2 * i + 1])];
+        invalid |= hi | lo;
+        out[i] = (hi << 4) | lo;
+      }
+      return invalid >= 0;
+    }
+
+    return false;
+  }
+
   void process_details(const std::string &validator, std::vector<uint64_t> slots, std::vector<std::pair<uint64_t, std::string>> *out) {
     for (const auto& slot: slots) {
       if (out->size() >= kMaxLogging) {
@@ -103,11 +1123,47 @@ namespace {
       out->push_back({slot, validator});
     }
   }
+
+  // Whether an offender would enter a bounded heap of offenders.
+  bool admits(const std::vector<Offender> &heap, const Offender &offender) {
+    return heap.size() < kTopOffenders || worse(offender, heap.front());
+  }
+
+  void offer(const Offender &offender, std::vector<Offender> *heap) {
+    if (!admits(*heap, offender)) {
+      return;
+    }
+    if (heap->size() >= kTopOffenders) {
+      std::pop_heap(heap->begin(), heap->end(), worse);
+      heap->pop_back();
+    }
+    heap->push_back(offender);
+    std::push_heap(heap->begin(), heap->end(), worse);
+  }
   
-  void process(uint64_t slot, std::size_t from, std::size_t to, const std::vector<Validator> &vals, std::map<std::string, MetricsByLabel> &out) {
+  void process(uint64_t slot, const HistoryWindow &window, std::size_t from, std::size_t to, const std::vector<Validator> &vals, std::map<std::string, MetricsByLabel> &out) {
     for (std::size_t i = from; i < to; i++) {
       auto &v = vals[i];
 
+      // Same for all labels of the validator.
+      const auto &h = v.history;
+      const bool missed_window = h.live.missed(window.epochs) >= window.threshold;
+      const uint64_t streak = h.live.streak();
+      const uint64_t missed_duties = h.duties.missed(window.epochs);
+      const int64_t missed_rewards = h.missed_rewards(window.epochs);
+
+      // The public key is only copied if it enters a heap.
+      Offender offender{v.consensus_index, {}, v.missed_attestation, streak, missed_rewards, v.weight};
+      const bool offending = v.missed_attestation || streak > 0 || missed_rewards > 0;
+
+      const float64_t reward_rate = v.ideal_consensus_reward > 0 ? v.actual_consensus_reward / v.ideal_consensus_reward : 0;
+      const std::size_t reward_rate_bucket = Distribution::bucket(kRewardRateBounds, reward_rate);
+      const uint64_t duties = h.duties.recorded(window.epochs);
+      const float64_t duties_rate = duties ? float64_t(duties - missed_duties) / duties : 0;
+      const std::size_t duties_rate_bucket = Distribution::bucket(kDutiesRateBounds, duties_rate);
+      const float64_t effective_balance = v.consensus_effective_balance / 1e9;
+      const std::size_t effective_balance_bucket = Distribution::bucket(kEffectiveBalanceBounds, effective_balance);
+
       for (const auto& label: v.labels) {
         MetricsByLabel & m = out[label];
 
@@ -147,18 +1203,35 @@ namespace {
         m.missed_consecutive_attestations_count += int(v.previous_missed_attestation == true && v.missed_attestation == true);
         m.missed_consecutive_attestations_scaled_count += int(v.previous_missed_attestation == true && v.missed_attestation == true) * v.weight;
 
+        m.missed_attestations_window_count += int(missed_window);
+        m.missed_attestations_window_scaled_count += int(missed_window) * v.weight;
+        m.missed_attestations_streak_max = std::max(m.missed_attestations_streak_max, streak);
+        m.missed_duties_window += missed_duties;
+        m.missed_consensus_rewards_window += missed_rewards;
+
         m.proposed_blocks += v.proposed_blocks.size();
         m.missed_blocks += v.missed_blocks.size();
         m.proposed_blocks_finalized += v.proposed_blocks_finalized.size();
         m.missed_blocks_finalized += v.missed_blocks_finalized.size();
         m.future_blocks_proposal += v.future_blocks_proposal.size();
 
+        if (v.ideal_consensus_reward > 0) {
+          m.reward_rate_distribution.observe(reward_rate_bucket, reward_rate);
+        }
+        if (duties) {
+          m.duties_rate_distribution.observe(duties_rate_bucket, duties_rate);
+        }
+        m.effective_balance_distribution.observe(effective_balance_bucket, effective_balance);
+
         process_details(v.consensus_pubkey, v.proposed_blocks, &m.details_proposed_blocks);
         process_details(v.consensus_pubkey, v.missed_blocks, &m.details_missed_blocks);
         process_details(v.consensus_pubkey, v.missed_blocks_finalized, &m.details_missed_blocks_finalized);
         process_details(v.consensus_pubkey, v.future_blocks_proposal, &m.details_future_blocks);
-        if (v.missed_attestation && m.details_missed_attestations.size() < kMaxLogging) {
-          m.details_missed_attestations.push_back(v.consensus_pubkey);
+        if (offending && admits(m.top_offenders, offender)) {
+          if (offender.pubkey.empty()) {
+            offender.pubkey = v.consensus_pubkey;
+          }
+          offer(offender, &m.top_offenders);
         }
       }
     }
@@ -210,21 +1283,41 @@ namespace {
         m.missed_consecutive_attestations_count += metric.missed_consecutive_attestations_count;
         m.missed_consecutive_attestations_scaled_count += metric.missed_consecutive_attestations_scaled_count;
 
+        m.missed_attestations_window_count += metric.missed_attestations_window_count;
+        m.missed_attestations_window_scaled_count += metric.missed_attestations_window_scaled_count;
+        m.missed_attestations_streak_max = std::max(m.missed_attestations_streak_max, metric.missed_attestations_streak_max);
+        m.missed_duties_window += metric.missed_duties_window;
+        m.missed_consensus_rewards_window += metric.missed_consensus_rewards_window;
+
         m.proposed_blocks += metric.proposed_blocks;
         m.missed_blocks += metric.missed_blocks;
         m.proposed_blocks_finalized += metric.proposed_blocks_finalized;
         m.missed_blocks_finalized += metric.missed_blocks_finalized;
         m.future_blocks_proposal += metric.future_blocks_proposal;
 
+        m.reward_rate_distribution.merge(metric.reward_rate_distribution);
+        m.duties_rate_distribution.merge(metric.duties_rate_distribution);
+        m.effective_balance_distribution.merge(metric.effective_balance_distribution);
+
         merge_details(metric.details_proposed_blocks, &m.details_proposed_blocks);
         merge_details(metric.details_missed_blocks, &m.details_missed_blocks);
         merge_details(metric.details_missed_blocks_finalized, &m.details_missed_blocks_finalized);
         merge_details(metric.details_future_blocks, &m.details_future_blocks);
 
-        for (const auto& missed_attestation: metric.details_missed_attestations) {
-          if (m.details_missed_attestations.size() < kMaxLogging) {
-            m.details_missed_attestations.push_back(missed_attestation);
-          }
+        for (const auto& offender: metric.top_offenders) {
+          offer(offender, &m.top_offenders);
+        }
+      }
+    }
+
+    // Rank the offenders once per label, the missed attestations
+    // logged are the worst ones.
+    for (auto& [label, o]: *out) {
+      std::sort(o.top_offenders.begin(), o.top_offenders.end(), worse);
+      o.details_missed_attestations.clear();
+      for (const auto& offender: o.top_offenders) {
+        if (offender.missed_attestation && o.details_missed_attestations.size() < kMaxLogging) {
+          o.details_missed_attestations.push_back(offender.pubkey);
         }
       }
     }
@@ -242,10 +1335,615 @@ namespace {
     
   }
 
+  // Compact binary encoding of metrics by label, used to ship partial
+  // metrics from the shard workers to the coordinator. Integers and
+  // floats are written in native byte order: both ends run on the
+  // same host.
+  class Writer {
+  public:
+    template <typename T>
+    void scalar(T value) {
+      out_.append(reinterpret_cast<const char *>(&value), sizeof(value));
+    }
+
+    void string(const std::string &value) {
+      scalar<uint64_t>(value.size());
+      out_.append(value);
+    }
+
+    template <typename K, typename V>
+    void map(const std::map<K, V> &values) {
+      scalar<uint64_t>(values.size());
+      for (const auto &[key, value]: values) {
+        if constexpr (std::is_same_v<K, std::string>) {
+          string(key);
+        } else {
+          scalar<K>(key);
+        }
+        scalar<V>(value);
+      }
+    }
+
+    void details(const std::vector<std::pair<uint64_t, std::string>> &values) {
+      scalar<uint64_t>(values.size());
+      for (const auto &[slot, pubkey]: values) {
+        scalar<uint64_t>(slot);
+        string(pubkey);
+      }
+    }
+
+    void offenders(const std::vector<Offender> &values) {
+      scalar<uint64_t>(values.size());
+      for (const auto &offender: values) {
+        scalar<uint64_t>(offender.index);
+        string(offender.pubkey);
+        scalar<bool>(offender.missed_attestation);
+        scalar<uint64_t>(offender.streak);
+        scalar<int64_t>(offender.lost_rewards);
+        scalar<float64_t>(offender.weight);
+      }
+    }
+
+    std::string &data() {
+      return out_;
+    }
+
+  private:
+    std::string out_;
+  };
+
+  class Reader {
+  public:
+    explicit Reader(const std::string &data) : data_(data) {}
+
+    template <typename T>
+    T scalar() {
+      T value;
+      if (sizeof(value) > data_.size() - offset_) {
+        throw py::value_error("truncated metrics data");
+      }
+      std::memcpy(&value, data_.data() + offset_, sizeof(value));
+      offset_ += sizeof(value);
+      return value;
+    }
+
+    std::string string() {
+      uint64_t size = scalar<uint64_t>();
+      if (size > data_.size() - offset_) {
+        throw py::value_error("truncated metrics data");
+      }
+      std::string value = data_.substr(offset_, size);
+      offset_ += size;
+      return value;
+    }
+
+    template <typename K, typename V>
+    void map(std::map<K, V> *values) {
+      uint64_t size = scalar<uint64_t>();
+      for (uint64_t i = 0; i < size; i++) {
+        K key;
+        if constexpr (std::is_same_v<K, std::string>) {
+          key = string();
+        } else {
+          key = scalar<K>();
+        }
+        (*values)[key] = scalar<V>();
+      }
+    }
+
+    void details(std::vector<std::pair<uint64_t, std::string>> *values) {
+      uint64_t size = scalar<uint64_t>();
+      for (uint64_t i = 0; i < size; i++) {
+        uint64_t slot = scalar<uint64_t>();
+        values->push_back({slot, string()});
+      }
+    }
+
+    void offenders(std::vector<Offender> *values) {
+      uint64_t size = scalar<uint64_t>();
+      for (uint64_t i = 0; i < size; i++) {
+        Offender offender;
+        offender.index = scalar<uint64_t>();
+        offender.pubkey = string();
+        offender.missed_attestation = scalar<bool>();
+        offender.streak = scalar<uint64_t>();
+        offender.lost_rewards = scalar<int64_t>();
+        offender.weight = scalar<float64_t>();
+        values->push_back(std::move(offender));
+      }
+    }
+
+    bool done() const {
+      return offset_ == data_.size();
+    }
+
+  private:
+    const std::string &data_;
+    std::size_t offset_ = 0;
+  };
+
+  // Scalar fields, in encoding order.
+  template <typename F>
+  void visit_scalars(MetricsByLabel &m, F &&f) {
+    f(m.suboptimal_source_count);
+    f(m.suboptimal_target_count);
+    f(m.suboptimal_head_count);
+    f(m.optimal_source_count);
+    f(m.optimal_target_count);
+    f(m.optimal_head_count);
+    f(m.validator_slashes);
+    f(m.missed_duties_at_slot_count);
+    f(m.missed_duties_at_slot_scaled_count);
+    f(m.performed_duties_at_slot_count);
+    f(m.performed_duties_at_slot_scaled_count);
+    f(m.duties_rate);
+    f(m.duties_rate_scaled);
+    f(m.ideal_consensus_reward);
+    f(m.actual_consensus_reward);
+    f(m.missed_attestations_count);
+    f(m.missed_attestations_scaled_count);
+    f(m.missed_consecutive_attestations_count);
+    f(m.missed_consecutive_attestations_scaled_count);
+    f(m.missed_attestations_window_count);
+    f(m.missed_attestations_window_scaled_count);
+    f(m.missed_attestations_streak_max);
+    f(m.missed_duties_window);
+    f(m.missed_consensus_rewards_window);
+    f(m.proposed_blocks);
+    f(m.missed_blocks);
+    f(m.proposed_blocks_finalized);
+    f(m.missed_blocks_finalized);
+    f(m.future_blocks_proposal);
+    for (auto *distribution: {&m.reward_rate_distribution, &m.duties_rate_distribution, &m.effective_balance_distribution}) {
+      for (auto &count: distribution->buckets) {
+        f(count);
+      }
+      f(distribution->count);
+      f(distribution->sum);
+    }
+  }
+
+  std::string serialize(std::map<std::string, MetricsByLabel> metrics) {
+    Writer w;
+    w.scalar<uint64_t>(metrics.size());
+    for (auto &[label, m]: metrics) {
+      w.string(label);
+      w.map(m.validator_status_count);
+      w.map(m.validator_status_scaled_count);
+      w.map(m.validator_type_count);
+      w.map(m.validator_type_scaled_count);
+      visit_scalars(m, [&w](auto &value) { w.scalar(value); });
+      w.details(m.details_proposed_blocks);
+      w.details(m.details_missed_blocks);
+      w.details(m.details_missed_blocks_finalized);
+      w.details(m.details_future_blocks);
+      w.scalar<uint64_t>(m.details_missed_attestations.size());
+      for (const auto &pubkey: m.details_missed_attestations) {
+        w.string(pubkey);
+      }
+      w.offenders(m.top_offenders);
+    }
+    return std::move(w.data());
+  }
+
+  std::map<std::string, MetricsByLabel> deserialize(const std::string &data) {
+    Reader r(data);
+    std::map<std::string, MetricsByLabel> metrics;
+    uint64_t size = r.scalar<uint64_t>();
+    for (uint64_t i = 0; i < size; i++) {
+      MetricsByLabel &m = metrics[r.string()];
+      r.map(&m.validator_status_count);
+      r.map(&m.validator_status_scaled_count);
+      r.map(&m.validator_type_count);
+      r.map(&m.validator_type_scaled_count);
+      visit_scalars(m, [&r](auto &value) { value = r.scalar<std::decay_t<decltype(value)>>(); });
+      r.details(&m.details_proposed_blocks);
+      r.details(&m.details_missed_blocks);
+      r.details(&m.details_missed_blocks_finalized);
+      r.details(&m.details_future_blocks);
+      uint64_t missed = r.scalar<uint64_t>();
+      for (uint64_t j = 0; j < missed; j++) {
+        m.details_missed_attestations.push_back(r.string());
+      }
+      r.offenders(&m.top_offenders);
+    }
+    if (!r.done()) {
+      throw py::value_error("trailing bytes in metrics data");
+    }
+    return metrics;
+  }
+
+  // Columns of the watched validators, as raw buffers in the Arrow
+  // layout: little-endian values and LSB-first validity bitmaps.
+  // Strings are dictionary-encoded, a row only holds a code.
+  class ValidatorColumns {
+  public:
+    explicit ValidatorColumns(std::size_t n)
+      : index_(n), effective_balance_(n), duty_slot_(n), label_set_(n), status_(n), type_(n),
+        ideal_reward_(n), actual_reward_(n) {
+      bitmaps_.fill(std::string((n + 7) / 8, '\0'));
+    }
+
+    void set(std::size_t i, uint64_t index, const Validator &v) {
+      index_[i] = index;
+      effective_balance_[i] = v.consensus_effective_balance;
+      duty_slot_[i] = v.duties_slot;
+      label_set_[i] = code(&label_sets_, &label_set_names_, join(v.labels));
+      status_[i] = static_cast<int8_t>(code(&statuses_, &status_names_, v.consensus_status));
+      type_[i] = static_cast<uint8_t>(v.consensus_type);
+      ideal_reward_[i] = v.ideal_consensus_reward;
+      actual_reward_[i] = v.actual_consensus_reward;
+      set_bit(kSlashed, i, v.consensus_slashed);
+      set_bit(kLive, i, !v.missed_attestation);
+      set_bit(kPreviousLive, i, !v.previous_missed_attestation);
+      set_bit(kSourceOk, i, !v.suboptimal_source);
+      set_bit(kTargetOk, i, !v.suboptimal_target);
+      set_bit(kHeadOk, i, !v.suboptimal_head);
+      set_bit(kDutyPerformed, i, v.duties_performed_at_slot);
+    }
+
+    py::dict to_python() const {
+      py::dict columns;
+      columns["index"] = bytes(index_);
+      columns["effective_balance"] = bytes(effective_balance_);
+      columns["duty_slot"] = bytes(duty_slot_);
+      columns["label_set"] = bytes(label_set_);
+      columns["status"] = bytes(status_);
+      columns["withdrawal_type"] = bytes(type_);
+      columns["ideal_reward"] = bytes(ideal_reward_);
+      columns["actual_reward"] = bytes(actual_reward_);
+      for (std::size_t b = 0; b < kBitmapCount; b++) {
+        columns[kBitmapNames[b]] = py::bytes(bitmaps_[b]);
+      }
+      columns["label_sets"] = label_set_names_;
+      columns["statuses"] = status_names_;
+      return columns;
+    }
+
+  private:
+    enum Bitmap { kSlashed, kLive, kPreviousLive, kSourceOk, kTargetOk, kHeadOk, kDutyPerformed, kBitmapCount };
+    static constexpr const char *kBitmapNames[kBitmapCount] = {
+      "slashed", "live", "previous_live", "source_ok", "target_ok", "head_ok", "duty_performed",
+    };
+
+    template <typename T>
+    static py::bytes bytes(const std::vector<T> &values) {
+      return py::bytes(reinterpret_cast<const char *>(values.data()), values.size() * sizeof(T));
+    }
+
+    static std::string join(const std::vector<std::string> &labels) {
+      std::string out;
+      for (const auto &label: labels) {
+        if (!out.empty()) {
+          out += ',';
+        }
+        out += label;
+      }
+      return out;
+    }
+
+    static int32_t code(std::map<std::string, int32_t> *codes, std::vector<std::string> *names, const std::string &value) {
+      auto [it, inserted] = codes->emplace(value, static_cast<int32_t>(names->size()));
+      if (inserted) {
+        names->push_back(value);
+      }
+      return it->second;
+    }
+
+    void set_bit(Bitmap bitmap, std::size_t i, bool value) {
+      if (value) {
+        bitmaps_[bitmap][i / 8] |= static_cast<char>(1 << (i % 8));
+      }
+    }
+
+    std::vector<uint64_t> index_;
+    std::vector<uint64_t> effective_balance_;
+    std::vector<uint64_t> duty_slot_;
+    std::vector<int32_t> label_set_;
+    std::vector<int8_t> status_;
+    std::vector<uint8_t> type_;
+    std::vector<float64_t> ideal_reward_;
+    std::vector<float64_t> actual_reward_;
+    std::array<std::string, kBitmapCount> bitmaps_;
+    std::map<std::string, int32_t> label_sets_;
+    std::vector<std::string> label_set_names_;
+    std::map<std::string, int32_t> statuses_;
+    std::vector<std::string> status_names_;
+  };
+
+  // Read-only copy of the watched validators, indexed by validator
+  // index, public key and label. A view is built by the processing
+  // loop once per slot and then only read, so any number of threads
+  // can query it without locking while the next one is built.
+  //
+  // Public keys and labels only change with the watched validators,
+  // they are shared between views while the rest of the state is
+  // copied to compact rows on every slot.
+  class RegistryView {
+  public:
+    enum Field {
+      kIndex, kPubkey, kLabels, kStatus, kType, kEffectiveBalance, kSlashed, kActivationEpoch,
+      kMissedAttestation, kPreviousMissedAttestation, kSuboptimalSource, kSuboptimalTarget, kSuboptimalHead,
+      kIdealConsensusReward, kActualConsensusReward, kDutiesSlot, kDutiesPerformedAtSlot,
+      kMissedAttestationsStreak, kMissedAttestationsHistory, kFieldCount,
+    };
+
+    static constexpr const char *kFieldNames[kFieldCount] = {
+      "index", "pubkey", "labels", "status", "type", "effective_balance", "slashed", "activation_epoch",
+      "missed_attestation", "previous_missed_attestation", "suboptimal_source", "suboptimal_target", "suboptimal_head",
+      "ideal_consensus_reward", "actual_consensus_reward", "duties_slot", "duties_performed_at_slot",
+      "missed_attestations_streak", "missed_attestations_history",
+    };
+
+    // Rows are in index order.
+    struct Identities {
+      std::vector<uint64_t> indexes;
+      std::vector<std::string> pubkeys;
+      std::vector<std::vector<std::string>> labels;
+      std::unordered_map<std::string, uint32_t> rows_by_pubkey;
+      std::unordered_map<std::string, std::vector<uint32_t>> rows_by_label;
+    };
+
+    struct Row {
+      uint64_t effective_balance = 0;
+      uint64_t activation_epoch = 0;
+      uint64_t duties_slot = 0;
+      float64_t ideal_consensus_reward = 0;
+      float64_t actual_consensus_reward = 0;
+      uint8_t status = 0;
+      uint8_t type = 0;
+      // One bit per flag field.
+      uint32_t flags = 0;
+      uint8_t streak = 0;
+      uint8_t missed = 0;
+    };
+
+    RegistryView(std::shared_ptr<const Identities> identities, uint64_t slot)
+      : identities_(std::move(identities)), rows_(identities_->indexes.size()), slot_(slot) {}
+
+    // Identities of validators given in any order, along with the
+    // rows they were given at.
+    static std::shared_ptr<const Identities> identities(std::vector<std::tuple<uint64_t, std::string, std::vector<std::string>>> vals,
+                                                         std::vector<uint32_t> *order) {
+      std::vector<uint32_t> sorted(vals.size());
+      for (uint32_t i = 0; i < sorted.size(); i++) {
+        sorted[i] = i;
+      }
+      std::sort(sorted.begin(), sorted.end(), [&vals](uint32_t a, uint32_t b) { return std::get<0>(vals[a]) < std::get<0>(vals[b]); });
+
+      auto out = std::make_shared<Identities>();
+      out->indexes.reserve(vals.size());
+      out->pubkeys.reserve(vals.size());
+      out->labels.reserve(vals.size());
+      out->rows_by_pubkey.reserve(vals.size());
+      order->assign(vals.size(), 0);
+      for (uint32_t row = 0; row < sorted.size(); row++) {
+        auto &[index, pubkey, labels] = vals[sorted[row]];
+        (*order)[sorted[row]] = row;
+        out->rows_by_pubkey[lower(pubkey)] = row;
+        for (const auto &label: labels) {
+          out->rows_by_label[label].push_back(row);
+        }
+        out->indexes.push_back(index);
+        out->pubkeys.push_back(std::move(pubkey));
+        out->labels.push_back(std::move(labels));
+      }
+      return out;
+    }
+
+    const std::shared_ptr<const Identities> &identities() const {
+      return identities_;
+    }
+
+    void set(uint32_t row, const Validator &v) {
+      Row &r = rows_.at(row);
+      r.effective_balance = v.consensus_effective_balance;
+      r.activation_epoch = v.consensus_activation_epoch;
+      r.duties_slot = v.duties_slot;
+      r.ideal_consensus_reward = v.ideal_consensus_reward;
+      r.actual_consensus_reward = v.actual_consensus_reward;
+      r.status = status_id(v.consensus_status);
+      r.type = v.consensus_type;
+      r.flags = 0;
+      for (int field = 0; field < kFieldCount; field++) {
+        if (is_flag(static_cast<Field>(field)) && flag(v, static_cast<Field>(field))) {
+          r.flags |= uint32_t(1) << field;
+        }
+      }
+      r.streak = v.history.live.streak();
+      r.missed = v.history.live.missed(kHistoryEpochs);
+    }
+
+    uint64_t slot() const {
+      return slot_;
+    }
+
+    std::size_t size() const {
+      return rows_.size();
+    }
+
+    std::optional<uint32_t> find_index(uint64_t index) const {
+      const auto &indexes = identities_->indexes;
+      auto it = std::lower_bound(indexes.begin(), indexes.end(), index);
+      if (it == indexes.end() || *it != index) {
+        return std::nullopt;
+      }
+      return static_cast<uint32_t>(it - indexes.begin());
+    }
+
+    std::optional<uint32_t> find_pubkey(const std::string &pubkey) const {
+      auto it = identities_->rows_by_pubkey.find(lower(pubkey));
+      if (it == identities_->rows_by_pubkey.end()) {
+        return std::nullopt;
+      }
+      return it->second;
+    }
+
+    std::map<std::string, std::size_t> label_counts() const {
+      std::map<std::string, std::size_t> counts;
+      for (const auto &[label, rows]: identities_->rows_by_label) {
+        counts[label] = rows.size();
+      }
+      return counts;
+    }
+
+    // Rows of a label (all rows without label) matching the status and
+    // boolean filters, in index order: the total number of matches and
+    // the rows of the requested page.
+    std::pair<std::size_t, std::vector<uint32_t>> select(const std::optional<std::string> &label,
+                                                         const std::optional<std::string> &status,
+                                                         const std::vector<std::pair<Field, bool>> &flags,
+                                                         std::size_t offset, std::size_t limit) const {
+      std::vector<uint32_t> page;
+      std::size_t total = 0;
+
+      std::optional<uint8_t> status_filter;
+      if (status) {
+        auto it = std::find(statuses_.begin(), statuses_.end(), *status);
+        if (it == statuses_.end()) {
+          return {total, std::move(page)};
+        }
+        status_filter = it - statuses_.begin();
+      }
+      uint32_t mask = 0, expected = 0;
+      for (const auto &[field, value]: flags) {
+        mask |= uint32_t(1) << field;
+        expected = value ? (expected | uint32_t(1) << field) : (expected & ~(uint32_t(1) << field));
+      }
+
+      auto visit = [&](uint32_t row) {
+        const Row &r = rows_[row];
+        if ((status_filter && r.status != *status_filter) || (r.flags & mask) != expected) {
+          return;
+        }
+        if (total >= offset && page.size() < limit) {
+          page.push_back(row);
+        }
+        total++;
+      };
+
+      if (label) {
+        auto it = identities_->rows_by_label.find(*label);
+        if (it != identities_->rows_by_label.end()) {
+          for (uint32_t row: it->second) {
+            visit(row);
+          }
+        }
+      } else {
+        for (uint32_t row = 0; row < rows_.size(); row++) {
+          visit(row);
+        }
+      }
+      return {total, std::move(page)};
+    }
+
+    py::dict row(uint32_t row, const std::vector<Field> &fields) const {
+      const Row &r = rows_.at(row);
+      py::dict out;
+      for (Field field: fields) {
+        const char *name = kFieldNames[field];
+        switch (field) {
+        case kIndex: out[name] = identities_->indexes[row]; break;
+        case kPubkey: out[name] = identities_->pubkeys[row]; break;
+        case kLabels: out[name] = identities_->labels[row]; break;
+        case kStatus: out[name] = statuses_[r.status]; break;
+        case kType: out[name] = r.type; break;
+        case kEffectiveBalance: out[name] = r.effective_balance; break;
+        case kActivationEpoch: out[name] = r.activation_epoch; break;
+        case kIdealConsensusReward: out[name] = r.ideal_consensus_reward; break;
+        case kActualConsensusReward: out[name] = r.actual_consensus_reward; break;
+        case kDutiesSlot: out[name] = r.duties_slot; break;
+        case kMissedAttestationsStreak: out[name] = r.streak; break;
+        case kMissedAttestationsHistory: out[name] = r.missed; break;
+        default: out[name] = bool(r.flags & (uint32_t(1) << field)); break;
+        }
+      }
+      return out;
+    }
+
+    static bool is_flag(Field field) {
+      return field == kSlashed || (field >= kMissedAttestation && field <= kSuboptimalHead) || field == kDutiesPerformedAtSlot;
+    }
+
+  private:
+    static bool flag(const Validator &v, Field field) {
+      switch (field) {
+      case kSlashed: return v.consensus_slashed;
+      case kMissedAttestation: return v.missed_attestation;
+      case kPreviousMissedAttestation: return v.previous_missed_attestation;
+      case kSuboptimalSource: return v.suboptimal_source;
+      case kSuboptimalTarget: return v.suboptimal_target;
+      case kSuboptimalHead: return v.suboptimal_head;
+      case kDutiesPerformedAtSlot: return v.duties_performed_at_slot;
+      default: return false;
+      }
+    }
+
+    static std::string lower(std::string value) {
+      std::transform(value.begin(), value.end(), value.begin(), [](unsigned char c) { return std::tolower(c); });
+      return value;
+    }
+
+    // Statuses are a handful of strings, rows only hold their id.
+    uint8_t status_id(const std::string &status) {
+      for (std::size_t i = 0; i < statuses_.size(); i++) {
+        if (statuses_[i] == status) {
+          return i;
+        }
+      }
+      if (statuses_.size() == 255) {
+        throw std::length_error("too many validator statuses");
+      }
+      statuses_.push_back(status);
+      return statuses_.size() - 1;
+    }
+
+    std::shared_ptr<const Identities> identities_;
+    std::vector<Row> rows_;
+    std::vector<std::string> statuses_;
+    uint64_t slot_;
+  };
+
+  RegistryView::Field field_by_name(const std::string &name, bool flag) {
+    for (int field = 0; field < RegistryView::kFieldCount; field++) {
+      if (name == RegistryView::kFieldNames[field]) {
+        if (flag && !RegistryView::is_flag(static_cast<RegistryView::Field>(field))) {
+          break;
+        }
+        return static_cast<RegistryView::Field>(field);
+      }
+    }
+    throw py::value_error("unknown field: " + name);
+  }
+
 } // anonymous namespace
 
 PYBIND11_MODULE(eth_validator_watcher_ext, m) {
 
+  m.attr("HISTORY_EPOCHS") = kHistoryEpochs;
+  m.attr("TOP_OFFENDERS") = kTopOffenders;
+  m.attr("REWARD_RATE_BUCKETS") = kRewardRateBounds;
+  m.attr("DUTIES_RATE_BUCKETS") = kDutiesRateBounds;
+  m.attr("EFFECTIVE_BALANCE_BUCKETS") = kEffectiveBalanceBounds;
+
+  py::class_<EpochBits>(m, "EpochBits")
+    .def(py::init<>())
+    .def_readonly("last", &EpochBits::last)
+    .def_readonly("known", &EpochBits::known)
+    .def_readonly("ok", &EpochBits::ok)
+    .def("missed", &EpochBits::missed)
+    .def("recorded", &EpochBits::recorded)
+    .def("streak", &EpochBits::streak);
+
+  py::class_<ValidatorHistory>(m, "ValidatorHistory")
+    .def(py::init<>())
+    .def_readonly("live", &ValidatorHistory::live)
+    .def_readonly("source", &ValidatorHistory::source)
+    .def_readonly("target", &ValidatorHistory::target)
+    .def_readonly("head", &ValidatorHistory::head)
+    .def_readonly("duties", &ValidatorHistory::duties)
+    .def("missed_rewards", &ValidatorHistory::missed_rewards);
+
   py::class_<Validator>(m, "Validator")
     .def(py::init<>())
     .def_readwrite("labels", &Validator::labels)
@@ -270,7 +1968,32 @@ PYBIND11_MODULE(eth_validator_watcher_ext, m) {
     .def_readwrite("consensus_status", &Validator::consensus_status)
     .def_readwrite("consensus_activation_epoch", &Validator::consensus_activation_epoch)
     .def_readwrite("consensus_type", &Validator::consensus_type)
-    .def_readwrite("weight", &Validator::weight);
+    .def_readwrite("weight", &Validator::weight)
+    .def_readwrite("history", &Validator::history)
+    .def("record_liveness", [](Validator &v, uint64_t epoch, bool is_live) {
+      v.history.record_liveness(epoch, is_live);
+    })
+    .def("record_rewards", [](Validator &v, uint64_t epoch, bool source_ok, bool target_ok, bool head_ok, int64_t delta) {
+      v.history.record_rewards(epoch, source_ok, target_ok, head_ok, delta);
+    })
+    .def("record_duty", [](Validator &v, uint64_t slot, bool performed) {
+      v.history.record_duty(slot, performed);
+    });
+
+  py::class_<Offender>(m, "Offender")
+    .def(py::init<>())
+    .def_readonly("index", &Offender::index)
+    .def_readonly("pubkey", &Offender::pubkey)
+    .def_readonly("missed_attestation", &Offender::missed_attestation)
+    .def_readonly("streak", &Offender::streak)
+    .def_readonly("lost_rewards", &Offender::lost_rewards)
+    .def_readonly("weight", &Offender::weight);
+
+  py::class_<Distribution>(m, "Distribution")
+    .def(py::init<>())
+    .def_readonly("buckets", &Distribution::buckets)
+    .def_readonly("count", &Distribution::count)
+    .def_readonly("sum", &Distribution::sum);
 
   py::class_<MetricsByLabel>(m, "MetricsByLabel")
     .def(py::init<>())
@@ -298,6 +2021,11 @@ PYBIND11_MODULE(eth_validator_watcher_ext, m) {
     .def_readwrite("missed_attestations_scaled_count", &MetricsByLabel::missed_attestations_scaled_count)
     .def_readwrite("missed_consecutive_attestations_count", &MetricsByLabel::missed_consecutive_attestations_count)
     .def_readwrite("missed_consecutive_attestations_scaled_count", &MetricsByLabel::missed_consecutive_attestations_scaled_count)
+    .def_readwrite("missed_attestations_window_count", &MetricsByLabel::missed_attestations_window_count)
+    .def_readwrite("missed_attestations_window_scaled_count", &MetricsByLabel::missed_attestations_window_scaled_count)
+    .def_readwrite("missed_attestations_streak_max", &MetricsByLabel::missed_attestations_streak_max)
+    .def_readwrite("missed_duties_window", &MetricsByLabel::missed_duties_window)
+    .def_readwrite("missed_consensus_rewards_window", &MetricsByLabel::missed_consensus_rewards_window)
     .def_readwrite("proposed_blocks", &MetricsByLabel::proposed_blocks)
     .def_readwrite("missed_blocks", &MetricsByLabel::missed_blocks)
     .def_readwrite("proposed_blocks_finalized", &MetricsByLabel::proposed_blocks_finalized)
@@ -307,35 +2035,167 @@ PYBIND11_MODULE(eth_validator_watcher_ext, m) {
     .def_readwrite("details_missed_blocks", &MetricsByLabel::details_missed_blocks)
     .def_readwrite("details_missed_blocks_finalized", &MetricsByLabel::details_missed_blocks_finalized)
     .def_readwrite("details_future_blocks", &MetricsByLabel::details_future_blocks)
-    .def_readwrite("details_missed_attestations", &MetricsByLabel::details_missed_attestations);
+    .def_readwrite("details_missed_attestations", &MetricsByLabel::details_missed_attestations)
+    .def_readwrite("reward_rate_distribution", &MetricsByLabel::reward_rate_distribution)
+    .def_readwrite("duties_rate_distribution", &MetricsByLabel::duties_rate_distribution)
+    .def_readwrite("effective_balance_distribution", &MetricsByLabel::effective_balance_distribution)
+    .def_readwrite("top_offenders", &MetricsByLabel::top_offenders);
     
-  m.def("fast_compute_validator_metrics", [](const py::dict& pyvals, uint64_t slot) {
+  py::class_<PubkeyIndex>(m, "PubkeyIndex")
+    .def(py::init<>())
+    .def("__setitem__", [](PubkeyIndex &self, const py::handle &pubkey, uint64_t index) {
+      uint8_t key[kPubkeySize];
+      if (!parse_pubkey(pubkey, key)) {
+        throw py::value_error("invalid public key");
+      }
+      self.set(key, index);
+    })
+    .def("get", [](const PubkeyIndex &self, const py::handle &pubkey) -> std::optional<uint64_t> {
+      uint8_t key[kPubkeySize];
+      if (!parse_pubkey(pubkey, key)) {
+        return std::nullopt;
+      }
+      return self.get(key);
+    })
+    .def("get_many", [](const PubkeyIndex &self, const py::list &pubkeys) {
+      py::list out(pubkeys.size());
+      uint8_t key[kPubkeySize];
+      for (std::size_t i = 0; i < pubkeys.size(); i++) {
+        std::optional<uint64_t> index;
+        if (parse_pubkey(pubkeys[i], key)) {
+          index = self.get(key);
+        }
+        out[i] = index ? py::cast(*index) : py::none();
+      }
+      return out;
+    })
+    .def("__contains__", [](const PubkeyIndex &self, const py::handle &pubkey) {
+      uint8_t key[kPubkeySize];
+      return parse_pubkey(pubkey, key) && self.get(key).has_value();
+    })
+    .def("get_pubkey", [](const PubkeyIndex &self, uint64_t index) -> std::optional<py::bytes> {
+      const uint8_t *key = self.get_pubkey(index);
+      if (!key) {
+        return std::nullopt;
+      }
+      return py::bytes(reinterpret_cast<const char *>(key), kPubkeySize);
+    })
+    .def("reserve", &PubkeyIndex::reserve)
+    .def("__len__", &PubkeyIndex::size)
+    .def("memory_usage", &PubkeyIndex::memory_usage)
+    .def("dump", [](const PubkeyIndex &self) {
+      return py::bytes(self.dump());
+    })
+    .def("load", [](PubkeyIndex &self, const std::string &data) {
+      if (!self.load(data)) {
+        throw py::value_error("invalid public key index data");
+      }
+    });
+
+  py::class_<NetworkRegistry>(m, "NetworkRegistry")
+    .def(py::init<uint64_t, uint64_t>(), py::arg("shard_index") = 0, py::arg("shard_count") = 1)
+    .def("update", &NetworkRegistry::update)
+    .def("__contains__", &NetworkRegistry::contains)
+    .def("is_watched", &NetworkRegistry::is_watched)
+    .def("set_watched", &NetworkRegistry::set_watched)
+    .def("process_liveness", &NetworkRegistry::process_liveness)
+    .def("process_rewards", &NetworkRegistry::process_rewards)
+    .def("process_duties", &NetworkRegistry::process_duties)
+    .def("process_block", &NetworkRegistry::process_block)
+    .def("process_block_finalized", &NetworkRegistry::process_block_finalized)
+    .def("process_future_block", &NetworkRegistry::process_future_block)
+    .def("reset_blocks", &NetworkRegistry::reset_blocks)
+    .def("get", [](const NetworkRegistry &self, uint64_t index) {
+      auto v = self.get(index);
+      if (!v) {
+        throw py::key_error(std::to_string(index));
+      }
+      return *v;
+    })
+    .def("set", &NetworkRegistry::set)
+    .def("compute", [](const NetworkRegistry &self, uint64_t slot, const std::vector<std::string> &labels) {
+      std::map<std::string, MetricsByLabel> metrics;
+      {
+        py::gil_scoped_release release;
+        // Merging a single partial fills the duties rate.
+        merge({self.compute(slot, labels)}, &metrics);
+      }
+      py::dict pymetrics;
+      for (const auto& [label, metric]: metrics) {
+        pymetrics[py::str(label)] = metric;
+      }
+      return pymetrics;
+    })
+    .def("indexes", &NetworkRegistry::indexes)
+    .def("__iter__", [](const NetworkRegistry &self) {
+      return py::iter(py::cast(self.indexes()));
+    })
+    .def("reserve", &NetworkRegistry::reserve)
+    .def("__len__", &NetworkRegistry::size)
+    .def("memory_usage", &NetworkRegistry::memory_usage)
+    .def("dump", [](const NetworkRegistry &self) {
+      return py::bytes(self.dump());
+    })
+    .def("load", [](NetworkRegistry &self, const std::string &data) {
+      if (!self.load(data)) {
+        throw py::value_error("invalid network registry data");
+      }
+    })
+    .def("dump_history", [](const NetworkRegistry &self) {
+      return py::bytes(self.dump_history());
+    })
+    .def("load_history", [](NetworkRegistry &self, const std::string &data) {
+      if (!self.load_history(data)) {
+        throw py::value_error("invalid validator history data");
+      }
+    });
+
+  m.def("serialize_validator_metrics", [](const std::map<std::string, MetricsByLabel> &metrics) {
+    return py::bytes(serialize(metrics));
+  });
+
+  m.def("deserialize_validator_metrics", [](const std::string &data) {
+    py::dict pymetrics;
+    for (const auto& [label, metric]: deserialize(data)) {
+      pymetrics[py::str(label)] = metric;
+    }
+    return pymetrics;
+  });
+
+  m.def("merge_validator_metrics", [](const std::vector<std::map<std::string, MetricsByLabel>> &partials) {
+    std::map<std::string, MetricsByLabel> metrics;
+    merge(partials, &metrics);
+
+    py::dict pymetrics;
+    for (const auto& [label, metric]: metrics) {
+      pymetrics[py::str(label)] = metric;
+    }
+    return pymetrics;
+  });
+
+  m.def("fast_compute_validator_metrics", [](const py::dict& pyvals, uint64_t slot, uint64_t window_epochs, uint64_t missed_threshold) {
     std::vector<Validator> vals;
     vals.reserve(pyvals.size());
     for (auto& pyval: pyvals) {
       vals.push_back(pyval.second.attr("_v").cast<Validator>());
     }
 
-    auto n = std::thread::hardware_concurrency();
+    const HistoryWindow window{std::min(window_epochs, kHistoryEpochs), std::max<uint64_t>(missed_threshold, 1)};
+
+    auto& pool = WorkerPool::get();
+    auto n = pool.size();
 
     std::size_t chunk = (vals.size() / n) + 1;
-    std::vector<std::thread> threads;
     std::vector<std::map<std::string, MetricsByLabel>> thread_metrics(n);
     std::map<std::string, MetricsByLabel> metrics;
 
     {
       py::gil_scoped_release release;
-      for (size_t i = 0; i < n; i++) {
-        threads.push_back(std::thread([slot, i, chunk, &vals, &thread_metrics] {
-            std::size_t from = i * chunk;
-            std::size_t to = std::min(from + chunk, vals.size());
-            process(slot, from, to, vals, thread_metrics[i]);
-        }));
-      }
-
-      for (auto& thread: threads) {
-        thread.join();
-      }
+      pool.run(n, [slot, &window, chunk, &vals, &thread_metrics](std::size_t i) {
+          std::size_t from = std::min(i * chunk, vals.size());
+          std::size_t to = std::min(from + chunk, vals.size());
+          process(slot, window, from, to, vals, thread_metrics[i]);
+      });
 
       merge(thread_metrics, &metrics);
     }
@@ -346,5 +2206,97 @@ PYBIND11_MODULE(eth_validator_watcher_ext, m) {
     }
 
     return pymetrics;
+  }, py::arg("validators"), py::arg("slot"), py::arg("window_epochs") = HistoryWindow().epochs, py::arg("missed_threshold") = HistoryWindow().threshold);
+
+  py::class_<RegistryView, std::shared_ptr<RegistryView>>(m, "RegistryView")
+    .def(py::init([](const py::dict& pyvals, uint64_t slot) {
+      std::vector<std::tuple<uint64_t, std::string, std::vector<std::string>>> vals;
+      std::vector<const Validator *> states;
+      vals.reserve(pyvals.size());
+      states.reserve(pyvals.size());
+      for (auto& pyval: pyvals) {
+        const Validator &v = pyval.second.attr("_v").cast<const Validator&>();
+        vals.emplace_back(pyval.first.cast<uint64_t>(), v.consensus_pubkey, v.labels);
+        states.push_back(&v);
+      }
+      std::vector<uint32_t> rows;
+      auto view = std::make_shared<RegistryView>(RegistryView::identities(std::move(vals), &rows), slot);
+      for (std::size_t i = 0; i < states.size(); i++) {
+        view->set(rows[i], *states[i]);
+      }
+      return view;
+    }))
+    // Same validators with their current state, only valid as long as
+    // the watched validators and their labels didn't change.
+    .def("update", [](const RegistryView &self, const py::dict& pyvals, uint64_t slot) {
+      auto view = std::make_shared<RegistryView>(self.identities(), slot);
+      if (pyvals.size() != view->size()) {
+        throw py::value_error("watched validators changed");
+      }
+      for (auto& pyval: pyvals) {
+        auto row = view->find_index(pyval.first.cast<uint64_t>());
+        if (!row) {
+          throw py::value_error("watched validators changed");
+        }
+        view->set(*row, pyval.second.attr("_v").cast<const Validator&>());
+      }
+      return view;
+    })
+    .def_property_readonly("slot", &RegistryView::slot)
+    .def("__len__", &RegistryView::size)
+    .def_static("fields", []() {
+      return std::vector<std::string>(RegistryView::kFieldNames, RegistryView::kFieldNames + RegistryView::kFieldCount);
+    })
+    .def_static("flags", []() {
+      std::vector<std::string> flags;
+      for (int field = 0; field < RegistryView::kFieldCount; field++) {
+        if (RegistryView::is_flag(static_cast<RegistryView::Field>(field))) {
+          flags.push_back(RegistryView::kFieldNames[field]);
+        }
+      }
+      return flags;
+    })
+    .def("find_index", &RegistryView::find_index)
+    .def("find_pubkey", &RegistryView::find_pubkey)
+    .def("label_counts", &RegistryView::label_counts)
+    .def("select", [](const RegistryView &self, std::optional<std::string> label, std::optional<std::string> status,
+                      const std::map<std::string, bool> &flags, std::size_t offset, std::size_t limit) {
+      std::vector<std::pair<RegistryView::Field, bool>> fields;
+      for (const auto &[name, expected]: flags) {
+        fields.emplace_back(field_by_name(name, true), expected);
+      }
+      py::gil_scoped_release release;
+      return self.select(label, status, fields, offset, limit);
+    }, py::arg("label") = py::none(), py::arg("status") = py::none(), py::arg("flags") = std::map<std::string, bool>(),
+       py::arg("offset") = 0, py::arg("limit") = 100)
+    .def("row", [](const RegistryView &self, uint32_t row, const std::vector<std::string> &names) {
+      std::vector<RegistryView::Field> fields;
+      for (const auto &name: names) {
+        fields.push_back(field_by_name(name, false));
+      }
+      return self.row(row, fields);
+    });
+
+  m.def("validator_columns", [](const py::dict& pyvals) {
+    ValidatorColumns columns(pyvals.size());
+    std::size_t i = 0;
+    for (auto& pyval: pyvals) {
+      columns.set(i++, pyval.first.cast<uint64_t>(), pyval.second.attr("_v").cast<const Validator&>());
+    }
+    return columns.to_python();
+  });
+
+  m.def("native_worker_count", []() {
+    return WorkerPool::get().size();
+  });
+
+  m.def("native_worker_stats", []() {
+    auto &pool = WorkerPool::get();
+    py::dict stats;
+    stats["workers"] = pool.size();
+    stats["busy"] = pool.busy();
+    stats["queued"] = pool.queued();
+    stats["completed"] = pool.completed();
+    return stats;
   });
 }
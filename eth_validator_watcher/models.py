@@ -1,6 +1,7 @@
 """Pydantic models for Ethereum validator watcher data structures."""
 
 from enum import StrEnum
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -85,6 +86,7 @@ class Header(BaseModel):
         class Header(BaseModel):
             class Message(BaseModel):
                 slot: int
+                parent_root: Optional[str] = None
 
             message: Message
 
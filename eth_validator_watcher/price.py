@@ -0,0 +1,226 @@
+"""Background refresh of the ETH/USD price.
+
+The price is only informative, it must never delay the processing of
+slots: it is refreshed by a background thread and the last known value
+is served instantly, along with its age.
+"""
+
+import logging
+import threading
+import time
+
+from typing import Optional, Protocol
+
+from requests import Session
+
+
+# Delay between two refreshes of the price.
+PRICE_REFRESH_INTERVAL_SEC = 600
+
+# Delay before retrying after a failed refresh.
+PRICE_RETRY_INTERVAL_SEC = 60
+
+# Timeout of the requests to the price source.
+PRICE_TIMEOUT_SEC = 10
+
+_fetcher: Optional['PriceFetcher'] = None
+_fetcher_lock = threading.Lock()
+
+
+class PriceSource(Protocol):
+    """Source of the ETH/USD price."""
+
+    def fetch(self, session: Session, timeout_sec: float) -> float:
+        """Fetch the current price.
+
+        Args:
+            session: Session
+                HTTP session to use.
+            timeout_sec: float
+                Timeout of the HTTP requests, in seconds.
+
+        Returns:
+            float
+                The current ETH price in USD.
+        """
+        ...
+
+
+class StaticPriceSource:
+    """Price source always returning the same price, for tests.
+
+    Args:
+        price: float
+            Price to return.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, price: float) -> None:
+        self.price = price
+
+    def fetch(self, session: Session, timeout_sec: float) -> float:
+        return self.price
+
+
+class PriceFetcher:
+    """Refresh the price from a source in a background thread.
+
+    Args:
+        source: PriceSource
+            Where to fetch the price from.
+        interval_sec: float
+            Delay between two refreshes.
+        retry_interval_sec: float
+            Delay before retrying after a failed refresh.
+        timeout_sec: float
+            Timeout of the requests to the source.
+
+    Returns:
+        None
+    """
+
+    def __init__(
+            self,
+            source: PriceSource,
+            interval_sec: float = PRICE_REFRESH_INTERVAL_SEC,
+            retry_interval_sec: float = PRICE_RETRY_INTERVAL_SEC,
+            timeout_sec: float = PRICE_TIMEOUT_SEC,
+    ) -> None:
+        self._source = source
+        self._interval_sec = interval_sec
+        self._retry_interval_sec = retry_interval_sec
+        self._timeout_sec = timeout_sec
+        self._session = Session()
+        self._price = 0.0
+        self._updated_at: Optional[float] = None
+        self._refreshed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'PriceFetcher':
+        """Start refreshing the price in the background.
+
+        Args:
+            None
+
+        Returns:
+            PriceFetcher
+                This fetcher.
+        """
+        self._thread = threading.Thread(target=self._run, name='price', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the background refresh.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def get(self) -> float:
+        """Get the last known price, never blocks.
+
+        Args:
+            None
+
+        Returns:
+            float
+                The last known ETH price in USD, or 0.0 if it was
+                never fetched.
+        """
+        return self._price
+
+    def age(self) -> Optional[float]:
+        """Get the age of the last known price.
+
+        Args:
+            None
+
+        Returns:
+            Optional[float]
+                Seconds since the price was fetched, or None if it was
+                never fetched.
+        """
+        if self._updated_at is None:
+            return None
+        return time.monotonic() - self._updated_at
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the first refresh attempt.
+
+        Args:
+            timeout: Optional[float]
+                Maximum time to wait, in seconds.
+
+        Returns:
+            bool
+                True if a refresh was attempted.
+        """
+        return self._refreshed.wait(timeout)
+
+    def refresh(self) -> bool:
+        """Fetch the price from the source.
+
+        Args:
+            None
+
+        Returns:
+            bool
+                True if the price was updated.
+        """
+        try:
+            price = self._source.fetch(self._session, self._timeout_sec)
+        except Exception as e:
+            # This feature is totally optional, we keep serving the
+            # last known price.
+            logging.warning(f'💸 Unable to fetch the ETH price: {e}')
+            return False
+        finally:
+            self._refreshed.set()
+
+        self._price = price
+        self._updated_at = time.monotonic()
+        return True
+
+    def _run(self) -> None:
+        """Refresh the price until stopped.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        while not self._stopped.is_set():
+            delay = self._interval_sec if self.refresh() else self._retry_interval_sec
+            self._stopped.wait(delay)
+
+
+def get_price_fetcher() -> PriceFetcher:
+    """Get the price fetcher of the process, started on first use.
+
+    Args:
+        None
+
+    Returns:
+        PriceFetcher
+            The Coinbase price fetcher.
+    """
+    global _fetcher
+
+    with _fetcher_lock:
+        if _fetcher is None:
+            # Price fetching is optional, only import it when needed.
+            from .coinbase import CoinbasePriceSource
+
+            _fetcher = PriceFetcher(CoinbasePriceSource()).start()
+        return _fetcher
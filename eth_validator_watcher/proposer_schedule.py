@@ -1,24 +1,44 @@
 """This module contains facilities to keep track of which validator proposes blocks.
 """
 
+import logging
+
+from array import array
+from typing import Optional
 
 from .beacon import Beacon
-from .models import Spec
+from .models import Header, ProposerDuties, Spec
+
+
+# Slots without a known proposer.
+_UNKNOWN = -1
 
 
 class ProposerSchedule:
     """Helper class to keep track of which validator proposes blocks.
 
     We need to keep track of all slots since the last finalization and
-    up to the end of the next epoch.
+    up to the end of the next epoch. Proposers are kept in one array
+    per epoch along with the dependent root of its duties: the block
+    root at the last slot of the previous epoch. The first block of an
+    epoch has this root as parent unless a reorg changed the chain, in
+    which case the duties of the epoch are fetched again.
     """
 
     def __init__(self, spec: Spec):
         self._spec = spec
         self._last_slot = None
-        self._schedule = dict()
+        self._proposers: dict[int, array] = {}
+        self._dependent_roots: dict[int, Optional[str]] = {}
+        self._cutoff = -1
+
+        # Slot from which blocks were observed, and slot of the last
+        # observed block: tells whether a block is the first of its
+        # epoch.
+        self._observed_from: Optional[int] = None
+        self._last_block_slot: Optional[int] = None
 
-    def get_proposer(self, slot: int) -> int:
+    def get_proposer(self, slot: int) -> Optional[int]:
         """Get the proposer for a slot.
 
         Args:
@@ -28,7 +48,11 @@ class ProposerSchedule:
         Returns:
             int: The validator index of the proposer, or None if not found.
         """
-        return self._schedule.get(slot, None)
+        proposers = self._proposers.get(self.epoch(slot))
+        if proposers is None or slot <= self._cutoff:
+            return None
+        proposer = proposers[slot % self._spec.data.SLOTS_PER_EPOCH]
+        return None if proposer == _UNKNOWN else proposer
 
     def get_future_proposals(self, slot: int) -> dict[int, int]:
         """Get all future proposals after the given slot.
@@ -40,7 +64,57 @@ class ProposerSchedule:
         Returns:
             dict[int, int]: A dictionary mapping slots to validator indices.
         """
-        return {k: v for k, v in self._schedule.items() if k > slot}
+        slots_per_epoch = self._spec.data.SLOTS_PER_EPOCH
+        proposals = {}
+        for epoch in sorted(e for e in self._proposers if e >= self.epoch(slot)):
+            start = max(slot + 1 - epoch * slots_per_epoch, 0)
+            for offset, proposer in enumerate(self._proposers[epoch][start:], epoch * slots_per_epoch + start):
+                if proposer != _UNKNOWN:
+                    proposals[offset] = proposer
+        return proposals
+
+    def get_schedule(self) -> dict[int, int]:
+        """Get the whole known schedule.
+
+        Args:
+            None
+
+        Returns:
+            dict[int, int]: A dictionary mapping slots to validator indices.
+        """
+        return self.get_future_proposals(self._cutoff)
+
+    def get_dependent_roots(self) -> dict[int, str]:
+        """Get the dependent roots of the known epochs.
+
+        Args:
+            None
+
+        Returns:
+            dict[int, str]: A dictionary mapping epochs to dependent roots.
+        """
+        return {epoch: root for epoch, root in self._dependent_roots.items() if root is not None}
+
+    def load(self, schedule: dict[int, int], dependent_roots: Optional[dict[int, str]] = None) -> None:
+        """Load a previously saved schedule, i.e: from a snapshot.
+
+        Epochs without a dependent root adopt the parent of their first
+        observed block.
+
+        Args:
+            schedule: dict[int, int]
+                A dictionary mapping slots to validator indices.
+            dependent_roots: Optional[dict[int, str]]
+                A dictionary mapping epochs to dependent roots.
+
+        Returns:
+            None
+        """
+        for slot, proposer in schedule.items():
+            self._epoch_proposers(self.epoch(slot))[slot % self._spec.data.SLOTS_PER_EPOCH] = proposer
+        for epoch, root in (dependent_roots or {}).items():
+            if epoch in self._proposers:
+                self._dependent_roots[epoch] = root
 
     def epoch(self, slot: int) -> int:
         """Convert a slot to its epoch.
@@ -57,7 +131,7 @@ class ProposerSchedule:
     def update(self, beacon: Beacon, slot: int) -> None:
         """Update the proposer schedules.
 
-        Updates both the head and finalized proposer schedules.
+        Fetches the duties of the current and next epochs if unknown.
 
         Args:
             beacon: Beacon
@@ -68,21 +142,53 @@ class ProposerSchedule:
         Returns:
             None
         """
-        # Current slots & future proposals.
-
         # There is a case to handle here: on the very first slot of an
         # epoch, some beacons will return 404 and will only expose the
-        # schedule on the next slot.
+        # schedule on the next slot, this is handled by the beacon
+        # client which retries on 404.
+        epoch = self.epoch(slot)
+        for e in (epoch, epoch + 1):
+            if e not in self._proposers:
+                self._set_duties(e, beacon.get_proposer_duties(e))
+
+    def process_header(self, beacon: Beacon, slot: int, header: Optional[Header]) -> None:
+        """Check the dependent root of the epoch against the block of a slot.
+
+        The first block of an epoch has the dependent root of the
+        epoch as parent, the duties are fetched again if it changed.
+
+        Args:
+            beacon: Beacon
+                The beacon client to fetch data from.
+            slot: int
+                The slot of the header.
+            header: Optional[Header]
+                The block header at this slot, None if the slot was
+                missed.
+
+        Returns:
+            None
+        """
+        if self._observed_from is None:
+            self._observed_from = slot
+        if header is None:
+            return
 
         epoch = self.epoch(slot)
-        if slot not in self._schedule:
-            duties = beacon.get_proposer_duties(epoch)
-            for duty in duties.data:
-                self._schedule[duty.slot] = duty.validator_index
-        if (slot + self._spec.data.SLOTS_PER_EPOCH) not in self._schedule:
-            duties = beacon.get_proposer_duties(epoch + 1)
-            for duty in duties.data:
-                self._schedule[duty.slot] = duty.validator_index
+        epoch_start = epoch * self._spec.data.SLOTS_PER_EPOCH
+        first_of_epoch = self._observed_from <= epoch_start and (self._last_block_slot is None or self._last_block_slot < epoch_start)
+        self._last_block_slot = slot
+
+        parent_root = header.data.header.message.parent_root
+        if not first_of_epoch or epoch not in self._proposers or parent_root is None:
+            return
+
+        dependent_root = self._dependent_roots.get(epoch)
+        if dependent_root is None:
+            self._dependent_roots[epoch] = parent_root
+        elif dependent_root != parent_root:
+            logging.info(f'🔀 Dependent root of epoch {epoch} changed, fetching proposer duties again')
+            self._set_duties(epoch, beacon.get_proposer_duties(epoch))
 
     def clear(self, cutoff: int) -> None:
         """Clear old slots from the schedules.
@@ -94,4 +200,41 @@ class ProposerSchedule:
         Returns:
             None
         """
-        self._schedule = {k: v for k, v in self._schedule.items() if k > cutoff}
+        self._cutoff = max(self._cutoff, cutoff)
+        for epoch in [e for e in self._proposers if e < self.epoch(cutoff + 1)]:
+            del self._proposers[epoch]
+            del self._dependent_roots[epoch]
+
+    def _epoch_proposers(self, epoch: int) -> array:
+        """Get the proposers array of an epoch, created if needed.
+
+        Args:
+            epoch: int
+                The epoch.
+
+        Returns:
+            array: Proposer of each slot of the epoch.
+        """
+        proposers = self._proposers.get(epoch)
+        if proposers is None:
+            proposers = array('q', [_UNKNOWN]) * self._spec.data.SLOTS_PER_EPOCH
+            self._proposers[epoch] = proposers
+            self._dependent_roots[epoch] = None
+        return proposers
+
+    def _set_duties(self, epoch: int, duties: ProposerDuties) -> None:
+        """Replace the proposers of an epoch.
+
+        Args:
+            epoch: int
+                The epoch of the duties.
+            duties: ProposerDuties
+                Proposer duties returned by the beacon.
+
+        Returns:
+            None
+        """
+        proposers = self._epoch_proposers(epoch)
+        for duty in duties.data:
+            proposers[duty.slot % self._spec.data.SLOTS_PER_EPOCH] = duty.validator_index
+        self._dependent_roots[epoch] = duties.dependent_root
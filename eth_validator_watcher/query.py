@@ -0,0 +1,415 @@
+"""Read-only HTTP/JSON query API over the watched validators.
+
+The processing loop publishes a view of the watched validators at the
+end of every slot: a native copy of the registry indexed by validator
+index, public key and label. Queries are answered from the last
+published view, with the GIL released while filtering, so they never
+wait for the slot being processed and always see a consistent slot.
+
+- `/v1/validators/{index or pubkey}`: a single validator,
+- `/v1/validators?label=operator:kiln&missed_attestation=true`:
+  validators of a label (all watched validators without label),
+  filtered by status and boolean fields, in index order, with
+  `offset` and `limit` for paging,
+- `/v1/labels`: labels and their number of validators,
+- `/v1/offenders?label=operator:kiln`: worst validators of a label
+  (all watched validators without label), ranked by the native
+  aggregation of the slot: missed last attestation, then ongoing
+  missed attestations streak, then consensus rewards lost over the
+  history window, then stake.
+
+All routes accept `fields` (comma-separated) to select the returned
+fields and `network` when several networks run in the process.
+"""
+
+import json
+import logging
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
+
+from eth_validator_watcher_ext import Offender, RegistryView, TOP_OFFENDERS
+
+from .metrics import get_prometheus_metrics
+from .utils import LABEL_SCOPE_WATCHED
+
+
+QUERY_DEFAULT_LIMIT = 100
+QUERY_MAX_LIMIT = 1000
+
+QUERY_DEFAULT_FIELDS = (
+    'index', 'pubkey', 'labels', 'status', 'effective_balance', 'missed_attestation',
+    'duties_performed_at_slot', 'missed_attestations_streak',
+)
+
+# Parameters which are not boolean filters.
+_PARAMETERS = {'network', 'label', 'status', 'fields', 'offset', 'limit'}
+
+_views: dict[str, RegistryView] = {}
+_offenders: dict[str, dict[str, list[Offender]]] = {}
+_views_lock = threading.Lock()
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+class QueryError(Exception):
+    """Invalid query, reported to the client with a status code.
+
+    Args:
+        status: int
+            HTTP status of the response.
+        message: str
+            Description of the error.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def publish_view(network: str, view: RegistryView, offenders: Optional[dict[str, list[Offender]]] = None) -> None:
+    """Make a view the one queries of a network are answered from.
+
+    Args:
+        network: str
+            Network of the view.
+        view: RegistryView
+            View of the watched validators at the end of a slot.
+        offenders: Optional[dict[str, list[Offender]]]
+            Worst validators per label computed for the same slot.
+
+    Returns:
+        None
+    """
+    with _views_lock:
+        _views[network] = view
+        _offenders[network] = offenders or {}
+
+
+def get_view(network: Optional[str]) -> tuple[str, RegistryView]:
+    """Get the last view published for a network.
+
+    Args:
+        network: Optional[str]
+            Network to query, may be omitted if there is only one.
+
+    Returns:
+        tuple[str, RegistryView]
+            The network and its view.
+
+    Raises:
+        QueryError
+            If there is no such view yet.
+    """
+    network, view, _ = _get_published(network)
+    return network, view
+
+
+def _get_published(network: Optional[str]) -> tuple[str, RegistryView, dict[str, list[Offender]]]:
+    """Get the last view and offenders published for a network.
+
+    Args:
+        network: Optional[str]
+            Network to query, may be omitted if there is only one.
+
+    Returns:
+        tuple[str, RegistryView, dict[str, list[Offender]]]
+            The network, its view and the offenders of the same slot.
+
+    Raises:
+        QueryError
+            If there is no such view yet.
+    """
+    with _views_lock:
+        views = dict(_views)
+        offenders = dict(_offenders)
+
+    if network is None:
+        if len(views) != 1:
+            raise QueryError(400 if views else 503, 'network must be given' if views else 'no slot processed yet')
+        network = next(iter(views))
+
+    view = views.get(network)
+    if view is None:
+        raise QueryError(404, f'unknown network: {network}')
+    return network, view, offenders[network]
+
+
+def _parse_fields(params: dict[str, str]) -> list[str]:
+    """Get the fields requested by a query.
+
+    Args:
+        params: dict[str, str]
+            Query parameters.
+
+    Returns:
+        list[str]
+            Names of the fields to return.
+
+    Raises:
+        QueryError
+            If a field is unknown.
+    """
+    if 'fields' not in params:
+        return list(QUERY_DEFAULT_FIELDS)
+    fields = [field for field in params['fields'].split(',') if field]
+    unknown = set(fields) - set(RegistryView.fields())
+    if unknown:
+        raise QueryError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def _parse_int(params: dict[str, str], name: str, default: int, maximum: int) -> int:
+    """Get a bounded integer parameter.
+
+    Args:
+        params: dict[str, str]
+            Query parameters.
+        name: str
+            Name of the parameter.
+        default: int
+            Value if the parameter is missing.
+        maximum: int
+            Largest accepted value.
+
+    Returns:
+        int
+            The value.
+
+    Raises:
+        QueryError
+            If the value is not an integer within [0, maximum].
+    """
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        raise QueryError(400, f'{name} must be an integer')
+    if not 0 <= value <= maximum:
+        raise QueryError(400, f'{name} must be within [0, {maximum}]')
+    return value
+
+
+def _parse_flags(params: dict[str, str]) -> dict[str, bool]:
+    """Get the boolean filters of a query.
+
+    Args:
+        params: dict[str, str]
+            Query parameters.
+
+    Returns:
+        dict[str, bool]
+            Expected value of each filtered field.
+
+    Raises:
+        QueryError
+            If a parameter is unknown or not a boolean.
+    """
+    flags = {}
+    known = set(RegistryView.flags())
+    for name, value in params.items():
+        if name in _PARAMETERS:
+            continue
+        if name not in known:
+            raise QueryError(400, f'unknown filter: {name}')
+        if value not in ('true', 'false'):
+            raise QueryError(400, f'{name} must be true or false')
+        flags[name] = value == 'true'
+    return flags
+
+
+def query_validator(view: RegistryView, validator_id: str, params: dict[str, str]) -> dict:
+    """Look up a validator by index or public key.
+
+    Args:
+        view: RegistryView
+            View to query.
+        validator_id: str
+            Index of the validator, or its hex-encoded public key.
+        params: dict[str, str]
+            Query parameters.
+
+    Returns:
+        dict
+            The requested fields of the validator.
+
+    Raises:
+        QueryError
+            If the validator is not watched or the query is invalid.
+    """
+    fields = _parse_fields(params)
+    if validator_id.startswith('0x'):
+        row = view.find_pubkey(validator_id)
+    elif validator_id.isdigit():
+        row = view.find_index(int(validator_id))
+    else:
+        raise QueryError(400, 'validators are identified by index or 0x-prefixed public key')
+    if row is None:
+        raise QueryError(404, f'validator {validator_id} is not watched')
+    return {'slot': view.slot, 'data': view.row(row, fields)}
+
+
+def query_validators(view: RegistryView, params: dict[str, str]) -> dict:
+    """Select validators by label, status and boolean fields.
+
+    Args:
+        view: RegistryView
+            View to query.
+        params: dict[str, str]
+            Query parameters.
+
+    Returns:
+        dict
+            The page of validators, with the total number of matches.
+
+    Raises:
+        QueryError
+            If the query is invalid.
+    """
+    fields = _parse_fields(params)
+    flags = _parse_flags(params)
+    offset = _parse_int(params, 'offset', 0, 2 ** 32)
+    limit = _parse_int(params, 'limit', QUERY_DEFAULT_LIMIT, QUERY_MAX_LIMIT)
+
+    total, rows = view.select(params.get('label'), params.get('status'), flags, offset, limit)
+    return {
+        'slot': view.slot,
+        'total': total,
+        'offset': offset,
+        'data': [view.row(row, fields) for row in rows],
+    }
+
+
+def query_labels(view: RegistryView) -> dict:
+    """List the labels of the watched validators.
+
+    Args:
+        view: RegistryView
+            View to query.
+
+    Returns:
+        dict
+            Number of validators per label.
+    """
+    return {'slot': view.slot, 'data': view.label_counts()}
+
+
+def query_offenders(view: RegistryView, offenders: dict[str, list[Offender]], params: dict[str, str]) -> dict:
+    """List the worst validators of a label, worst first.
+
+    Args:
+        view: RegistryView
+            View the offenders were published with.
+        offenders: dict[str, list[Offender]]
+            Worst validators per label.
+        params: dict[str, str]
+            Query parameters.
+
+    Returns:
+        dict
+            The ranked validators.
+
+    Raises:
+        QueryError
+            If the query is invalid.
+    """
+    limit = _parse_int(params, 'limit', TOP_OFFENDERS, TOP_OFFENDERS)
+    label = params.get('label', LABEL_SCOPE_WATCHED)
+    return {
+        'slot': view.slot,
+        'label': label,
+        'data': [
+            {
+                'index': offender.index,
+                'pubkey': offender.pubkey,
+                'missed_attestation': offender.missed_attestation,
+                'missed_attestations_streak': offender.streak,
+                'missed_consensus_rewards_window': offender.lost_rewards,
+                'weight': offender.weight,
+            } for offender in offenders.get(label, [])[:limit]
+        ],
+    }
+
+
+class QueryServer(ThreadingHTTPServer):
+    """HTTP server accepting bursts of concurrent clients."""
+
+    daemon_threads = True
+    # Connections beyond the backlog are dropped and retried by the
+    # clients a second later, which would dominate the latency.
+    request_queue_size = 128
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Serve the query API."""
+
+    def do_GET(self) -> None:
+        started_at = time.perf_counter()
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        parts = [unquote(part) for part in url.path.strip('/').split('/')]
+
+        route = 'unknown'
+        network = params.get('network', '')
+        try:
+            if parts[:2] != ['v1', 'validators'] and parts not in (['v1', 'labels'], ['v1', 'offenders']):
+                raise QueryError(404, 'not found')
+            route = '/'.join(parts[:2]) if len(parts) <= 2 else 'v1/validator'
+            network, view, offenders = _get_published(params.get('network'))
+            if parts == ['v1', 'labels']:
+                body = query_labels(view)
+            elif parts == ['v1', 'offenders']:
+                body = query_offenders(view, offenders, params)
+            elif len(parts) == 2:
+                body = query_validators(view, params)
+            elif len(parts) == 3:
+                body = query_validator(view, parts[2], params)
+            else:
+                raise QueryError(404, 'not found')
+            self._reply(200, body)
+        except QueryError as e:
+            self._reply(e.status, {'error': str(e)})
+
+        get_prometheus_metrics().eth_watcher_query_seconds.labels(route, network).observe(time.perf_counter() - started_at)
+
+    def _reply(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def start_query_server(port: int, addr: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Start the query HTTP server if not already running.
+
+    There is a single server per process, shared by all networks.
+
+    Args:
+        port: int
+            Port on which the API is served.
+        addr: str
+            Address to listen on.
+
+    Returns:
+        ThreadingHTTPServer
+            The running server.
+    """
+    global _server
+
+    with _server_lock:
+        if _server is None:
+            _server = QueryServer((addr, port), QueryHandler)
+            threading.Thread(target=_server.serve_forever, name='query', daemon=True).start()
+            logging.info(f'🔎 Query API listening on {addr}:{_server.server_port}')
+        return _server
@@ -4,7 +4,7 @@ from .models import Rewards
 from .watched_validators import WatchedValidators
 
 
-def process_rewards(validators: WatchedValidators, rewards: Rewards) -> None:
+def process_rewards(validators: WatchedValidators, rewards: Rewards, epoch: int) -> None:
     """Processes rewards for all validators.
 
     Args:
@@ -12,6 +12,8 @@ def process_rewards(validators: WatchedValidators, rewards: Rewards) -> None:
             The registry of validators being watched.
         rewards: Rewards
             The rewards data to process.
+        epoch: int
+            Epoch of the rewards.
 
     Returns:
         None
@@ -20,13 +22,26 @@ def process_rewards(validators: WatchedValidators, rewards: Rewards) -> None:
     for ideal_reward in rewards.data.ideal_rewards:
         ideal_by_eb[ideal_reward.effective_balance] = ideal_reward
 
+    # Validators which are not watched are processed in one go by the
+    # network registry.
+    network_rewards: list[Rewards.Data.TotalReward] = []
+
     for reward in rewards.data.total_rewards:
         validator = validators.get_validator_by_index(reward.validator_index)
         if not validator:
+            network_rewards.append(reward)
             continue
 
         ideal = ideal_by_eb.get(validator.effective_balance)
         if not ideal:
             continue
 
-        validator.process_rewards(ideal, reward)
+        validator.process_rewards(ideal, reward, epoch)
+
+    validators.get_network().process_rewards(
+        {eb: (ideal.source, ideal.target, ideal.head) for eb, ideal in ideal_by_eb.items()},
+        [reward.validator_index for reward in network_rewards],
+        [reward.source for reward in network_rewards],
+        [reward.target for reward in network_rewards],
+        [reward.head for reward in network_rewards],
+    )
@@ -0,0 +1,209 @@
+"""Windowed rollups of the metrics of each label.
+
+Long-range panels over the per-label gauges, i.e: the missed
+attestations rate of thousands of labels over the last week, are
+expensive to evaluate in Prometheus while the watcher sees every epoch
+anyway. Each label keeps fixed-size ring buffers of per-epoch counters
+from which rates over the last hour, day and week are exported as
+plain gauges, so that such panels become instant queries.
+
+A window is split in at most `ROLLUP_BUCKETS` buckets of whole epochs
+and slides one bucket at a time: the last bucket is partial, so a
+window covers its length, rounded up to a whole bucket, minus the
+part of the current bucket still to come. Ring positions are shared
+by all labels, each label only holds counters.
+
+Counters of an epoch are recorded once the epoch is over:
+
+- attestations and rewards are those processed during the epoch,
+  i.e: the liveness of the previous epoch,
+- block proposals and attestation duties are summed over its slots.
+
+Rollups are kept in memory only and start over when the watcher
+restarts.
+"""
+
+from array import array
+from typing import Iterator, Optional
+
+from eth_validator_watcher_ext import MetricsByLabel
+
+
+# Windows and their length, in seconds.
+ROLLUP_WINDOWS = {
+    '1h': 3600,
+    '24h': 86_400,
+    '7d': 604_800,
+}
+
+# Maximum number of buckets per window.
+ROLLUP_BUCKETS = 24
+
+# Counters of a bucket.
+ACTIVE_VALIDATORS = 0
+MISSED_ATTESTATIONS = 1
+IDEAL_CONSENSUS_REWARDS = 2
+ACTUAL_CONSENSUS_REWARDS = 3
+PROPOSED_BLOCKS = 4
+MISSED_BLOCKS = 5
+PERFORMED_DUTIES = 6
+MISSED_DUTIES = 7
+COUNTERS = 8
+
+
+class RollupWindow:
+    """Ring buffer of per-label counters over a window.
+
+    Args:
+        epochs: int
+            Length of the window, in epochs.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, epochs: int) -> None:
+        epochs = max(epochs, 1)
+        self.bucket_epochs = -(-epochs // min(epochs, ROLLUP_BUCKETS))
+        self.size = -(-epochs // self.bucket_epochs)
+        # Bucket held at each position of the rings, -1 if none.
+        self._buckets = [-1] * self.size
+        self._rings: dict[str, array] = {}
+        self._totals: dict[str, array] = {}
+
+    def add(self, epoch: int, counters: dict[str, array]) -> None:
+        """Add the counters of an epoch.
+
+        Labels without counters are forgotten, i.e: after a
+        configuration reload.
+
+        Args:
+            epoch: int
+                Epoch of the counters.
+            counters: dict[str, array]
+                Counters of the epoch by label.
+
+        Returns:
+            None
+        """
+        bucket = epoch // self.bucket_epochs
+
+        # Buckets out of the window, i.e: after a downtime, and in the
+        # future, i.e: when replaying from an earlier time.
+        for position, held in enumerate(self._buckets):
+            if held != -1 and not bucket - self.size < held <= bucket:
+                self._evict(position)
+
+        position = bucket % self.size
+        if self._buckets[position] != bucket:
+            self._evict(position)
+            self._buckets[position] = bucket
+
+        for label in self._rings.keys() - counters.keys():
+            del self._rings[label]
+            del self._totals[label]
+
+        offset = position * COUNTERS
+        for label, values in counters.items():
+            ring = self._rings.get(label)
+            if ring is None:
+                ring = self._rings[label] = array('d', bytes(8 * COUNTERS * self.size))
+                self._totals[label] = array('d', bytes(8 * COUNTERS))
+            totals = self._totals[label]
+            for i, value in enumerate(values):
+                ring[offset + i] += value
+                totals[i] += value
+
+    def totals(self) -> Iterator[tuple[str, array]]:
+        """Iterate over the counters summed over the window.
+
+        Args:
+            None
+
+        Returns:
+            Iterator[tuple[str, array]]
+                Labels and their counters.
+        """
+        return iter(self._totals.items())
+
+    def _evict(self, position: int) -> None:
+        """Remove the counters of a position from the window.
+
+        Args:
+            position: int
+                Position in the rings.
+
+        Returns:
+            None
+        """
+        if self._buckets[position] == -1:
+            return
+        offset = position * COUNTERS
+        for label, ring in self._rings.items():
+            totals = self._totals[label]
+            for i in range(COUNTERS):
+                totals[i] -= ring[offset + i]
+                ring[offset + i] = 0
+        self._buckets[position] = -1
+
+
+class LabelRollups:
+    """Rollups of the metrics of each label over all windows.
+
+    Args:
+        epoch_seconds: int
+            Duration of an epoch, in seconds.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, epoch_seconds: int) -> None:
+        self.windows = {
+            name: RollupWindow(round(seconds / epoch_seconds)) for name, seconds in ROLLUP_WINDOWS.items()
+        }
+        self._epoch: Optional[int] = None
+        self._pending: dict[str, array] = {}
+
+    def observe(self, epoch: int, metrics: dict[str, MetricsByLabel]) -> bool:
+        """Account for the metrics of a slot.
+
+        Args:
+            epoch: int
+                Epoch of the slot.
+            metrics: dict[str, MetricsByLabel]
+                Metrics of the slot by label.
+
+        Returns:
+            bool
+                Whether an epoch was over and added to the windows.
+        """
+        # Labels removed during the epoch, i.e: after a configuration
+        # reload, are no longer exported and must not come back.
+        for label in self._pending.keys() - metrics.keys():
+            del self._pending[label]
+
+        flushed = False
+        if self._epoch is not None and epoch != self._epoch:
+            for window in self.windows.values():
+                window.add(self._epoch, self._pending)
+            self._pending = {}
+            flushed = True
+        self._epoch = epoch
+
+        # Attestations and rewards are the last values seen in the
+        # epoch, proposals and duties are summed over its slots.
+        for label, m in metrics.items():
+            counters = self._pending.get(label)
+            if counters is None:
+                counters = self._pending[label] = array('d', bytes(8 * COUNTERS))
+            counters[ACTIVE_VALIDATORS] = m.optimal_source_count + m.suboptimal_source_count
+            counters[MISSED_ATTESTATIONS] = m.missed_attestations_count
+            counters[IDEAL_CONSENSUS_REWARDS] = m.ideal_consensus_reward
+            counters[ACTUAL_CONSENSUS_REWARDS] = m.actual_consensus_reward
+            counters[PROPOSED_BLOCKS] += m.proposed_blocks
+            counters[MISSED_BLOCKS] += m.missed_blocks
+            counters[PERFORMED_DUTIES] += m.performed_duties_at_slot_count
+            counters[MISSED_DUTIES] += m.missed_duties_at_slot_count
+
+        return flushed
@@ -0,0 +1,267 @@
+"""Sharded mode: several worker processes share the validators.
+
+Each worker runs the regular processing loop on a slice of the
+validator index space (indexes equal to the shard modulo the number of
+shards) and sends the partial metrics of each slot to the coordinator.
+The coordinator merges the partials with the same semantics as the
+per-thread merge of the native extension and is the only process
+serving /metrics. Timings of the slot processing and of the beacon
+requests are not measured by the workers, they would never be served.
+
+Partials travel over pipes in a compact binary encoding: a fixed header
+for the scalar state of the slot followed by the native encoding of
+the metrics by label.
+"""
+
+import logging
+import multiprocessing
+import struct
+import time
+
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Optional
+
+from prometheus_client import start_http_server
+
+from eth_validator_watcher_ext import (
+    deserialize_validator_metrics,
+    merge_validator_metrics,
+    serialize_validator_metrics,
+)
+
+from .config import load_config
+from .metrics import MetricsExporter, SlotMetrics, get_prometheus_metrics
+
+
+# shard, epoch, slot, pending deposits count, pending deposits value,
+# pending consolidations, pending withdrawals, epoch duration.
+_REPORT = struct.Struct('<IQQQQQQQ')
+
+# Slots for which a shard never reported are dropped after a while so
+# that a lagging shard doesn't make the coordinator grow unbounded.
+MAX_PENDING_SLOTS = 64
+
+
+def encode_report(shard: int, report: SlotMetrics) -> bytes:
+    """Encode the partial metrics of a shard.
+
+    Args:
+        shard: int
+            Index of the shard.
+        report: SlotMetrics
+            Partial metrics computed by the shard.
+
+    Returns:
+        bytes
+            The encoded metrics.
+    """
+    header = _REPORT.pack(
+        shard,
+        report.epoch,
+        report.slot,
+        report.pending_deposits[0],
+        report.pending_deposits[1],
+        report.pending_consolidations,
+        report.pending_withdrawals,
+        report.epoch_seconds,
+    )
+    return header + serialize_validator_metrics(report.metrics)
+
+
+def decode_report(data: bytes) -> tuple[int, SlotMetrics]:
+    """Decode the partial metrics of a shard.
+
+    Args:
+        data: bytes
+            Encoded metrics.
+
+    Returns:
+        tuple[int, SlotMetrics]
+            Index of the shard and its partial metrics.
+    """
+    shard, epoch, slot, deposits, deposits_value, consolidations, withdrawals, epoch_seconds = _REPORT.unpack_from(data)
+    return shard, SlotMetrics(
+        epoch=epoch,
+        slot=slot,
+        pending_deposits=(deposits, deposits_value),
+        pending_consolidations=consolidations,
+        pending_withdrawals=withdrawals,
+        metrics=deserialize_validator_metrics(data[_REPORT.size:]),
+        epoch_seconds=epoch_seconds,
+    )
+
+
+class ShardWorker:
+    """Worker side of a shard.
+
+    Args:
+        index: int
+            Index of the shard.
+        count: int
+            Number of shards.
+        conn: Connection
+            Pipe to the coordinator.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, index: int, count: int, conn: Connection) -> None:
+        self.index = index
+        self.count = count
+        self._conn = conn
+
+    def send(self, report: SlotMetrics) -> None:
+        """Send the partial metrics of a slot to the coordinator.
+
+        Args:
+            report: SlotMetrics
+                Partial metrics computed by this shard.
+
+        Returns:
+            None
+        """
+        self._conn.send_bytes(encode_report(self.index, report))
+
+
+class ShardCoordinator:
+    """Merge the partial metrics of the shards, slot by slot.
+
+    Args:
+        count: int
+            Number of shards.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, count: int) -> None:
+        self._count = count
+        self._pending: dict[int, dict[int, SlotMetrics]] = {}
+
+    def receive(self, data: bytes) -> Optional[SlotMetrics]:
+        """Receive the partial metrics of a shard.
+
+        Args:
+            data: bytes
+                Encoded partial metrics.
+
+        Returns:
+            Optional[SlotMetrics]
+                The merged metrics of the slot once all shards
+                reported it, None otherwise.
+        """
+        shard, report = decode_report(data)
+        partials = self._pending.setdefault(report.slot, {})
+        partials[shard] = report
+
+        if len(partials) < self._count:
+            while len(self._pending) > MAX_PENDING_SLOTS:
+                del self._pending[min(self._pending)]
+            return None
+
+        # Older slots can't complete anymore, all shards moved on.
+        for slot in [slot for slot in self._pending if slot <= report.slot]:
+            del self._pending[slot]
+
+        # Queues are the same for all shards.
+        first = partials[min(partials)]
+        return SlotMetrics(
+            epoch=first.epoch,
+            slot=first.slot,
+            pending_deposits=first.pending_deposits,
+            pending_consolidations=first.pending_consolidations,
+            pending_withdrawals=first.pending_withdrawals,
+            metrics=merge_validator_metrics([partials[i].metrics for i in sorted(partials)]),
+            epoch_seconds=first.epoch_seconds,
+        )
+
+
+def run_shard(cfg_path: Path, index: int, count: int, conn: Connection) -> None:
+    """Run the processing loop of a shard worker.
+
+    Args:
+        cfg_path: Path
+            Path to the configuration file.
+        index: int
+            Index of the shard.
+        count: int
+            Number of shards.
+        conn: Connection
+            Pipe to the coordinator.
+
+    Returns:
+        None
+    """
+    # The worker imports the watcher itself, the entrypoint imports
+    # this module.
+    from .entrypoint import ValidatorWatcher
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s %(levelname)-8s [shard {index}] %(message)s'
+    )
+
+    ValidatorWatcher(cfg_path, ShardWorker(index, count, conn)).run()
+
+
+def run_sharded(cfg_path: Path, count: int) -> None:
+    """Run the shard workers and merge their metrics.
+
+    Workers are started in fresh interpreters, the coordinator exits
+    as soon as one of them fails.
+
+    Args:
+        cfg_path: Path
+            Path to the configuration file.
+        count: int
+            Number of shards.
+
+    Returns:
+        None
+
+    Raises:
+        ValueError
+            If the configuration records a beacon archive, which the
+            workers can't share.
+    """
+    cfg = load_config(str(cfg_path))
+    # Workers would all write to the same archive file.
+    if cfg.beacon_archive_path and cfg.beacon_archive_mode == 'record':
+        raise ValueError('recording a beacon archive is not supported with several shards')
+    started_at = time.monotonic()
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = {}
+    for index in range(count):
+        reader, writer = ctx.Pipe(duplex=False)
+        process = ctx.Process(target=run_shard, args=(cfg_path, index, count, writer), name=f'shard-{index}', daemon=True)
+        process.start()
+        writer.close()
+        processes[reader] = process
+
+    logging.info(f'🧩 Started {count} shard workers')
+
+    start_http_server(cfg.metrics_port)
+    exporter = MetricsExporter(get_prometheus_metrics(), started_at)
+    coordinator = ShardCoordinator(count)
+
+    try:
+        while processes:
+            for reader in wait(list(processes)):
+                try:
+                    data = reader.recv_bytes()
+                except EOFError:
+                    process = processes.pop(reader)
+                    process.join()
+                    if process.exitcode != 0:
+                        raise RuntimeError(f'{process.name} exited with code {process.exitcode}')
+                    continue
+
+                report = coordinator.receive(data)
+                if report is not None:
+                    exporter.export(cfg.network, report)
+    finally:
+        for process in processes.values():
+            process.terminate()
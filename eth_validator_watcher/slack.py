@@ -0,0 +1,254 @@
+"""Slack notifications, sent in the background.
+
+Notifications are pushed to a bounded queue and sent by a background
+thread so that neither a burst of events nor Slack latency delays the
+processing of slots. Events of the same kind (i.e: missed blocks)
+received within a short window are coalesced into a single message,
+and Slack rate limits are honored by waiting for the duration it asks.
+When the queue is full, notifications are dropped and counted.
+"""
+
+import functools
+import logging
+import queue
+import threading
+import time
+
+from typing import Any, Callable, Optional
+
+from .metrics import PrometheusMetrics, get_prometheus_metrics
+
+
+# Notifications waiting to be sent, past that they are dropped.
+SLACK_QUEUE_SIZE = 1000
+
+# Events of the same kind received within this window are sent as a
+# single message.
+SLACK_COALESCE_WINDOW_SEC = 10.0
+
+# Slack allows about one message per second per channel.
+SLACK_MIN_INTERVAL_SEC = 1.0
+
+# Coalesced messages list this many events at most.
+SLACK_MAX_LINES = 20
+
+# Attempts to send a message when Slack rate limits us.
+SLACK_MAX_ATTEMPTS = 5
+
+# Sent to the background thread to stop it.
+_STOP = object()
+
+_notifiers: dict[tuple[str, str], 'SlackNotifier'] = {}
+_notifiers_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _slack_client(token: str) -> Any:
+    """Get the slack client of a token.
+
+    Clients are shared by all the networks of the process.
+
+    Args:
+        token: str
+            Slack API token.
+
+    Returns:
+        WebClient
+            The slack client.
+    """
+    # Slack is optional and slow to import, only pay for it when it
+    # is configured.
+    from slack_sdk import WebClient
+
+    return WebClient(token=token)
+
+
+class SlackNotifier:
+    """Send notifications to a slack channel from a background thread.
+
+    Args:
+        client: Any
+            Slack client, with a chat_postMessage method.
+        channel: str
+            Channel to send the notifications to.
+        metrics: PrometheusMetrics
+            Metrics of the notifications queue.
+        queue_size: int
+            Maximum number of notifications waiting to be sent.
+        window_sec: float
+            Window during which events of the same kind are coalesced.
+        min_interval_sec: float
+            Minimum interval between two messages.
+        sleep: Callable[[float], None]
+            Function used to wait, for tests.
+
+    Returns:
+        None
+    """
+
+    def __init__(
+            self,
+            client: Any,
+            channel: str,
+            metrics: PrometheusMetrics,
+            queue_size: int = SLACK_QUEUE_SIZE,
+            window_sec: float = SLACK_COALESCE_WINDOW_SEC,
+            min_interval_sec: float = SLACK_MIN_INTERVAL_SEC,
+            sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._client = client
+        self._channel = channel
+        self._metrics = metrics
+        self._window_sec = window_sec
+        self._min_interval_sec = min_interval_sec
+        self._sleep = sleep
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._last_sent_at: Optional[float] = None
+
+        self._thread = threading.Thread(target=self._run, name=f'slack-{channel}', daemon=True)
+        self._thread.start()
+
+    def notify(self, msg: str, kind: Optional[str] = None) -> None:
+        """Queue a notification, never blocks.
+
+        Args:
+            msg: str
+                Message to send.
+            kind: Optional[str]
+                Kind of event, messages of the same kind are coalesced.
+                Messages without a kind are sent on their own.
+
+        Returns:
+            None
+        """
+        try:
+            self._queue.put_nowait((kind, msg))
+        except queue.Full:
+            self._metrics.eth_watcher_slack_dropped_total.labels(self._channel).inc()
+        self._metrics.eth_watcher_slack_queue_depth.labels(self._channel).set(self._queue.qsize())
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Send the pending notifications and stop the background thread.
+
+        Args:
+            timeout: Optional[float]
+                Maximum time to wait, in seconds.
+
+        Returns:
+            None
+        """
+        self._queue.put(_STOP, timeout=timeout)
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        """Send queued notifications until stopped.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        # Kind of event to the messages received and the time at
+        # which they are due.
+        pending: dict[str, tuple[list[str], float]] = {}
+
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0.0, min(deadline for _, deadline in pending.values()) - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            self._metrics.eth_watcher_slack_queue_depth.labels(self._channel).set(self._queue.qsize())
+
+            if item is _STOP:
+                for messages, _ in pending.values():
+                    self._send(self._coalesce(messages))
+                return
+
+            if item is not None:
+                kind, msg = item
+                if kind is None:
+                    self._send(msg)
+                else:
+                    pending.setdefault(kind, ([], time.monotonic() + self._window_sec))[0].append(msg)
+
+            now = time.monotonic()
+            for kind in [kind for kind, (_, deadline) in pending.items() if deadline <= now]:
+                messages, _ = pending.pop(kind)
+                self._send(self._coalesce(messages))
+
+    def _coalesce(self, messages: list[str]) -> str:
+        """Build a single message from events of the same kind.
+
+        Args:
+            messages: list[str]
+                Messages of the events.
+
+        Returns:
+            str
+                The message to send.
+        """
+        text = '\n'.join(messages[:SLACK_MAX_LINES])
+        if len(messages) > SLACK_MAX_LINES:
+            text += f'\n… and {len(messages) - SLACK_MAX_LINES} more'
+        return text
+
+    def _send(self, text: str) -> None:
+        """Send a message, waiting when Slack rate limits us.
+
+        Args:
+            text: str
+                Message to send.
+
+        Returns:
+            None
+        """
+        from slack_sdk.errors import SlackApiError
+
+        for _ in range(SLACK_MAX_ATTEMPTS):
+            if self._last_sent_at is not None:
+                self._sleep(max(0.0, self._last_sent_at + self._min_interval_sec - time.monotonic()))
+            self._last_sent_at = time.monotonic()
+
+            try:
+                self._client.chat_postMessage(channel=self._channel, text=text)
+                self._metrics.eth_watcher_slack_sent_total.labels(self._channel).inc()
+                return
+            except SlackApiError as e:
+                if e.response.status_code != 429:
+                    logging.warning(f'😿 Unable to send slack notification: {e.response["error"]}')
+                    break
+                self._metrics.eth_watcher_slack_rate_limited_total.labels(self._channel).inc()
+                self._sleep(float(e.response.headers.get('Retry-After', 1)))
+            except Exception as e:
+                # Notifications are best effort, this thread must
+                # survive network errors.
+                logging.warning(f'😿 Unable to send slack notification: {e}')
+                break
+
+        self._metrics.eth_watcher_slack_dropped_total.labels(self._channel).inc()
+
+
+def get_slack_notifier(token: str, channel: str) -> SlackNotifier:
+    """Get the notifier of a slack channel, shared by all networks.
+
+    Args:
+        token: str
+            Slack API token.
+        channel: str
+            Channel to send the notifications to.
+
+    Returns:
+        SlackNotifier
+            The notifier of the channel.
+    """
+    with _notifiers_lock:
+        notifier = _notifiers.get((token, channel))
+        if notifier is None:
+            notifier = SlackNotifier(_slack_client(token), channel, get_prometheus_metrics())
+            _notifiers[(token, channel)] = notifier
+        return notifier
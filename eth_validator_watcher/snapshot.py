@@ -0,0 +1,314 @@
+"""Warm-start snapshot of the watcher state.
+
+Fetching the whole validator set, liveness, rewards and proposer
+schedules takes a while on mainnet, and restarting the watcher loses
+the state we accumulated so far (consecutive missed attestations,
+history of the watched validators, block counters). The watcher
+periodically dumps a compact binary snapshot of its state which is
+memory-mapped on startup and then reconciled with the chain by the
+regular processing loop.
+
+The layout is a fixed header followed by the native dumps of the
+network registry (the compact state of every validator), of the
+public key index and of the history of the watched validators, then
+the proposer schedule and a small JSON trailer for the variable-sized
+bits (network name, counters, dependent roots of the proposer
+schedule):
+
+    header | network registry | pubkey index | history | schedule | meta
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+
+from array import array
+from dataclasses import dataclass
+from typing import Optional
+
+from .metrics import PrometheusMetrics
+from .proposer_schedule import ProposerSchedule
+from .watched_validators import WatchedValidators
+
+
+SNAPSHOT_MAGIC = b'EVWS'
+SNAPSHOT_VERSION = 3
+
+# magic, version, epoch, last processed finalized slot, liveness
+# epoch, rewards epoch, network registry size, pubkey index size,
+# history size, schedule size, meta size.
+_HEADER = struct.Struct('<4sIQQQQQQQQQ')
+
+# Sentinel to encode None in unsigned header fields.
+_NONE = 2 ** 64 - 1
+
+# Snapshots older than this are not worth restoring: catching up on
+# finalized slots would take longer than starting from scratch.
+SNAPSHOT_MAX_AGE_EPOCHS = 2
+
+
+@dataclass
+class SnapshotHeader:
+    """Scalar state of the processing loop saved along the registry.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    network: str
+    epoch: int
+    last_processed_finalized_slot: Optional[int] = None
+    liveness_epoch: Optional[int] = None
+    rewards_epoch: Optional[int] = None
+
+
+def _encode_optional(value: Optional[int]) -> int:
+    """Encode an optional integer for the header.
+
+    Args:
+        value: Optional[int]
+            Value to encode.
+
+    Returns:
+        int
+            The value, or a sentinel if it is None.
+    """
+    return _NONE if value is None else value
+
+
+def _decode_optional(value: int) -> Optional[int]:
+    """Decode an optional integer from the header.
+
+    Args:
+        value: int
+            Value to decode.
+
+    Returns:
+        Optional[int]
+            The value, or None if it is the sentinel.
+    """
+    return None if value == _NONE else value
+
+
+# Counters which need to survive a restart.
+_COUNTERS = [
+    'eth_block_proposals_head_total',
+    'eth_missed_block_proposals_head_total',
+    'eth_block_proposals_finalized_total',
+    'eth_missed_block_proposals_finalized_total',
+]
+
+
+def _counter_values(metrics: PrometheusMetrics) -> dict[str, list]:
+    """Collect the current values of the block counters.
+
+    Args:
+        metrics: PrometheusMetrics
+            Prometheus metrics of the watcher.
+
+    Returns:
+        dict[str, list]
+            Counter name to a list of (scope, network, value).
+    """
+    counters = {}
+    for name in _COUNTERS:
+        values = []
+        for family in getattr(metrics, name).collect():
+            for sample in family.samples:
+                if sample.name.endswith('_total'):
+                    values.append((sample.labels['scope'], sample.labels['network'], sample.value))
+        counters[name] = values
+    return counters
+
+
+def save_snapshot(path: str, header: SnapshotHeader, validators: WatchedValidators, schedule: ProposerSchedule, metrics: PrometheusMetrics) -> None:
+    """Write a snapshot of the watcher state.
+
+    The snapshot is written to a temporary file which is then renamed
+    so that a crash never leaves a truncated snapshot behind.
+
+    Args:
+        path: str
+            Path of the snapshot file.
+        header: SnapshotHeader
+            Scalar state of the processing loop.
+        validators: WatchedValidators
+            Registry of validators.
+        schedule: ProposerSchedule
+            Proposer schedule.
+        metrics: PrometheusMetrics
+            Prometheus metrics of the watcher.
+
+    Returns:
+        None
+    """
+    network, pubkeys, history = validators.dump()
+
+    slots = array('Q', schedule.get_schedule().keys())
+    proposers = array('Q', schedule.get_schedule().values())
+
+    meta = json.dumps({
+        'network': header.network,
+        'counters': _counter_values(metrics),
+        'dependent_roots': schedule.get_dependent_roots(),
+    }).encode()
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(_HEADER.pack(
+            SNAPSHOT_MAGIC,
+            SNAPSHOT_VERSION,
+            header.epoch,
+            _encode_optional(header.last_processed_finalized_slot),
+            _encode_optional(header.liveness_epoch),
+            _encode_optional(header.rewards_epoch),
+            len(network),
+            len(pubkeys),
+            len(history),
+            len(slots),
+            len(meta),
+        ))
+        fh.write(network)
+        fh.write(pubkeys)
+        fh.write(history)
+        fh.write(slots.tobytes())
+        fh.write(proposers.tobytes())
+        fh.write(meta)
+    os.replace(tmp, path)
+
+    logging.info(f'💾 Wrote snapshot of {len(validators.get_network())} validators at epoch {header.epoch}')
+
+
+def _restore(buf: memoryview, network_size: int, pubkeys_size: int, history_size: int, m: int, validators: WatchedValidators, schedule: ProposerSchedule, dependent_roots: dict[int, str]) -> None:
+    """Restore the registry and schedule from the snapshot sections.
+
+    Views are local to this function so they are all released when it
+    returns.
+
+    Args:
+        buf: memoryview
+            View on the whole snapshot file.
+        network_size: int
+            Size of the network registry dump.
+        pubkeys_size: int
+            Size of the public key index dump.
+        history_size: int
+            Size of the history dump.
+        m: int
+            Number of entries in the proposer schedule.
+        validators: WatchedValidators
+            Registry of validators to fill.
+        schedule: ProposerSchedule
+            Proposer schedule to fill.
+        dependent_roots: dict[int, str]
+            Dependent roots of the epochs of the proposer schedule.
+
+    Returns:
+        None
+    """
+    offset = _HEADER.size
+
+    network = bytes(buf[offset:offset + network_size])
+    offset += network_size
+    pubkeys = bytes(buf[offset:offset + pubkeys_size])
+    offset += pubkeys_size
+    history = bytes(buf[offset:offset + history_size])
+    offset += history_size
+    validators.load(network, pubkeys, history)
+
+    slots = buf[offset:offset + m * 8].cast('Q')
+    offset += m * 8
+    proposers = buf[offset:offset + m * 8].cast('Q')
+    schedule.load(dict(zip(slots, proposers)), dependent_roots)
+
+
+def _read_meta(buf: memoryview, offset: int, meta_size: int) -> dict:
+    """Read the JSON trailer of the snapshot.
+
+    Args:
+        buf: memoryview
+            View on the whole snapshot file.
+        offset: int
+            Offset of the JSON trailer.
+        meta_size: int
+            Size of the JSON trailer.
+
+    Returns:
+        dict
+            The JSON trailer of the snapshot.
+    """
+    return json.loads(bytes(buf[offset:offset + meta_size]))
+
+
+def load_snapshot(path: str, validators: WatchedValidators, schedule: ProposerSchedule, metrics: PrometheusMetrics, network: str, min_epoch: int) -> Optional[SnapshotHeader]:
+    """Restore the watcher state from a snapshot.
+
+    Snapshots from another network or older than min_epoch are
+    ignored: the processing loop then starts from scratch.
+
+    Args:
+        path: str
+            Path of the snapshot file.
+        validators: WatchedValidators
+            Registry of validators to fill.
+        schedule: ProposerSchedule
+            Proposer schedule to fill.
+        metrics: PrometheusMetrics
+            Prometheus metrics of the watcher.
+        network: str
+            Network the watcher is running on.
+        min_epoch: int
+            Oldest epoch for which a snapshot is considered usable.
+
+    Returns:
+        Optional[SnapshotHeader]
+            The scalar state of the processing loop, or None if no
+            usable snapshot was found.
+    """
+    if not os.path.exists(path):
+        return None
+
+    # Empty files can't be mapped.
+    if os.path.getsize(path) < _HEADER.size:
+        logging.warning(f'💾 Ignoring truncated snapshot {path}')
+        return None
+
+    with open(path, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, version, epoch, finalized, liveness, rewards, network_size, pubkeys_size, history_size, m, meta_size = _HEADER.unpack_from(mm)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            logging.warning(f'💾 Ignoring snapshot {path} with unsupported format')
+            return None
+
+        buf = memoryview(mm)
+        try:
+            meta = _read_meta(buf, _HEADER.size + network_size + pubkeys_size + history_size + m * 16, meta_size)
+            if meta['network'] != network or epoch < min_epoch:
+                logging.info(f'💾 Ignoring stale snapshot from epoch {epoch} on {meta["network"]}')
+                return None
+            dependent_roots = {int(epoch): root for epoch, root in meta.get('dependent_roots', {}).items()}
+            _restore(buf, network_size, pubkeys_size, history_size, m, validators, schedule, dependent_roots)
+        except ValueError as err:
+            logging.warning(f'💾 Ignoring corrupted snapshot {path}: {err}')
+            return None
+        finally:
+            buf.release()
+
+    for name, values in meta['counters'].items():
+        counter = getattr(metrics, name)
+        for scope, counter_network, value in values:
+            if counter_network == network:
+                counter.labels(scope, counter_network).inc(value)
+
+    logging.info(f'💾 Restored snapshot of {len(validators.get_network())} validators from epoch {epoch}')
+
+    return SnapshotHeader(
+        network=network,
+        epoch=epoch,
+        last_processed_finalized_slot=_decode_optional(finalized),
+        liveness_epoch=_decode_optional(liveness),
+        rewards_epoch=_decode_optional(rewards),
+    )
@@ -3,6 +3,17 @@
 SLOT_FOR_CONFIG_RELOAD = 15
 SLOT_FOR_MISSED_ATTESTATIONS_PROCESS = 16
 SLOT_FOR_REWARDS_PROCESS = 17
+SLOT_FOR_SNAPSHOT = 18
+
+# In watched-only mode, number of epochs between two samples of the
+# whole network used for the network scopes.
+DEFAULT_NETWORK_STATS_INTERVAL_EPOCHS = 16
+
+# Number of epochs of history considered for the windowed metrics,
+# and number of missed attestations over that window for a validator
+# to be reported. At most HISTORY_EPOCHS epochs are kept.
+DEFAULT_HISTORY_WINDOW_EPOCHS = 32
+DEFAULT_HISTORY_MISSED_THRESHOLD = 3
 
 # Default set of existing scopes.
 LABEL_SCOPE_ALL_NETWORK = "scope:all-network"
@@ -10,6 +21,22 @@ LABEL_SCOPE_WATCHED = "scope:watched"
 LABEL_SCOPE_NETWORK = "scope:network"
 
 
+def normalized_public_key(pubkey: str) -> str:
+    """Normalize a validator public key by removing 0x prefix and lowercasing.
+
+    Args:
+        pubkey: str
+            Public key to normalize.
+
+    Returns:
+        str
+            Normalized public key.
+    """
+    if pubkey.startswith('0x'):
+        pubkey = pubkey[2:]
+    return pubkey.lower()
+
+
 def pct(a: int, b: int, inclusive: bool = False) -> float:
     """Helper function to calculate the percentage of a over b.
 
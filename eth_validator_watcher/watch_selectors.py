@@ -0,0 +1,248 @@
+"""Rule-based selection of watched validators.
+
+Instead of listing every public key in watched_keys, validators can be
+watched through selectors: a withdrawal address, a range of indexes, a
+withdrawal credentials type or membership in an external keys file.
+All the criteria of a selector must match for its labels to apply.
+
+Selectors are resolved against indexes built once per epoch from the
+validators state, so labelling hundreds of thousands of validators is
+a handful of set operations.
+"""
+
+import os
+
+from functools import lru_cache
+from typing import Callable, Collection, Iterable, Optional
+
+from pydantic import BaseModel, field_validator, model_validator
+
+from .models import Validators
+from .watched_keys import pubkey_to_bytes
+from .utils import normalized_public_key
+
+
+class WatchedSelectorConfig(BaseModel):
+    """Configuration model for a watched validators selector.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    labels: Optional[list[str]] = None
+
+    withdrawal_address: Optional[str] = None
+    credentials_type: Optional[int] = None
+    index_range: Optional[tuple[int, int]] = None
+    keys_file: Optional[str] = None
+
+    @field_validator('withdrawal_address')
+    @classmethod
+    def _validate_withdrawal_address(cls, value: Optional[str]) -> Optional[str]:
+        """Normalize the withdrawal address.
+
+        Args:
+            value: Optional[str]
+                Hex-encoded execution address, with or without 0x.
+
+        Returns:
+            Optional[str]
+                The lowercase address without the 0x prefix.
+        """
+        if value is None:
+            return None
+        address = normalized_public_key(value)
+        if len(address) != 40 or any(c not in '0123456789abcdef' for c in address):
+            raise ValueError(f'invalid withdrawal address: {value!r}')
+        return address
+
+    @field_validator('credentials_type')
+    @classmethod
+    def _validate_credentials_type(cls, value: Optional[int]) -> Optional[int]:
+        """Check the withdrawal credentials type.
+
+        Args:
+            value: Optional[int]
+                Withdrawal credentials type (0x00, 0x01 or 0x02).
+
+        Returns:
+            Optional[int]
+                The credentials type.
+        """
+        if value is not None and not 0 <= value <= 0xff:
+            raise ValueError(f'invalid credentials type: {value!r}')
+        return value
+
+    @model_validator(mode='after')
+    def _validate_criteria(self) -> 'WatchedSelectorConfig':
+        """Check the selector has at least one criterion.
+
+        Returns:
+            WatchedSelectorConfig
+                The selector.
+        """
+        if self.withdrawal_address is None and self.credentials_type is None and self.index_range is None and self.keys_file is None:
+            raise ValueError('selector must have at least one criterion')
+        if self.index_range is not None and self.index_range[0] > self.index_range[1]:
+            raise ValueError(f'invalid index range: {self.index_range!r}')
+        return self
+
+
+@lru_cache(maxsize=16)
+def _read_keys_file(path: str, mtime: float) -> frozenset[bytes]:
+    """Read an external keys file.
+
+    The file has one hex-encoded public key per line, empty lines and
+    lines starting with # are ignored. Results are cached until the
+    file is modified.
+
+    Args:
+        path: str
+            Path of the keys file.
+        mtime: float
+            Modification time of the file, part of the cache key.
+
+    Returns:
+        frozenset[bytes]
+            Raw public keys listed in the file.
+    """
+    keys = set()
+    with open(path, 'r') as fh:
+        for line in fh:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                keys.add(pubkey_to_bytes(line))
+    return frozenset(keys)
+
+
+def read_keys_file(path: str) -> frozenset[bytes]:
+    """Read an external keys file, using the cache if it did not change.
+
+    Args:
+        path: str
+            Path of the keys file.
+
+    Returns:
+        frozenset[bytes]
+            Raw public keys listed in the file.
+    """
+    return _read_keys_file(path, os.stat(path).st_mtime)
+
+
+class SelectorIndexes:
+    """Indexes of the validators state used to resolve selectors.
+
+    Only the withdrawal addresses referenced by selectors are indexed,
+    indexing every address of the network would cost more memory than
+    the registry itself.
+
+    Args:
+        addresses: set[str]
+            Normalized withdrawal addresses to index.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, addresses: set[str]) -> None:
+        self.by_withdrawal_address: dict[str, list[int]] = {address: [] for address in addresses}
+        self.by_credentials_type: dict[str, list[int]] = {}
+
+    def build(self, validators: Iterable[Validators.DataItem]) -> None:
+        """Index the validators state of an epoch.
+
+        Args:
+            validators: Iterable[Validators.DataItem]
+                Validators state from the beacon chain.
+
+        Returns:
+            None
+        """
+        by_type = self.by_credentials_type
+        by_address = self.by_withdrawal_address
+
+        for item in validators:
+            credentials = item.validator.withdrawal_credentials
+            credentials_type = credentials[2:4]
+            indexes = by_type.get(credentials_type)
+            if indexes is None:
+                indexes = by_type[credentials_type] = []
+            indexes.append(item.index)
+
+            # BLS credentials (0x00) don't hold an execution address.
+            if by_address and credentials_type != '00':
+                indexes = by_address.get(credentials[-40:].lower())
+                if indexes is not None:
+                    indexes.append(item.index)
+
+    def covers(self, selectors: list[WatchedSelectorConfig]) -> bool:
+        """Check whether the withdrawal addresses of selectors are indexed.
+
+        Args:
+            selectors: list[WatchedSelectorConfig]
+                Selectors to check.
+
+        Returns:
+            bool
+                True if all the addresses used by selectors are indexed.
+        """
+        return all(s.withdrawal_address in self.by_withdrawal_address for s in selectors if s.withdrawal_address is not None)
+
+    def resolve(
+            self,
+            selectors: list[WatchedSelectorConfig],
+            registry: Collection[int],
+            get_index: Callable[[bytes], Optional[int]],
+    ) -> dict[int, tuple[str, ...]]:
+        """Resolve selectors to the labels of matching validators.
+
+        Args:
+            selectors: list[WatchedSelectorConfig]
+                Selectors to resolve.
+            registry: Collection[int]
+                Indexes of the validators known to the watcher.
+            get_index: Callable[[bytes], Optional[int]]
+                Lookup of a validator index from its raw public key.
+
+        Returns:
+            dict[int, tuple[str, ...]]
+                Labels of each matching validator, in selector order.
+        """
+        resolved: dict[int, tuple[str, ...]] = {}
+
+        for selector in selectors:
+            candidates: list[set[int]] = []
+            if selector.withdrawal_address is not None:
+                candidates.append(set(self.by_withdrawal_address.get(selector.withdrawal_address, ())))
+            if selector.credentials_type is not None:
+                candidates.append(set(self.by_credentials_type.get(f'{selector.credentials_type:02x}', ())))
+            if selector.keys_file is not None:
+                indexes = (get_index(pubkey) for pubkey in read_keys_file(selector.keys_file))
+                candidates.append({index for index in indexes if index is not None})
+            if selector.index_range is not None:
+                first, last = selector.index_range
+                if last - first < len(registry):
+                    candidates.append({index for index in range(first, last + 1) if index in registry})
+                else:
+                    candidates.append({index for index in registry if first <= index <= last})
+
+            candidates.sort(key=len)
+            matches = candidates[0].intersection(*candidates[1:])
+
+            # Label sets are shared between validators, only those
+            # matched by several selectors get a merged one.
+            labels = tuple(selector.labels or ())
+            overlap = matches.intersection(resolved.keys())
+            resolved.update(dict.fromkeys(matches.difference(overlap), labels))
+
+            merged: dict[tuple[str, ...], tuple[str, ...]] = {}
+            for index in overlap:
+                previous = resolved[index]
+                entry = merged.get(previous)
+                if entry is None:
+                    entry = merged[previous] = tuple(dict.fromkeys(previous + labels))
+                resolved[index] = entry
+
+        return resolved
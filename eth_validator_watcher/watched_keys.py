@@ -0,0 +1,540 @@
+"""Compact in-memory representation of the watched keys.
+
+Configurations with hundreds of thousands of watched keys are common,
+building a pydantic object per key is both slow and memory hungry. We
+instead keep a mapping of raw 48-byte public keys to a label-set
+identifier, label sets being shared between keys (in practice there
+are only a handful of distinct label sets).
+
+The same representation can be stored in a binary file which is
+memory-mapped by the watcher, see MappedWatchedKeys:
+
+    header | prefix buckets | sorted pubkeys | u32 label-set ids | label sets (JSON)
+
+Prefix buckets hold, for each value of the first two bytes of public
+keys, the position of the first key with this prefix so that lookups
+only have to bisect a handful of keys.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+from pydantic import BaseModel
+
+from .utils import normalized_public_key
+
+
+PUBKEY_SIZE = 48
+
+WATCHED_KEYS_FILE_MAGIC = b'EVWK'
+WATCHED_KEYS_FILE_VERSION = 1
+
+# magic, version, number of keys, size of the label sets table.
+_HEADER = struct.Struct('<4sIQQ')
+
+_PREFIX_BUCKETS = 1 << 16
+_BUCKETS_SIZE = (_PREFIX_BUCKETS + 1) * 4
+
+
+class WatchedKeyConfig(BaseModel):
+    """Configuration model for a watched validator key.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    public_key: str
+    labels: Optional[list[str]] = None
+
+
+def pubkey_to_bytes(pubkey: str) -> bytes:
+    """Convert an hex-encoded public key to its raw representation.
+
+    Args:
+        pubkey: str
+            Public key, with or without the 0x prefix.
+
+    Returns:
+        bytes
+            The 48-byte public key.
+
+    Raises:
+        ValueError: If the public key is not a valid 48-byte hex string.
+    """
+    try:
+        raw = bytes.fromhex(normalized_public_key(pubkey))
+    except (TypeError, AttributeError, ValueError):
+        raise ValueError(f'invalid public key: {pubkey!r}')
+    if len(raw) != PUBKEY_SIZE:
+        raise ValueError(f'invalid public key length: {pubkey!r}')
+    return raw
+
+
+@dataclass
+class WatchedKeysDiff:
+    """Changes between two sets of watched keys.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+    added: list[tuple[bytes, tuple[str, ...]]] = field(default_factory=list)
+    removed: list[bytes] = field(default_factory=list)
+    relabeled: list[tuple[bytes, tuple[str, ...]]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.relabeled)
+
+
+class BaseWatchedKeys:
+    """Read-only mapping of watched public keys to their labels.
+
+    It behaves like a read-only sequence of WatchedKeyConfig for
+    convenience, but the watcher itself only relies on get_labels()
+    and items() which do not create any per-key object.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+
+    def get_labels(self, pubkey: bytes) -> Optional[tuple[str, ...]]:
+        """Get the labels of a watched key.
+
+        Args:
+            pubkey: bytes
+                Raw 48-byte public key.
+
+        Returns:
+            Optional[tuple[str, ...]]
+                Labels of the key, or None if the key is not watched.
+        """
+        raise NotImplementedError
+
+    def items(self) -> Iterator[tuple[bytes, tuple[str, ...]]]:
+        """Iterate over watched keys and their labels.
+
+        Returns:
+            Iterator[tuple[bytes, tuple[str, ...]]]
+                Raw public keys and their labels.
+        """
+        raise NotImplementedError
+
+    def label_sets(self) -> list[tuple[str, ...]]:
+        """Get the distinct label sets.
+
+        Returns:
+            list[tuple[str, ...]]
+                Distinct label sets, indexed by label-set identifier.
+        """
+        raise NotImplementedError
+
+    def diff(self, previous: Optional['BaseWatchedKeys']) -> WatchedKeysDiff:
+        """Compute the changes from a previous set of watched keys.
+
+        Args:
+            previous: Optional[BaseWatchedKeys]
+                Previously applied watched keys, None if there were none.
+
+        Returns:
+            WatchedKeysDiff
+                Keys added, removed and relabeled since previous.
+        """
+        diff = WatchedKeysDiff()
+        if previous is None:
+            diff.added = list(self.items())
+            return diff
+
+        for pubkey, labels in self.items():
+            previous_labels = previous.get_labels(pubkey)
+            if previous_labels is None:
+                diff.added.append((pubkey, labels))
+            elif previous_labels != labels:
+                diff.relabeled.append((pubkey, labels))
+
+        for pubkey, _ in previous.items():
+            if pubkey not in self:
+                diff.removed.append(pubkey)
+
+        return diff
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, pubkey: bytes) -> bool:
+        return self.get_labels(pubkey) is not None
+
+    def __iter__(self) -> Iterator[WatchedKeyConfig]:
+        for pubkey, labels in self.items():
+            yield WatchedKeyConfig(public_key=f'0x{pubkey.hex()}', labels=list(labels) or None)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, BaseWatchedKeys):
+            return dict(self.items()) == dict(other.items())
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({len(self)} keys, {len(self.label_sets())} label sets)'
+
+
+class WatchedKeys(BaseWatchedKeys):
+    """In-memory mapping of watched public keys to their labels.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+
+    def __init__(self) -> None:
+        self._keys: dict[bytes, int] = {}
+        self._label_sets: list[tuple[str, ...]] = []
+        self._label_set_ids: dict[tuple[str, ...], int] = {}
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Any]) -> 'WatchedKeys':
+        """Build the mapping from configuration entries.
+
+        Args:
+            entries: Iterable[Any]
+                Either dictionaries as found in the configuration file
+                or WatchedKeyConfig objects.
+
+        Returns:
+            WatchedKeys
+                The compact mapping.
+        """
+        keys = cls()
+        for entry in entries:
+            if isinstance(entry, WatchedKeyConfig):
+                keys.add(entry.public_key, entry.labels)
+            elif isinstance(entry, dict):
+                keys.add_entry(entry)
+            else:
+                raise ValueError(f'invalid watched key entry: {entry!r}')
+        return keys
+
+    def add(self, public_key: str, labels: Optional[list[str]]) -> None:
+        """Watch a key.
+
+        If the key is already watched, its labels are replaced.
+
+        Args:
+            public_key: str
+                Hex-encoded public key of the validator.
+            labels: Optional[list[str]]
+                Labels of the validator.
+
+        Returns:
+            None
+        """
+        if labels is not None and (not isinstance(labels, list) or not all(isinstance(label, str) for label in labels)):
+            raise ValueError(f'invalid labels for {public_key!r}: {labels!r}')
+
+        label_set = tuple(labels or ())
+        label_set_id = self._label_set_ids.get(label_set)
+        if label_set_id is None:
+            label_set_id = len(self._label_sets)
+            self._label_sets.append(label_set)
+            self._label_set_ids[label_set] = label_set_id
+
+        self._keys[pubkey_to_bytes(public_key)] = label_set_id
+
+    def add_entry(self, entry: dict) -> None:
+        """Watch a key from a raw configuration entry.
+
+        Args:
+            entry: dict
+                Entry with a public_key and optional labels.
+
+        Returns:
+            None
+        """
+        if 'public_key' not in entry:
+            raise ValueError(f'missing public_key in watched key entry: {entry!r}')
+        self.add(entry['public_key'], entry.get('labels'))
+
+    def json_object_hook(self, obj: dict) -> Any:
+        """Hook for json.load() to build the mapping while parsing.
+
+        Entries are consumed as soon as they are decoded so that we
+        never hold the whole list of dictionaries in memory.
+
+        Args:
+            obj: dict
+                Decoded JSON object.
+
+        Returns:
+            Any
+                None for watched key entries (consumed), the object
+                itself otherwise.
+        """
+        if 'public_key' in obj:
+            self.add_entry(obj)
+            return None
+        return obj
+
+    def get_labels(self, pubkey: bytes) -> Optional[tuple[str, ...]]:
+        """Get the labels of a watched key.
+
+        Args:
+            pubkey: bytes
+                Raw 48-byte public key.
+
+        Returns:
+            Optional[tuple[str, ...]]
+                Labels of the key, or None if the key is not watched.
+        """
+        label_set_id = self._keys.get(pubkey)
+        if label_set_id is None:
+            return None
+        return self._label_sets[label_set_id]
+
+    def items(self) -> Iterator[tuple[bytes, tuple[str, ...]]]:
+        """Iterate over watched keys and their labels.
+
+        Returns:
+            Iterator[tuple[bytes, tuple[str, ...]]]
+                Raw public keys and their labels.
+        """
+        label_sets = self._label_sets
+        for pubkey, label_set_id in self._keys.items():
+            yield pubkey, label_sets[label_set_id]
+
+    def label_sets(self) -> list[tuple[str, ...]]:
+        """Get the distinct label sets.
+
+        Returns:
+            list[tuple[str, ...]]
+                Distinct label sets, indexed by label-set identifier.
+        """
+        return self._label_sets
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, pubkey: bytes) -> bool:
+        return pubkey in self._keys
+
+
+class _PubkeyColumn:
+    """Sequence view over the sorted public keys of a mapped file.
+
+    Args:
+        None
+
+    Returns:
+        None
+    """
+
+    def __init__(self, mm: mmap.mmap, n: int) -> None:
+        self._mm = mm
+        self._n = n
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = _HEADER.size + _BUCKETS_SIZE + i * PUBKEY_SIZE
+        return self._mm[offset:offset + PUBKEY_SIZE]
+
+    def __len__(self) -> int:
+        return self._n
+
+
+class MappedWatchedKeys(BaseWatchedKeys):
+    """Watched keys backed by a memory-mapped binary file.
+
+    Public keys are sorted so that lookups are binary searches on the
+    mapped pages: nothing is materialized per key, and opening a file
+    of millions of keys is immediate. Files are written with
+    save_watched_keys_file().
+
+    Args:
+        path: str
+            Path of the watched keys file.
+
+    Returns:
+        None
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+
+        with open(path, 'rb') as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < _HEADER.size:
+            raise ValueError(f'truncated watched keys file: {path}')
+        magic, version, n, labels_size = _HEADER.unpack_from(self._mm)
+        if magic != WATCHED_KEYS_FILE_MAGIC or version != WATCHED_KEYS_FILE_VERSION:
+            raise ValueError(f'unsupported watched keys file: {path}')
+
+        ids_offset = _HEADER.size + _BUCKETS_SIZE + n * PUBKEY_SIZE
+        labels_offset = ids_offset + n * 4
+        if len(self._mm) != labels_offset + labels_size:
+            raise ValueError(f'truncated watched keys file: {path}')
+
+        buf = memoryview(self._mm)
+        self._n = n
+        self._buckets = buf[_HEADER.size:_HEADER.size + _BUCKETS_SIZE].cast('I')
+        self._pubkeys = _PubkeyColumn(self._mm, n)
+        self._label_set_ids = buf[ids_offset:labels_offset].cast('I')
+        self._label_sets = [tuple(labels) for labels in json.loads(bytes(buf[labels_offset:]))]
+
+    @property
+    def path(self) -> str:
+        """Get the path of the mapped file.
+
+        Returns:
+            str
+                Path of the watched keys file.
+        """
+        return self._path
+
+    def _find(self, pubkey: bytes) -> Optional[int]:
+        """Find the position of a public key in the file.
+
+        Args:
+            pubkey: bytes
+                Raw 48-byte public key.
+
+        Returns:
+            Optional[int]
+                Position of the key, or None if the key is not watched.
+        """
+        prefix = int.from_bytes(pubkey[:2], 'big')
+        hi = self._buckets[prefix + 1]
+        i = bisect_left(self._pubkeys, pubkey, self._buckets[prefix], hi)
+        if i < hi and self._pubkeys[i] == pubkey:
+            return i
+        return None
+
+    def get_labels(self, pubkey: bytes) -> Optional[tuple[str, ...]]:
+        """Get the labels of a watched key.
+
+        Args:
+            pubkey: bytes
+                Raw 48-byte public key.
+
+        Returns:
+            Optional[tuple[str, ...]]
+                Labels of the key, or None if the key is not watched.
+        """
+        i = self._find(pubkey)
+        if i is None:
+            return None
+        return self._label_sets[self._label_set_ids[i]]
+
+    def items(self) -> Iterator[tuple[bytes, tuple[str, ...]]]:
+        """Iterate over watched keys and their labels, sorted by key.
+
+        Returns:
+            Iterator[tuple[bytes, tuple[str, ...]]]
+                Raw public keys and their labels.
+        """
+        label_sets = self._label_sets
+        ids = self._label_set_ids
+        for i in range(self._n):
+            yield self._pubkeys[i], label_sets[ids[i]]
+
+    def diff(self, previous: Optional[BaseWatchedKeys]) -> WatchedKeysDiff:
+        """Compute the changes from a previous set of watched keys.
+
+        Two mapped files are diffed with a single merge pass as both
+        are sorted.
+
+        Args:
+            previous: Optional[BaseWatchedKeys]
+                Previously applied watched keys, None if there were none.
+
+        Returns:
+            WatchedKeysDiff
+                Keys added, removed and relabeled since previous.
+        """
+        if not isinstance(previous, MappedWatchedKeys):
+            return super().diff(previous)
+
+        diff = WatchedKeysDiff()
+        current, before = self.items(), previous.items()
+        a, b = next(current, None), next(before, None)
+        while a is not None or b is not None:
+            if b is None or (a is not None and a[0] < b[0]):
+                diff.added.append(a)
+                a = next(current, None)
+            elif a is None or b[0] < a[0]:
+                diff.removed.append(b[0])
+                b = next(before, None)
+            else:
+                if a[1] != b[1]:
+                    diff.relabeled.append(a)
+                a, b = next(current, None), next(before, None)
+        return diff
+
+    def label_sets(self) -> list[tuple[str, ...]]:
+        """Get the distinct label sets.
+
+        Returns:
+            list[tuple[str, ...]]
+                Distinct label sets, indexed by label-set identifier.
+        """
+        return self._label_sets
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __contains__(self, pubkey: bytes) -> bool:
+        return self._find(pubkey) is not None
+
+
+def save_watched_keys_file(path: str, watched_keys: BaseWatchedKeys) -> None:
+    """Write watched keys to the binary format used by MappedWatchedKeys.
+
+    The file is written to a temporary file which is then renamed:
+    a watcher which has the previous version mapped keeps a consistent
+    view until it reloads its configuration.
+
+    Args:
+        path: str
+            Path of the watched keys file.
+        watched_keys: BaseWatchedKeys
+            Watched keys to write.
+
+    Returns:
+        None
+    """
+    label_sets = watched_keys.label_sets()
+    label_set_ids = {labels: i for i, labels in enumerate(label_sets)}
+    entries = sorted(watched_keys.items())
+
+    ids = array('I', (label_set_ids[labels] for _, labels in entries))
+    labels = json.dumps([list(labels) for labels in label_sets]).encode()
+
+    buckets = array('I', bytes(_BUCKETS_SIZE))
+    for pubkey, _ in entries:
+        buckets[int.from_bytes(pubkey[:2], 'big') + 1] += 1
+    for prefix in range(_PREFIX_BUCKETS):
+        buckets[prefix + 1] += buckets[prefix]
+
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as fh:
+        fh.write(_HEADER.pack(WATCHED_KEYS_FILE_MAGIC, WATCHED_KEYS_FILE_VERSION, len(entries), len(labels)))
+        fh.write(buckets.tobytes())
+        for pubkey, _ in entries:
+            fh.write(pubkey)
+        fh.write(ids.tobytes())
+        fh.write(labels)
+    os.replace(tmp, path)
@@ -1,29 +1,17 @@
 """Classes and functions for managing watched validators."""
 
-from typing import Optional
+import logging
 
-from eth_validator_watcher_ext import Validator
-from .config import Config, WatchedKeyConfig
+from typing import Iterable, Optional, Sequence
+
+from eth_validator_watcher_ext import NetworkRegistry, PubkeyIndex, Validator
+from .config import Config
+from .watch_selectors import SelectorIndexes, WatchedSelectorConfig
+from .watched_keys import BaseWatchedKeys
 from .models import Validators, ValidatorsLivenessResponse, Rewards
 from .utils import LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_WATCHED, LABEL_SCOPE_NETWORK
 
 
-def normalized_public_key(pubkey: str) -> str:
-    """Normalize a validator public key by removing 0x prefix and lowercasing.
-
-    Args:
-        pubkey: str
-            Public key to normalize.
-
-    Returns:
-        str
-            Normalized public key.
-    """
-    if pubkey.startswith('0x'):
-        pubkey = pubkey[2:]
-    return pubkey.lower()
-
-
 class WatchedValidator:
     """Watched validator abstraction.
 
@@ -31,13 +19,14 @@ class WatchedValidator:
     state of a validator.
 
     Args:
-        None
+        state: Optional[Validator]
+            Initial state of the validator, i.e: from the network registry.
 
     Returns:
         None
     """
 
-    def __init__(self):
+    def __init__(self, state: Optional[Validator] = None):
         # State is wrapped in a C++ object so we can perform efficient
         # operations without holding the GIL.
         #
@@ -45,7 +34,7 @@ class WatchedValidator:
         # can only be performed using explicit copies (i.e: do not
         # call append() on a list but rather create a new list with
         # the new element).
-        self._v = Validator()
+        self._v = state if state is not None else Validator()
 
         # This gets overriden by process_config if the validator is watched.
         self._v.labels: Optional[list[str]] = [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK]
@@ -63,6 +52,19 @@ class WatchedValidator:
         """
         return self._v.consensus_effective_balance
 
+    @property
+    def state(self) -> Validator:
+        """Get the underlying C++ validator state.
+
+        Args:
+            None
+
+        Returns:
+            Validator
+                The C++ object holding the state of this validator.
+        """
+        return self._v
+
     @property
     def labels(self) -> list[str]:
         """Get the labels for the validator.
@@ -76,12 +78,12 @@ class WatchedValidator:
         """
         return self._v.labels
 
-    def process_config(self, config: WatchedKeyConfig):
+    def process_config(self, labels: Sequence[str]):
         """Process a new configuration for this validator.
 
         Args:
-            config: WatchedKeyConfig
-                New configuration for this validator.
+            labels: Sequence[str]
+                Labels configured for this validator.
 
         Returns:
             None
@@ -89,11 +91,18 @@ class WatchedValidator:
         # Even if there is no label in the config, we consider the
         # validator as watched.  This method is only called for
         # validators that are watched.
-        labels = [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_WATCHED]
-        if config.labels:
-            labels = labels + config.labels
+        self._v.labels = [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_WATCHED, *labels]
 
-        self._v.labels = labels
+    def reset_config(self):
+        """Stop watching this validator.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._v.labels = [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK]
 
     def process_epoch(self, validator: Validators.DataItem):
         """Process validator state for a new epoch.
@@ -129,8 +138,9 @@ class WatchedValidator:
         if (current_epoch - 1) >= self._v.consensus_activation_epoch:
             self._v.previous_missed_attestation = self._v.missed_attestation
             self._v.missed_attestation = not liveness.is_live
+            self._v.record_liveness(current_epoch - 1, liveness.is_live)
 
-    def process_rewards(self, ideal: Rewards.Data.IdealReward, reward: Rewards.Data.TotalReward):
+    def process_rewards(self, ideal: Rewards.Data.IdealReward, reward: Rewards.Data.TotalReward, epoch: int):
         """Process validator rewards data.
 
         Args:
@@ -138,6 +148,8 @@ class WatchedValidator:
                 Ideal rewards that could have been earned.
             reward: Rewards.Data.TotalReward
                 Actual rewards earned by the validator.
+            epoch: int
+                Epoch of the rewards.
 
         Returns:
             None
@@ -149,6 +161,14 @@ class WatchedValidator:
         self._v.ideal_consensus_reward = ideal.source + ideal.target + ideal.head
         self._v.actual_consensus_reward = reward.source + reward.target + reward.head
 
+        self._v.record_rewards(
+            epoch,
+            not self._v.suboptimal_source,
+            not self._v.suboptimal_target,
+            not self._v.suboptimal_head,
+            int(self._v.ideal_consensus_reward - self._v.actual_consensus_reward),
+        )
+
     def process_duties(self, slot: int, performed: bool):
         """Process a validator attestation duty.
 
@@ -163,6 +183,7 @@ class WatchedValidator:
         """
         self._v.duties_slot = slot
         self._v.duties_performed_at_slot = performed
+        self._v.record_duty(slot, performed)
 
     def process_block(self, slot: int, has_block: bool):
         """Processes a block proposal.
@@ -225,44 +246,70 @@ class WatchedValidators:
 
     Provides facilities to retrieve a validator by index or public
     key. This needs to be efficient both in terms of CPU and memory as
-    there are about ~1 million validators on the network.
+    there are about ~2 million validators on the network: only watched
+    validators are backed by a WatchedValidator, the others only have
+    an entry in the compact network registry used for the network-wide
+    metrics.
+
+    In sharded mode, the registry only holds the validators whose
+    index is equal to the shard modulo the number of shards.
 
     Args:
-        None
+        shard_index: int
+            Index of the shard handled by this registry.
+        shard_count: int
+            Number of shards, 1 to handle all validators.
 
     Returns:
         None
     """
 
-    def __init__(self):
+    def __init__(self, shard_index: int = 0, shard_count: int = 1):
+        self._shard_index = shard_index
+        self._shard_count = shard_count
+
+        # Watched validators only.
         self._validators: dict[int, WatchedValidator] = {}
-        self._pubkey_to_index: dict[str, int] = {}
+        # State of all validators of the network, watched ones are
+        # flagged and skipped when computing the network metrics.
+        self._network = NetworkRegistry(shard_index, shard_count)
+        # Raw public keys to indexes, for all validators of the network.
+        self._pubkey_index = PubkeyIndex()
+        self._watched_keys: Optional[BaseWatchedKeys] = None
+
+        # Selectors are resolved against indexes rebuilt on each epoch.
+        self._selectors: list[WatchedSelectorConfig] = []
+        self._selector_indexes = SelectorIndexes(set())
+        self._selector_labels: dict[int, tuple[str, ...]] = {}
 
         self.config_initialized = False
+        # Bumped whenever watched validators or their labels may have
+        # changed.
+        self.generation = 0
 
     def get_validator_by_index(self, index: int) -> Optional[WatchedValidator]:
-        """Get a validator by index.
+        """Get a watched validator by index.
 
         Args:
             index: int
                 Index of the validator to retrieve.
 
         Returns:
-            Optional[WatchedValidator]: The validator with the given index, or None if not found.
+            Optional[WatchedValidator]: The validator with the given index, or None if not found or not watched.
         """
         return self._validators.get(index)
 
     def get_validator_by_pubkey(self, pubkey: str) -> Optional[WatchedValidator]:
-        """Get a validator by public key.
+        """Get a watched validator by public key.
 
         Args:
             pubkey: str
                 Public key of the validator to retrieve.
 
         Returns:
-            Optional[WatchedValidator]: The validator with the given public key, or None if not found.
+            Optional[WatchedValidator]: The validator with the given public key, or None if not found or not watched.
         """
-        index = self._pubkey_to_index.get(normalized_public_key(pubkey))
+        index = self._pubkey_index.get(pubkey)
         if index is None:
             return None
         return self._validators.get(index)
@@ -273,19 +320,79 @@ class WatchedValidators:
         Returns:
             list[int]: A list of all validator indices in the registry.
         """
-        return list(self._validators.keys())
+        return self._network.indexes()
+
+    def get_watched_indexes(self) -> list[int]:
+        """Get the indexes of watched validators.
+
+        Returns:
+            list[int]: A list of the indices of validators watched by key or selector.
+        """
+        return sorted(self._validators)
+
+    def get_watched_ids(self) -> list[str]:
+        """Get identifiers to fetch the state of watched validators.
+
+        Validators already known are identified by index, watched keys
+        which are not in the registry yet (i.e: pending deposits) by
+        public key.
+
+        Returns:
+            list[str]: Indexes and hex-encoded public keys of watched validators.
+        """
+        ids = [str(index) for index in sorted(self._validators)]
+        if self._watched_keys is not None:
+            ids.extend(f'0x{pubkey.hex()}' for pubkey, _ in self._watched_keys.items() if pubkey not in self._pubkey_index)
+        return ids
 
     def get_validators(self) -> dict[int, WatchedValidator]:
-        """Get all validators in the registry.
+        """Get the watched validators.
 
         Returns:
             dict[int, WatchedValidator]: A dictionary mapping validator indices to WatchedValidator objects.
         """
         return self._validators
 
+    def get_network(self) -> NetworkRegistry:
+        """Get the compact state of the validators which are not watched.
+
+        Returns:
+            NetworkRegistry: The network registry, indexed by validator index.
+        """
+        return self._network
+
+    def get_native_stats(self) -> dict[str, int]:
+        """Get the sizes of the native structures holding the validators.
+
+        Returns:
+            dict[str, int]: Number of entries and memory used by the
+                network registry and the public key index, along with
+                the label table of watched validators.
+        """
+        label_entries = 0
+        labels = set()
+        for validator in self._validators.values():
+            validator_labels = validator.labels
+            label_entries += len(validator_labels)
+            labels.update(validator_labels)
+
+        return {
+            'network_validators': len(self._network),
+            'network_bytes': self._network.memory_usage(),
+            'pubkey_index_entries': len(self._pubkey_index),
+            'pubkey_index_bytes': self._pubkey_index.memory_usage(),
+            'watched_validators': len(self._validators),
+            'labels': len(labels),
+            'label_entries': label_entries,
+        }
+
     def process_config(self, config: Config):
         """Process a configuration update for watched validators.
 
+        Only the changes since the previously applied configuration
+        are processed: keys added, relabeled or no longer watched, and
+        validators whose selectors changed.
+
         Args:
             config: Config
                 Updated configuration containing watched keys.
@@ -293,18 +400,144 @@ class WatchedValidators:
         Returns:
             None
         """
-        for item in config.watched_keys:
-            index = self._pubkey_to_index.get(normalized_public_key(item.public_key), None)
-            if index:
-                validator = self._validators.get(index)
-                if validator:
-                    validator.process_config(item)
+        keys_labels: dict[int, Optional[tuple[str, ...]]] = {}
+
+        watched_keys = config.watched_keys
+        if watched_keys is not self._watched_keys:
+            diff = watched_keys.diff(self._watched_keys)
+
+            for pubkey, labels in diff.added + diff.relabeled:
+                index = self._pubkey_index.get(pubkey)
+                if index is not None:
+                    keys_labels[index] = labels
+
+            for pubkey in diff.removed:
+                index = self._pubkey_index.get(pubkey)
+                if index is not None:
+                    keys_labels[index] = None
+
+            self._watched_keys = watched_keys
+
+        selectors = config.watched_selectors or []
+        changed: set[int] = set()
+        if selectors != self._selectors:
+            self._selectors = selectors
+            if not self._selector_indexes.covers(selectors):
+                logging.info('⚙️ New withdrawal addresses in selectors will be resolved on the next epoch')
+            changed = self._resolve_selectors()
+
+        self._update_labels(keys_labels.keys() | changed, keys_labels)
 
         self.config_initialized = True
 
+    def _resolve_selectors(self) -> set[int]:
+        """Resolve selectors against the current indexes.
+
+        Args:
+            None
+
+        Returns:
+            set[int]
+                Indexes of validators whose selector labels changed.
+        """
+        resolved = {}
+        if self._selectors:
+            resolved = self._selector_indexes.resolve(
+                self._selectors,
+                self._network,
+                self._pubkey_index.get,
+            )
+
+        previous = self._selector_labels
+        self._selector_labels = resolved
+
+        if resolved == previous:
+            return set()
+        return {index for index in resolved.keys() | previous.keys() if resolved.get(index) != previous.get(index)}
+
+    def _update_labels(self, indexes: Iterable[int], keys_labels: dict[int, Optional[tuple[str, ...]]]):
+        """Recompute the labels of validators from keys and selectors.
+
+        Validators which start being watched get a WatchedValidator
+        initialized from the network registry, and those which stop
+        being watched get their state back into the network registry.
+
+        Args:
+            indexes: Iterable[int]
+                Indexes of validators to update.
+            keys_labels: dict[int, Optional[tuple[str, ...]]]
+                Labels from watched keys when already known, None for
+                validators which are not watched by key.
+
+        Returns:
+            None
+        """
+        self.generation += 1
+        for index in indexes:
+            if index not in self._network:
+                continue
+
+            if index in keys_labels:
+                labels = keys_labels[index]
+            elif self._watched_keys is not None:
+                labels = self._watched_keys.get_labels(self._pubkey_index.get_pubkey(index))
+            else:
+                labels = None
+
+            selector_labels = self._selector_labels.get(index)
+            validator = self._validators.get(index)
+            if labels is None and selector_labels is None:
+                if validator is not None:
+                    self._unwatch(index, validator)
+                continue
+
+            if validator is None:
+                validator = self._watch(index)
+            if selector_labels is None:
+                validator.process_config(labels)
+            else:
+                validator.process_config(list(dict.fromkeys((*(labels or ()), *selector_labels))))
+
+    def _watch(self, index: int) -> WatchedValidator:
+        """Start watching a validator of the network registry.
+
+        Args:
+            index: int
+                Index of the validator.
+
+        Returns:
+            WatchedValidator
+                The watched validator, with the state of the network registry.
+        """
+        state = self._network.get(index)
+        state.consensus_pubkey = f'0x{self._pubkey_index.get_pubkey(index).hex()}'
+        validator = WatchedValidator(state)
+        self._validators[index] = validator
+        self._network.set_watched(index, True)
+        return validator
+
+    def _unwatch(self, index: int, validator: WatchedValidator):
+        """Stop watching a validator, its state goes back to the network registry.
+
+        Args:
+            index: int
+                Index of the validator.
+            validator: WatchedValidator
+                The validator which is no longer watched.
+
+        Returns:
+            None
+        """
+        self._network.set(index, validator.state)
+        self._network.set_watched(index, False)
+        del self._validators[index]
+
     def process_epoch(self, validators: Validators):
         """Process validator state data for a new epoch.
 
+        Newly seen validators are labeled from the watched keys, and
+        selectors are resolved again as validators may now match them.
+
         Args:
             validators: Validators
                 New validator state for the epoch from the beacon chain.
@@ -312,14 +545,56 @@ class WatchedValidators:
         Returns:
             None
         """
-        for item in validators.data:
-            validator = self._validators.get(item.index)
-            if validator is None:
-                validator = WatchedValidator()
-                self._validators[item.index] = validator
-                self._pubkey_to_index[normalized_public_key(item.validator.pubkey)] = item.index
+        indexes = None
+        if self._selectors:
+            indexes = SelectorIndexes({s.withdrawal_address for s in self._selectors if s.withdrawal_address is not None})
 
-            validator.process_epoch(item)
+        network = self._network
+        pubkey_index = self._pubkey_index
+        network.reserve(len(validators.data) // self._shard_count + 1)
+        pubkey_index.reserve(len(validators.data) // self._shard_count + 1)
+
+        sharded = self._shard_count > 1
+        new: list[int] = []
+        for item in validators.data:
+            index = item.index
+            if sharded and index % self._shard_count != self._shard_index:
+                continue
+            v = item.validator
+            if index not in network:
+                pubkey_index[v.pubkey] = index
+                new.append(index)
+
+            validator = self._validators.get(index)
+            if validator is not None:
+                validator.process_epoch(item)
+            else:
+                network.update(index, item.status, int(v.withdrawal_credentials[2:4], 16), v.effective_balance, v.slashed, v.activation_epoch)
+
+        # Keys can be watched before they show up on the beacon chain,
+        # i.e: pending deposits. We join on the smallest side: on
+        # startup every validator is new.
+        keys_labels: dict[int, Optional[tuple[str, ...]]] = {}
+        if self._watched_keys is not None and new:
+            if len(new) <= len(self._watched_keys):
+                for index in new:
+                    labels = self._watched_keys.get_labels(pubkey_index.get_pubkey(index))
+                    if labels is not None:
+                        keys_labels[index] = labels
+            else:
+                new_indexes = set(new)
+                for pubkey, labels in self._watched_keys.items():
+                    index = pubkey_index.get(pubkey)
+                    if index in new_indexes:
+                        keys_labels[index] = labels
+
+        changed: set[int] = set()
+        if indexes is not None:
+            indexes.build(validators.data)
+            self._selector_indexes = indexes
+            changed = self._resolve_selectors()
+
+        self._update_labels(keys_labels.keys() | changed, keys_labels)
 
     def process_liveness(self, liveness: ValidatorsLivenessResponse, current_epoch: int):
         """Process validator liveness data.
@@ -333,7 +608,82 @@ class WatchedValidators:
         Returns:
             None
         """
+        indexes: list[int] = []
+        is_live: list[bool] = []
         for item in liveness.data:
             validator = self._validators.get(item.index)
             if validator:
                 validator.process_liveness(item, current_epoch)
+            else:
+                indexes.append(item.index)
+                is_live.append(item.is_live)
+
+        self._network.process_liveness(indexes, is_live, current_epoch)
+
+    def reset_blocks(self):
+        """Reset the block counters of all validators for the next run.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        for validator in self._validators.values():
+            validator.reset_blocks()
+        self._network.reset_blocks()
+
+    def dump(self) -> tuple[bytes, bytes, bytes]:
+        """Serialize the state of all validators.
+
+        The state of watched validators is written back to the network
+        registry so that it is part of the dump, their entries are
+        restored as not watched and picked up again by the next
+        configuration processing, along with their history.
+
+        Args:
+            None
+
+        Returns:
+            tuple[bytes, bytes, bytes]
+                Serialized network registry, public key index and
+                history of the validators which were watched.
+        """
+        for index, validator in self._validators.items():
+            self._network.set(index, validator.state)
+        dump = self._network.dump(), self._pubkey_index.dump(), self._network.dump_history()
+        # Only keep aside the history of validators no longer watched.
+        for index in self._validators:
+            self._network.set_watched(index, True)
+        return dump
+
+    def load(self, network: bytes, pubkey_index: bytes, history: bytes):
+        """Restore the state of all validators from a dump.
+
+        Args:
+            network: bytes
+                Serialized network registry.
+            pubkey_index: bytes
+                Serialized public key index.
+            history: bytes
+                Serialized history of the validators which were watched.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If a dump is invalid, the registry is then left untouched.
+        """
+        registry = NetworkRegistry(self._shard_index, self._shard_count)
+        registry.load(network)
+        registry.load_history(history)
+        index = PubkeyIndex()
+        index.load(pubkey_index)
+
+        self._network = registry
+        self._pubkey_index = index
+        self._validators = {}
+        self._watched_keys = None
+        self._selector_labels = {}
+        self.config_initialized = False
+        self.generation += 1
@@ -0,0 +1,68 @@
+from eth_validator_watcher.models import Validators, ValidatorsLivenessResponse
+
+
+def make_validator(index: int, pubkey: str, status: str = 'active_ongoing', effective_balance: int = 32_000_000_000,
+                   slashed: bool = False, activation_epoch: int = 0, withdrawal_credentials: str = '0x01' + '00' * 31) -> dict:
+    """Build a validator as returned by the beacon.
+
+    Args:
+        index: int
+            Index of the validator.
+        pubkey: str
+            Public key of the validator.
+        status: str
+            Status of the validator.
+        effective_balance: int
+            Effective balance of the validator, in Gwei.
+        slashed: bool
+            Whether the validator was slashed.
+        activation_epoch: int
+            Activation epoch of the validator.
+        withdrawal_credentials: str
+            Withdrawal credentials of the validator.
+
+    Returns:
+        dict
+            The validator, to be passed to make_validators.
+    """
+    return {
+        'index': index,
+        'status': status,
+        'validator': {
+            'pubkey': pubkey,
+            'effective_balance': effective_balance,
+            'slashed': slashed,
+            'activation_epoch': activation_epoch,
+            'withdrawal_credentials': withdrawal_credentials,
+        },
+    }
+
+
+def make_validators(*validators: dict) -> Validators:
+    """Build a response of the validators endpoint.
+
+    Args:
+        validators: dict
+            Validators built with make_validator.
+
+    Returns:
+        Validators
+            The validators response.
+    """
+    return Validators.model_validate({'data': list(validators)})
+
+
+def make_liveness(is_live: dict[int, bool]) -> ValidatorsLivenessResponse:
+    """Build a response of the liveness endpoint.
+
+    Args:
+        is_live: dict[int, bool]
+            Liveness by validator index.
+
+    Returns:
+        ValidatorsLivenessResponse
+            The liveness response.
+    """
+    return ValidatorsLivenessResponse.model_validate({'data': [
+        {'index': index, 'is_live': live} for index, live in is_live.items()
+    ]})
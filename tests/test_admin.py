@@ -0,0 +1,104 @@
+import json
+import marshal
+import threading
+import time
+import tracemalloc
+import unittest
+import urllib.error
+import urllib.request
+
+from eth_validator_watcher.admin import get_loop_profiler, register_native_stats, start_admin_server
+from eth_validator_watcher.watched_validators import WatchedValidators
+
+
+def busy_slot() -> int:
+    return sum(i * i for i in range(10000))
+
+
+class AdminTestCase(unittest.TestCase):
+    """Test case for the admin HTTP server."""
+
+    def setUp(self) -> None:
+        self.url = f'http://127.0.0.1:{start_admin_server(0).server_port}'
+
+    def _get(self, path: str) -> tuple[int, bytes]:
+        try:
+            with urllib.request.urlopen(self.url + path, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def test_profile(self) -> None:
+        """Test the slot loops are profiled during the capture only."""
+        profiler = get_loop_profiler()
+        self.assertIsNone(profiler.start_slot())
+
+        stopped = threading.Event()
+
+        def loop() -> None:
+            while not stopped.is_set():
+                profile = profiler.start_slot()
+                busy_slot()
+                profiler.end_slot(profile)
+                stopped.wait(0.01)
+
+        thread = threading.Thread(target=loop)
+        thread.start()
+        try:
+            status, body = self._get('/debug/profile?seconds=0.3')
+            self.assertEqual(status, 200)
+            self.assertIn(b'busy_slot', body)
+
+            status, body = self._get('/debug/profile?seconds=0.3&format=pstats')
+            self.assertEqual(status, 200)
+            self.assertTrue(any(func[2] == 'busy_slot' for func in marshal.loads(body)))
+        finally:
+            stopped.set()
+            thread.join()
+
+    def test_memory(self) -> None:
+        """Test the top allocations are reported."""
+        status, body = self._get('/debug/memory?seconds=0.1&top=5')
+        self.assertEqual(status, 200)
+        self.assertTrue(body.startswith(b'Traced '))
+
+    def test_memory_busy(self) -> None:
+        """Test overlapping memory captures are rejected."""
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self._get('/debug/memory?seconds=1')))
+        thread.start()
+        try:
+            # Wait for the first capture to trace allocations.
+            for _ in range(100):
+                if tracemalloc.is_tracing():
+                    break
+                time.sleep(0.01)
+            self.assertEqual(self._get('/debug/memory?seconds=0.1')[0], 409)
+        finally:
+            thread.join()
+        self.assertEqual(results[0][0], 200)
+
+    def test_native(self) -> None:
+        """Test the native statistics are reported per network."""
+        register_native_stats('admin-test', WatchedValidators().get_native_stats)
+        status, body = self._get('/debug/native')
+        self.assertEqual(status, 200)
+        stats = json.loads(body)
+        self.assertGreaterEqual(stats['worker_pool']['workers'], 1)
+        self.assertEqual(stats['admin-test']['network_validators'], 0)
+
+    def test_threads(self) -> None:
+        """Test the stacks of all threads are reported."""
+        status, body = self._get('/debug/threads')
+        self.assertEqual(status, 200)
+        self.assertIn(b'Thread admin', body)
+
+    def test_invalid(self) -> None:
+        """Test invalid requests are rejected."""
+        self.assertEqual(self._get('/debug/profile?seconds=3600')[0], 400)
+        self.assertEqual(self._get('/debug/memory?top=x')[0], 400)
+        self.assertEqual(self._get('/debug/unknown')[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
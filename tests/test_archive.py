@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+
+from eth_validator_watcher.archive import ArchiveMissError, ArchiveReader, ArchiveWriter, RecordingAdapter, archive_adapter
+from eth_validator_watcher.beacon import Beacon, BeaconSessions, NoBlockError
+from eth_validator_watcher.models import BlockIdentierType
+
+
+class FakeAdapter(BaseAdapter):
+    """Serves canned responses in order, per path."""
+
+    def __init__(self, responses: dict[str, list[tuple[int, bytes]]]) -> None:
+        super().__init__()
+        self.responses = responses
+        self.sent = 0
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        self.sent += 1
+        status, content = self.responses[request.path_url].pop(0)
+        response = Response()
+        response.status_code = status
+        response.headers['Content-Type'] = 'application/json'
+        response._content = content
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        pass
+
+
+def _header(slot: int) -> bytes:
+    return b'{"data": {"header": {"message": {"slot": "%d"}}}}' % slot
+
+
+class ArchiveTestCase(unittest.TestCase):
+    """Test case for the beacon archive."""
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'beacon.archive')
+        self.fake = FakeAdapter({
+            '/eth/v1/config/spec': [(200, b'{"data": {"SECONDS_PER_SLOT": "12", "SLOTS_PER_EPOCH": "32"}}')],
+            '/eth/v1/beacon/headers/finalized': [(200, _header(64)), (200, _header(96))],
+            '/eth/v1/beacon/headers/100': [(404, b'{"code": 404}')],
+            '/eth/v1/validator/liveness/3': [
+                (200, b'{"data": [{"index": "1", "is_live": true}]}'),
+                (200, b'{"data": [{"index": "2", "is_live": false}]}'),
+            ],
+        })
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _record(self) -> ArchiveWriter:
+        writer = ArchiveWriter(self.path)
+        sessions = BeaconSessions(lambda adapter: RecordingAdapter(self.fake, writer))
+        beacon = Beacon('http://beacon-node:5051', 90, sessions)
+        beacon.get_spec()
+        self.assertEqual(beacon.get_header(BlockIdentierType.FINALIZED).data.header.message.slot, 64)
+        self.assertEqual(beacon.get_header(BlockIdentierType.FINALIZED).data.header.message.slot, 96)
+        self.assertFalse(beacon.has_block_at_slot(100))
+        self.assertTrue(beacon.get_validators_liveness(3, [1]).data[0].is_live)
+        self.assertFalse(beacon.get_validators_liveness(3, [2]).data[0].is_live)
+        return writer
+
+    def _check_replay(self) -> None:
+        beacon = Beacon('http://other-node:5052', 90, BeaconSessions(archive_adapter(self.path, 'replay')))
+        self.assertEqual(beacon.get_spec().data.SLOTS_PER_EPOCH, 32)
+        # Repeated requests are served in order, the last one being repeated.
+        for slot in (64, 96, 96):
+            self.assertEqual(beacon.get_header(BlockIdentierType.FINALIZED).data.header.message.slot, slot)
+        with self.assertRaises(NoBlockError):
+            beacon.get_header(100)
+        # Requests with a body are told apart by their body.
+        self.assertFalse(beacon.get_validators_liveness(3, [2]).data[0].is_live)
+        self.assertTrue(beacon.get_validators_liveness(3, [1]).data[0].is_live)
+        with self.assertRaises(ArchiveMissError):
+            beacon.get_genesis()
+
+    def test_replay(self) -> None:
+        """Test recorded responses are replayed without the network."""
+        self._record().close()
+        sent = self.fake.sent
+        self._check_replay()
+        self.assertEqual(self.fake.sent, sent)
+
+    def test_not_closed(self) -> None:
+        """Test an archive which was not closed is scanned."""
+        writer = self._record()
+        self._check_replay()
+        writer.close()
+
+    def test_deduplicated(self) -> None:
+        """Test identical bodies are stored once."""
+        writer = ArchiveWriter(self.path)
+        body = b'{"data": []}' * 1000
+        for i in range(10):
+            writer.record('GET', f'http://beacon/eth/v1/{i}', None, 200, {}, body)
+        writer.close()
+        self.assertLess(os.path.getsize(self.path), len(body))
+        self.assertEqual(len(ArchiveReader(self.path)), 10)
+
+    def test_invalid(self) -> None:
+        """Test other files are rejected."""
+        with open(self.path, 'wb') as fh:
+            fh.write(b'not an archive')
+        with self.assertRaises(ValueError):
+            ArchiveReader(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from benchmarks.synthetic import BeaconStandIn, SyntheticNetwork
+from eth_validator_watcher.backfill import chunk_epochs, run_backfill
+
+
+class BackfillTestCase(unittest.TestCase):
+    """Test case for the historical backfill."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.network = SyntheticNetwork(2048)
+        cls.stand_in = BeaconStandIn(cls.network).start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.stand_in.stop()
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cfg_path = Path(self.tmp.name) / 'config.yaml'
+        self.cfg_path.write_text(json.dumps({
+            'network': 'backfill',
+            'beacon_url': self.stand_in.url,
+            'watched_keys': [
+                {'public_key': self.network.pubkeys[i], 'labels': [f'operator:{"ab"[i % 2]}']}
+                for i in range(64)
+            ],
+        }))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_chunks(self) -> None:
+        """Test epoch ranges are split in chunks."""
+        self.assertEqual(list(chunk_epochs(10, 14, 2)), [range(10, 12), range(12, 14), range(14, 15)])
+
+    def test_backfill(self) -> None:
+        """Test workers produce the same aggregates as a single process."""
+        output = os.path.join(self.tmp.name, 'sequential.csv')
+        sequential = run_backfill(self.cfg_path, 100, 104, 1, output, chunk_size=2)
+        parallel = run_backfill(self.cfg_path, 100, 104, 2, os.path.join(self.tmp.name, 'parallel.csv'), chunk_size=2)
+        self.assertEqual(sequential, parallel)
+
+        epochs = {a.epoch for a in sequential}
+        self.assertEqual(epochs, set(range(100, 105)))
+        active = [i for i in range(64) if self.network.statuses[i].startswith('active')]
+        expected = {
+            'scope:watched': len(active),
+            'operator:a': len([i for i in active if i % 2 == 0]),
+            'operator:b': len([i for i in active if i % 2 == 1]),
+        }
+        for aggregate in sequential:
+            # Every active validator has one duty per epoch.
+            self.assertEqual(aggregate.performed_duties + aggregate.missed_duties, expected[aggregate.label])
+            self.assertGreater(aggregate.duties_rate, 0.8)
+
+        with open(output) as fh:
+            rows = list(csv.DictReader(fh))
+        self.assertEqual(len(rows), len(sequential))
+        self.assertEqual(rows[0]['epoch'], '100')
+        self.assertIn('duties_rate', rows[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
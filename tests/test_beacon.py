@@ -4,6 +4,8 @@ import unittest
 
 from requests_mock import Mocker
 
+from prometheus_client import REGISTRY
+
 from eth_validator_watcher.beacon import Beacon, NoBlockError
 from eth_validator_watcher.models import (
     BlockIdentierType,
@@ -98,6 +100,34 @@ class BeaconTestCase(unittest.TestCase):
             self.assertEqual(result.data.SECONDS_PER_SLOT, 12)
             self.assertEqual(result.data.SLOTS_PER_EPOCH, 32)
 
+    def test_request_metrics(self) -> None:
+        """Test requests are timed and measured per endpoint."""
+        genesis_data = {
+            "data": {
+                "genesis_time": 1655733600
+            }
+        }
+        with Mocker() as m:
+            m.get(f"{self.beacon_url}/eth/v1/beacon/genesis", json=genesis_data)
+            b = Beacon(self.beacon_url, self.timeout, network='timing-test')
+            b.get_genesis()
+
+        labels = dict(endpoint='genesis', network='timing-test')
+        self.assertEqual(REGISTRY.get_sample_value('eth_watcher_beacon_request_seconds_count', labels), 1)
+        self.assertEqual(REGISTRY.get_sample_value('eth_watcher_beacon_parse_seconds_count', labels), 1)
+        self.assertEqual(REGISTRY.get_sample_value('eth_watcher_beacon_response_bytes_sum', labels), len(json.dumps(genesis_data)))
+
+    def test_request_metrics_disabled(self) -> None:
+        """Test requests are not measured when timings are disabled."""
+        with Mocker() as m:
+            m.get(f"{self.beacon_url}/eth/v1/beacon/genesis", json={"data": {"genesis_time": 1655733600}})
+            b = Beacon(self.beacon_url, self.timeout, network='no-timing-test', timings=False)
+            self.assertEqual(b.get_genesis().data.genesis_time, 1655733600)
+
+        labels = dict(endpoint='genesis', network='no-timing-test')
+        self.assertIsNone(REGISTRY.get_sample_value('eth_watcher_beacon_request_seconds_count', labels))
+        self.assertIsNone(REGISTRY.get_sample_value('eth_watcher_beacon_parse_seconds_count', labels))
+
     def test_get_header(self) -> None:
         """Test get_header() returns the correct header."""
         with open(Path(assets.__file__).parent / "sepolia_header_4996301.json") as fd:
@@ -219,6 +249,36 @@ class BeaconTestCase(unittest.TestCase):
             self.assertFalse(result.data[0].validator.slashed)
             self.assertEqual(result.data[0].validator.withdrawal_credentials, "0xabcdef1234567890abcdef1234567890abcdef1234567890abcdef1234567890")
 
+    def test_get_validators_by_ids(self) -> None:
+        """Test get_validators_by_ids() fetches ids in chunks."""
+        def validators_by_ids(request, context) -> dict:
+            return {
+                "data": [
+                    {
+                        "index": int(i),
+                        "status": "active_ongoing",
+                        "validator": {
+                            "pubkey": f"0x{int(i):096x}",
+                            "effective_balance": 32000000000,
+                            "slashed": False,
+                            "activation_epoch": 100,
+                            "withdrawal_credentials": "0x01" + "00" * 31,
+                        }
+                    } for i in request.json()["ids"]
+                ]
+            }
+
+        ids = [str(i) for i in range(2500)]
+        with Mocker() as m:
+            m.post(f"{self.beacon_url}/eth/v1/beacon/states/{self.slot}/validators", json=validators_by_ids)
+            b = Beacon(self.beacon_url, self.timeout)
+            result = b.get_validators_by_ids(self.slot, ids)
+            self.assertEqual(m.call_count, 3)
+            self.assertEqual([item.index for item in result.data], list(range(2500)))
+
+            self.assertEqual(b.get_validators_by_ids(self.slot, []).data, [])
+            self.assertEqual(m.call_count, 3)
+
     def test_get_rewards(self) -> None:
         """Test get_rewards() returns reward data."""
         epoch = 156134
@@ -252,6 +312,10 @@ class BeaconTestCase(unittest.TestCase):
             self.assertEqual(len(result.data.total_rewards), 1)
             self.assertEqual(result.data.total_rewards[0].validator_index, 42)
 
+            # No validator to fetch rewards for is not all of them.
+            self.assertEqual(b.get_rewards(epoch, []).data.total_rewards, [])
+            self.assertEqual(m.call_count, 1)
+
     def test_get_validators_liveness(self) -> None:
         """Test get_validators_liveness() returns liveness data."""
         epoch = 156134
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import unittest
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.watched_validators import WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+try:
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+
+    from eth_validator_watcher.export import EpochExporter
+except ImportError:
+    pq = None
+
+
+PUBKEY_1 = '0x' + 'aa' * 48
+PUBKEY_2 = '0x' + 'bb' * 48
+PUBKEY_3 = '0x' + 'cc' * 48
+
+
+def _registry() -> WatchedValidators:
+    credentials = '0x02' + '00' * 31
+    validators = WatchedValidators()
+    validators.process_config(Config(watched_keys=[
+        {'public_key': PUBKEY_1, 'labels': ['operator:a']},
+        {'public_key': PUBKEY_2, 'labels': ['operator:a']},
+        {'public_key': PUBKEY_3, 'labels': ['operator:b']},
+    ]))
+    validators.process_epoch(make_validators(
+        make_validator(1, PUBKEY_1, withdrawal_credentials=credentials),
+        make_validator(2, PUBKEY_2, withdrawal_credentials=credentials),
+        make_validator(3, PUBKEY_3, 'active_slashed', slashed=True, withdrawal_credentials=credentials),
+    ))
+    validators.process_liveness(make_liveness({1: True, 2: False, 3: True}), 10)
+    return validators
+
+
+@unittest.skipIf(pq is None, 'pyarrow is not installed')
+class EpochExporterTestCase(unittest.TestCase):
+    """Test case for the columnar export of epochs."""
+
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.validators = _registry()
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def test_build_batch(self) -> None:
+        exporter = EpochExporter(self.dir.name, 'mainnet')
+        exporter.record_proposal(2, True)
+        exporter.record_proposal(2, False)
+        exporter.record_proposal(3, False)
+        exporter.record_proposal(None, True)
+
+        rows = sorted(exporter.build_batch(self.validators, 10).to_pylist(), key=lambda row: row['index'])
+        exporter.close()
+
+        self.assertEqual([row['index'] for row in rows], [1, 2, 3])
+        self.assertEqual({row['epoch'] for row in rows}, {10})
+        self.assertEqual({row['liveness_epoch'] for row in rows}, {9})
+        self.assertEqual({row['rewards_epoch'] for row in rows}, {8})
+        self.assertEqual([row['status'] for row in rows], ['active_ongoing', 'active_ongoing', 'active_slashed'])
+        self.assertEqual([row['slashed'] for row in rows], [False, False, True])
+        self.assertEqual([row['live'] for row in rows], [True, False, True])
+        self.assertEqual([row['withdrawal_type'] for row in rows], [2, 2, 2])
+        self.assertEqual([row['effective_balance'] for row in rows], [32_000_000_000] * 3)
+        self.assertEqual([row['proposed_blocks'] for row in rows], [0, 1, 0])
+        self.assertEqual([row['missed_blocks'] for row in rows], [0, 1, 1])
+        self.assertIn('operator:a', rows[0]['label_set'].split(','))
+        self.assertIn('operator:b', rows[2]['label_set'].split(','))
+        self.assertEqual(rows[0]['label_set'], rows[1]['label_set'])
+
+    def test_parquet_rotation(self) -> None:
+        exporter = EpochExporter(self.dir.name, 'mainnet', 'parquet', rotate_epochs=2)
+        for epoch in range(10, 15):
+            exporter.export(self.validators, epoch)
+        exporter.close()
+
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ['mainnet-10.parquet', 'mainnet-12.parquet', 'mainnet-14.parquet'])
+        parquet = pq.ParquetFile(os.path.join(self.dir.name, 'mainnet-10.parquet'))
+        self.assertEqual(parquet.num_row_groups, 2)
+        self.assertEqual(parquet.read().column('epoch').to_pylist(), [10] * 3 + [11] * 3)
+
+    def test_arrow_ipc(self) -> None:
+        exporter = EpochExporter(self.dir.name, 'holesky', 'arrow')
+        exporter.record_proposal(1, True)
+        exporter.export(self.validators, 20)
+        exporter.export(self.validators, 21)
+        exporter.close()
+
+        with pyarrow.ipc.open_file(os.path.join(self.dir.name, 'holesky-20.arrow')) as reader:
+            self.assertEqual(reader.num_record_batches, 2)
+            first, second = reader.get_batch(0), reader.get_batch(1)
+        # Proposals are forgotten once their epoch is exported.
+        self.assertEqual(sum(first.column('proposed_blocks').to_pylist()), 1)
+        self.assertEqual(sum(second.column('proposed_blocks').to_pylist()), 0)
+
+    def test_unknown_format(self) -> None:
+        with self.assertRaises(ValueError):
+            EpochExporter(self.dir.name, 'mainnet', 'csv')
@@ -0,0 +1,177 @@
+import unittest
+
+from eth_validator_watcher_ext import NetworkRegistry, fast_compute_validator_metrics
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import compute_validator_metrics
+from eth_validator_watcher.utils import LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK
+from eth_validator_watcher.watched_validators import WatchedValidator, WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+
+LABELS = [LABEL_SCOPE_ALL_NETWORK, LABEL_SCOPE_NETWORK]
+
+FIELDS = [
+    'validator_status_count',
+    'validator_status_scaled_count',
+    'validator_type_count',
+    'validator_type_scaled_count',
+    'suboptimal_source_count',
+    'optimal_source_count',
+    'suboptimal_head_count',
+    'validator_slashes',
+    'missed_duties_at_slot_count',
+    'performed_duties_at_slot_scaled_count',
+    'duties_rate',
+    'ideal_consensus_reward',
+    'actual_consensus_reward',
+    'missed_attestations_count',
+    'missed_consecutive_attestations_scaled_count',
+    'proposed_blocks',
+    'missed_blocks_finalized',
+    'future_blocks_proposal',
+]
+
+
+def _network() -> NetworkRegistry:
+    network = NetworkRegistry()
+    network.update(0, 'active_ongoing', 1, 32_000_000_000, False, 0)
+    network.update(1, 'active_ongoing', 2, 64_000_000_000, False, 0)
+    network.update(2, 'active_exiting', 1, 32_000_000_000, True, 0)
+    network.update(3, 'pending_queued', 0, 32_000_000_000, False, 2 ** 64 - 1)
+
+    network.process_liveness([0, 1, 2, 3], [False, True, False, False], 10)
+    network.process_liveness([0, 1, 2, 3], [False, False, True, False], 11)
+    network.process_rewards({32_000_000_000: (10, 20, 5), 64_000_000_000: (20, 40, 10)}, [0, 1, 2], [10, 20, 10], [-20, 40, 20], [0, 10, 5])
+    network.process_duties(100, [0, 1, 2], [True, False, True])
+    network.process_block(0, True)
+    network.process_block_finalized(1, False)
+    network.process_future_block(2)
+    network.process_future_block(3)
+    return network
+
+
+class NetworkRegistryTestCase(unittest.TestCase):
+    """Test case for the compact state of network validators."""
+
+    def test_metrics_match_validators(self) -> None:
+        """Test network metrics are the same as with Validator objects."""
+        network = _network()
+
+        validators = {}
+        for index in network.indexes():
+            state = network.get(index)
+            state.labels = LABELS
+            validators[index] = WatchedValidator(state)
+        validators[0].process_block(99, True)
+        validators[1].process_block_finalized(98, False)
+        validators[2].process_future_block(101)
+        validators[3].process_future_block(102)
+
+        expected = fast_compute_validator_metrics(validators, 100)
+        actual = network.compute(100, LABELS)
+
+        self.assertEqual(actual.keys(), expected.keys())
+        for label in LABELS:
+            for field in FIELDS:
+                self.assertEqual(getattr(actual[label], field), getattr(expected[label], field), field)
+
+        self.assertEqual(actual[LABEL_SCOPE_NETWORK].missed_attestations_count, 2)
+        self.assertEqual(actual[LABEL_SCOPE_NETWORK].validator_status_scaled_count['active_ongoing'], 3.0)
+
+    def test_watched_are_skipped(self) -> None:
+        """Test watched validators are not part of the network metrics."""
+        network = _network()
+        network.set_watched(0, True)
+        network.set_watched(42, True)
+
+        metrics = network.compute(100, LABELS)[LABEL_SCOPE_NETWORK]
+        self.assertEqual(len(network), 4)
+        self.assertTrue(network.is_watched(0))
+        self.assertFalse(network.is_watched(42))
+        self.assertNotIn(42, network)
+        self.assertEqual(metrics.validator_status_count['active_ongoing'], 1)
+        self.assertEqual(metrics.proposed_blocks, 0)
+
+        network.reset_blocks()
+        self.assertEqual(network.compute(100, LABELS)[LABEL_SCOPE_NETWORK].future_blocks_proposal, 0)
+
+    def test_dump(self) -> None:
+        """Test the registry survives a dump/load cycle."""
+        network = _network()
+        network.set_watched(1, True)
+
+        loaded = NetworkRegistry()
+        loaded.load(network.dump())
+        self.assertEqual(loaded.indexes(), [0, 1, 2, 3])
+        self.assertFalse(loaded.is_watched(1))
+        self.assertEqual(loaded.get(2).consensus_status, 'active_exiting')
+        self.assertTrue(loaded.get(0).previous_missed_attestation)
+        self.assertEqual(loaded.get(1).actual_consensus_reward, 70)
+
+        with self.assertRaises(ValueError):
+            loaded.load(b'garbage')
+        with self.assertRaises(KeyError):
+            loaded.get(4)
+
+    def test_watch_transfers_state(self) -> None:
+        """Test the state follows validators which start or stop being watched."""
+        pubkeys = ['0x' + f'{i:02x}' * 48 for i in range(3)]
+        registry = WatchedValidators()
+        registry.process_epoch(make_validators(*(make_validator(index, pubkey) for index, pubkey in enumerate(pubkeys))))
+        liveness = make_liveness({1: False})
+        registry.process_liveness(liveness, 10)
+        registry.process_liveness(liveness, 11)
+
+        registry.process_config(Config(watched_keys=[{'public_key': pubkeys[1], 'labels': ['a']}]))
+        validator = registry.get_validator_by_index(1)
+        self.assertEqual(validator.state.consensus_pubkey, pubkeys[1])
+        self.assertTrue(validator.state.missed_attestation)
+        self.assertTrue(validator.state.previous_missed_attestation)
+
+        metrics = compute_validator_metrics(registry, 0)
+        self.assertEqual(metrics['scope:watched'].missed_consecutive_attestations_count, 1)
+        self.assertEqual(metrics[LABEL_SCOPE_NETWORK].missed_consecutive_attestations_count, 0)
+        self.assertEqual(metrics[LABEL_SCOPE_ALL_NETWORK].validator_status_count['active_ongoing'], 3)
+
+        registry.process_liveness(liveness, 12)
+        self.assertEqual(validator.state.history.live.streak(), 1)
+
+        validator.state.missed_attestation = False
+        registry.process_config(Config(watched_keys=[]))
+        self.assertIsNone(registry.get_validator_by_index(1))
+        self.assertFalse(registry.get_network().get(1).missed_attestation)
+        self.assertEqual(registry.get_indexes(), [0, 1, 2])
+
+        # The history is kept aside until the validator is watched again.
+        registry.process_config(Config(watched_keys=[{'public_key': pubkeys[1], 'labels': ['a']}]))
+        self.assertEqual(registry.get_validator_by_index(1).state.history.live.streak(), 1)
+        self.assertEqual(registry.get_validator_by_index(1).state.history.live.last, 11)
+
+    def test_dump_history(self) -> None:
+        """Test the history kept aside survives a dump/load cycle."""
+        network = _network()
+        validator = network.get(1)
+        for epoch in range(5):
+            validator.record_liveness(epoch, False)
+        network.set(1, validator)
+        network.set(2, network.get(2))
+
+        loaded = NetworkRegistry()
+        loaded.load(network.dump())
+        loaded.load_history(network.dump_history())
+        self.assertEqual(loaded.get(1).history.live.streak(), 5)
+        self.assertEqual(loaded.get(2).history.live.known, 0)
+
+        # Watched validators hold their own history.
+        loaded.set_watched(1, True)
+        self.assertEqual(loaded.get(1).history.live.known, 0)
+
+        with self.assertRaises(ValueError):
+            loaded.load_history(b'garbage')
+        with self.assertRaises(ValueError):
+            NetworkRegistry().load_history(network.dump_history())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import tempfile
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+from eth_validator_watcher_ext import fast_compute_validator_metrics, native_worker_count
+
+from eth_validator_watcher import entrypoint
+from eth_validator_watcher.beacon import Beacon, BeaconSessions
+from eth_validator_watcher.entrypoint import run_networks
+from eth_validator_watcher.watched_validators import WatchedValidator
+
+
+def _validators(n: int) -> dict[int, WatchedValidator]:
+    validators = {}
+    for i in range(n):
+        validator = WatchedValidator()
+        validator.state.labels = ['scope:watched', f'operator:{i % 3}']
+        validator.state.consensus_status = 'active_ongoing'
+        validator.state.consensus_effective_balance = 32_000_000_000
+        validator.state.missed_attestation = i % 4 == 0
+        validators[i] = validator
+    return validators
+
+
+class FakeWatcher:
+    """Stand-in for the watcher of a network."""
+
+    threads: dict[str, str] = {}
+
+    def __init__(self, cfg_path: Path, sessions: BeaconSessions) -> None:
+        self._cfg_path = cfg_path
+        self._sessions = sessions
+
+    def run(self) -> None:
+        if self._cfg_path.stem == 'broken':
+            raise ValueError('beacon unreachable')
+        FakeWatcher.threads[self._cfg_path.stem] = threading.current_thread().name
+
+
+class NetworksTestCase(unittest.TestCase):
+    """Test case for running several networks in one process."""
+
+    def setUp(self) -> None:
+        self._dir = tempfile.TemporaryDirectory()
+        FakeWatcher.threads = {}
+
+    def tearDown(self) -> None:
+        self._dir.cleanup()
+
+    def _config(self, name: str, network: str) -> Path:
+        path = Path(self._dir.name) / f'{name}.yaml'
+        path.write_text(f'network: {network}\nmetrics_port: 8000\n')
+        return path
+
+    def test_concurrent_native_compute(self) -> None:
+        """Test the shared native workers serve concurrent computations."""
+        validators = _validators(10_000)
+        expected = fast_compute_validator_metrics(validators, 0)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda _: fast_compute_validator_metrics(validators, 0), range(16)))
+
+        self.assertGreaterEqual(native_worker_count(), 1)
+        for metrics in results:
+            self.assertEqual(metrics['operator:1'].missed_attestations_count, expected['operator:1'].missed_attestations_count)
+            self.assertEqual(metrics['scope:watched'].validator_status_count, expected['scope:watched'].validator_status_count)
+
+    def test_shared_sessions(self) -> None:
+        """Test beacons of several networks share their HTTP sessions."""
+        sessions = BeaconSessions()
+        mainnet = Beacon('http://mainnet:5051', 10, sessions)
+        hoodi = Beacon('http://hoodi:5051', 10, sessions)
+        self.assertIs(mainnet._http, hoodi._http)
+        self.assertIs(mainnet._http_retry_not_found, hoodi._http_retry_not_found)
+        self.assertIsNot(Beacon('http://mainnet:5051', 10)._http, mainnet._http)
+
+    @patch.object(entrypoint, 'start_metrics_server')
+    @patch.object(entrypoint, 'ValidatorWatcher', FakeWatcher)
+    def test_run_networks(self, start_metrics_server) -> None:
+        """Test each network runs in its own thread."""
+        run_networks([self._config('a', 'mainnet'), self._config('b', 'hoodi')])
+
+        start_metrics_server.assert_called_once_with(8000)
+        self.assertEqual(FakeWatcher.threads, {'a': 'mainnet', 'b': 'hoodi'})
+
+    @patch.object(entrypoint, 'start_metrics_server')
+    @patch.object(entrypoint, 'ValidatorWatcher', FakeWatcher)
+    def test_run_networks_failures(self, start_metrics_server) -> None:
+        """Test invalid setups and failing networks stop the process."""
+        with self.assertRaises(ValueError):
+            run_networks([self._config('a', 'mainnet'), self._config('b', 'mainnet')])
+        start_metrics_server.assert_not_called()
+
+        with self.assertRaisesRegex(RuntimeError, 'hoodi stopped: beacon unreachable'):
+            run_networks([self._config('a', 'mainnet'), self._config('broken', 'hoodi')])
+
+
+if __name__ == "__main__":
+    unittest.main()
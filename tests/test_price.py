@@ -0,0 +1,91 @@
+import json
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_validator_watcher.coinbase import CoinbasePriceSource
+from eth_validator_watcher.metrics import MetricsExporter, SlotMetrics, get_prometheus_metrics
+from eth_validator_watcher.price import PriceFetcher, StaticPriceSource
+
+
+TRADE = {'time': '2024-07-22T15:00:00Z', 'trade_id': 1, 'price': '3456.78', 'size': '0.1', 'side': 'buy'}
+
+
+class CoinbaseHandler(BaseHTTPRequestHandler):
+    """Local stand-in for the Coinbase trades endpoint."""
+
+    status = 200
+    delay = 0.0
+
+    def do_GET(self) -> None:
+        time.sleep(self.delay)
+        body = json.dumps([TRADE]).encode()
+        self.send_response(self.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class PriceTestCase(unittest.TestCase):
+    """Test case for the background price fetcher."""
+
+    def setUp(self) -> None:
+        CoinbaseHandler.status = 200
+        CoinbaseHandler.delay = 0.0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CoinbaseHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/products/ETH-USD/trades'
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_background_refresh(self) -> None:
+        """Test the price is served from the last background refresh."""
+        fetcher = PriceFetcher(StaticPriceSource(1234.5))
+        self.assertEqual(fetcher.get(), 0.0)
+        self.assertIsNone(fetcher.age())
+
+        fetcher.start()
+        self.assertTrue(fetcher.wait(10))
+        self.assertEqual(fetcher.get(), 1234.5)
+        self.assertLess(fetcher.age(), 10)
+        fetcher.stop()
+
+    def test_coinbase(self) -> None:
+        """Test failures and timeouts keep the last known price."""
+        fetcher = PriceFetcher(CoinbasePriceSource(self.url), timeout_sec=0.2)
+        self.assertTrue(fetcher.refresh())
+        self.assertEqual(fetcher.get(), 3456.78)
+
+        CoinbaseHandler.status = 500
+        self.assertFalse(fetcher.refresh())
+
+        CoinbaseHandler.status = 200
+        CoinbaseHandler.delay = 1.0
+        start = time.monotonic()
+        self.assertFalse(fetcher.refresh())
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(fetcher.get(), 3456.78)
+
+    def test_export(self) -> None:
+        """Test the price and its age are exported."""
+        metrics = get_prometheus_metrics()
+        fetcher = PriceFetcher(StaticPriceSource(42.0))
+        fetcher.refresh()
+
+        report = SlotMetrics(epoch=1, slot=32, pending_deposits=(0, 0), pending_consolidations=0, pending_withdrawals=0, metrics={}, epoch_seconds=384)
+        MetricsExporter(metrics, time.monotonic(), fetcher).export('price-test', report)
+
+        self.assertEqual(metrics.eth_current_price_dollars.labels('price-test')._value.get(), 42.0)
+        self.assertLess(metrics.eth_current_price_age_seconds.labels('price-test')._value.get(), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+
+from eth_validator_watcher.models import Header, ProposerDuties, Spec
+from eth_validator_watcher.proposer_schedule import ProposerSchedule
+
+
+def _header(slot: int, parent_root: str) -> Header:
+    return Header.model_validate({'data': {'header': {'message': {'slot': slot, 'parent_root': parent_root}}}})
+
+
+class FakeBeacon:
+    """Serves proposer duties, the proposers depend on the dependent root."""
+
+    def __init__(self) -> None:
+        self.roots = {0: '0x00', 1: '0x01', 2: '0x02', 3: '0x03'}
+        self.calls = []
+
+    def get_proposer_duties(self, epoch: int) -> ProposerDuties:
+        self.calls.append(epoch)
+        root = self.roots[epoch]
+        return ProposerDuties.model_validate({
+            'dependent_root': root,
+            'data': [
+                {'pubkey': '0x', 'validator_index': 100 * epoch + slot + int(root, 16), 'slot': epoch * 4 + slot}
+                for slot in range(4)
+            ],
+        })
+
+
+class ProposerScheduleTestCase(unittest.TestCase):
+    """Test case for the proposer schedule."""
+
+    def setUp(self) -> None:
+        self.spec = Spec.model_validate({'data': {'SECONDS_PER_SLOT': 12, 'SLOTS_PER_EPOCH': 4}})
+        self.beacon = FakeBeacon()
+        self.schedule = ProposerSchedule(self.spec)
+
+    def test_future_proposals(self) -> None:
+        """Test proposals are served from the epochs arrays."""
+        self.schedule.update(self.beacon, 2)
+        self.schedule.update(self.beacon, 3)
+        self.assertEqual(self.beacon.calls, [0, 1])
+
+        self.assertEqual(self.schedule.get_proposer(2), 2)
+        self.assertIsNone(self.schedule.get_proposer(8))
+        self.assertEqual(self.schedule.get_future_proposals(2), {3: 3, 4: 101, 5: 102, 6: 103, 7: 104})
+        self.assertEqual(self.schedule.get_dependent_roots(), {0: '0x00', 1: '0x01'})
+
+        self.schedule.clear(4)
+        self.assertIsNone(self.schedule.get_proposer(3))
+        self.assertIsNone(self.schedule.get_proposer(4))
+        self.assertEqual(self.schedule.get_schedule(), {5: 102, 6: 103, 7: 104})
+        self.assertEqual(self.schedule.get_dependent_roots(), {1: '0x01'})
+
+    def test_reorg(self) -> None:
+        """Test duties are fetched again when the dependent root changes."""
+        self.schedule.update(self.beacon, 0)
+        self.schedule.process_header(self.beacon, 0, None)
+        self.schedule.process_header(self.beacon, 1, _header(1, '0x00'))
+        self.schedule.process_header(self.beacon, 2, _header(2, '0xaa'))
+
+        # Same dependent root: nothing to fetch.
+        self.schedule.update(self.beacon, 4)
+        self.schedule.process_header(self.beacon, 4, _header(4, '0x01'))
+        self.assertEqual(self.beacon.calls, [0, 1, 2])
+
+        # The first block of epoch 2 is on another chain, later blocks
+        # of the epoch don't matter.
+        self.beacon.roots[2] = '0x03'
+        self.schedule.update(self.beacon, 8)
+        self.schedule.process_header(self.beacon, 8, None)
+        self.schedule.process_header(self.beacon, 9, _header(9, '0x03'))
+        self.schedule.process_header(self.beacon, 10, _header(10, '0x04'))
+        self.assertEqual(self.beacon.calls, [0, 1, 2, 3, 2])
+        self.assertEqual(self.schedule.get_proposer(9), 204)
+        self.assertEqual(self.schedule.get_dependent_roots()[2], '0x03')
+
+    def test_first_block_unknown(self) -> None:
+        """Test the parent of a block can't be checked when starting mid-epoch."""
+        self.schedule.load({5: 1, 6: 2})
+        self.schedule.process_header(self.beacon, 5, _header(5, '0x42'))
+        self.schedule.process_header(self.beacon, 8, _header(8, '0x43'))
+        self.assertEqual(self.beacon.calls, [])
+        self.assertEqual(self.schedule.get_dependent_roots(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from eth_validator_watcher_ext import PubkeyIndex
+
+
+PUBKEY_1 = '0x' + 'aa' * 48
+PUBKEY_2 = '0x' + 'Bb' * 48
+
+
+class PubkeyIndexTestCase(unittest.TestCase):
+    """Test case for the native public key index."""
+
+    def test_lookups(self) -> None:
+        """Test hex and raw public keys resolve to the same entry."""
+        index = PubkeyIndex()
+        index[PUBKEY_1] = 1
+        index[bytes.fromhex(PUBKEY_2[2:])] = 2
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get(PUBKEY_1), 1)
+        self.assertEqual(index.get(PUBKEY_1[2:].upper()), 1)
+        self.assertEqual(index.get(bytes.fromhex(PUBKEY_1[2:])), 1)
+        self.assertEqual(index.get(PUBKEY_2.lower()), 2)
+        self.assertEqual(index.get_many([PUBKEY_2, '0x' + 'cc' * 48, 'garbage']), [2, None, None])
+        self.assertIn(PUBKEY_1, index)
+        self.assertNotIn('0x' + 'cc' * 48, index)
+
+        index[PUBKEY_1] = 3
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.get(PUBKEY_1), 3)
+
+    def test_invalid_keys(self) -> None:
+        """Test malformed public keys are rejected."""
+        index = PubkeyIndex()
+        for pubkey in ['0x1234', '0x' + 'zz' * 48, b'\x00' * 47, 42]:
+            with self.assertRaises(ValueError):
+                index[pubkey] = 1
+            self.assertIsNone(index.get(pubkey))
+
+    def test_growth(self) -> None:
+        """Test the table keeps every entry while it grows."""
+        index = PubkeyIndex()
+        index.reserve(10)
+        keys = [i.to_bytes(48, 'little') for i in range(10_000)]
+        for i, key in enumerate(keys):
+            index[key] = i
+        self.assertEqual(len(index), len(keys))
+        self.assertEqual(index.get_many(keys), list(range(len(keys))))
+
+    def test_reverse_lookup_and_dump(self) -> None:
+        """Test keys are found by index and survive a dump/load cycle."""
+        index = PubkeyIndex()
+        index[PUBKEY_1] = 1
+        index[PUBKEY_2] = 2
+        index[PUBKEY_2] = 5
+
+        self.assertEqual(index.get_pubkey(1), bytes.fromhex(PUBKEY_1[2:]))
+        self.assertIsNone(index.get_pubkey(2))
+        self.assertEqual(index.get_pubkey(5), bytes.fromhex(PUBKEY_2[2:]))
+
+        loaded = PubkeyIndex()
+        loaded.load(index.dump())
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.get(PUBKEY_2), 5)
+        self.assertEqual(loaded.get_pubkey(1), bytes.fromhex(PUBKEY_1[2:]))
+
+        with self.assertRaises(ValueError):
+            loaded.load(b'\x01')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import json
+import unittest
+import urllib.error
+import urllib.request
+
+from eth_validator_watcher_ext import RegistryView
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import compute_validator_metrics
+from eth_validator_watcher.query import QueryError, publish_view, query_offenders, query_validator, query_validators, start_query_server
+from eth_validator_watcher.watched_validators import WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+
+def _pubkey(index: int) -> str:
+    return '0x' + f'{index:02x}' * 48
+
+
+def _registry(count: int) -> WatchedValidators:
+    validators = WatchedValidators()
+    validators.process_config(Config(watched_keys=[
+        {'public_key': _pubkey(i), 'labels': [f'operator:{"a" if i % 2 else "b"}']} for i in range(count)
+    ]))
+    validators.process_epoch(make_validators(*(
+        make_validator(i, _pubkey(i), 'active_ongoing' if i < count - 1 else 'exited_unslashed') for i in range(count)
+    )))
+    validators.process_liveness(make_liveness({i: i % 3 != 0 for i in range(count)}), 10)
+    return validators
+
+
+class QueryTestCase(unittest.TestCase):
+    """Test case for the query API."""
+
+    def setUp(self) -> None:
+        self.registry = _registry(10)
+        self.view = RegistryView(self.registry.get_validators(), 320)
+
+    def test_lookup(self) -> None:
+        by_index = query_validator(self.view, '4', {})
+        self.assertEqual(by_index['slot'], 320)
+        self.assertEqual(by_index['data']['pubkey'], _pubkey(4))
+        self.assertIn('operator:b', by_index['data']['labels'])
+
+        by_pubkey = query_validator(self.view, _pubkey(3).upper().replace('0X', '0x'), {'fields': 'index,missed_attestation'})
+        self.assertEqual(by_pubkey['data'], {'index': 3, 'missed_attestation': True})
+
+        with self.assertRaises(QueryError) as e:
+            query_validator(self.view, '42', {})
+        self.assertEqual(e.exception.status, 404)
+        with self.assertRaises(QueryError):
+            query_validator(self.view, '1', {'fields': 'index,secret'})
+
+    def test_filters_and_paging(self) -> None:
+        result = query_validators(self.view, {'label': 'operator:a', 'missed_attestation': 'true', 'fields': 'index'})
+        self.assertEqual(result['total'], 2)
+        self.assertEqual([row['index'] for row in result['data']], [3, 9])
+
+        result = query_validators(self.view, {'status': 'active_ongoing', 'fields': 'index', 'offset': '2', 'limit': '3'})
+        self.assertEqual(result['total'], 9)
+        self.assertEqual([row['index'] for row in result['data']], [2, 3, 4])
+
+        self.assertEqual(query_validators(self.view, {'label': 'operator:c'})['total'], 0)
+        for params in ({'missed': 'true'}, {'missed_attestation': 'yes'}, {'limit': '100000'}, {'index': 'true'}):
+            with self.assertRaises(QueryError):
+                query_validators(self.view, params)
+
+    def test_view_is_consistent(self) -> None:
+        """Test a published view doesn't change with the registry."""
+        self.registry.process_liveness(make_liveness(dict.fromkeys(range(10), False)), 11)
+
+        self.assertEqual(query_validators(self.view, {'missed_attestation': 'true'})['total'], 4)
+        view = RegistryView(self.registry.get_validators(), 352)
+        self.assertEqual(query_validators(view, {'missed_attestation': 'true'})['total'], 10)
+
+    def test_view_update(self) -> None:
+        """Test a view updated with the current state keeps its identities."""
+        generation = self.registry.generation
+        self.registry.process_liveness(make_liveness(dict.fromkeys(range(10), False)), 11)
+        self.assertEqual(self.registry.generation, generation)
+
+        view = self.view.update(self.registry.get_validators(), 352)
+        self.assertEqual(view.slot, 352)
+        self.assertEqual(query_validators(self.view, {'missed_attestation': 'true'})['total'], 4)
+        self.assertEqual(query_validators(view, {'label': 'operator:a', 'missed_attestation': 'true'})['total'], 5)
+        row = query_validator(view, _pubkey(4), {'fields': 'labels,status,missed_attestations_streak'})['data']
+        self.assertEqual(row, {'labels': ['scope:all-network', 'scope:watched', 'operator:b'], 'status': 'active_ongoing', 'missed_attestations_streak': 1})
+
+        # Identities can't be reused once watched validators changed.
+        self.registry.process_config(Config(watched_keys=[{'public_key': _pubkey(1)}]))
+        self.assertGreater(self.registry.generation, generation)
+        with self.assertRaises(ValueError):
+            view.update(self.registry.get_validators(), 384)
+
+    def test_offenders(self) -> None:
+        offenders = {label: m.top_offenders for label, m in compute_validator_metrics(self.registry, 320).items()}
+
+        result = query_offenders(self.view, offenders, {})
+        self.assertEqual(result['label'], 'scope:watched')
+        self.assertEqual([row['index'] for row in result['data']], [0, 3, 6])
+        self.assertEqual(result['data'][0]['missed_attestations_streak'], 1)
+
+        result = query_offenders(self.view, offenders, {'label': 'operator:a', 'limit': '1'})
+        self.assertEqual([row['index'] for row in result['data']], [3])
+        self.assertEqual(query_offenders(self.view, offenders, {'label': 'operator:c'})['data'], [])
+        with self.assertRaises(QueryError):
+            query_offenders(self.view, offenders, {'limit': '1000'})
+
+    def test_server(self) -> None:
+        offenders = {label: m.top_offenders for label, m in compute_validator_metrics(self.registry, 320).items()}
+        publish_view('query-test', self.view, offenders)
+        url = f'http://127.0.0.1:{start_query_server(0, "127.0.0.1").server_port}'
+
+        def get(path: str) -> tuple[int, dict]:
+            try:
+                with urllib.request.urlopen(url + path, timeout=30) as response:
+                    return response.status, json.loads(response.read())
+            except urllib.error.HTTPError as e:
+                return e.code, json.loads(e.read())
+
+        status, body = get('/v1/validators?network=query-test&label=operator:b&fields=index')
+        self.assertEqual(status, 200)
+        self.assertEqual([row['index'] for row in body['data']], [0, 2, 4, 6, 8])
+
+        status, body = get(f'/v1/validators/{_pubkey(7)}?network=query-test')
+        self.assertEqual(status, 200)
+        self.assertEqual(body['data']['index'], 7)
+
+        status, body = get('/v1/labels?network=query-test')
+        self.assertEqual(body['data']['operator:a'], 5)
+
+        status, body = get('/v1/offenders?network=query-test&label=operator:b')
+        self.assertEqual(status, 200)
+        self.assertEqual([row['index'] for row in body['data']], [0, 6])
+
+        self.assertEqual(get('/v1/validators?network=unknown')[0], 404)
+        self.assertEqual(get('/v2/validators?network=query-test')[0], 404)
+        self.assertEqual(get('/v1/validators?network=query-test&limit=x')[0], 400)
@@ -0,0 +1,135 @@
+import time
+import unittest
+
+from array import array
+
+from eth_validator_watcher_ext import MetricsByLabel
+
+from eth_validator_watcher.metrics import MetricsExporter, SlotMetrics, get_prometheus_metrics
+from eth_validator_watcher.price import PriceFetcher, StaticPriceSource
+from eth_validator_watcher.rollups import COUNTERS, MISSED_BLOCKS, PROPOSED_BLOCKS, LabelRollups, RollupWindow
+
+
+def _counters(value: float) -> array:
+    return array('d', [value] * COUNTERS)
+
+
+def _metrics(active: int, missed: int, proposed: int, performed: int, missed_duties: int) -> MetricsByLabel:
+    m = MetricsByLabel()
+    m.optimal_source_count = active
+    m.missed_attestations_count = missed
+    m.ideal_consensus_reward = 100.0 * active
+    m.actual_consensus_reward = 100.0 * (active - missed)
+    m.proposed_blocks = proposed
+    m.performed_duties_at_slot_count = performed
+    m.missed_duties_at_slot_count = missed_duties
+    return m
+
+
+class RollupsTestCase(unittest.TestCase):
+    """Test case for the windowed rollups."""
+
+    def test_window_size(self) -> None:
+        # 1h, 24h and 7d of mainnet epochs.
+        for epochs, bucket_epochs, size in [(9, 1, 9), (225, 10, 23), (1575, 66, 24), (0, 1, 1)]:
+            window = RollupWindow(epochs)
+            self.assertEqual((window.bucket_epochs, window.size), (bucket_epochs, size))
+
+    def test_window_slides(self) -> None:
+        window = RollupWindow(3)
+        for epoch in range(5):
+            window.add(epoch, {'operator:a': _counters(epoch + 1)})
+        self.assertEqual(dict(window.totals())['operator:a'][0], 3 + 4 + 5)
+
+        # After a downtime, only the last epoch is in the window.
+        window.add(10, {'operator:a': _counters(11), 'operator:b': _counters(1)})
+        self.assertEqual({label: c[0] for label, c in window.totals()}, {'operator:a': 11, 'operator:b': 1})
+
+        # Replaying from an earlier time, labels no longer used.
+        window.add(2, {'operator:b': _counters(3)})
+        self.assertEqual({label: c[0] for label, c in window.totals()}, {'operator:b': 3})
+
+    def test_buckets(self) -> None:
+        window = RollupWindow(50)
+        self.assertEqual((window.bucket_epochs, window.size), (3, 17))
+        for epoch in range(59):
+            window.add(epoch, {'operator:a': _counters(1)})
+        # The last bucket is partial: 16 whole buckets and epochs 57-58.
+        self.assertEqual(dict(window.totals())['operator:a'][0], 16 * 3 + 2)
+
+    def test_observe(self) -> None:
+        rollups = LabelRollups(384)
+        self.assertEqual({name: w.size for name, w in rollups.windows.items()}, {'1h': 9, '24h': 23, '7d': 24})
+
+        for slot in range(32):
+            self.assertFalse(rollups.observe(1, {'operator:a': _metrics(10, slot // 16, 1, 3, 1)}))
+        self.assertTrue(rollups.observe(2, {'operator:a': _metrics(10, 0, 0, 0, 0)}))
+
+        totals = dict(rollups.windows['1h'].totals())['operator:a']
+        # The last attestations of the epoch, the sum of the proposals.
+        self.assertEqual(list(totals), [10, 1, 1000, 900, 32, 0, 96, 32])
+        self.assertEqual(totals[PROPOSED_BLOCKS], 32)
+        self.assertEqual(totals[MISSED_BLOCKS], 0)
+
+    def test_export(self) -> None:
+        metrics = get_prometheus_metrics()
+        fetcher = PriceFetcher(StaticPriceSource(42.0))
+        exporter = MetricsExporter(metrics, time.monotonic(), fetcher)
+
+        def export(epoch: int, m: dict[str, MetricsByLabel]) -> None:
+            exporter.export('rollups-test', SlotMetrics(
+                epoch=epoch, slot=epoch * 32, pending_deposits=(0, 0), pending_consolidations=0,
+                pending_withdrawals=0, metrics=m, epoch_seconds=384,
+            ))
+
+        export(1, {'operator:a': _metrics(10, 2, 0, 3, 1)})
+        export(2, {'operator:a': _metrics(10, 0, 0, 4, 0)})
+
+        def value(gauge, window: str) -> float:
+            return gauge.labels('operator:a', window, 'rollups-test')._value.get()
+
+        self.assertEqual(value(metrics.eth_rollup_missed_attestations_rate, '7d'), 20.0)
+        self.assertEqual(value(metrics.eth_rollup_consensus_rewards_rate, '1h'), 80.0)
+        self.assertEqual(value(metrics.eth_rollup_duties_rate, '24h'), 0.75)
+
+        # Series of removed labels are removed, new labels are exported
+        # once their first epoch is over.
+        export(3, {'operator:b': _metrics(1, 0, 0, 0, 0)})
+        export(4, {'operator:b': _metrics(1, 0, 0, 0, 0)})
+        samples = [s for s in metrics.eth_rollup_duties_rate.collect()[0].samples if s.labels['network'] == 'rollups-test']
+        self.assertEqual({s.labels['scope'] for s in samples}, {'operator:b'})
+
+        # Labels removed during an epoch are not exported again once it
+        # is over.
+        export(5, {'operator:b': _metrics(1, 0, 0, 0, 0), 'operator:c': _metrics(1, 0, 0, 0, 0)})
+        export(6, {'operator:b': _metrics(1, 0, 0, 0, 0), 'operator:c': _metrics(1, 0, 0, 0, 0)})
+        export(6, {'operator:b': _metrics(1, 0, 0, 0, 0)})
+        export(7, {'operator:b': _metrics(1, 0, 0, 0, 0)})
+        export(8, {'operator:b': _metrics(1, 0, 0, 0, 0)})
+        for gauge in [metrics.eth_rollup_duties_rate, metrics.eth_duties_rate]:
+            samples = [s for s in gauge.collect()[0].samples if s.labels['network'] == 'rollups-test']
+            self.assertEqual({s.labels['scope'] for s in samples}, {'operator:b'})
+
+    def test_remove_before_first_epoch(self) -> None:
+        metrics = get_prometheus_metrics()
+        fetcher = PriceFetcher(StaticPriceSource(42.0))
+        exporter = MetricsExporter(metrics, time.monotonic(), fetcher)
+
+        def export(epoch: int, m: dict[str, MetricsByLabel]) -> None:
+            exporter.export('rollups-remove-test', SlotMetrics(
+                epoch=epoch, slot=epoch * 32, pending_deposits=(0, 0), pending_consolidations=0,
+                pending_withdrawals=0, metrics=m, epoch_seconds=384,
+            ))
+
+        # The label is removed before any of its epochs is over, it
+        # never had rollup series.
+        export(1, {'operator:a': _metrics(10, 2, 0, 3, 1), 'operator:b': _metrics(1, 0, 0, 0, 0)})
+        export(1, {'operator:a': _metrics(10, 2, 0, 3, 1)})
+        export(2, {'operator:a': _metrics(10, 0, 0, 4, 0)})
+
+        samples = [s for s in metrics.eth_rollup_duties_rate.collect()[0].samples if s.labels['network'] == 'rollups-remove-test']
+        self.assertEqual({s.labels['scope'] for s in samples}, {'operator:a'})
+
+
+if __name__ == "__main__":
+    unittest.main()
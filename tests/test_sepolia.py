@@ -27,7 +27,10 @@ def sepolia_test(config_path: str):
     def wrapper(f):
         @wraps(f)
         def _run_test(self, *args, **kwargs):
-            with self.vcr.use_cassette('tests/assets/cassettes/test_sepolia.yaml'):
+            # Proposer duties are fetched again when the first block
+            # of an epoch confirms another dependent root, the beacon
+            # then replays the same recorded duties.
+            with self.vcr.use_cassette('tests/assets/cassettes/test_sepolia.yaml', allow_playback_repeats=True):
 
                 self.watcher = ValidatorWatcher(
                     Path(assets.__file__).parent / config_path
@@ -0,0 +1,141 @@
+import multiprocessing
+import tempfile
+import unittest
+
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+
+from eth_validator_watcher_ext import deserialize_validator_metrics, serialize_validator_metrics
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import SlotMetrics, compute_validator_metrics
+from eth_validator_watcher.shards import ShardCoordinator, ShardWorker, decode_report, encode_report, run_sharded
+from eth_validator_watcher.watched_validators import WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+
+SLOT = 100
+VALIDATORS = 50
+SHARDS = 3
+
+
+def _pubkey(index: int) -> str:
+    return '0x' + index.to_bytes(48, 'big').hex()
+
+
+def _registry(shard_index: int = 0, shard_count: int = 1) -> WatchedValidators:
+    registry = WatchedValidators(shard_index, shard_count)
+    registry.process_config(Config(watched_keys=[
+        {'public_key': _pubkey(i), 'labels': [f'operator:{i % 2}']} for i in range(0, VALIDATORS, 3)
+    ]))
+    registry.process_epoch(make_validators(*(
+        make_validator(i, _pubkey(i), 'active_ongoing' if i % 7 else 'exited_unslashed',
+                       effective_balance=32_000_000_000 * (1 + i % 2), slashed=i == 7)
+        for i in range(VALIDATORS)
+    )))
+    registry.process_liveness(make_liveness({i: i % 5 != 0 for i in range(VALIDATORS)}), 10)
+    return registry
+
+
+def _report(registry: WatchedValidators) -> SlotMetrics:
+    return SlotMetrics(
+        epoch=SLOT // 32,
+        slot=SLOT,
+        pending_deposits=(3, 96_000_000_000),
+        pending_consolidations=1,
+        pending_withdrawals=2,
+        metrics=compute_validator_metrics(registry, SLOT),
+        epoch_seconds=384,
+    )
+
+
+def _run_worker(index: int, count: int, conn: Connection) -> None:
+    ShardWorker(index, count, conn).send(_report(_registry(index, count)))
+    conn.close()
+
+
+class ShardsTestCase(unittest.TestCase):
+    """Test case for the sharded mode."""
+
+    def test_encoding(self) -> None:
+        """Test partial metrics survive the binary encoding."""
+        report = _report(_registry())
+
+        metrics = deserialize_validator_metrics(serialize_validator_metrics(report.metrics))
+        self.assertEqual(metrics.keys(), report.metrics.keys())
+        self.assertEqual(metrics['scope:watched'].validator_status_count, report.metrics['scope:watched'].validator_status_count)
+        self.assertEqual(metrics['scope:watched'].details_missed_attestations, report.metrics['scope:watched'].details_missed_attestations)
+
+        shard, decoded = decode_report(encode_report(2, report))
+        self.assertEqual(shard, 2)
+        self.assertEqual(decoded.slot, SLOT)
+        self.assertEqual(decoded.pending_deposits, (3, 96_000_000_000))
+        self.assertEqual(decoded.epoch_seconds, 384)
+
+        with self.assertRaises(ValueError):
+            deserialize_validator_metrics(serialize_validator_metrics(report.metrics)[:-1])
+
+    def test_coordinator_waits_for_all_shards(self) -> None:
+        """Test a slot is merged once every shard reported it."""
+        coordinator = ShardCoordinator(2)
+        report = _report(_registry(0, 2))
+
+        self.assertIsNone(coordinator.receive(encode_report(0, report)))
+        self.assertIsNone(coordinator.receive(encode_report(0, report)))
+        self.assertIsNotNone(coordinator.receive(encode_report(1, report)))
+        self.assertIsNone(coordinator.receive(encode_report(1, report)))
+
+    def test_local_processes(self) -> None:
+        """Test metrics merged from shard processes match a single process."""
+        ctx = multiprocessing.get_context('spawn')
+        readers = []
+        processes = []
+        for index in range(SHARDS):
+            reader, writer = ctx.Pipe(duplex=False)
+            process = ctx.Process(target=_run_worker, args=(index, SHARDS, writer))
+            process.start()
+            writer.close()
+            readers.append(reader)
+            processes.append(process)
+
+        coordinator = ShardCoordinator(SHARDS)
+        merged = None
+        while readers:
+            for reader in wait(readers, timeout=60):
+                try:
+                    merged = coordinator.receive(reader.recv_bytes()) or merged
+                except EOFError:
+                    readers.remove(reader)
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        expected = _report(_registry()).metrics
+        self.assertIsNotNone(merged)
+        self.assertEqual(merged.pending_consolidations, 1)
+        self.assertEqual(merged.metrics.keys(), expected.keys())
+        for label, m in expected.items():
+            actual = merged.metrics[label]
+            self.assertEqual(actual.validator_status_count, m.validator_status_count, label)
+            self.assertEqual(actual.validator_status_scaled_count, m.validator_status_scaled_count, label)
+            self.assertEqual(actual.validator_type_count, m.validator_type_count, label)
+            self.assertEqual(actual.validator_slashes, m.validator_slashes, label)
+            self.assertEqual(actual.missed_attestations_count, m.missed_attestations_count, label)
+            self.assertEqual(actual.duties_rate, m.duties_rate, label)
+
+    def test_reject_archive_recording(self) -> None:
+        """Test shards can't record a beacon archive."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'config.yaml'
+            path.write_text(
+                'beacon_url: http://localhost:5051/\n'
+                f'beacon_archive_path: {tmp}/archive\n'
+                'beacon_archive_mode: record\n'
+            )
+            with self.assertRaises(ValueError):
+                run_sharded(path, SHARDS)
+            self.assertFalse((Path(tmp) / 'archive').exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
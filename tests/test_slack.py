@@ -0,0 +1,109 @@
+import threading
+import unittest
+
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web import SlackResponse
+
+from eth_validator_watcher.metrics import get_prometheus_metrics
+from eth_validator_watcher.slack import SLACK_MAX_LINES, SlackNotifier
+
+
+def _response(status_code: int, error: str) -> SlackResponse:
+    return SlackResponse(
+        client=None,
+        http_verb='POST',
+        api_url='https://slack.com/api/chat.postMessage',
+        req_args={},
+        data={'ok': False, 'error': error},
+        headers={'Retry-After': '3'},
+        status_code=status_code,
+    )
+
+
+class FakeClient:
+    """Records messages, can be rate limited or blocked."""
+
+    def __init__(self, rate_limited: int = 0) -> None:
+        self.messages = []
+        self.rate_limited = rate_limited
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+
+    def chat_postMessage(self, channel: str, text: str) -> None:
+        self.unblocked.wait()
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise SlackApiError('ratelimited', _response(429, 'ratelimited'))
+        if text == 'invalid':
+            raise SlackApiError('invalid', _response(200, 'invalid_blocks'))
+        self.messages.append((channel, text))
+
+
+class SlackNotifierTestCase(unittest.TestCase):
+    """Test case for the background slack notifications."""
+
+    def setUp(self) -> None:
+        self.metrics = get_prometheus_metrics()
+        self.sleeps = []
+
+    def _notifier(self, client: FakeClient, channel: str, **kwargs) -> SlackNotifier:
+        return SlackNotifier(client, channel, self.metrics, min_interval_sec=0, sleep=self.sleeps.append, **kwargs)
+
+    def _value(self, metric, channel: str) -> float:
+        return metric.labels(channel)._value.get()
+
+    def test_coalesce(self) -> None:
+        """Test events of the same kind are sent as a single message."""
+        client = FakeClient()
+        notifier = self._notifier(client, '#coalesce', window_sec=60)
+        notifier.notify('🚀 started')
+        for i in range(SLACK_MAX_LINES + 2):
+            notifier.notify(f'😩 missed block {i}', '😩 missed')
+        notifier.notify('🏅 proposed block', '🏅 proposed')
+        notifier.close(10)
+
+        texts = [text for _, text in client.messages]
+        self.assertEqual(texts[0], '🚀 started')
+        self.assertEqual(len(texts), 3)
+        missed = next(text for text in texts if text.startswith('😩'))
+        self.assertEqual(len(missed.splitlines()), SLACK_MAX_LINES + 1)
+        self.assertTrue(missed.endswith('… and 2 more'))
+        self.assertIn('🏅 proposed block', texts)
+        self.assertEqual(self._value(self.metrics.eth_watcher_slack_sent_total, '#coalesce'), 3)
+
+    def test_rate_limited(self) -> None:
+        """Test rate limited messages are retried after the delay asked by Slack."""
+        client = FakeClient(rate_limited=2)
+        notifier = self._notifier(client, '#rate-limited')
+        notifier.notify('hello')
+        notifier.notify('invalid')
+        notifier.close(10)
+
+        self.assertEqual(client.messages, [('#rate-limited', 'hello')])
+        self.assertEqual(self.sleeps.count(3.0), 2)
+        self.assertEqual(self._value(self.metrics.eth_watcher_slack_rate_limited_total, '#rate-limited'), 2)
+        self.assertEqual(self._value(self.metrics.eth_watcher_slack_dropped_total, '#rate-limited'), 1)
+
+    def test_queue_full(self) -> None:
+        """Test notifications are dropped instead of blocking when the queue is full."""
+        client = FakeClient()
+        client.unblocked.clear()
+        notifier = self._notifier(client, '#full', queue_size=2)
+
+        # The first message is being sent, blocked by the client.
+        notifier.notify('first')
+        while self._value(self.metrics.eth_watcher_slack_queue_depth, '#full') != 0:
+            pass
+        for i in range(5):
+            notifier.notify(f'message {i}')
+
+        self.assertEqual(self._value(self.metrics.eth_watcher_slack_queue_depth, '#full'), 2)
+        self.assertEqual(self._value(self.metrics.eth_watcher_slack_dropped_total, '#full'), 3)
+
+        client.unblocked.set()
+        notifier.close(10)
+        self.assertEqual([text for _, text in client.messages], ['first', 'message 0', 'message 1'])
+
+
+if __name__ == "__main__":
+    unittest.main()
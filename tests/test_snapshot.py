@@ -0,0 +1,119 @@
+import tempfile
+import unittest
+
+from pathlib import Path
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import compute_validator_metrics, get_prometheus_metrics
+from eth_validator_watcher.models import Spec
+from eth_validator_watcher.proposer_schedule import ProposerSchedule
+from eth_validator_watcher.snapshot import SnapshotHeader, load_snapshot, save_snapshot
+from eth_validator_watcher.watched_validators import WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+
+PUBKEY_1 = '0x' + 'aa' * 48
+PUBKEY_2 = '0x' + 'bb' * 48
+
+
+class SnapshotTestCase(unittest.TestCase):
+    """Test case for the warm-start snapshot."""
+
+    def setUp(self) -> None:
+        self.spec = Spec.model_validate({'data': {'SECONDS_PER_SLOT': 12, 'SLOTS_PER_EPOCH': 32}})
+        self.metrics = get_prometheus_metrics()
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = str(Path(self.dir.name) / 'snapshot.bin')
+
+    def tearDown(self) -> None:
+        self.dir.cleanup()
+
+    def _save(self, network: str = 'mainnet', epoch: int = 10) -> None:
+        validators = WatchedValidators()
+        validators.process_epoch(make_validators(
+            make_validator(1, PUBKEY_1),
+            make_validator(2, PUBKEY_2, 'exited_unslashed'),
+        ))
+        validators.process_config(Config(watched_keys=[{'public_key': PUBKEY_1}]))
+        liveness = make_liveness({1: False})
+        for liveness_epoch in range(epoch - 4, epoch + 1):
+            validators.process_liveness(liveness, liveness_epoch)
+
+        schedule = ProposerSchedule(self.spec)
+        schedule.load({320: 1, 321: 2}, {10: '0xabcd'})
+
+        header = SnapshotHeader(network=network, epoch=epoch, last_processed_finalized_slot=300, liveness_epoch=epoch)
+        save_snapshot(self.path, header, validators, schedule, self.metrics)
+
+    def test_roundtrip(self) -> None:
+        """Test the registry and schedule survive a save/load cycle."""
+        self._save()
+
+        validators = WatchedValidators()
+        schedule = ProposerSchedule(self.spec)
+        header = load_snapshot(self.path, validators, schedule, self.metrics, 'mainnet', 9)
+
+        self.assertEqual(header.epoch, 10)
+        self.assertEqual(header.last_processed_finalized_slot, 300)
+        self.assertEqual(header.liveness_epoch, 10)
+        self.assertIsNone(header.rewards_epoch)
+
+        # Validators are restored as not watched until the
+        # configuration is processed again.
+        self.assertIsNone(validators.get_validator_by_pubkey(PUBKEY_1))
+        self.assertFalse(validators.config_initialized)
+        validators.process_config(Config(watched_keys=[{'public_key': PUBKEY_1}]))
+
+        v = validators.get_validator_by_pubkey(PUBKEY_1)
+        self.assertIsNotNone(v)
+        self.assertEqual(v.state.consensus_pubkey, PUBKEY_1)
+        self.assertEqual(v.state.consensus_index, 1)
+        self.assertEqual(v.state.consensus_status, 'active_ongoing')
+        self.assertEqual(v.state.consensus_type, 1)
+        self.assertEqual(v.effective_balance, 32_000_000_000)
+        self.assertTrue(v.state.missed_attestation)
+        self.assertTrue(v.state.previous_missed_attestation)
+        self.assertEqual(v.state.history.live.streak(), 5)
+        self.assertEqual(v.state.history.live.last, 9)
+
+        m = compute_validator_metrics(validators, 0)['scope:watched']
+        self.assertEqual(m.missed_attestations_streak_max, 5)
+        self.assertEqual(m.missed_attestations_window_count, 1)
+
+        self.assertIsNone(validators.get_validator_by_index(2))
+        v = validators.get_network().get(2)
+        self.assertEqual(v.consensus_status, 'exited_unslashed')
+        self.assertFalse(v.missed_attestation)
+        self.assertEqual(validators.get_indexes(), [1, 2])
+
+        self.assertEqual(schedule.get_proposer(320), 1)
+        self.assertEqual(schedule.get_proposer(321), 2)
+        self.assertEqual(schedule.get_dependent_roots(), {10: '0xabcd'})
+
+    def test_stale_snapshot(self) -> None:
+        """Test snapshots from another network or too old are ignored."""
+        self._save(network='hoodi', epoch=10)
+
+        validators = WatchedValidators()
+        schedule = ProposerSchedule(self.spec)
+        self.assertIsNone(load_snapshot(self.path, validators, schedule, self.metrics, 'mainnet', 9))
+        self.assertIsNone(load_snapshot(self.path, validators, schedule, self.metrics, 'hoodi', 11))
+        self.assertEqual(validators.get_indexes(), [])
+
+    def test_missing_snapshot(self) -> None:
+        """Test a missing snapshot is not an error."""
+        validators = WatchedValidators()
+        schedule = ProposerSchedule(self.spec)
+        self.assertIsNone(load_snapshot(self.path, validators, schedule, self.metrics, 'mainnet', 0))
+
+    def test_truncated_snapshot(self) -> None:
+        """Test empty or truncated snapshots are ignored."""
+        validators = WatchedValidators()
+        schedule = ProposerSchedule(self.spec)
+        for content in (b'', b'EVWS'):
+            Path(self.path).write_bytes(content)
+            self.assertIsNone(load_snapshot(self.path, validators, schedule, self.metrics, 'mainnet', 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
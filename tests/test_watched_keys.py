@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+
+import pytest
+
+from eth_validator_watcher.config import load_config
+from eth_validator_watcher.watched_keys import MappedWatchedKeys, WatchedKeys, pubkey_to_bytes, save_watched_keys_file
+
+
+PUBKEY_1 = '0x' + 'aa' * 48
+PUBKEY_2 = 'BB' * 48
+PUBKEY_3 = '0x' + 'cc' * 48
+
+
+def _write(content: str, suffix: str) -> str:
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    with os.fdopen(fd, 'w') as fh:
+        fh.write(content)
+    return path
+
+
+def test_json_config() -> None:
+    path = _write(json.dumps({
+        'network': 'hoodi',
+        'watched_keys': [
+            {'public_key': PUBKEY_1, 'labels': ['operator:kiln']},
+            {'public_key': PUBKEY_2, 'labels': ['operator:kiln']},
+            {'public_key': PUBKEY_3},
+        ],
+    }), '.json')
+    config = load_config(path)
+    os.unlink(path)
+
+    assert config.network == 'hoodi'
+    assert len(config.watched_keys) == 3
+    assert config.watched_keys.get_labels(pubkey_to_bytes(PUBKEY_1)) == ('operator:kiln',)
+    assert config.watched_keys.get_labels(pubkey_to_bytes(PUBKEY_2)) == ('operator:kiln',)
+    assert config.watched_keys.get_labels(pubkey_to_bytes(PUBKEY_3)) == ()
+    assert config.watched_keys.label_sets() == [('operator:kiln',), ()]
+
+
+def test_yaml_and_json_are_equivalent() -> None:
+    entries = [{'public_key': PUBKEY_1, 'labels': ['a', 'b']}, {'public_key': PUBKEY_2}]
+    json_path = _write(json.dumps({'watched_keys': entries}), '.json')
+    yaml_path = _write('watched_keys:\n' + ''.join(
+        f"  - public_key: '{e['public_key']}'\n" + (f"    labels: {json.dumps(e['labels'])}\n" if 'labels' in e else '')
+        for e in entries
+    ), '.yaml')
+
+    assert load_config(json_path).watched_keys == load_config(yaml_path).watched_keys
+
+    os.unlink(json_path)
+    os.unlink(yaml_path)
+
+
+def test_watched_keys_from_env() -> None:
+    environ = os.environ.copy()
+    os.environ['eth_watcher_watched_keys'] = json.dumps([{'public_key': PUBKEY_3, 'labels': ['env']}])
+
+    path = _write(json.dumps({'watched_keys': [{'public_key': PUBKEY_1}]}), '.json')
+    config = load_config(path)
+    os.unlink(path)
+
+    assert [k.public_key for k in config.watched_keys] == [PUBKEY_3]
+    assert [k.labels for k in config.watched_keys] == [['env']]
+
+    os.environ.clear()
+    os.environ.update(environ)
+
+
+def test_invalid_public_key() -> None:
+    with pytest.raises(ValueError):
+        WatchedKeys.from_entries([{'public_key': '0x1234'}])
+    with pytest.raises(ValueError):
+        WatchedKeys.from_entries([{'public_key': 'zz' * 48}])
+    with pytest.raises(ValueError):
+        WatchedKeys.from_entries([{'labels': ['a']}])
+    with pytest.raises(ValueError):
+        WatchedKeys.from_entries([{'public_key': PUBKEY_1, 'labels': 'a'}])
+
+
+def test_diff() -> None:
+    previous = WatchedKeys.from_entries([
+        {'public_key': PUBKEY_1, 'labels': ['a']},
+        {'public_key': PUBKEY_2, 'labels': ['b']},
+    ])
+    current = WatchedKeys.from_entries([
+        {'public_key': PUBKEY_2, 'labels': ['c']},
+        {'public_key': PUBKEY_3},
+    ])
+
+    diff = current.diff(previous)
+    assert diff.added == [(pubkey_to_bytes(PUBKEY_3), ())]
+    assert diff.removed == [pubkey_to_bytes(PUBKEY_1)]
+    assert diff.relabeled == [(pubkey_to_bytes(PUBKEY_2), ('c',))]
+
+    assert len(current.diff(current)) == 0
+    assert len(current.diff(None)) == 2
+
+
+def test_watched_keys_file() -> None:
+    keys = WatchedKeys.from_entries([
+        {'public_key': PUBKEY_3, 'labels': ['a']},
+        {'public_key': PUBKEY_1, 'labels': ['a', 'b']},
+        {'public_key': PUBKEY_2},
+    ])
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    save_watched_keys_file(path, keys)
+
+    mapped = MappedWatchedKeys(path)
+    assert len(mapped) == 3
+    assert mapped == keys
+    assert [pubkey for pubkey, _ in mapped.items()] == sorted(pubkey for pubkey, _ in keys.items())
+    assert mapped.get_labels(pubkey_to_bytes(PUBKEY_1)) == ('a', 'b')
+    assert mapped.get_labels(pubkey_to_bytes(PUBKEY_2)) == ()
+    assert mapped.get_labels(b'\x00' * 48) is None
+    assert b'\xff' * 48 not in mapped
+
+    # Diffs between two mapped files are a merge of sorted keys.
+    save_watched_keys_file(path, WatchedKeys.from_entries([
+        {'public_key': PUBKEY_1, 'labels': ['c']},
+        {'public_key': PUBKEY_2},
+    ]))
+    diff = MappedWatchedKeys(path).diff(mapped)
+    assert diff.added == []
+    assert diff.removed == [pubkey_to_bytes(PUBKEY_3)]
+    assert diff.relabeled == [(pubkey_to_bytes(PUBKEY_1), ('c',))]
+
+    os.unlink(path)
+
+
+def test_watched_keys_file_config() -> None:
+    fd, keys_path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    save_watched_keys_file(keys_path, WatchedKeys.from_entries([{'public_key': PUBKEY_1, 'labels': ['a']}]))
+
+    path = _write(json.dumps({'watched_keys_file': keys_path}), '.json')
+    config = load_config(path)
+    assert isinstance(config.watched_keys, MappedWatchedKeys)
+    assert config.watched_keys.get_labels(pubkey_to_bytes(PUBKEY_1)) == ('a',)
+    os.unlink(path)
+
+    path = _write(json.dumps({'watched_keys_file': keys_path, 'watched_keys': [{'public_key': PUBKEY_2}]}), '.json')
+    with pytest.raises(ValueError):
+        load_config(path)
+    os.unlink(path)
+    os.unlink(keys_path)
@@ -0,0 +1,267 @@
+import os
+import tempfile
+import unittest
+
+from eth_validator_watcher_ext import (
+    HISTORY_EPOCHS,
+    TOP_OFFENDERS,
+    deserialize_validator_metrics,
+    fast_compute_validator_metrics,
+    merge_validator_metrics,
+    serialize_validator_metrics,
+)
+
+from eth_validator_watcher.config import Config
+from eth_validator_watcher.metrics import DistributionCollector, compute_validator_metrics
+from eth_validator_watcher.models import Rewards
+from eth_validator_watcher.watched_validators import WatchedValidators
+from tests import make_liveness, make_validator, make_validators
+
+
+PUBKEY_1 = '0x' + 'aa' * 48
+PUBKEY_2 = '0x' + 'bb' * 48
+PUBKEY_3 = '0x' + 'cc' * 48
+
+
+ADDRESS_1 = '0x' + '11' * 20
+ADDRESS_2 = '0x' + '22' * 20
+
+
+def _config(watched_keys: list[dict], watched_selectors: list[dict] = None) -> Config:
+    return Config(watched_keys=watched_keys, watched_selectors=watched_selectors)
+
+
+class WatchedValidatorsTestCase(unittest.TestCase):
+    """Test case for the validators registry."""
+
+    def test_process_config_diff(self) -> None:
+        """Test configuration updates apply added, relabeled and removed keys."""
+        registry = WatchedValidators()
+        registry.process_epoch(make_validators(make_validator(0, PUBKEY_1), make_validator(1, PUBKEY_2), make_validator(2, PUBKEY_3)))
+
+        registry.process_config(_config([
+            {'public_key': PUBKEY_1, 'labels': ['a']},
+            {'public_key': PUBKEY_2, 'labels': ['b']},
+        ]))
+        self.assertEqual(registry.get_validator_by_index(0).labels, ['scope:all-network', 'scope:watched', 'a'])
+        self.assertEqual(registry.get_validator_by_index(1).labels, ['scope:all-network', 'scope:watched', 'b'])
+        self.assertIsNone(registry.get_validator_by_index(2))
+
+        registry.process_config(_config([
+            {'public_key': PUBKEY_2, 'labels': ['c']},
+            {'public_key': PUBKEY_3},
+        ]))
+        self.assertIsNone(registry.get_validator_by_index(0))
+        self.assertEqual(registry.get_validator_by_index(1).labels, ['scope:all-network', 'scope:watched', 'c'])
+        self.assertEqual(registry.get_validator_by_index(2).labels, ['scope:all-network', 'scope:watched'])
+
+    def test_new_validator_is_labeled(self) -> None:
+        """Test keys watched before they appear on chain are labeled."""
+        registry = WatchedValidators()
+        registry.process_epoch(make_validators(make_validator(0, PUBKEY_1)))
+        registry.process_config(_config([{'public_key': PUBKEY_2, 'labels': ['late']}]))
+
+        registry.process_epoch(make_validators(make_validator(0, PUBKEY_1), make_validator(1, PUBKEY_2)))
+        self.assertEqual(registry.get_validator_by_pubkey(PUBKEY_2).labels, ['scope:all-network', 'scope:watched', 'late'])
+        self.assertIsNone(registry.get_validator_by_pubkey(PUBKEY_1))
+
+    def test_watched_ids(self) -> None:
+        """Test watched validators are identified by index once known."""
+        registry = WatchedValidators()
+        registry.process_config(_config([{'public_key': PUBKEY_2}, {'public_key': PUBKEY_3}]))
+        registry.process_epoch(make_validators(make_validator(0, PUBKEY_1), make_validator(1, PUBKEY_2)))
+
+        self.assertEqual(registry.get_watched_indexes(), [1])
+        self.assertEqual(registry.get_watched_ids(), ['1', PUBKEY_3])
+
+    def test_selectors(self) -> None:
+        """Test selectors are resolved against the validators state."""
+        fd, keys_file = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as fh:
+            fh.write(f'# external keys\n{PUBKEY_3}\n\n')
+
+        registry = WatchedValidators()
+        registry.process_config(_config([{'public_key': PUBKEY_1, 'labels': ['key']}], [
+            {'withdrawal_address': ADDRESS_1, 'labels': ['addr']},
+            {'credentials_type': 2, 'index_range': [1, 2], 'labels': ['compounding']},
+            {'keys_file': keys_file, 'labels': ['file']},
+        ]))
+        registry.process_epoch(make_validators(
+            make_validator(0, PUBKEY_1, withdrawal_credentials='0x01' + '00' * 11 + ADDRESS_1[2:]),
+            make_validator(1, PUBKEY_2, withdrawal_credentials='0x02' + '00' * 11 + ADDRESS_2[2:]),
+            make_validator(2, PUBKEY_3, withdrawal_credentials='0x00' + '00' * 11 + ADDRESS_1[2:]),
+        ))
+        os.unlink(keys_file)
+
+        self.assertEqual(registry.get_validator_by_index(0).labels, ['scope:all-network', 'scope:watched', 'key', 'addr'])
+        self.assertEqual(registry.get_validator_by_index(1).labels, ['scope:all-network', 'scope:watched', 'compounding'])
+        self.assertEqual(registry.get_validator_by_index(2).labels, ['scope:all-network', 'scope:watched', 'file'])
+
+        registry.process_config(_config([], [{'index_range': [2, 10]}]))
+        self.assertIsNone(registry.get_validator_by_index(0))
+        self.assertIsNone(registry.get_validator_by_index(1))
+        self.assertEqual(registry.get_validator_by_index(2).labels, ['scope:all-network', 'scope:watched'])
+
+    def test_invalid_selectors(self) -> None:
+        """Test selectors without criteria or with bad values are rejected."""
+        for selector in [{'labels': ['a']}, {'withdrawal_address': '0x1234'}, {'index_range': [10, 1]}]:
+            with self.assertRaises(ValueError):
+                _config([], [selector])
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class ValidatorHistoryTestCase(unittest.TestCase):
+    """Test case for the history of watched validators."""
+
+    def setUp(self) -> None:
+        self.registry = WatchedValidators()
+        self.registry.process_config(_config([{'public_key': PUBKEY_1, 'labels': ['operator:a']}, {'public_key': PUBKEY_2, 'labels': ['operator:a']}]))
+        self.registry.process_epoch(make_validators(make_validator(0, PUBKEY_1), make_validator(1, PUBKEY_2)))
+
+    def _liveness(self, epoch: int, *is_live: bool) -> None:
+        self.registry.process_liveness(make_liveness(dict(enumerate(is_live))), epoch + 1)
+
+    def test_liveness(self) -> None:
+        for epoch, live in enumerate([True, False, True, False, False, False]):
+            self._liveness(epoch, live, True)
+        # Processed twice, i.e: on startup, the outcome is overwritten.
+        self._liveness(5, False, True)
+
+        history = self.registry.get_validator_by_index(0).state.history
+        self.assertEqual(history.live.last, 5)
+        self.assertEqual(history.live.missed(64), 4)
+        self.assertEqual(history.live.missed(3), 3)
+        self.assertEqual(history.live.streak(), 3)
+        self.assertEqual(self.registry.get_validator_by_index(1).state.history.live.streak(), 0)
+
+    def test_history_is_bounded(self) -> None:
+        for epoch in range(HISTORY_EPOCHS + 10):
+            self._liveness(epoch, False, epoch % 2 == 0)
+
+        self.assertEqual(self.registry.get_validator_by_index(0).state.history.live.missed(HISTORY_EPOCHS), HISTORY_EPOCHS)
+        self.assertEqual(self.registry.get_validator_by_index(0).state.history.live.streak(), HISTORY_EPOCHS)
+        self.assertEqual(self.registry.get_validator_by_index(1).state.history.live.missed(HISTORY_EPOCHS), HISTORY_EPOCHS // 2)
+
+        # Epochs older than the history are ignored.
+        self._liveness(0, True, True)
+        self.assertEqual(self.registry.get_validator_by_index(0).state.history.live.missed(HISTORY_EPOCHS), HISTORY_EPOCHS)
+
+    def test_rewards_and_duties(self) -> None:
+        validator = self.registry.get_validator_by_index(0)
+        ideal = Rewards.Data.IdealReward(effective_balance=32_000_000_000, source=10, target=20, head=5)
+        validator.process_rewards(ideal, Rewards.Data.TotalReward(validator_index=0, source=10, target=20, head=5), 10)
+        validator.process_rewards(ideal, Rewards.Data.TotalReward(validator_index=0, source=10, target=20, head=0), 11)
+        validator.process_rewards(ideal, Rewards.Data.TotalReward(validator_index=0, source=-10, target=-20, head=0), 12)
+
+        history = validator.state.history
+        self.assertEqual(history.head.missed(64), 2)
+        self.assertEqual(history.source.missed(64), 1)
+        self.assertEqual(history.missed_rewards(64), 5 + 65)
+        self.assertEqual(history.missed_rewards(1), 65)
+
+        validator.process_duties(100, True)
+        validator.process_duties(132, False)
+        validator.process_duties(132, False)
+        validator.process_duties(164, False)
+        self.assertEqual(history.duties.missed(64), 2)
+        self.assertEqual(history.duties.streak(), 2)
+
+    def test_window_metrics(self) -> None:
+        for epoch in range(10):
+            self._liveness(epoch, epoch < 6, epoch % 3 != 0)
+
+        metrics = compute_validator_metrics(self.registry, 0, window_epochs=8, missed_threshold=3)
+
+        m = metrics['operator:a']
+        # Validator 0 missed its 4 last epochs, validator 1 epochs 3, 6 and 9.
+        self.assertEqual(m.missed_attestations_window_count, 2)
+        self.assertEqual(m.missed_attestations_streak_max, 4)
+        self.assertEqual(compute_validator_metrics(self.registry, 0, window_epochs=8, missed_threshold=5)['operator:a'].missed_attestations_window_count, 0)
+        self.assertEqual(compute_validator_metrics(self.registry, 0, window_epochs=3, missed_threshold=3)['operator:a'].missed_attestations_window_count, 1)
+
+    def test_top_offenders(self) -> None:
+        pubkeys = ['0x' + f'{i:02x}' * 48 for i in range(24)]
+        registry = WatchedValidators()
+        registry.process_config(_config([{'public_key': pubkey, 'labels': ['operator:a']} for pubkey in pubkeys]))
+        registry.process_epoch(make_validators(*(make_validator(index, pubkey) for index, pubkey in enumerate(pubkeys))))
+        # Validator i missed its i % 6 last epochs.
+        for epoch in range(8):
+            registry.process_liveness(make_liveness({i: epoch < 8 - i % 6 for i in range(24)}), epoch + 1)
+
+        m = compute_validator_metrics(registry, 0)['operator:a']
+        ranked = [5, 11, 17, 23, 4, 10, 16, 22, 3, 9]
+        self.assertEqual(len(m.top_offenders), TOP_OFFENDERS)
+        self.assertEqual([offender.index for offender in m.top_offenders], ranked)
+        self.assertEqual([offender.streak for offender in m.top_offenders], [5] * 4 + [4] * 4 + [3] * 2)
+        self.assertEqual(m.details_missed_attestations, [pubkeys[i] for i in ranked[:5]])
+
+        # Partials computed over disjoint validators merge to the same ranking.
+        validators = registry.get_validators()
+        partials = [
+            fast_compute_validator_metrics({k: v for k, v in validators.items() if k % 2 == parity}, 0)
+            for parity in (0, 1)
+        ]
+        partials = [deserialize_validator_metrics(serialize_validator_metrics(partial)) for partial in partials]
+        merged = merge_validator_metrics(partials)['operator:a']
+        self.assertEqual([offender.index for offender in merged.top_offenders], ranked)
+        self.assertEqual(merged.details_missed_attestations, m.details_missed_attestations)
+
+    def test_missed_attestations_logged_first(self) -> None:
+        pubkeys = ['0x' + f'{i:02x}' * 48 for i in range(TOP_OFFENDERS + 2)]
+        registry = WatchedValidators()
+        registry.process_config(_config([{'public_key': pubkey, 'labels': ['operator:a']} for pubkey in pubkeys]))
+        registry.process_epoch(make_validators(*(make_validator(index, pubkey) for index, pubkey in enumerate(pubkeys))))
+        # All validators but the last one lost rewards without missing
+        # attestations, the last one just missed its attestation
+        # without any history, i.e: after a restart.
+        ideal = Rewards.Data.IdealReward(effective_balance=32_000_000_000, source=10, target=20, head=5)
+        for i in range(len(pubkeys) - 1):
+            registry.get_validator_by_index(i).process_rewards(
+                ideal, Rewards.Data.TotalReward(validator_index=i, source=10, target=20, head=0), 10)
+        misser = registry.get_validator_by_index(len(pubkeys) - 1)
+        misser.state.missed_attestation = True
+
+        m = compute_validator_metrics(registry, 0)['operator:a']
+        self.assertEqual(m.top_offenders[0].index, misser.state.consensus_index)
+        self.assertEqual(m.top_offenders[0].streak, 0)
+        self.assertEqual(m.details_missed_attestations, [pubkeys[-1]])
+
+    def test_distributions(self) -> None:
+        ideal = Rewards.Data.IdealReward(effective_balance=32_000_000_000, source=10, target=20, head=5)
+        first, second = self.registry.get_validator_by_index(0), self.registry.get_validator_by_index(1)
+        first.process_rewards(ideal, Rewards.Data.TotalReward(validator_index=0, source=10, target=20, head=5), 10)
+        second.process_rewards(ideal, Rewards.Data.TotalReward(validator_index=1, source=10, target=20, head=0), 10)
+        for slot, performed in [(100, True), (132, False), (164, True), (196, True)]:
+            first.process_duties(slot, performed)
+
+        metrics = compute_validator_metrics(self.registry, 0)
+        m = metrics['operator:a']
+        self.assertEqual(m.reward_rate_distribution.count, 2)
+        self.assertAlmostEqual(m.reward_rate_distribution.sum, 1 + 30 / 35)
+        self.assertEqual(m.reward_rate_distribution.buckets[3], 1)
+        self.assertEqual(m.reward_rate_distribution.buckets[8], 1)
+        # Validators without duties in the window are not counted.
+        self.assertEqual(m.duties_rate_distribution.count, 1)
+        self.assertEqual(m.duties_rate_distribution.buckets[2], 1)
+        self.assertEqual(m.effective_balance_distribution.buckets[3], 2)
+        self.assertEqual(m.effective_balance_distribution.sum, 64)
+
+        collector = DistributionCollector()
+        collector.update('test', metrics)
+        families = {family.name: family for family in collector.collect()}
+        samples = {
+            (sample.name, sample.labels.get('le')): sample.value
+            for sample in families['eth_validator_consensus_rewards_rate'].samples
+            if sample.labels['scope'] == 'operator:a'
+        }
+        self.assertEqual(samples[('eth_validator_consensus_rewards_rate_bucket', '0.8')], 0)
+        self.assertEqual(samples[('eth_validator_consensus_rewards_rate_bucket', '0.9')], 1)
+        self.assertEqual(samples[('eth_validator_consensus_rewards_rate_bucket', '1.0')], 2)
+        self.assertEqual(samples[('eth_validator_consensus_rewards_rate_bucket', '+Inf')], 2)
+        self.assertEqual(samples[('eth_validator_consensus_rewards_rate_gcount', None)], 2)
+
+        collector.update('test', {})
+        self.assertEqual([family.samples for family in collector.collect()], [[], [], []])